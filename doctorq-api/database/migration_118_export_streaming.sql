@@ -0,0 +1,47 @@
+-- =====================================================
+-- Migration 118: Exportação em streaming
+-- UC115 - Progresso de jobs, formato NDJSON e índices para cursores
+-- Data: 19/10/2026
+-- =====================================================
+
+-- =====================================================
+-- PROGRESSO DO JOB
+-- =====================================================
+
+ALTER TABLE tb_export_jobs
+    ADD COLUMN IF NOT EXISTS nr_registros_processados INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE tb_export_jobs
+    ALTER COLUMN nr_tamanho_bytes TYPE BIGINT;
+
+COMMENT ON COLUMN tb_export_jobs.nr_registros_processados IS 'Linhas já gravadas no arquivo (progresso do ExportWorker)';
+
+-- =====================================================
+-- FORMATO NDJSON
+-- =====================================================
+
+ALTER TABLE tb_export_jobs DROP CONSTRAINT IF EXISTS tb_export_jobs_tp_formato_check;
+ALTER TABLE tb_export_jobs
+    ADD CONSTRAINT tb_export_jobs_tp_formato_check
+    CHECK (tp_formato IN ('excel', 'csv', 'pdf', 'json', 'ndjson'));
+
+-- =====================================================
+-- ÍNDICES
+-- =====================================================
+
+-- Fila do ExportWorker (SELECT ... WHERE st_export = 'pendente' ORDER BY dt_solicitacao FOR UPDATE SKIP LOCKED)
+CREATE INDEX IF NOT EXISTS idx_export_jobs_fila
+    ON tb_export_jobs(dt_solicitacao)
+    WHERE st_export = 'pendente';
+
+-- Relatórios ordenados por data: o cursor percorre o índice sem sort externo
+CREATE INDEX IF NOT EXISTS idx_agendamentos_clinica_dt
+    ON tb_agendamentos(id_clinica, dt_agendamento, id_agendamento);
+
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_estoque_empresa_dt
+    ON tb_movimentacoes_estoque(id_empresa, dt_criacao);
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 118 aplicada com sucesso!';
+END $$;
@@ -0,0 +1,37 @@
+-- =====================================================
+-- Migration 119: Pipeline de envio de broadcast
+-- UC096 - Checkpoint, lease do worker e índice de pendentes
+-- Data: 19/10/2026
+-- =====================================================
+
+-- =====================================================
+-- CHECKPOINT E LEASE DA CAMPANHA
+-- =====================================================
+
+ALTER TABLE tb_broadcast_campanhas
+    ADD COLUMN IF NOT EXISTS id_checkpoint_destinatario UUID,
+    ADD COLUMN IF NOT EXISTS ds_worker_envio VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS dt_heartbeat_envio TIMESTAMP;
+
+COMMENT ON COLUMN tb_broadcast_campanhas.id_checkpoint_destinatario IS 'Último destinatário gravado pelo BroadcastWorker (retomada por keyset)';
+COMMENT ON COLUMN tb_broadcast_campanhas.ds_worker_envio IS 'Instância do BroadcastWorker que detém o envio';
+COMMENT ON COLUMN tb_broadcast_campanhas.dt_heartbeat_envio IS 'Renovado a cada lote; sem heartbeat o lease expira e outra instância assume';
+
+-- =====================================================
+-- ÍNDICES
+-- =====================================================
+
+-- Lotes por keyset: WHERE id_campanha = ? AND st_envio = 'pendente' AND id_destinatario > ? ORDER BY id_destinatario
+CREATE INDEX IF NOT EXISTS idx_broadcast_destinatarios_pendentes
+    ON tb_broadcast_destinatarios(id_campanha, id_destinatario)
+    WHERE st_envio = 'pendente';
+
+-- Fila do BroadcastWorker (campanhas em processamento / agendadas vencidas)
+CREATE INDEX IF NOT EXISTS idx_broadcast_campanhas_fila
+    ON tb_broadcast_campanhas(st_campanha, dt_agendamento)
+    WHERE st_campanha IN ('agendada', 'processando');
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 119 aplicada com sucesso!';
+END $$;
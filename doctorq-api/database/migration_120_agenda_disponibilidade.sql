@@ -0,0 +1,16 @@
+-- =====================================================
+-- Migration 120: Motor de disponibilidade da agenda
+-- Consultas por intervalo (dt_agendamento >= :inicio AND < :fim) por profissional
+-- Data: 19/10/2026
+-- =====================================================
+
+-- Substitui os filtros DATE(dt_agendamento) = :data, que não usavam índice.
+-- INCLUDE permite montar o bitmap de ocupação só com o índice (index-only scan).
+CREATE INDEX IF NOT EXISTS idx_agendamentos_profissional_dt
+    ON tb_agendamentos(id_profissional, dt_agendamento)
+    INCLUDE (nr_duracao_minutos, ds_status);
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 120 aplicada com sucesso!';
+END $$;
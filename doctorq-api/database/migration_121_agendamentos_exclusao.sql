@@ -0,0 +1,79 @@
+-- =====================================================
+-- Migration 121: Agendamentos sem conflito por constraint de exclusão
+-- Período (tsrange) gerado + EXCLUDE USING gist por profissional
+-- Reservas temporárias de horário (checkout)
+-- Data: 19/10/2026
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- =====================================================
+-- PERÍODO DO AGENDAMENTO
+-- =====================================================
+-- dt_agendamento é TIMESTAMP sem fuso, então o período é tsrange (não tstzrange):
+-- a conversão para timestamptz depende do fuso da sessão e não pode ser gerada.
+
+ALTER TABLE tb_agendamentos
+    ADD COLUMN IF NOT EXISTS tr_periodo TSRANGE
+    GENERATED ALWAYS AS (
+        tsrange(dt_agendamento, dt_agendamento + make_interval(mins => nr_duracao_minutos), '[)')
+    ) STORED;
+
+COMMENT ON COLUMN tb_agendamentos.tr_periodo IS 'Período ocupado [início, fim) - base da constraint de exclusão';
+
+-- Conflitos existentes impedem a criação da constraint: listar antes de falhar
+DO $$
+DECLARE
+    v_conflitos INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO v_conflitos
+    FROM tb_agendamentos a
+    JOIN tb_agendamentos b
+      ON a.id_profissional = b.id_profissional
+     AND a.id_agendamento < b.id_agendamento
+     AND a.tr_periodo && b.tr_periodo
+    WHERE a.ds_status NOT IN ('cancelado', 'nao_compareceu')
+      AND b.ds_status NOT IN ('cancelado', 'nao_compareceu');
+
+    IF v_conflitos > 0 THEN
+        RAISE EXCEPTION 'Existem % pares de agendamentos sobrepostos. Resolva-os (cancelar/remarcar) antes de aplicar a migration 121.', v_conflitos;
+    END IF;
+END $$;
+
+ALTER TABLE tb_agendamentos DROP CONSTRAINT IF EXISTS ex_agendamentos_profissional_periodo;
+ALTER TABLE tb_agendamentos
+    ADD CONSTRAINT ex_agendamentos_profissional_periodo
+    EXCLUDE USING gist (id_profissional WITH =, tr_periodo WITH &&)
+    WHERE (ds_status NOT IN ('cancelado', 'nao_compareceu'));
+
+-- =====================================================
+-- RESERVAS TEMPORÁRIAS DE HORÁRIO
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS tb_agendamento_reservas (
+    id_reserva UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id_profissional UUID NOT NULL REFERENCES tb_profissionais(id_profissional) ON DELETE CASCADE,
+    id_user UUID REFERENCES tb_users(id_user) ON DELETE CASCADE,
+    id_procedimento UUID REFERENCES tb_procedimentos(id_procedimento) ON DELETE SET NULL,
+    dt_agendamento TIMESTAMP NOT NULL,
+    nr_duracao_minutos INTEGER NOT NULL CHECK (nr_duracao_minutos BETWEEN 15 AND 480),
+    tr_periodo TSRANGE GENERATED ALWAYS AS (
+        tsrange(dt_agendamento, dt_agendamento + make_interval(mins => nr_duracao_minutos), '[)')
+    ) STORED,
+    dt_expiracao TIMESTAMP NOT NULL,
+    dt_criacao TIMESTAMP NOT NULL DEFAULT NOW(),
+
+    -- Duas reservas do mesmo profissional nunca se sobrepõem
+    CONSTRAINT ex_agendamento_reservas_periodo
+        EXCLUDE USING gist (id_profissional WITH =, tr_periodo WITH &&)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agendamento_reservas_expiracao
+    ON tb_agendamento_reservas(dt_expiracao);
+
+COMMENT ON TABLE tb_agendamento_reservas IS 'Reservas temporárias de horário durante o checkout (expiram em dt_expiracao)';
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 121 aplicada com sucesso!';
+END $$;
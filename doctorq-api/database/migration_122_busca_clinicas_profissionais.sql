@@ -0,0 +1,97 @@
+-- =====================================================
+-- Migration 122: Busca de clínicas e profissionais
+-- Full-text (português, sem acento) + trigramas nos nomes
+-- Busca por raio/proximidade sobre as coordenadas das clínicas
+-- Índices para paginação keyset (cursor)
+-- Data: 19/10/2026
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS cube;
+CREATE EXTENSION IF NOT EXISTS earthdistance;
+
+-- =====================================================
+-- FUNÇÕES IMUTÁVEIS (utilizáveis em índices e colunas geradas)
+-- =====================================================
+-- unaccent() e array_to_string() são STABLE; os wrappers fixam o dicionário
+-- para que possam aparecer em expressões de índice.
+
+CREATE OR REPLACE FUNCTION f_unaccent(TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+CREATE OR REPLACE FUNCTION f_texto_array(TEXT[])
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$ SELECT COALESCE(array_to_string($1, ' '), '') $$;
+
+-- =====================================================
+-- CLÍNICAS
+-- =====================================================
+
+ALTER TABLE tb_clinicas
+    ADD COLUMN IF NOT EXISTS ts_busca TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese'::regconfig, f_unaccent(COALESCE(nm_clinica, ''))), 'A') ||
+        setweight(to_tsvector('portuguese'::regconfig, f_unaccent(f_texto_array(ds_especialidades))), 'B') ||
+        setweight(to_tsvector('portuguese'::regconfig, f_unaccent(COALESCE(ds_clinica, ''))), 'C')
+    ) STORED;
+
+COMMENT ON COLUMN tb_clinicas.ts_busca IS 'Documento full-text: nome (A), especialidades (B), descrição (C)';
+
+CREATE INDEX IF NOT EXISTS idx_clinicas_ts_busca
+    ON tb_clinicas USING gin (ts_busca);
+
+CREATE INDEX IF NOT EXISTS idx_clinicas_nome_trgm
+    ON tb_clinicas USING gin (f_unaccent(lower(nm_clinica)) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_clinicas_cidade_trgm
+    ON tb_clinicas USING gin (f_unaccent(lower(nm_cidade)) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_clinicas_especialidades
+    ON tb_clinicas USING gin (ds_especialidades);
+
+-- Vizinhos mais próximos / raio: ll_to_earth(lat, lon) com operadores do cube
+CREATE INDEX IF NOT EXISTS idx_clinicas_geo
+    ON tb_clinicas USING gist (ll_to_earth(ds_latitude::float8, ds_longitude::float8))
+    WHERE ds_latitude IS NOT NULL AND ds_longitude IS NOT NULL;
+
+-- Keyset da ordenação padrão (mais recentes)
+CREATE INDEX IF NOT EXISTS idx_clinicas_empresa_recentes
+    ON tb_clinicas (id_empresa, dt_criacao DESC, id_clinica DESC)
+    WHERE st_ativo = TRUE;
+
+-- =====================================================
+-- PROFISSIONAIS
+-- =====================================================
+
+ALTER TABLE tb_profissionais
+    ADD COLUMN IF NOT EXISTS ts_busca TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese'::regconfig, f_unaccent(COALESCE(nm_profissional, ''))), 'A') ||
+        setweight(to_tsvector('portuguese'::regconfig, f_unaccent(f_texto_array(ds_especialidades))), 'A') ||
+        setweight(to_tsvector('portuguese'::regconfig, f_unaccent(COALESCE(ds_biografia, ''))), 'C')
+    ) STORED;
+
+COMMENT ON COLUMN tb_profissionais.ts_busca IS 'Documento full-text: nome e especialidades (A), biografia (C)';
+
+CREATE INDEX IF NOT EXISTS idx_profissionais_ts_busca
+    ON tb_profissionais USING gin (ts_busca);
+
+CREATE INDEX IF NOT EXISTS idx_profissionais_nome_trgm
+    ON tb_profissionais USING gin (f_unaccent(lower(nm_profissional)) gin_trgm_ops);
+
+-- Filtro ds_especialidade (substring sem acento sobre as especialidades)
+CREATE INDEX IF NOT EXISTS idx_profissionais_especialidades_trgm
+    ON tb_profissionais USING gin (f_unaccent(lower(f_texto_array(ds_especialidades))) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_profissionais_recentes
+    ON tb_profissionais (dt_criacao DESC, id_profissional DESC)
+    WHERE st_ativo = TRUE;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 122 aplicada com sucesso!';
+END $$;
@@ -0,0 +1,44 @@
+-- =====================================================
+-- Migration 123: Embeddings de perfil para a busca inteligente
+-- Perfil do profissional (especialidades, bio, procedimentos, serviços da
+-- clínica) vetorizado previamente e indexado com HNSW (cosine)
+-- Data: 19/10/2026
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- =====================================================
+-- TABELA DE EMBEDDINGS DE PERFIL
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS tb_profissionais_embeddings (
+    id_profissional UUID PRIMARY KEY
+        REFERENCES tb_profissionais(id_profissional) ON DELETE CASCADE,
+    ds_texto_perfil TEXT NOT NULL,
+    -- sha256 do texto: reindexação só recalcula perfis alterados
+    ds_hash_perfil VARCHAR(64) NOT NULL,
+    -- 1536 dimensões (text-embedding-ada-002 / 3-small)
+    embedding vector(1536) NOT NULL,
+    dt_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_profissionais_embeddings_hnsw
+    ON tb_profissionais_embeddings
+    USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+COMMENT ON TABLE tb_profissionais_embeddings IS 'Embeddings de perfil dos profissionais (pré-filtro da busca inteligente)';
+
+-- =====================================================
+-- ENRIQUECIMENTO EM UMA CONSULTA
+-- =====================================================
+-- Lead mais recente da clínica por empresa (LATERAL ... LIMIT 1)
+
+CREATE INDEX IF NOT EXISTS idx_partner_leads_empresa_clinica_recente
+    ON tb_partner_leads (id_empresa, dt_criacao DESC)
+    WHERE tp_partner = 'clinica';
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 123 aplicada com sucesso!';
+END $$;
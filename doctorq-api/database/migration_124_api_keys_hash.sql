@@ -0,0 +1,47 @@
+-- =====================================================
+-- Migration 124: Índice por hash das API Keys
+-- Autenticação busca a chave pelo SHA-256 (nm_api_key_hash), mantido por
+-- trigger para cobrir inserções fora da aplicação (seeds, SQL manual)
+-- Data: 19/10/2026
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+ALTER TABLE tb_api_keys
+    ADD COLUMN IF NOT EXISTS nm_api_key_hash VARCHAR(64);
+
+COMMENT ON COLUMN tb_api_keys.nm_api_key_hash IS 'SHA-256 (hex) de nm_api_key - chave de busca na autenticação';
+
+UPDATE tb_api_keys
+SET nm_api_key_hash = encode(digest(nm_api_key, 'sha256'), 'hex')
+WHERE nm_api_key_hash IS NULL
+   OR nm_api_key_hash <> encode(digest(nm_api_key, 'sha256'), 'hex');
+
+ALTER TABLE tb_api_keys
+    ALTER COLUMN nm_api_key_hash SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_api_keys_hash
+    ON tb_api_keys (nm_api_key_hash);
+
+-- =====================================================
+-- TRIGGER: hash sempre coerente com a chave
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION fn_api_keys_hash()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.nm_api_key_hash := encode(digest(NEW.nm_api_key, 'sha256'), 'hex');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_api_keys_hash ON tb_api_keys;
+CREATE TRIGGER trg_api_keys_hash
+    BEFORE INSERT OR UPDATE OF nm_api_key ON tb_api_keys
+    FOR EACH ROW
+    EXECUTE FUNCTION fn_api_keys_hash();
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 124 aplicada com sucesso!';
+END $$;
@@ -0,0 +1,91 @@
+-- =====================================================
+-- Migration 125: Estoque atômico com snapshots de reconciliação
+-- - tb_produtos.nr_quantidade_estoque é a fonte da verdade, alterada só por
+--   UPDATE condicional (sem SUM do histórico a cada movimentação)
+-- - nr_quantidade_reservada: quantidade comprometida por reservas ativas
+-- - nr_sequencia no ledger + tb_estoque_snapshots: reconciliação incremental
+--   (snapshot anterior + movimentações posteriores = estoque do produto)
+-- Data: 19/10/2026
+-- =====================================================
+
+ALTER TABLE tb_produtos
+    ADD COLUMN IF NOT EXISTS nr_quantidade_reservada INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN tb_produtos.nr_quantidade_reservada IS 'Soma das reservas ativas (tb_reservas_estoque) - disponível = estoque - reservada';
+
+-- Reservas ativas existentes passam a comprometer estoque
+UPDATE tb_produtos p
+SET nr_quantidade_reservada = r.nr_reservado
+FROM (
+    SELECT id_produto, SUM(nr_quantidade) AS nr_reservado
+    FROM tb_reservas_estoque
+    WHERE st_reserva = 'ativa'
+      AND (dt_expiracao IS NULL OR dt_expiracao > now())
+    GROUP BY id_produto
+) r
+WHERE p.id_produto = r.id_produto;
+
+-- NOT VALID: não bloqueia a migration por dados legados; vale para escritas novas
+ALTER TABLE tb_produtos
+    DROP CONSTRAINT IF EXISTS chk_produtos_estoque_nao_negativo;
+ALTER TABLE tb_produtos
+    ADD CONSTRAINT chk_produtos_estoque_nao_negativo
+    CHECK (nr_quantidade_estoque >= 0 AND nr_quantidade_reservada >= 0) NOT VALID;
+
+-- =====================================================
+-- LEDGER: sequência monotônica por inserção
+-- A movimentação é inserida depois do UPDATE do produto (que segura o lock
+-- da linha), então por produto a sequência segue a ordem de commit.
+-- =====================================================
+
+ALTER TABLE tb_movimentacoes_estoque
+    ADD COLUMN IF NOT EXISTS nr_sequencia BIGINT GENERATED ALWAYS AS IDENTITY;
+
+CREATE INDEX IF NOT EXISTS idx_movimentacoes_produto_sequencia
+    ON tb_movimentacoes_estoque (id_produto, nr_sequencia);
+
+-- =====================================================
+-- SNAPSHOTS
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS tb_estoque_snapshots (
+    id_snapshot UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id_produto UUID NOT NULL REFERENCES tb_produtos(id_produto) ON DELETE CASCADE,
+    nr_sequencia BIGINT NOT NULL,
+    nr_estoque INTEGER NOT NULL,
+    nr_estoque_produto INTEGER NOT NULL,
+    nr_divergencia INTEGER NOT NULL DEFAULT 0,
+    dt_snapshot TIMESTAMP NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE tb_estoque_snapshots IS 'Estoque derivado do ledger até nr_sequencia, comparado com tb_produtos no mesmo instante';
+COMMENT ON COLUMN tb_estoque_snapshots.nr_estoque IS 'Snapshot anterior + movimentações com nr_sequencia posterior';
+COMMENT ON COLUMN tb_estoque_snapshots.nr_divergencia IS 'nr_estoque_produto - nr_estoque (0 = consistente)';
+
+CREATE INDEX IF NOT EXISTS idx_estoque_snapshots_produto
+    ON tb_estoque_snapshots (id_produto, nr_sequencia DESC);
+
+CREATE INDEX IF NOT EXISTS idx_estoque_snapshots_divergencia
+    ON tb_estoque_snapshots (dt_snapshot DESC)
+    WHERE nr_divergencia <> 0;
+
+-- Linha de base: estoque atual de todos os produtos, com ou sem histórico.
+-- Produto sem movimentação entra com nr_sequencia 0: a primeira movimentação
+-- posterior parte deste estoque, não de zero.
+-- Divergências anteriores à migration não são reportadas.
+INSERT INTO tb_estoque_snapshots (id_produto, nr_sequencia, nr_estoque, nr_estoque_produto)
+SELECT p.id_produto, COALESCE(m.nr_sequencia, 0), COALESCE(p.nr_quantidade_estoque, 0), COALESCE(p.nr_quantidade_estoque, 0)
+FROM tb_produtos p
+LEFT JOIN (
+    SELECT id_produto, MAX(nr_sequencia) AS nr_sequencia
+    FROM tb_movimentacoes_estoque
+    GROUP BY id_produto
+) m ON m.id_produto = p.id_produto
+WHERE NOT EXISTS (
+    SELECT 1 FROM tb_estoque_snapshots s WHERE s.id_produto = p.id_produto
+);
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 125 aplicada com sucesso!';
+END $$;
@@ -0,0 +1,33 @@
+-- =====================================================
+-- Migration 126: Numeração de pedidos por sequence
+-- nr_pedido (PED-000123) vem de nextval() dentro do próprio INSERT:
+-- sem SELECT MAX(nr_pedido) por pedido e sem números duplicados em picos
+-- Data: 19/10/2026
+-- =====================================================
+
+CREATE SEQUENCE IF NOT EXISTS seq_nr_pedido AS BIGINT;
+
+COMMENT ON SEQUENCE seq_nr_pedido IS 'Número sequencial dos pedidos (formatado como PED-000000); pode ter lacunas após rollback';
+
+-- Continua a partir do maior número já emitido
+SELECT setval(
+    'seq_nr_pedido',
+    COALESCE((
+        SELECT MAX(CAST(split_part(nr_pedido, '-', 2) AS BIGINT))
+        FROM tb_pedidos
+        WHERE nr_pedido ~ '^PED-[0-9]+$'
+    ), 0) + 1,
+    false
+);
+
+-- Itens por pedido (detalhe/listagem) e carrinho por usuário (leitura e limpeza no pedido)
+CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido
+    ON tb_itens_pedido (id_pedido);
+
+CREATE INDEX IF NOT EXISTS idx_carrinho_user
+    ON tb_carrinho (id_user);
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 126 aplicada com sucesso!';
+END $$;
@@ -0,0 +1,128 @@
+-- =====================================================
+-- Migration 127: Rollups diários do dashboard por empresa
+-- - tb_dashboard_diario: agendamentos por status e receita por (empresa, dia)
+-- - tb_dashboard_procedimentos_diario: agendamentos/receita por procedimento
+-- - tb_dashboard_eventos: change-log de dias alterados (trigger em
+--   tb_agendamentos), consumido pelo DashboardRollupWorker
+-- Dias ainda no change-log são lidos ao vivo pelo dashboard.
+-- Data: 19/10/2026
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS tb_dashboard_diario (
+    id_empresa UUID NOT NULL,
+    dt_dia DATE NOT NULL,
+    nr_agendamentos INTEGER NOT NULL DEFAULT 0,
+    nr_confirmados INTEGER NOT NULL DEFAULT 0,
+    nr_pendentes INTEGER NOT NULL DEFAULT 0,
+    nr_cancelados INTEGER NOT NULL DEFAULT 0,
+    nr_concluidos INTEGER NOT NULL DEFAULT 0,
+    vl_receita NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    nr_receita INTEGER NOT NULL DEFAULT 0,
+    dt_atualizacao TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (id_empresa, dt_dia)
+);
+
+COMMENT ON TABLE tb_dashboard_diario IS 'Agregado diário de agendamentos por empresa (recalculado por dia a partir de tb_dashboard_eventos)';
+COMMENT ON COLUMN tb_dashboard_diario.vl_receita IS 'Soma de vl_valor dos agendamentos confirmados/concluídos';
+COMMENT ON COLUMN tb_dashboard_diario.nr_receita IS 'Agendamentos confirmados/concluídos com valor (base do ticket médio)';
+
+CREATE TABLE IF NOT EXISTS tb_dashboard_procedimentos_diario (
+    id_empresa UUID NOT NULL,
+    dt_dia DATE NOT NULL,
+    id_procedimento UUID NOT NULL,
+    nr_agendamentos INTEGER NOT NULL DEFAULT 0,
+    vl_receita NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_empresa, dt_dia, id_procedimento)
+);
+
+COMMENT ON TABLE tb_dashboard_procedimentos_diario IS 'Agregado diário por procedimento (mais agendado e top receita do dashboard)';
+
+-- Change-log append-only: sem contenção entre agendamentos do mesmo dia
+CREATE TABLE IF NOT EXISTS tb_dashboard_eventos (
+    nr_evento BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    id_clinica UUID NOT NULL,
+    dt_dia DATE NOT NULL,
+    dt_evento TIMESTAMP NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE tb_dashboard_eventos IS 'Dias com agendamentos alterados ainda não consolidados em tb_dashboard_diario';
+
+CREATE INDEX IF NOT EXISTS idx_dashboard_eventos_clinica_dia
+    ON tb_dashboard_eventos (id_clinica, dt_dia);
+
+-- Leitura ao vivo dos dias pendentes (empresa -> clínicas -> agendamentos do dia)
+CREATE INDEX IF NOT EXISTS idx_agendamentos_clinica_data
+    ON tb_agendamentos (id_clinica, dt_agendamento);
+
+-- =====================================================
+-- TRIGGER: marca o dia antigo e o novo (mudança de data/clínica/status/valor)
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION fn_dashboard_marcar_dia()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.id_clinica IS NOT NULL THEN
+        INSERT INTO tb_dashboard_eventos (id_clinica, dt_dia)
+        VALUES (OLD.id_clinica, OLD.dt_agendamento::date);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.id_clinica IS NOT NULL
+       AND (TG_OP = 'INSERT'
+            OR NEW.id_clinica IS DISTINCT FROM OLD.id_clinica
+            OR NEW.dt_agendamento::date IS DISTINCT FROM OLD.dt_agendamento::date) THEN
+        INSERT INTO tb_dashboard_eventos (id_clinica, dt_dia)
+        VALUES (NEW.id_clinica, NEW.dt_agendamento::date);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_agendamentos_dashboard ON tb_agendamentos;
+CREATE TRIGGER trg_agendamentos_dashboard
+    AFTER INSERT OR DELETE OR UPDATE OF id_clinica, id_procedimento, dt_agendamento, ds_status, vl_valor
+    ON tb_agendamentos
+    FOR EACH ROW EXECUTE FUNCTION fn_dashboard_marcar_dia();
+
+-- =====================================================
+-- CARGA INICIAL (mesma agregação do DashboardRollupService)
+-- =====================================================
+
+INSERT INTO tb_dashboard_diario (
+    id_empresa, dt_dia, nr_agendamentos, nr_confirmados, nr_pendentes,
+    nr_cancelados, nr_concluidos, vl_receita, nr_receita
+)
+SELECT c.id_empresa,
+       a.dt_agendamento::date,
+       COUNT(*),
+       COUNT(*) FILTER (WHERE a.ds_status = 'confirmado'),
+       COUNT(*) FILTER (WHERE a.ds_status = 'pendente'),
+       COUNT(*) FILTER (WHERE a.ds_status = 'cancelado'),
+       COUNT(*) FILTER (WHERE a.ds_status = 'concluido'),
+       COALESCE(SUM(a.vl_valor) FILTER (WHERE a.ds_status IN ('confirmado', 'concluido')), 0),
+       COUNT(a.vl_valor) FILTER (WHERE a.ds_status IN ('confirmado', 'concluido'))
+FROM tb_agendamentos a
+JOIN tb_clinicas c ON c.id_clinica = a.id_clinica
+WHERE c.id_empresa IS NOT NULL
+GROUP BY c.id_empresa, a.dt_agendamento::date
+ON CONFLICT (id_empresa, dt_dia) DO NOTHING;
+
+INSERT INTO tb_dashboard_procedimentos_diario (
+    id_empresa, dt_dia, id_procedimento, nr_agendamentos, vl_receita
+)
+SELECT c.id_empresa,
+       a.dt_agendamento::date,
+       a.id_procedimento,
+       COUNT(*),
+       COALESCE(SUM(a.vl_valor) FILTER (WHERE a.ds_status IN ('confirmado', 'concluido')), 0)
+FROM tb_agendamentos a
+JOIN tb_clinicas c ON c.id_clinica = a.id_clinica
+WHERE c.id_empresa IS NOT NULL
+  AND a.id_procedimento IS NOT NULL
+GROUP BY c.id_empresa, a.dt_agendamento::date, a.id_procedimento
+ON CONFLICT (id_empresa, dt_dia, id_procedimento) DO NOTHING;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 127 aplicada com sucesso!';
+END $$;
@@ -0,0 +1,172 @@
+-- =====================================================
+-- Migration 128: Particionamento mensal das tabelas de mensagens
+-- tb_messages e tb_mensagens_omni passam a ser particionadas por RANGE
+-- (dt_criacao), uma partição por mês:
+-- - consultas com filtro de período leem só as partições do período
+--   (partition pruning)
+-- - retenção por partição (DROP da partição inteira, sem DELETE em massa)
+-- Partições futuras e retenção: ParticoesMensagensWorker
+-- (fn_criar_particoes_mensais / fn_remover_particoes_antigas).
+--
+-- ATENÇÃO: a conversão copia as mensagens existentes para a nova tabela
+-- (executar em janela de manutenção em bases grandes).
+-- Data: 19/10/2026
+-- =====================================================
+
+-- =====================================================
+-- FUNÇÕES DE MANUTENÇÃO
+-- =====================================================
+
+-- Cria (se não existirem) as partições <tabela>_pAAAAMM de p_inicio até p_fim
+CREATE OR REPLACE FUNCTION fn_criar_particoes_mensais(p_tabela TEXT, p_inicio DATE, p_fim DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_mes DATE := date_trunc('month', p_inicio)::date;
+    v_nome TEXT;
+    v_criadas INTEGER := 0;
+BEGIN
+    WHILE v_mes <= p_fim LOOP
+        v_nome := p_tabela || '_p' || to_char(v_mes, 'YYYYMM');
+        IF to_regclass(v_nome) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                v_nome, p_tabela, v_mes, (v_mes + INTERVAL '1 month')::date
+            );
+            v_criadas := v_criadas + 1;
+        END IF;
+        v_mes := (v_mes + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN v_criadas;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION fn_criar_particoes_mensais(TEXT, DATE, DATE) IS 'Cria partições mensais <tabela>_pAAAAMM no intervalo (idempotente)';
+
+-- Remove partições <tabela>_pAAAAMM inteiramente anteriores a p_limite
+CREATE OR REPLACE FUNCTION fn_remover_particoes_antigas(p_tabela TEXT, p_limite DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_particao RECORD;
+    v_removidas INTEGER := 0;
+BEGIN
+    FOR v_particao IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = p_tabela::regclass
+          AND c.relname ~ ('^' || p_tabela || '_p[0-9]{6}$')
+          AND (to_date(right(c.relname, 6), 'YYYYMM') + INTERVAL '1 month')::date <= p_limite
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', p_tabela, v_particao.relname);
+        EXECUTE format('DROP TABLE %I', v_particao.relname);
+        v_removidas := v_removidas + 1;
+    END LOOP;
+    RETURN v_removidas;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION fn_remover_particoes_antigas(TEXT, DATE) IS 'Retenção: remove partições mensais que terminam até p_limite';
+
+-- =====================================================
+-- tb_messages
+-- =====================================================
+
+DO $$
+DECLARE
+    v_inicio DATE;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'tb_messages'::regclass) THEN
+        RAISE NOTICE 'tb_messages já particionada';
+        RETURN;
+    END IF;
+
+    ALTER TABLE tb_messages RENAME TO tb_messages_legado;
+    UPDATE tb_messages_legado SET dt_criacao = COALESCE(dt_atualizacao, now()) WHERE dt_criacao IS NULL;
+
+    CREATE TABLE tb_messages (
+        LIKE tb_messages_legado INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS
+    ) PARTITION BY RANGE (dt_criacao);
+    ALTER TABLE tb_messages ALTER COLUMN dt_criacao SET NOT NULL;
+
+    SELECT COALESCE(MIN(dt_criacao)::date, CURRENT_DATE) INTO v_inicio FROM tb_messages_legado;
+    PERFORM fn_criar_particoes_mensais('tb_messages', v_inicio, (CURRENT_DATE + INTERVAL '3 months')::date);
+    -- Rede de segurança se a criação antecipada atrasar (deve ficar vazia)
+    CREATE TABLE tb_messages_default PARTITION OF tb_messages DEFAULT;
+
+    INSERT INTO tb_messages SELECT * FROM tb_messages_legado;
+    DROP TABLE tb_messages_legado;
+
+    -- PK precisa incluir a chave de partição
+    ALTER TABLE tb_messages ADD CONSTRAINT tb_messages_pkey PRIMARY KEY (id_message, dt_criacao);
+    ALTER TABLE tb_messages
+        ADD CONSTRAINT tb_messages_id_conversa_fkey FOREIGN KEY (id_conversa)
+        REFERENCES tb_conversas(id_conversa) ON DELETE CASCADE;
+    ALTER TABLE tb_messages
+        ADD CONSTRAINT tb_messages_id_user_fkey FOREIGN KEY (id_user)
+        REFERENCES tb_users(id_user) ON DELETE CASCADE;
+    ALTER TABLE tb_messages
+        ADD CONSTRAINT tb_messages_id_agente_fkey FOREIGN KEY (id_agente)
+        REFERENCES tb_agentes(id_agente) ON DELETE SET NULL;
+
+    CREATE INDEX idx_messages_conversa ON tb_messages (id_conversa, dt_criacao);
+    CREATE INDEX idx_messages_criacao ON tb_messages (dt_criacao);
+    CREATE INDEX idx_messages_user ON tb_messages (id_user);
+    CREATE INDEX idx_messages_agente ON tb_messages (id_agente);
+    CREATE INDEX idx_messages_deletada ON tb_messages (st_deletada) WHERE st_deletada = false;
+
+    IF to_regproc('update_messages_dt_atualizacao') IS NOT NULL THEN
+        CREATE TRIGGER trigger_update_messages_dt_atualizacao
+            BEFORE UPDATE ON tb_messages
+            FOR EACH ROW EXECUTE FUNCTION update_messages_dt_atualizacao();
+    END IF;
+    IF to_regproc('update_tb_messages_dt_atualizacao') IS NOT NULL THEN
+        CREATE TRIGGER trigger_update_tb_messages_dt_atualizacao
+            BEFORE UPDATE ON tb_messages
+            FOR EACH ROW EXECUTE FUNCTION update_tb_messages_dt_atualizacao();
+    END IF;
+END $$;
+
+-- =====================================================
+-- tb_mensagens_omni
+-- =====================================================
+
+DO $$
+DECLARE
+    v_inicio DATE;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'tb_mensagens_omni'::regclass) THEN
+        RAISE NOTICE 'tb_mensagens_omni já particionada';
+        RETURN;
+    END IF;
+
+    ALTER TABLE tb_mensagens_omni RENAME TO tb_mensagens_omni_legado;
+    UPDATE tb_mensagens_omni_legado SET dt_criacao = COALESCE(dt_envio, now()) WHERE dt_criacao IS NULL;
+
+    CREATE TABLE tb_mensagens_omni (
+        LIKE tb_mensagens_omni_legado INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS
+    ) PARTITION BY RANGE (dt_criacao);
+    ALTER TABLE tb_mensagens_omni ALTER COLUMN dt_criacao SET NOT NULL;
+
+    SELECT COALESCE(MIN(dt_criacao)::date, CURRENT_DATE) INTO v_inicio FROM tb_mensagens_omni_legado;
+    PERFORM fn_criar_particoes_mensais('tb_mensagens_omni', v_inicio, (CURRENT_DATE + INTERVAL '3 months')::date);
+    CREATE TABLE tb_mensagens_omni_default PARTITION OF tb_mensagens_omni DEFAULT;
+
+    INSERT INTO tb_mensagens_omni SELECT * FROM tb_mensagens_omni_legado;
+    DROP TABLE tb_mensagens_omni_legado;
+
+    ALTER TABLE tb_mensagens_omni ADD CONSTRAINT tb_mensagens_omni_pkey PRIMARY KEY (id_mensagem, dt_criacao);
+    ALTER TABLE tb_mensagens_omni
+        ADD CONSTRAINT tb_mensagens_omni_id_conversa_fkey FOREIGN KEY (id_conversa)
+        REFERENCES tb_conversas_omni(id_conversa) ON DELETE CASCADE;
+
+    CREATE INDEX idx_mensagens_omni_conversa ON tb_mensagens_omni (id_conversa, dt_criacao);
+    CREATE INDEX idx_mensagens_criacao ON tb_mensagens_omni (dt_criacao);
+    CREATE INDEX idx_mensagens_externo ON tb_mensagens_omni (id_externo);
+    CREATE INDEX idx_mensagens_status ON tb_mensagens_omni (st_mensagem);
+END $$;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 128 aplicada com sucesso!';
+END $$;
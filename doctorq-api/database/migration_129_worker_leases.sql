@@ -0,0 +1,24 @@
+-- =====================================================
+-- Migration 129: Leases dos jobs singleton (processo worker)
+-- A exclusão mútua é um advisory lock de sessão mantido pelo
+-- CoordenadorJobs; esta tabela só registra dono e heartbeat de cada job
+-- para GET /workers/status.
+-- Data: 19/10/2026
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS tb_worker_leases (
+    nm_job VARCHAR(100) PRIMARY KEY,
+    nm_instancia VARCHAR(255) NOT NULL,
+    nm_papel VARCHAR(20) NOT NULL,
+    dt_adquirido TIMESTAMP NOT NULL DEFAULT now(),
+    dt_heartbeat TIMESTAMP NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE tb_worker_leases IS 'Instância dona de cada job singleton (lease = advisory lock de sessão)';
+COMMENT ON COLUMN tb_worker_leases.nm_instancia IS 'host:pid (ou INSTANCE_ID) do processo dono do lease';
+COMMENT ON COLUMN tb_worker_leases.dt_heartbeat IS 'Último ciclo do coordenador dono; parado há mais de 3 intervalos = lease expirado';
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 129 aplicada com sucesso!';
+END $$;
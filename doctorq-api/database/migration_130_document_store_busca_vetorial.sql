@@ -0,0 +1,33 @@
+-- =====================================================
+-- Migration 130: Busca vetorial + texto nos chunks dos document stores
+-- - HNSW (cosine) sobre ds_embedding convertido para halfvec: o HNSW do
+--   pgvector indexa no máximo 2000 dimensões de vector, halfvec vai até 4000
+--   (text-embedding-3-large = 3072). A consulta ordena pela mesma expressão
+--   (ds_embedding::halfvec(3072)) e filtra por id_store; com pgvector >= 0.8
+--   o serviço liga hnsw.iterative_scan para o filtro por store não esvaziar
+--   o top-k
+-- - GIN de full-text (português) para a fusão híbrida com o vetorial
+-- Requer pgvector >= 0.7 (halfvec)
+-- Data: 19/10/2026
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE INDEX IF NOT EXISTS idx_chunk_embedding_hnsw
+    ON tb_documento_store_file_chunk
+    USING hnsw ((ds_embedding::halfvec(3072)) halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 64)
+    WHERE ds_embedding IS NOT NULL;
+
+COMMENT ON INDEX idx_chunk_embedding_hnsw IS 'HNSW (cosine, halfvec) para busca vetorial nos document stores';
+
+CREATE INDEX IF NOT EXISTS idx_chunk_conteudo_fts
+    ON tb_documento_store_file_chunk
+    USING gin (to_tsvector('portuguese', COALESCE(ds_page_content, '')));
+
+COMMENT ON INDEX idx_chunk_conteudo_fts IS 'Full-text (português) do conteúdo dos chunks para a busca híbrida';
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 130 aplicada com sucesso!';
+END $$;
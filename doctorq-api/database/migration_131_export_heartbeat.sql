@@ -0,0 +1,22 @@
+-- =====================================================
+-- Migration 131: Heartbeat dos jobs de exportação
+-- O ExportWorker atualiza dt_heartbeat enquanto faz o streaming; a
+-- recuperação de jobs abandonados usa o heartbeat em vez do horário de
+-- início, então exports longos não são reenfileirados no meio
+-- Data: 19/10/2026
+-- =====================================================
+
+ALTER TABLE tb_export_jobs
+    ADD COLUMN IF NOT EXISTS dt_heartbeat TIMESTAMP;
+
+COMMENT ON COLUMN tb_export_jobs.dt_heartbeat IS 'Último sinal de vida do worker que processa o job (NULL fora de processamento)';
+
+-- Recuperação de abandonados (WHERE st_export = 'processando' AND dt_heartbeat < ...)
+CREATE INDEX IF NOT EXISTS idx_export_jobs_processando
+    ON tb_export_jobs(dt_heartbeat)
+    WHERE st_export = 'processando';
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 131 aplicada com sucesso!';
+END $$;
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark do custo de logging por request (antes/depois do pipeline assíncrono)
+
+Simula o que um request de busca vetorial loga (middleware de auth + 20 linhas
+retornadas pelo pgvector) com LOG_LEVEL=INFO e arquivo de log habilitado:
+
+- antes: f-strings montadas em toda chamada (mesmo com DEBUG desligado) e
+  handler de arquivo síncrono no chamador
+- depois: argumentos lazy / logs por linha atrás de isEnabledFor e
+  FilaLogHandler (formatação e I/O na thread do QueueListener)
+
+    uv run python scripts/benchmark_logging.py [--requests 20000]
+"""
+import argparse
+import logging
+import os
+import queue
+import sys
+import tempfile
+import time
+from logging.handlers import QueueListener, RotatingFileHandler
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.logger_config import FilaLogHandler  # noqa: E402
+
+FORMATO = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+LINHAS = [SimpleNamespace(distance=0.1 + i * 0.03) for i in range(20)]
+PATH = "/ia/document-store/busca"
+THRESHOLD = 0.3
+
+
+def request_antes(logger: logging.Logger):
+    logger.debug(f"🔍 Middleware interceptou: {PATH}")
+    logger.debug(f"✅ Autenticado via API Key: {'chave-benchmark'}")
+    logger.debug(f"🔍 Iniciando busca vetorial - namespace: {'docs'}, threshold: {THRESHOLD}")
+    # INFO que existia só para o COUNT extra (agora DEBUG, sem o COUNT)
+    logger.info(f"Total de documentos no namespace '{'docs'}': {1234}")
+    for i, row in enumerate(LINHAS):
+        similarity = 1 - row.distance
+        logger.debug(f"📏 Doc {i+1}: distância={row.distance:.4f}, similaridade={similarity:.4f}")
+        if similarity >= THRESHOLD:
+            logger.debug(f"✅ Doc {i+1} incluído (similaridade {similarity:.4f} >= {THRESHOLD})")
+        else:
+            logger.debug(f"❌ Doc {i+1} rejeitado (similaridade {similarity:.4f} < {THRESHOLD})")
+    logger.info(f"Request concluído: {PATH}")
+
+
+def request_depois(logger: logging.Logger):
+    debug = logger.isEnabledFor(logging.DEBUG)
+    logger.debug("Autenticado via API Key: %s", "chave-benchmark")
+    if debug:
+        logger.debug("Iniciando busca vetorial - namespace=%s threshold=%s", "docs", THRESHOLD)
+    for i, row in enumerate(LINHAS):
+        similarity = 1 - row.distance
+        if debug:
+            logger.debug(
+                "Doc %d: distancia=%.4f similaridade=%.4f", i + 1, row.distance, similarity
+            )
+    logger.debug("Busca vetorial: %d linhas", len(LINHAS))
+    logger.info("Request concluído: %s", PATH)
+
+
+def _logger(nome: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(nome)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def medir(funcao, logger: logging.Logger, requests: int) -> float:
+    """Microssegundos por request no chamador (o que bloqueia o event loop)."""
+    inicio = time.perf_counter()
+    for _ in range(requests):
+        funcao(logger)
+    return (time.perf_counter() - inicio) / requests * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        arquivo_sync = RotatingFileHandler(os.path.join(diretorio, "antes.log"), encoding="utf-8")
+        arquivo_sync.setFormatter(logging.Formatter(FORMATO))
+        antes = medir(request_antes, _logger("benchmark.antes", arquivo_sync), args.requests)
+        arquivo_sync.close()
+
+        arquivo_async = RotatingFileHandler(
+            os.path.join(diretorio, "depois.log"), encoding="utf-8"
+        )
+        arquivo_async.setFormatter(logging.Formatter(FORMATO))
+        fila: queue.Queue = queue.Queue(maxsize=10000)
+        fila_handler = FilaLogHandler(fila, timeout_bloqueio=0.1)
+        listener = QueueListener(fila, arquivo_async, respect_handler_level=True)
+        listener.start()
+        depois = medir(request_depois, _logger("benchmark.depois", fila_handler), args.requests)
+        inicio_drenagem = time.perf_counter()
+        listener.stop()
+        drenagem = time.perf_counter() - inicio_drenagem
+        arquivo_async.close()
+
+    print(f"Requests simulados: {args.requests} (LOG_LEVEL=INFO, arquivo habilitado)")
+    print(f"antes : {antes:8.2f} µs/request no event loop")
+    print(f"depois: {depois:8.2f} µs/request no event loop")
+    print(f"ganho : {antes / depois:8.1f}x")
+    print(f"descartados: {fila_handler.nr_descartados} | drenagem final: {drenagem * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@ from sqlalchemy import select, update
 
 from src.config.logger_config import get_logger
 from src.config.orm_config import get_async_session_context
+from src.services.coordenador_jobs import execucao_exclusiva
 from src.central_atendimento.models.campanha import (
     Campanha,
     CampanhaStatus,
@@ -81,16 +82,20 @@ class CampanhaWorker:
                 await asyncio.sleep(10)  # Aguardar antes de tentar novamente
 
     async def _processar_campanhas(self):
-        """Processa todas as campanhas ativas."""
-        async with get_async_session_context() as db:
-            # Buscar campanhas para processar
-            campanhas = await self._obter_campanhas_para_processar(db)
-
-            for campanha in campanhas:
-                try:
-                    await self._processar_campanha(db, campanha)
-                except Exception as e:
-                    logger.error(f"Erro ao processar campanha {campanha.id_campanha}: {e}")
+        """Processa todas as campanhas ativas (um ciclo por vez entre as instâncias)."""
+        async with execucao_exclusiva("campanha_worker") as exclusivo:
+            if not exclusivo:
+                logger.debug("Campanhas em processamento em outra instância")
+                return
+            async with get_async_session_context() as db:
+                # Buscar campanhas para processar
+                campanhas = await self._obter_campanhas_para_processar(db)
+
+                for campanha in campanhas:
+                    try:
+                        await self._processar_campanha(db, campanha)
+                    except Exception as e:
+                        logger.error(f"Erro ao processar campanha {campanha.id_campanha}: {e}")
 
     async def _obter_campanhas_para_processar(
         self,
@@ -293,11 +298,12 @@ class CampanhaWorker:
 </html>
 """
                 email_service = EmailService()
-                sucesso = email_service.send_email(
+                sucesso = await email_service.send_email_async(
                     to=contato.nm_email,
                     subject=campanha.nm_campanha or "Mensagem da DoctorQ",
                     html_body=html_body,
                     text_body=mensagem,
+                    aguardar=True,
                 )
 
                 if sucesso:
@@ -236,6 +236,17 @@ class CentralAtendimentoTools:
             await self.db.commit()
             await self.db.refresh(agendamento)
 
+            if agendamento.id_profissional:
+                from src.services.disponibilidade_service import (
+                    INTERVALO_SLOTS_MINUTOS,
+                    invalidar_calendario,
+                )
+
+                await invalidar_calendario(
+                    agendamento.id_profissional,
+                    [(data_hora, agendamento.nr_duracao_minutos or INTERVALO_SLOTS_MINUTOS)],
+                )
+
             return {
                 "sucesso": True,
                 "id_agendamento": str(agendamento.id_agendamento),
@@ -21,6 +21,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logger_config import get_logger
 from src.config.orm_config import ORMConfig
+from src.services.coordenador_jobs import execucao_exclusiva
 
 # Models
 from src.central_atendimento.models.fila_atendimento import (
@@ -92,31 +93,35 @@ class FilaProcessorService:
             await asyncio.sleep(self.PROCESS_INTERVAL_SECONDS)
 
     async def _process_queue(self):
-        """Processa a fila de atendimento."""
-        async with ORMConfig.get_session() as db:
-            # Buscar itens aguardando atendimento, ordenados por prioridade e entrada
-            stmt = (
-                select(AtendimentoItem)
-                .where(AtendimentoItem.st_atendimento == AtendimentoStatus.AGUARDANDO)
-                .order_by(
-                    AtendimentoItem.nr_prioridade.desc(),
-                    AtendimentoItem.dt_entrada_fila.asc(),
+        """Processa a fila de atendimento (um ciclo por vez entre as instâncias)."""
+        async with execucao_exclusiva("fila_processor") as exclusivo:
+            if not exclusivo:
+                logger.debug("Fila de atendimento em processamento em outra instância")
+                return
+            async with ORMConfig.get_session() as db:
+                # Buscar itens aguardando atendimento, ordenados por prioridade e entrada
+                stmt = (
+                    select(AtendimentoItem)
+                    .where(AtendimentoItem.st_atendimento == AtendimentoStatus.AGUARDANDO)
+                    .order_by(
+                        AtendimentoItem.nr_prioridade.desc(),
+                        AtendimentoItem.dt_entrada_fila.asc(),
+                    )
+                    .limit(50)  # Processar até 50 por ciclo
                 )
-                .limit(50)  # Processar até 50 por ciclo
-            )
-            result = await db.execute(stmt)
-            items = result.scalars().all()
+                result = await db.execute(stmt)
+                items = result.scalars().all()
 
-            if not items:
-                return
+                if not items:
+                    return
 
-            logger.debug("Processando %d itens na fila", len(items))
+                logger.debug("Processando %d itens na fila", len(items))
 
-            # Processar cada item
-            for index, item in enumerate(items):
-                await self._process_item(db, item, index + 1, len(items))
+                # Processar cada item
+                for index, item in enumerate(items):
+                    await self._process_item(db, item, index + 1, len(items))
 
-            await db.commit()
+                await db.commit()
 
     async def _process_item(
         self,
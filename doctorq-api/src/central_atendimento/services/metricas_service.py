@@ -195,85 +195,48 @@ class MetricasService:
         dt_inicio_anterior = dt_inicio - delta
         dt_fim_anterior = dt_inicio
 
-        # Query principal para conversas
-        stmt_total = select(func.count()).select_from(ConversaOmni).where(
-            ConversaOmni.id_empresa == self.id_empresa
-        )
-        result = await self.db.execute(stmt_total)
-        total = result.scalar() or 0
-
-        # Conversas abertas
-        stmt_abertas = select(func.count()).select_from(ConversaOmni).where(
-            ConversaOmni.id_empresa == self.id_empresa,
-            ConversaOmni.st_aberta == True
-        )
-        result = await self.db.execute(stmt_abertas)
-        abertas = result.scalar() or 0
-
-        # Conversas aguardando humano
-        stmt_aguardando = select(func.count()).select_from(ConversaOmni).where(
-            ConversaOmni.id_empresa == self.id_empresa,
-            ConversaOmni.st_aguardando_humano == True,
-            ConversaOmni.st_aberta == True
-        )
-        result = await self.db.execute(stmt_aguardando)
-        aguardando = result.scalar() or 0
-
-        # Conversas com bot ativo
-        stmt_bot = select(func.count()).select_from(ConversaOmni).where(
-            ConversaOmni.id_empresa == self.id_empresa,
-            ConversaOmni.st_bot_ativo == True,
-            ConversaOmni.st_aberta == True
-        )
-        result = await self.db.execute(stmt_bot)
-        com_bot = result.scalar() or 0
-
-        # Conversas no período
-        stmt_periodo = select(func.count()).select_from(ConversaOmni).where(
-            ConversaOmni.id_empresa == self.id_empresa,
-            ConversaOmni.dt_criacao >= dt_inicio,
-            ConversaOmni.dt_criacao <= dt_fim
-        )
-        result = await self.db.execute(stmt_periodo)
-        conversas_periodo = result.scalar() or 0
+        # Todas as contagens em uma passada agrupada (FILTER por métrica)
+        no_periodo = ConversaOmni.dt_criacao >= dt_inicio
+        stmt = select(
+            func.count(),
+            func.count().filter(ConversaOmni.st_aberta == True),
+            func.count().filter(
+                ConversaOmni.st_aberta == True,
+                ConversaOmni.st_aguardando_humano == True,
+            ),
+            func.count().filter(
+                ConversaOmni.st_aberta == True,
+                ConversaOmni.st_bot_ativo == True,
+            ),
+            func.count().filter(no_periodo, ConversaOmni.dt_criacao <= dt_fim),
+            func.count().filter(
+                ConversaOmni.dt_criacao >= dt_inicio_anterior,
+                ConversaOmni.dt_criacao < dt_fim_anterior,
+            ),
+            func.avg(ConversaOmni.nr_tempo_resposta_medio).filter(
+                no_periodo, ConversaOmni.nr_tempo_resposta_medio > 0
+            ),
+            func.avg(ConversaOmni.nr_avaliacao).filter(no_periodo),
+            func.count(ConversaOmni.nr_avaliacao).filter(no_periodo),
+        ).where(ConversaOmni.id_empresa == self.id_empresa)
+        result = await self.db.execute(stmt)
+        row = result.one()
 
-        # Conversas período anterior
-        stmt_anterior = select(func.count()).select_from(ConversaOmni).where(
-            ConversaOmni.id_empresa == self.id_empresa,
-            ConversaOmni.dt_criacao >= dt_inicio_anterior,
-            ConversaOmni.dt_criacao < dt_fim_anterior
-        )
-        result = await self.db.execute(stmt_anterior)
-        conversas_anterior = result.scalar() or 0
+        total = row[0] or 0
+        abertas = row[1] or 0
+        aguardando = row[2] or 0
+        com_bot = row[3] or 0
+        conversas_periodo = row[4] or 0
+        conversas_anterior = row[5] or 0
+        tempo_medio = row[6] or 0
+        satisfacao = row[7] or 0.0
+        total_avaliacoes = row[8] or 0
 
         # Calcular variação
         variacao = 0.0
         if conversas_anterior > 0:
             variacao = ((conversas_periodo - conversas_anterior) / conversas_anterior) * 100
 
-        # Tempo médio de resposta (baseado em nr_tempo_resposta_medio das conversas)
-        stmt_tempo = select(func.avg(ConversaOmni.nr_tempo_resposta_medio)).where(
-            ConversaOmni.id_empresa == self.id_empresa,
-            ConversaOmni.nr_tempo_resposta_medio > 0,
-            ConversaOmni.dt_criacao >= dt_inicio
-        )
-        result = await self.db.execute(stmt_tempo)
-        tempo_medio = result.scalar() or 0
-
-        # Satisfação média
-        stmt_satisfacao = select(
-            func.avg(ConversaOmni.nr_avaliacao),
-            func.count(ConversaOmni.nr_avaliacao)
-        ).where(
-            ConversaOmni.id_empresa == self.id_empresa,
-            ConversaOmni.nr_avaliacao.isnot(None),
-            ConversaOmni.dt_criacao >= dt_inicio
-        )
-        result = await self.db.execute(stmt_satisfacao)
-        row = result.one()
-        satisfacao = row[0] or 0.0
-        total_avaliacoes = row[1] or 0
-
         # Taxa de resolução
         fechadas = total - abertas
         taxa_resolucao = (fechadas / total * 100) if total > 0 else 0.0
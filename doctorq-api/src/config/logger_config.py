@@ -1,14 +1,101 @@
 ﻿# src/config/logger_config.py
+"""
+Logging centralizado
+
+- Handlers reais (console colorido ou JSON, arquivo rotativo) rodam em uma
+  thread do QueueListener: o event loop só enfileira o LogRecord. Formatação
+  da mensagem (args), serialização e I/O acontecem na thread.
+- LOG_JSON=true: uma linha JSON por registro (campos de `extra` incluídos).
+- LOG_LEVELS: níveis por módulo, ex.
+  "src.middleware=WARNING,src.services.embedding_service=INFO".
+- Fila cheia (LOG_QUEUE_CAPACIDADE): DEBUG/INFO são descartados (contados em
+  logs_descartados()); WARNING+ aguardam até LOG_QUEUE_TIMEOUT segundos.
+
+Use formatação lazy nos hot paths: logger.debug("x=%s", x), nunca f-string.
+"""
+import atexit
+import json
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
 
 import colorlog
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
+# Atributos padrão do LogRecord (o restante veio de `extra` e vai para o JSON)
+ATRIBUTOS_LOG_RECORD = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None)).keys()
+) | {"message", "asctime", "taskName"}
+
+
+def parse_niveis_modulos(valor: str) -> Dict[str, int]:
+    """'modulo=NIVEL,outro=NIVEL' -> {modulo: nível}; entradas inválidas são ignoradas."""
+    niveis = {}
+    for item in (valor or "").split(","):
+        nome, _, nivel = item.partition("=")
+        nome, nivel = nome.strip(), nivel.strip().upper()
+        if nome and isinstance(logging.getLevelName(nivel), int):
+            niveis[nome] = logging.getLevelName(nivel)
+    return niveis
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os campos passados em `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        for chave, valor in record.__dict__.items():
+            if chave not in ATRIBUTOS_LOG_RECORD and not chave.startswith("_"):
+                dados[chave] = valor
+        if record.exc_info:
+            dados["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            dados["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FilaLogHandler(QueueHandler):
+    """
+    QueueHandler que não formata no chamador.
+
+    A fila é em processo, então o LogRecord vai inteiro (args e exc_info
+    incluídos) e a mensagem só é montada pelos handlers na thread do listener.
+    """
+
+    def __init__(self, fila: queue.Queue, timeout_bloqueio: float):
+        super().__init__(fila)
+        self._timeout_bloqueio = timeout_bloqueio
+        self.nr_descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                self.nr_descartados += 1
+                return
+            try:
+                self.queue.put(record, timeout=self._timeout_bloqueio)
+            except queue.Full:
+                self.nr_descartados += 1
+
 
 class LoggerConfig:
     """ConfiguraÃ§Ã£o centralizada de logging"""
@@ -21,10 +108,24 @@ class LoggerConfig:
         self.log_file_path = self._get_log_file_path()
         self.max_file_size = self._get_max_file_size()
         self.backup_count = self._get_backup_count()
+        self.json_output = os.getenv("LOG_JSON", "false").lower() == "true"
+        self.async_logging = os.getenv("LOG_ASYNC", "true").lower() == "true"
+        self.module_levels = parse_niveis_modulos(os.getenv("LOG_LEVELS", ""))
+        self.queue_capacity = self._get_int("LOG_QUEUE_CAPACIDADE", 10000)
+        self.queue_timeout = float(os.getenv("LOG_QUEUE_TIMEOUT", "0.1"))
+        self._queue_handler: Optional[FilaLogHandler] = None
+        self._listener: Optional[QueueListener] = None
 
         # Configurar logging global
         self._setup_logging()
 
+    @staticmethod
+    def _get_int(nome: str, padrao: int) -> int:
+        try:
+            return int(os.getenv(nome, str(padrao)))
+        except ValueError:
+            return padrao
+
     def _get_log_level(self) -> int:
         """Obter nÃ­vel de log das variÃ¡veis de ambiente"""
         level_str = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -65,42 +166,66 @@ class LoggerConfig:
 
     def _setup_logging(self):
         """Configurar o sistema de logging global"""
+        self.stop_listener()
         for handler in logging.root.handlers[:]:
             logging.root.removeHandler(handler)
 
-        # Cria formatter colorido
-        color_formatter = colorlog.ColoredFormatter(
-            fmt="%(log_color)s%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-            datefmt=self.date_format,
-            log_colors={
-                "DEBUG": "cyan",
-                "INFO": "green",
-                "WARNING": "yellow",
-                "ERROR": "red",
-                "CRITICAL": "bold_red",
-            },
-        )
-
-        # Configura handler para stdout com cores
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(color_formatter)
-
-        # Configurar logging bÃ¡sico
-        # Configura o root logger com o handler colorido
-        logging.basicConfig(
-            level=self.log_level,
-            handlers=[console_handler],
-            force=True,
-        )
+        handlers = [self._console_handler()]
 
         # Adicionar handler para arquivo se habilitado
         if self.enable_file_logging:
-            self._setup_file_handler()
+            file_handler = self._setup_file_handler()
+            if file_handler:
+                handlers.append(file_handler)
+
+        if self.async_logging:
+            # Root só enfileira; console/arquivo rodam na thread do listener
+            fila: queue.Queue = queue.Queue(maxsize=self.queue_capacity)
+            self._queue_handler = FilaLogHandler(fila, self.queue_timeout)
+            self._listener = QueueListener(fila, *handlers, respect_handler_level=True)
+            self._listener.start()
+            atexit.register(self.stop_listener)
+            root_handlers = [self._queue_handler]
+        else:
+            root_handlers = handlers
+
+        logging.basicConfig(level=self.log_level, handlers=root_handlers, force=True)
 
         # Configurar loggers especÃ­ficos
         self._configure_specific_loggers()
 
-    def _setup_file_handler(self):
+        # Níveis por módulo (LOG_LEVELS) têm precedência
+        for nome, nivel in self.module_levels.items():
+            logging.getLogger(nome).setLevel(nivel)
+
+    def _formatter(self) -> logging.Formatter:
+        if self.json_output:
+            return JsonFormatter()
+        return logging.Formatter(fmt=self.log_format, datefmt=self.date_format)
+
+    def _console_handler(self) -> logging.Handler:
+        console_handler = logging.StreamHandler(sys.stdout)
+        if self.json_output:
+            console_handler.setFormatter(JsonFormatter())
+            return console_handler
+
+        # Cria formatter colorido
+        console_handler.setFormatter(
+            colorlog.ColoredFormatter(
+                fmt="%(log_color)s%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+                datefmt=self.date_format,
+                log_colors={
+                    "DEBUG": "cyan",
+                    "INFO": "green",
+                    "WARNING": "yellow",
+                    "ERROR": "red",
+                    "CRITICAL": "bold_red",
+                },
+            )
+        )
+        return console_handler
+
+    def _setup_file_handler(self) -> Optional[logging.Handler]:
         """Configurar handler para arquivo de log"""
         try:
             # Criar diretÃ³rio se nÃ£o existir
@@ -113,16 +238,29 @@ class LoggerConfig:
                 backupCount=self.backup_count,
                 encoding="utf-8",
             )
-
-            file_handler.setFormatter(
-                logging.Formatter(fmt=self.log_format, datefmt=self.date_format)
-            )
-
-            # Adicionar ao root logger
-            logging.getLogger().addHandler(file_handler)
+            file_handler.setFormatter(self._formatter())
+            return file_handler
 
         except (OSError, PermissionError, ValueError) as e:
             print(f"Erro ao configurar logging em arquivo: {e}")
+            return None
+
+    def stop_listener(self):
+        """Drena a fila de logs e para a thread do listener."""
+        listener, self._listener = self._listener, None
+        if listener:
+            try:
+                listener.stop()
+            except Exception:
+                pass
+
+    def handlers(self) -> List[logging.Handler]:
+        """Handlers do root (a copiar para loggers com propagate=False)."""
+        return logging.getLogger().handlers[:]
+
+    def logs_descartados(self) -> int:
+        """Registros descartados por fila cheia."""
+        return self._queue_handler.nr_descartados if self._queue_handler else 0
 
     def _configure_specific_loggers(self):
         """Configurar loggers especÃ­ficos"""
@@ -85,6 +85,7 @@ from src.routes.rastreamento import router as rastreamento_router
 from src.routes.nota_fiscal import router as nota_fiscal_router
 from src.routes.broadcast import router as broadcast_router
 from src.routes.export import router as export_router
+from src.routes.workers_route import router as workers_router
 from src.routes.webhook_route import router as webhook_router
 from src.websocket.chat_websocket import router as websocket_router
 # REMOVIDO: Rotas de IA movidas para DoctorQ-service-ai
@@ -103,10 +104,6 @@ from src.central_atendimento.routes.webhook_route import router as central_atend
 from src.central_atendimento.routes.websocket_route import router as central_atendimento_ws_router
 from src.central_atendimento.routes.handoff_route import router as handoff_router
 from src.central_atendimento.routes.widget_route import router as widget_router
-from src.central_atendimento.services.fila_processor_service import (
-    start_fila_processor,
-    stop_fila_processor,
-)
 from src.central_atendimento.services.message_orchestrator_service import (
     start_message_orchestrator,
     stop_message_orchestrator,
@@ -119,10 +116,29 @@ from src.central_atendimento.services.websocket_notification_service import (
     start_notification_service,
     stop_notification_service,
 )
-from src.central_atendimento.services.campanha_worker import (
-    iniciar_campanha_worker,
-    parar_campanha_worker,
+from src.services.email_delivery_service import (
+    iniciar_email_delivery,
+    parar_email_delivery,
+)
+from src.services.analytics_ingestao_service import (
+    iniciar_ingestor_eventos,
+    parar_ingestor_eventos,
+)
+from src.services.apikey_cache import (
+    iniciar_apikey_cache,
+    parar_apikey_cache,
+)
+from src.services.permissao_cache import (
+    iniciar_permissao_cache,
+    parar_permissao_cache,
 )
+from src.services.coordenador_jobs import (
+    executa_jobs,
+    iniciar_coordenador_jobs,
+    papel_processo,
+    parar_coordenador_jobs,
+)
+from src.worker import jobs_singleton
 
 logger = get_logger("main")
 
@@ -189,12 +205,17 @@ async def lifespan(application: FastAPI):
             logger.error("Aplicação não pode continuar sem banco de dados")
             raise
 
-        # Iniciar processador de fila de atendimento
+        # Revogação de API Keys entre instâncias (Redis pub/sub)
         try:
-            await start_fila_processor()
-            logger.info("Processador de fila de atendimento iniciado")
+            await iniciar_apikey_cache()
         except Exception as e:
-            logger.warning(f"Não foi possível iniciar processador de fila: {str(e)}")
+            logger.warning(f"Não foi possível assinar revogações de API Keys: {str(e)}")
+
+        # Invalidação de permissões compiladas entre instâncias (Redis pub/sub)
+        try:
+            await iniciar_permissao_cache()
+        except Exception as e:
+            logger.warning(f"Não foi possível assinar invalidações de permissões: {str(e)}")
 
         # Iniciar orquestrador de mensagens (Central de Atendimento)
         try:
@@ -217,12 +238,30 @@ async def lifespan(application: FastAPI):
         except Exception as e:
             logger.warning(f"Não foi possível iniciar serviço de notificações: {str(e)}")
 
-        # Iniciar worker de campanhas de marketing
+        # Iniciar motor de entrega de emails (pool SMTP + fila assíncrona)
+        try:
+            await iniciar_email_delivery()
+            logger.info("Motor de entrega de emails iniciado")
+        except Exception as e:
+            logger.warning(f"Não foi possível iniciar motor de emails: {str(e)}")
+
+        # Ingestão bufferizada de eventos de analytics
         try:
-            await iniciar_campanha_worker()
-            logger.info("Worker de campanhas iniciado")
+            await iniciar_ingestor_eventos()
         except Exception as e:
-            logger.warning(f"Não foi possível iniciar worker de campanhas: {str(e)}")
+            logger.warning(f"Não foi possível iniciar ingestor de analytics: {str(e)}")
+
+        # Jobs singleton (fila, campanhas, exportação, uso, estoque, partições,
+        # dashboard, broadcast): uma instância por vez via lease; APP_ROLE=api
+        # deixa os jobs para o processo worker (python -m src.worker)
+        papel = papel_processo()
+        if executa_jobs(papel):
+            try:
+                await iniciar_coordenador_jobs(jobs_singleton(), papel)
+            except Exception as e:
+                logger.warning(f"Não foi possível iniciar coordenador de jobs: {str(e)}")
+        else:
+            logger.info("APP_ROLE=api: jobs singleton executados pelo processo worker")
 
         await asyncio.sleep(0.1)
         logger.debug("Aplicação pronta para uso!")
@@ -231,12 +270,34 @@ async def lifespan(application: FastAPI):
         logger.error("Erro fatal durante inicialização: %s", str(e))
         raise
     finally:
-        # Parar worker de campanhas
         try:
-            await parar_campanha_worker()
-            logger.debug("Worker de campanhas parado")
+            await parar_apikey_cache()
+        except Exception as e:
+            logger.warning(f"Erro ao parar cache de API Keys: {str(e)}")
+
+        try:
+            await parar_permissao_cache()
+        except Exception as e:
+            logger.warning(f"Erro ao parar cache de permissões: {str(e)}")
+
+        # Para os jobs singleton locais e libera os leases (failover imediato)
+        try:
+            await parar_coordenador_jobs()
+        except Exception as e:
+            logger.warning(f"Erro ao parar coordenador de jobs: {str(e)}")
+
+        # Drena o buffer de analytics (banco ou spool)
+        try:
+            await parar_ingestor_eventos()
         except Exception as e:
-            logger.warning(f"Erro ao parar worker de campanhas: {str(e)}")
+            logger.warning(f"Erro ao parar ingestor de analytics: {str(e)}")
+
+        # Drenar fila de emails e fechar conexões SMTP
+        try:
+            await parar_email_delivery()
+            logger.debug("Motor de entrega de emails parado")
+        except Exception as e:
+            logger.warning(f"Erro ao parar motor de emails: {str(e)}")
 
         # Parar serviço de notificações WebSocket
         try:
@@ -259,13 +320,6 @@ async def lifespan(application: FastAPI):
         except Exception as e:
             logger.warning(f"Erro ao parar orquestrador de mensagens: {str(e)}")
 
-        # Parar processador de fila
-        try:
-            await stop_fila_processor()
-            logger.debug("Processador de fila parado")
-        except Exception as e:
-            logger.warning(f"Erro ao parar processador de fila: {str(e)}")
-
         await ORMConfig.close_connections()
         logger.debug("Finalizando aplicação...")
 
@@ -373,6 +427,7 @@ app.include_router(rastreamento_router)
 app.include_router(nota_fiscal_router)
 app.include_router(broadcast_router)
 app.include_router(export_router)
+app.include_router(workers_router)
 app.include_router(webhook_router)
 app.include_router(templates_router)
 app.include_router(analytics_router)
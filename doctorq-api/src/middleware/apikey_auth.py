@@ -5,8 +5,7 @@ from fastapi import HTTPException, Request, status
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from src.config.logger_config import get_logger
-from src.config.orm_config import get_async_session_context
-from src.services.apikey_service import ApiKeyService
+from src.services.apikey_cache import resolver_apikey
 from src.utils.security import decode_access_token
 
 logger = get_logger(__name__)
@@ -17,8 +16,12 @@ class ApiKeyAuthMiddleware(BaseHTTPMiddleware):
     Middleware para autenticação via Bearer Token (API Key ou JWT).
 
     Suporta dois métodos de autenticação:
-    1. API Key global (para integrações e admin bypass)
-    2. JWT Token (para usuários autenticados com permissões granulares)
+    1. JWT Token (para usuários autenticados com permissões granulares)
+    2. API Key global (para integrações e admin bypass)
+
+    JWT é verificado localmente, sem banco. API Keys são resolvidas pelo hash
+    da chave com cache em processo (ver services/apikey_cache.py), então só
+    chaves ainda não vistas (ou revogadas) consultam o banco.
     """
 
     def __init__(self, app, excluded_paths: Optional[list] = None):
@@ -52,6 +55,11 @@ class ApiKeyAuthMiddleware(BaseHTTPMiddleware):
 
         return parts[1]
 
+    @staticmethod
+    def _parece_jwt(token: str) -> bool:
+        """JWT compacto: três segmentos base64url separados por ponto (API Keys usam vf_...)"""
+        return token.count(".") == 2 and token.startswith("eyJ")
+
     async def _try_validate_jwt(self, token: str) -> Optional[dict]:
         """
         Tenta validar token como JWT.
@@ -60,11 +68,10 @@ class ApiKeyAuthMiddleware(BaseHTTPMiddleware):
         try:
             payload = decode_access_token(token)
             if payload and "sub" in payload:
-                logger.debug(f"✅ JWT válido detectado: user_id={payload.get('sub')}")
                 return payload
             return None
         except Exception as e:
-            logger.debug(f"Token não é JWT válido: {str(e)}")
+            logger.debug("Token não é JWT válido: %s", e)
             return None
 
     async def dispatch(self, request: Request, call_next):
@@ -74,10 +81,10 @@ class ApiKeyAuthMiddleware(BaseHTTPMiddleware):
         Fluxo:
         1. Verifica se rota está excluída
         2. Extrai token Bearer do header Authorization
-        3. Tenta validar como API Key (tabela tb_api_keys)
-        4. Se falhar, tenta validar como JWT (decode_access_token)
-        5. Se ambos falharem, retorna HTTP 401
-        6. Se algum for válido, permite request continuar
+        3. Token no formato JWT: valida localmente (decode_access_token)
+        4. Caso contrário: resolve como API Key (hash + cache, banco só em miss)
+        5. Se a validação falhar, retorna HTTP 401
+        6. Se for válido, permite request continuar
         """
 
         # Permitir preflight CORS sem exigir autenticação
@@ -86,21 +93,19 @@ class ApiKeyAuthMiddleware(BaseHTTPMiddleware):
 
         # Verificar se a rota está excluída da autenticação
         path = request.url.path
-        logger.debug(f"🔍 Middleware interceptou: {path}")
 
         is_excluded = any(
             path.startswith(excluded_path) for excluded_path in self.excluded_paths
         )
 
         if is_excluded:
-            logger.debug(f"✅ Permitindo acesso sem auth para: {path}")
             return await call_next(request)
 
         # Verificar header Authorization
         authorization = request.headers.get("Authorization")
 
         if not authorization:
-            logger.warning(f"❌ Acesso negado - Authorization header ausente: {path}")
+            logger.warning("Acesso negado - Authorization header ausente: %s", path)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Authorization header requerido",
@@ -111,50 +116,56 @@ class ApiKeyAuthMiddleware(BaseHTTPMiddleware):
         token = self._extract_bearer_token(authorization)
 
         if not token:
-            logger.warning(f"❌ Bearer token malformado: {path}")
+            logger.warning("Bearer token malformado: %s", path)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Bearer token inválido ou ausente",
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # ESTRATÉGIA 1: Tentar validar como API Key global
-        try:
-            async with get_async_session_context() as db:
-                service = ApiKeyService(db)
-                validated_apikey = await service.get_apikey_by_key(token)
-
-                if validated_apikey:
-                    # API Key válida - marcar request e continuar
-                    logger.debug(f"✅ Autenticado via API Key: {validated_apikey.keyName}")
-                    request.state.api_key = validated_apikey
-                    request.state.auth_method = "bearer_apikey"
-
-                    response = await call_next(request)
-                    response.headers["X-Auth-Method"] = "bearer_apikey"
+        # ESTRATÉGIA 1: JWT verificado localmente (tráfego de usuários logados)
+        if self._parece_jwt(token):
+            jwt_payload = await self._try_validate_jwt(token)
+
+            if jwt_payload:
+                # JWT válido - marcar request e continuar
+                # A validação de permissões será feita pelo decorator @require_permission
+                logger.debug("Autenticado via JWT: user_id=%s", jwt_payload.get("sub"))
+                request.state.jwt_payload = jwt_payload
+                request.state.auth_method = "jwt"
+
+                response = await call_next(request)
+                response.headers["X-Auth-Method"] = "jwt"
+                return response
+
+        # ESTRATÉGIA 2: API Key global (hash + cache em processo)
+        else:
+            try:
+                validated_apikey = await resolver_apikey(token)
+            except Exception as e:
+                logger.error("Erro ao validar API Key: %s", e)
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Não foi possível validar a API Key no momento",
+                )
+
+            if validated_apikey:
+                # API Key válida - marcar request e continuar
+                logger.debug("Autenticado via API Key: %s", validated_apikey.keyName)
+                request.state.api_key = validated_apikey
+                request.state.auth_method = "bearer_apikey"
+
+                response = await call_next(request)
+                response.headers["X-Auth-Method"] = "bearer_apikey"
+                if validated_apikey.keyName:
                     response.headers["X-API-Key-Name"] = validated_apikey.keyName
-                    return response
-
-        except Exception as e:
-            logger.debug(f"Erro ao validar como API Key: {str(e)}")
-
-        # ESTRATÉGIA 2: Tentar validar como JWT Token
-        jwt_payload = await self._try_validate_jwt(token)
-
-        if jwt_payload:
-            # JWT válido - marcar request e continuar
-            # A validação de permissões será feita pelo decorator @require_permission
-            logger.debug(f"✅ Autenticado via JWT: user_id={jwt_payload.get('sub')}")
-            request.state.jwt_payload = jwt_payload
-            request.state.auth_method = "jwt"
-
-            response = await call_next(request)
-            response.headers["X-Auth-Method"] = "jwt"
-            return response
+                return response
 
         # Ambas as estratégias falharam
         logger.warning(
-            f"❌ Token inválido (não é API Key nem JWT válido): {path} (token: {token[:8]}...)"
+            "Token inválido (não é API Key nem JWT válido): %s (token: %s...)",
+            path,
+            token[:8],
         )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
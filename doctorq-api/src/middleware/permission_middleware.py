@@ -19,101 +19,94 @@ from functools import wraps
 from typing import Callable, Optional
 
 from fastapi import HTTPException, Request, status
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logger_config import get_logger
-from src.models.perfil import Perfil
 from src.models.user import User
+from src.services.permissao_cache import (
+    obter_perfil_usuario,
+    obter_permissoes_perfil,
+    permissao_em_claims,
+)
 
 logger = get_logger(__name__)
 
 
 class PermissionChecker:
-    """Classe auxiliar para verificação de permissões."""
+    """
+    Classe auxiliar para verificação de permissões.
+
+    Perfis são compilados e mantidos em cache (src.services.permissao_cache);
+    o banco só é consultado em cache miss ou após invalidação.
+    """
 
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def check_user_permission(
+    async def check_perfil_permission(
         self,
-        user_id: uuid.UUID,
+        id_perfil: Optional[uuid.UUID],
         grupo: str,
         recurso: str,
         acao: str
     ) -> tuple[bool, str]:
         """
-        Verifica se usuário tem permissão para executar ação em recurso.
-
-        Args:
-            user_id: UUID do usuário
-            grupo: Grupo de acesso (admin, clinica, profissional, paciente, fornecedor)
-            recurso: Recurso a ser acessado (agendamentos, pacientes, etc.)
-            acao: Ação a ser realizada (visualizar, criar, editar, excluir)
+        Verifica permissão diretamente pelo perfil (usuário já carregado e ativo).
 
         Returns:
             tuple[bool, str]: (tem_permissao, mensagem_erro)
         """
         try:
-            # 1. Buscar usuário e seu perfil
-            stmt = select(User).where(
-                User.id_user == user_id,
-                User.st_ativo == "S"
-            )
-            result = await self.db.execute(stmt)
-            user = result.scalar_one_or_none()
-
-            if not user:
-                return False, "Usuário não encontrado ou inativo"
-
-            if not user.id_perfil:
+            if not id_perfil:
                 return False, "Usuário sem perfil atribuído"
 
-            # 2. Buscar perfil com permissões
-            stmt = select(Perfil).where(
-                Perfil.id_perfil == user.id_perfil,
-                Perfil.st_ativo == "S"
-            )
-            result = await self.db.execute(stmt)
-            perfil = result.scalar_one_or_none()
-
-            if not perfil:
+            permissoes = await obter_permissoes_perfil(self.db, id_perfil)
+            if not permissoes:
                 return False, "Perfil não encontrado ou inativo"
 
-            # 3. Verificar se perfil tem acesso ao grupo (Nível 1)
-            if not perfil.ds_grupos_acesso or grupo not in perfil.ds_grupos_acesso:
-                return False, f"Perfil não tem acesso ao grupo '{grupo}'"
-
-            # 4. Verificar permissão detalhada (Nível 2)
-            if not perfil.ds_permissoes_detalhadas:
-                return False, "Perfil sem permissões detalhadas configuradas"
-
-            # Navegar na estrutura: {grupo: {recurso: {acao: bool}}}
-            grupo_permissions = perfil.ds_permissoes_detalhadas.get(grupo, {})
-            if not grupo_permissions:
-                return False, f"Sem permissões configuradas para grupo '{grupo}'"
-
-            recurso_permissions = grupo_permissions.get(recurso, {})
-            if not recurso_permissions:
-                return False, f"Sem permissões configuradas para recurso '{recurso}'"
-
-            tem_permissao = recurso_permissions.get(acao, False)
-
-            if not tem_permissao:
-                return False, f"Sem permissão para '{acao}' em '{recurso}'"
+            if not permissoes.permite(grupo, recurso, acao):
+                return False, permissoes.motivo_negacao(grupo, recurso, acao)
 
             logger.debug(
-                f"✅ Permissão concedida: user={user_id}, "
-                f"perfil={perfil.nm_perfil}, grupo={grupo}, "
-                f"recurso={recurso}, acao={acao}"
+                f"✅ Permissão concedida: perfil={permissoes.nm_perfil}, "
+                f"grupo={grupo}, recurso={recurso}, acao={acao}"
             )
-
             return True, ""
 
         except Exception as e:
             logger.error(f"Erro ao verificar permissão: {str(e)}", exc_info=True)
             return False, f"Erro ao verificar permissão: {str(e)}"
 
+    async def check_user_permission(
+        self,
+        user_id: uuid.UUID,
+        grupo: str,
+        recurso: str,
+        acao: str
+    ) -> tuple[bool, str]:
+        """
+        Verifica se usuário tem permissão para executar ação em recurso.
+
+        Args:
+            user_id: UUID do usuário
+            grupo: Grupo de acesso (admin, clinica, profissional, paciente, fornecedor)
+            recurso: Recurso a ser acessado (agendamentos, pacientes, etc.)
+            acao: Ação a ser realizada (visualizar, criar, editar, excluir)
+
+        Returns:
+            tuple[bool, str]: (tem_permissao, mensagem_erro)
+        """
+        try:
+            ativo, id_perfil = await obter_perfil_usuario(self.db, user_id)
+        except Exception as e:
+            logger.error(f"Erro ao verificar permissão: {str(e)}", exc_info=True)
+            return False, f"Erro ao verificar permissão: {str(e)}"
+
+        if not ativo:
+            return False, "Usuário não encontrado ou inativo"
+
+        return await self.check_perfil_permission(id_perfil, grupo, recurso, acao)
+
 
 def require_permission(
     grupo: str,
@@ -181,14 +174,21 @@ def require_permission(
                 logger.debug(f"✅ Admin bypass: user={current_user.id_user}, papel={current_user.nm_papel}")
                 return await func(*args, **kwargs)
 
-            # Verificar permissão
-            checker = PermissionChecker(db)
-            tem_permissao, mensagem_erro = await checker.check_user_permission(
-                user_id=current_user.id_user,
-                grupo=grupo,
-                recurso=recurso,
-                acao=acao
-            )
+            # Verificar permissão: claims do JWT (se emitidas no login) ou perfil em cache.
+            # current_user já foi carregado ativo por get_current_user - não relê o usuário.
+            jwt_payload = getattr(request.state, "jwt_payload", None) if request else None
+            tem_permissao = permissao_em_claims(jwt_payload, current_user.id_perfil, grupo, recurso, acao)
+            mensagem_erro = ""
+            if tem_permissao is None:
+                checker = PermissionChecker(db)
+                tem_permissao, mensagem_erro = await checker.check_perfil_permission(
+                    id_perfil=current_user.id_perfil,
+                    grupo=grupo,
+                    recurso=recurso,
+                    acao=acao
+                )
+            elif not tem_permissao:
+                mensagem_erro = f"Sem permissão para '{acao}' em '{recurso}'"
 
             if not tem_permissao:
                 logger.warning(
@@ -262,24 +262,15 @@ async def get_user_permissions(
         }
     """
     try:
-        # Buscar usuário e perfil
-        stmt = select(User).where(User.id_user == user_id, User.st_ativo == "S")
-        result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
-
-        if not user or not user.id_perfil:
-            return {"grupos_acesso": [], "permissoes_detalhadas": {}}
-
-        stmt = select(Perfil).where(Perfil.id_perfil == user.id_perfil, Perfil.st_ativo == "S")
-        result = await db.execute(stmt)
-        perfil = result.scalar_one_or_none()
+        ativo, id_perfil = await obter_perfil_usuario(db, user_id)
+        permissoes = await obter_permissoes_perfil(db, id_perfil) if ativo else None
 
-        if not perfil:
+        if not permissoes:
             return {"grupos_acesso": [], "permissoes_detalhadas": {}}
 
         return {
-            "grupos_acesso": perfil.ds_grupos_acesso or [],
-            "permissoes_detalhadas": perfil.ds_permissoes_detalhadas or {}
+            "grupos_acesso": list(permissoes.grupos_acesso),
+            "permissoes_detalhadas": permissoes.permissoes_detalhadas
         }
 
     except Exception as e:
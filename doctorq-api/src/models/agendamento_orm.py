@@ -17,8 +17,9 @@ from sqlalchemy import (
     ForeignKey,
     DECIMAL,
     Date,
+    Computed,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import TSRANGE, UUID
 
 from src.models.base import Base
 
@@ -40,6 +41,14 @@ class AgendamentoORM(Base):
     )
     dt_agendamento = Column(TIMESTAMP, nullable=False)
     nr_duracao_minutos = Column(Integer, nullable=False)
+    # Período [início, fim) gerado pelo banco; base da constraint de exclusão por profissional
+    tr_periodo = Column(
+        TSRANGE,
+        Computed(
+            "tsrange(dt_agendamento, dt_agendamento + make_interval(mins => nr_duracao_minutos), '[)')",
+            persisted=True,
+        ),
+    )
     ds_status = Column(String(50), default="agendado")
     ds_motivo = Column(String(255))
     ds_observacoes = Column(Text)
@@ -58,3 +67,30 @@ class AgendamentoORM(Base):
     st_avaliado = Column(Boolean, default=False)
     dt_criacao = Column(TIMESTAMP, default=datetime.now)
     dt_atualizacao = Column(TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+
+
+class AgendamentoReservaORM(Base):
+    """Reservas temporárias de horário - tabela tb_agendamento_reservas"""
+
+    __tablename__ = "tb_agendamento_reservas"
+    __table_args__ = {'extend_existing': True}
+
+    id_reserva = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id_profissional = Column(
+        UUID(as_uuid=True), ForeignKey("tb_profissionais.id_profissional"), nullable=False
+    )
+    id_user = Column(UUID(as_uuid=True), ForeignKey("tb_users.id_user"))
+    id_procedimento = Column(
+        UUID(as_uuid=True), ForeignKey("tb_procedimentos.id_procedimento")
+    )
+    dt_agendamento = Column(TIMESTAMP, nullable=False)
+    nr_duracao_minutos = Column(Integer, nullable=False)
+    tr_periodo = Column(
+        TSRANGE,
+        Computed(
+            "tsrange(dt_agendamento, dt_agendamento + make_interval(mins => nr_duracao_minutos), '[)')",
+            persisted=True,
+        ),
+    )
+    dt_expiracao = Column(TIMESTAMP, nullable=False)
+    dt_criacao = Column(TIMESTAMP, default=datetime.now)
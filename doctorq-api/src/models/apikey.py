@@ -22,10 +22,13 @@ class ApiKey(Base):
         name="id_api_key",
     )
     apiKey = Column(String, nullable=False, name="nm_api_key", unique=True)
+    # SHA-256 (hex) da chave: índice usado na autenticação (mantido também por trigger)
+    apiKeyHash = Column(String(64), nullable=False, name="nm_api_key_hash", unique=True)
     keyName = Column(String, nullable=True, name="nm_descricao")
     id_empresa = Column(UUID(as_uuid=True), nullable=True, name="id_empresa")
     id_user = Column(UUID(as_uuid=True), nullable=True, name="id_user")
     st_ativo = Column(Boolean, nullable=True, name="st_ativo", default=True)
+    dt_expiracao = Column(DateTime, nullable=True, name="dt_expiracao")
     updatedDate = Column(
         DateTime,
         nullable=False,
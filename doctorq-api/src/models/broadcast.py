@@ -7,7 +7,7 @@ from typing import Optional, List, Dict, Any
 from uuid import UUID, uuid4
 from enum import Enum
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, computed_field, validator
 from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Integer, Boolean, JSON
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 
@@ -94,6 +94,11 @@ class TbBroadcastCampanha(Base):
     nr_abertos = Column(Integer, default=0)  # Para email/push
     nr_cliques = Column(Integer, default=0)  # Se houver links
 
+    # Pipeline de envio (checkpoint keyset + lease do worker)
+    id_checkpoint_destinatario = Column(PG_UUID(as_uuid=True))  # Último destinatário processado
+    ds_worker_envio = Column(String(100))  # Instância que detém o envio
+    dt_heartbeat_envio = Column(DateTime)  # Renovado a cada lote; lease expira sem heartbeat
+
     # Metadados
     ds_metadados = Column(JSON)  # Dados adicionais (UTM params, variáveis personalizadas)
 
@@ -244,6 +249,15 @@ class BroadcastCampanhaResponse(BaseModel):
     dt_criacao: datetime
     dt_atualizacao: datetime
 
+    @computed_field
+    @property
+    def nr_progresso_percentual(self) -> float:
+        """Percentual de destinatários já processados (enviados + falhas)"""
+        if not self.nr_total_destinatarios:
+            return 0.0
+        processados = (self.nr_enviados or 0) + (self.nr_falhas or 0)
+        return round(min(100.0, 100.0 * processados / self.nr_total_destinatarios), 1)
+
     class Config:
         from_attributes = True
 
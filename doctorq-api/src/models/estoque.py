@@ -3,10 +3,10 @@ Modelos para Gestão de Estoque - UC043
 """
 from datetime import datetime
 from typing import Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from pydantic import BaseModel, Field
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Numeric, Text
+from sqlalchemy import BigInteger, Column, String, DateTime, ForeignKey, Identity, Integer, Numeric, Text
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 
 from src.models.base import Base
@@ -16,7 +16,7 @@ class TbMovimentacaoEstoque(Base):
     """Tabela de movimentações de estoque"""
     __tablename__ = "tb_movimentacoes_estoque"
 
-    id_movimentacao = Column(PG_UUID(as_uuid=True), primary_key=True)
+    id_movimentacao = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid4)
     id_empresa = Column(PG_UUID(as_uuid=True), ForeignKey("tb_empresas.id_empresa"), nullable=False)
     id_produto = Column(PG_UUID(as_uuid=True), ForeignKey("tb_produtos.id_produto"), nullable=False)
     id_user = Column(PG_UUID(as_uuid=True), ForeignKey("tb_users.id_user"))
@@ -31,6 +31,8 @@ class TbMovimentacaoEstoque(Base):
     ds_motivo = Column(Text)
     ds_lote = Column(String(50))
     dt_validade = Column(DateTime)
+    # Ordem de gravação no ledger (base da reconciliação incremental)
+    nr_sequencia = Column(BigInteger, Identity(always=True))
 
     dt_criacao = Column(DateTime, default=datetime.utcnow)
 
@@ -39,7 +41,7 @@ class TbReservaEstoque(Base):
     """Tabela de reservas de estoque"""
     __tablename__ = "tb_reservas_estoque"
 
-    id_reserva = Column(PG_UUID(as_uuid=True), primary_key=True)
+    id_reserva = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid4)
     id_empresa = Column(PG_UUID(as_uuid=True), ForeignKey("tb_empresas.id_empresa"), nullable=False)
     id_produto = Column(PG_UUID(as_uuid=True), ForeignKey("tb_produtos.id_produto"), nullable=False)
     id_agendamento = Column(PG_UUID(as_uuid=True), ForeignKey("tb_agendamentos.id_agendamento"), nullable=False)
@@ -98,6 +100,16 @@ class ReservaEstoqueCreate(BaseModel):
     nr_quantidade: int = Field(..., gt=0)
 
 
+class ReservaEstoqueItem(BaseModel):
+    id_produto: UUID
+    nr_quantidade: int = Field(..., gt=0)
+
+
+class ReservaEstoqueLoteCreate(BaseModel):
+    id_agendamento: UUID
+    itens: list[ReservaEstoqueItem] = Field(..., min_length=1)
+
+
 class ReservaEstoqueResponse(BaseModel):
     id_reserva: UUID
     id_empresa: UUID
@@ -7,8 +7,8 @@ from typing import Optional, List, Dict, Any
 from uuid import UUID, uuid4
 from enum import Enum
 
-from pydantic import BaseModel, Field, validator
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Integer, Boolean, JSON
+from pydantic import BaseModel, Field, computed_field, validator
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Integer, BigInteger, Boolean, JSON
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 
 from src.models.base import Base
@@ -20,6 +20,7 @@ class FormatoExport(str, Enum):
     CSV = "csv"
     PDF = "pdf"
     JSON = "json"
+    NDJSON = "ndjson"  # JSON Lines (um objeto por linha)
 
 
 class TipoRelatorio(str, Enum):
@@ -81,11 +82,13 @@ class TbExportJob(Base):
     ds_arquivo_path = Column(Text)  # Caminho do arquivo gerado
     ds_arquivo_url = Column(Text)  # URL para download
     nr_total_registros = Column(Integer, default=0)
-    nr_tamanho_bytes = Column(Integer, default=0)
+    nr_registros_processados = Column(Integer, default=0)  # Progresso durante o processamento
+    nr_tamanho_bytes = Column(BigInteger, default=0)
 
     # Timestamps
     dt_solicitacao = Column(DateTime, nullable=False, default=datetime.utcnow)
     dt_inicio_processamento = Column(DateTime)
+    dt_heartbeat = Column(DateTime)  # Sinal de vida do ExportWorker durante o processamento
     dt_fim_processamento = Column(DateTime)
     dt_expiracao = Column(DateTime)  # Data de expiração do arquivo (limpar após X dias)
 
@@ -174,6 +177,7 @@ class ExportJobResponse(BaseModel):
 
     ds_arquivo_url: Optional[str]
     nr_total_registros: int
+    nr_registros_processados: int = 0
     nr_tamanho_bytes: int
 
     dt_solicitacao: datetime
@@ -183,6 +187,16 @@ class ExportJobResponse(BaseModel):
 
     fg_agendado: bool
 
+    @computed_field
+    @property
+    def nr_progresso_percentual(self) -> float:
+        """Percentual processado (0-100), estimado a partir do total contado no início"""
+        if not self.nr_total_registros:
+            return 100.0 if self.st_export == StatusExport.CONCLUIDO.value else 0.0
+        return round(
+            min(100.0, 100.0 * (self.nr_registros_processados or 0) / self.nr_total_registros), 1
+        )
+
     class Config:
         from_attributes = True
 
@@ -2,9 +2,10 @@
 Rotas para Agenda Inteligente - Sistema de Agendamentos
 """
 
+import os
 import uuid
 from typing import List, Optional
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
@@ -16,6 +17,15 @@ from src.config.logger_config import get_logger
 from src.config.orm_config import get_db
 from src.middleware.permission_middleware import require_permission
 from src.models.user import User
+from src.services.disponibilidade_service import (
+    Slot,
+    calcular_slots,
+    carregar_calendario,
+    horario_livre,
+    invalidar_calendario,
+    obter_disponibilidade_cacheada,
+    obter_disponibilidade_profissionais,
+)
 from src.utils.auth import get_current_apikey, get_current_user
 from src.utils.auth_helpers import validate_empresa_access, get_user_empresa_id
 
@@ -38,6 +48,7 @@ class AgendamentoCreateRequest(BaseModel):
     ds_observacoes: Optional[str] = None
     vl_valor: Optional[Decimal] = None
     ds_forma_pagamento: Optional[str] = None
+    id_reserva: Optional[str] = None  # Reserva temporária obtida em POST /agendamentos/reservas
 
 class AgendamentoUpdateRequest(BaseModel):
     dt_agendamento: Optional[datetime] = None
@@ -76,6 +87,41 @@ class HorarioDisponivel(BaseModel):
     disponivel: bool
     motivo: Optional[str] = None
 
+
+def _para_horarios(slots: List[Slot]) -> List[HorarioDisponivel]:
+    return [
+        HorarioDisponivel(dt_horario=slot.dt_horario, disponivel=slot.disponivel, motivo=slot.motivo)
+        for slot in slots
+    ]
+
+
+# Namespace do advisory lock por profissional (segunda chave = hashtext do id)
+CHAVE_AGENDA_PROFISSIONAL = 743200
+
+
+async def _travar_agenda_profissional(db: AsyncSession, id_profissional: str):
+    """
+    Serializa reservas e agendamentos do mesmo profissional até o fim da
+    transação. As constraints de exclusão valem por tabela; o NOT EXISTS que
+    cruza agendamentos e reservas só é seguro com o lock (READ COMMITTED).
+    """
+    await db.execute(
+        text("SELECT pg_advisory_xact_lock(:chave, hashtext(:id_profissional))"),
+        {"chave": CHAVE_AGENDA_PROFISSIONAL, "id_profissional": str(id_profissional)},
+    )
+
+
+def _eh_conflito_horario(erro: Exception) -> bool:
+    """Violação das constraints de exclusão de período (SQLSTATE 23P01)"""
+    if getattr(getattr(erro, "orig", None), "sqlstate", None) == "23P01":
+        return True
+    mensagem = str(erro)
+    return (
+        "ex_agendamentos_profissional_periodo" in mensagem
+        or "ex_agendamento_reservas_periodo" in mensagem
+        or "ExclusionViolation" in mensagem
+    )
+
 # ============================================
 # Agendamentos - CRUD
 # ============================================
@@ -89,7 +135,8 @@ async def criar_agendamento(
 ):
     """
     Criar novo agendamento.
-    Verifica disponibilidade do profissional antes de confirmar.
+    Conflitos de horário são barrados pelo banco (constraint de exclusão por
+    profissional) e retornam 409. Se houver reserva de checkout, envie id_reserva.
 
     **Permissão necessária**: clinica.agendamentos.criar
     """
@@ -178,37 +225,6 @@ async def criar_agendamento(
             else:
                 logger.warning(f"Usuário {request.id_paciente} não encontrado na tabela tb_users. Não foi possível criar paciente automaticamente.")
 
-        # Verificar disponibilidade do horário
-        check_query = text("""
-            SELECT COUNT(*)
-            FROM tb_agendamentos
-            WHERE id_profissional = :id_profissional
-              AND ds_status NOT IN ('cancelado', 'nao_compareceu')
-              AND (
-                (dt_agendamento <= :dt_inicio AND dt_agendamento + (nr_duracao_minutos || ' minutes')::INTERVAL > :dt_inicio)
-                OR
-                (dt_agendamento < :dt_fim AND dt_agendamento + (nr_duracao_minutos || ' minutes')::INTERVAL >= :dt_fim)
-                OR
-                (dt_agendamento >= :dt_inicio AND dt_agendamento < :dt_fim)
-              )
-        """)
-
-        dt_fim = request.dt_agendamento + timedelta(minutes=request.nr_duracao_minutos)
-
-        result = await db.execute(check_query, {
-            "id_profissional": request.id_profissional,
-            "dt_inicio": request.dt_agendamento,
-            "dt_fim": dt_fim
-        })
-
-        conflitos = result.scalar()
-
-        if conflitos > 0:
-            raise HTTPException(
-                status_code=409,
-                detail=f"Horário indisponível. Existe {conflitos} agendamento(s) conflitante(s)."
-            )
-
         # Inserir agendamento
         insert_params = {
             "id_paciente": request.id_paciente,
@@ -221,10 +237,42 @@ async def criar_agendamento(
             "ds_observacoes": request.ds_observacoes,
             "vl_valor": request.vl_valor,
             "ds_forma_pagamento": request.ds_forma_pagamento,
+            "dt_fim": request.dt_agendamento + timedelta(minutes=request.nr_duracao_minutos),
+            "id_reserva": request.id_reserva,
         }
 
         logger.info(f"Criando agendamento com parâmetros: id_clinica={insert_params['id_clinica']}, id_profissional={insert_params['id_profissional']}, id_paciente={insert_params['id_paciente']}")
 
+        if request.id_reserva:
+            try:
+                uuid.UUID(request.id_reserva)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="ID de reserva inválido")
+
+        await _travar_agenda_profissional(db, request.id_profissional)
+
+        # A reserva do próprio checkout só é consumida se for do usuário, do
+        # mesmo profissional e exatamente do mesmo período, e ainda válida
+        if request.id_reserva:
+            reserva = await db.execute(text("""
+                DELETE FROM tb_agendamento_reservas
+                WHERE id_reserva = CAST(:id_reserva AS UUID)
+                  AND id_user = CAST(:id_user AS UUID)
+                  AND id_profissional = CAST(:id_profissional AS UUID)
+                  AND tr_periodo = tsrange(CAST(:dt_agendamento AS TIMESTAMP), CAST(:dt_fim AS TIMESTAMP), '[)')
+                  AND dt_expiracao > NOW()
+                RETURNING id_reserva
+            """), {**insert_params, "id_user": str(current_user.id_user)})
+            if not reserva.fetchone():
+                await db.rollback()
+                raise HTTPException(
+                    status_code=409,
+                    detail="Reserva de horário expirada ou não corresponde a este agendamento. Reserve o horário novamente."
+                )
+
+        # Conflito entre agendamentos é garantido pela constraint de exclusão
+        # ex_agendamentos_profissional_periodo (violação vira 409 abaixo);
+        # reservas ativas de outros pacientes bloqueiam o horário
         insert_query = text("""
             INSERT INTO tb_agendamentos (
                 id_paciente,
@@ -238,26 +286,43 @@ async def criar_agendamento(
                 vl_valor,
                 ds_forma_pagamento,
                 ds_status
-            ) VALUES (
-                :id_paciente,
-                :id_profissional,
-                :id_clinica,
-                :id_procedimento,
-                :dt_agendamento,
-                :nr_duracao_minutos,
-                :ds_motivo,
-                :ds_observacoes,
-                :vl_valor,
-                :ds_forma_pagamento,
+            )
+            SELECT
+                CAST(:id_paciente AS UUID),
+                CAST(:id_profissional AS UUID),
+                CAST(:id_clinica AS UUID),
+                CAST(:id_procedimento AS UUID),
+                CAST(:dt_agendamento AS TIMESTAMP),
+                CAST(:nr_duracao_minutos AS INTEGER),
+                CAST(:ds_motivo AS VARCHAR),
+                CAST(:ds_observacoes AS TEXT),
+                CAST(:vl_valor AS NUMERIC),
+                CAST(:ds_forma_pagamento AS VARCHAR),
                 'agendado'
+            WHERE NOT EXISTS (
+                SELECT 1 FROM tb_agendamento_reservas r
+                WHERE r.id_profissional = CAST(:id_profissional AS UUID)
+                  AND r.tr_periodo && tsrange(CAST(:dt_agendamento AS TIMESTAMP), CAST(:dt_fim AS TIMESTAMP), '[)')
+                  AND r.dt_expiracao > NOW()
             )
             RETURNING id_agendamento, dt_criacao
         """)
 
         result = await db.execute(insert_query, insert_params)
+        row = result.fetchone()
+
+        if not row:
+            await db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail="Horário reservado temporariamente por outro paciente. Escolha outro horário."
+            )
+
         await db.commit()
+        await invalidar_calendario(
+            request.id_profissional, [(request.dt_agendamento, request.nr_duracao_minutos)]
+        )
 
-        row = result.fetchone()
         id_agendamento = str(row[0])
 
         logger.info(f"Agendamento criado: {id_agendamento}")
@@ -271,6 +336,12 @@ async def criar_agendamento(
         error_msg = str(e)
         logger.error(f"Erro ao criar agendamento: {error_msg}")
 
+        if _eh_conflito_horario(e):
+            raise HTTPException(
+                status_code=409,
+                detail="Horário indisponível. Já existe agendamento conflitante neste período."
+            )
+
         # Tratar erros de foreign key violation
         if "foreign key constraint" in error_msg.lower() or "violates foreign key" in error_msg.lower():
             if "tb_pacientes" in error_msg or "id_paciente" in error_msg:
@@ -297,6 +368,167 @@ async def criar_agendamento(
         raise HTTPException(status_code=500, detail=f"Erro ao criar agendamento: {error_msg}")
 
 
+# ============================================
+# Reservas Temporárias de Horário (checkout)
+# ============================================
+
+# Tempo que um horário fica segurado enquanto o paciente conclui o checkout
+RESERVA_TTL_MINUTOS = int(os.getenv("AGENDAMENTO_RESERVA_TTL_MINUTOS", "10"))
+
+
+class ReservaHorarioRequest(BaseModel):
+    id_profissional: str
+    dt_agendamento: datetime
+    nr_duracao_minutos: int = Field(ge=15, le=480)
+    id_procedimento: Optional[str] = None
+
+class ReservaHorarioResponse(BaseModel):
+    id_reserva: str
+    id_profissional: str
+    dt_agendamento: datetime
+    nr_duracao_minutos: int
+    dt_expiracao: datetime
+
+
+@router.post("/reservas", response_model=ReservaHorarioResponse, status_code=201)
+async def reservar_horario(
+    request: ReservaHorarioRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Segura um horário por alguns minutos durante o checkout.
+
+    - Reservas de um mesmo profissional nunca se sobrepõem (constraint de exclusão)
+    - Não é possível reservar sobre um agendamento ativo
+    - A reserva expira em AGENDAMENTO_RESERVA_TTL_MINUTOS (padrão 10)
+    - Envie o id_reserva em POST /agendamentos/ para confirmar o horário
+
+    Retorna 409 se o horário já estiver agendado ou reservado.
+    """
+    try:
+        try:
+            uuid.UUID(request.id_profissional)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ID de profissional inválido")
+
+        dt_inicio = request.dt_agendamento
+        if dt_inicio.tzinfo is not None:
+            dt_inicio = dt_inicio.replace(tzinfo=None)
+
+        if dt_inicio <= datetime.now():
+            raise HTTPException(status_code=400, detail="O horário deve ser no futuro")
+
+        params = {
+            "id_profissional": request.id_profissional,
+            "id_user": str(current_user.id_user),
+            "id_procedimento": request.id_procedimento,
+            "dt_agendamento": dt_inicio,
+            "dt_fim": dt_inicio + timedelta(minutes=request.nr_duracao_minutos),
+            "nr_duracao_minutos": request.nr_duracao_minutos,
+            "ttl": RESERVA_TTL_MINUTOS,
+        }
+
+        await _travar_agenda_profissional(db, request.id_profissional)
+
+        # Reservas vencidas ainda ocupam a constraint: remove as do profissional antes
+        await db.execute(text("""
+            DELETE FROM tb_agendamento_reservas
+            WHERE id_profissional = CAST(:id_profissional AS UUID)
+              AND dt_expiracao <= NOW()
+        """), params)
+
+        result = await db.execute(text("""
+            INSERT INTO tb_agendamento_reservas (
+                id_profissional,
+                id_user,
+                id_procedimento,
+                dt_agendamento,
+                nr_duracao_minutos,
+                dt_expiracao
+            )
+            SELECT
+                CAST(:id_profissional AS UUID),
+                CAST(:id_user AS UUID),
+                CAST(:id_procedimento AS UUID),
+                CAST(:dt_agendamento AS TIMESTAMP),
+                CAST(:nr_duracao_minutos AS INTEGER),
+                NOW() + make_interval(mins => CAST(:ttl AS INTEGER))
+            WHERE NOT EXISTS (
+                SELECT 1 FROM tb_agendamentos a
+                WHERE a.id_profissional = CAST(:id_profissional AS UUID)
+                  AND a.tr_periodo && tsrange(CAST(:dt_agendamento AS TIMESTAMP), CAST(:dt_fim AS TIMESTAMP), '[)')
+                  AND a.ds_status NOT IN ('cancelado', 'nao_compareceu')
+            )
+            RETURNING id_reserva, dt_expiracao
+        """), params)
+        row = result.fetchone()
+
+        if not row:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Horário indisponível. Já existe agendamento neste período.")
+
+        await db.commit()
+        await invalidar_calendario(request.id_profissional, [(dt_inicio, request.nr_duracao_minutos)])
+
+        logger.info(
+            f"Horário reservado: profissional={request.id_profissional}, "
+            f"dt={dt_inicio}, expira={row.dt_expiracao}"
+        )
+
+        return ReservaHorarioResponse(
+            id_reserva=str(row.id_reserva),
+            id_profissional=request.id_profissional,
+            dt_agendamento=dt_inicio,
+            nr_duracao_minutos=request.nr_duracao_minutos,
+            dt_expiracao=row.dt_expiracao,
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        if _eh_conflito_horario(e):
+            raise HTTPException(
+                status_code=409,
+                detail="Horário reservado temporariamente por outro paciente. Escolha outro horário."
+            )
+        logger.error(f"Erro ao reservar horário: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao reservar horário: {str(e)}")
+
+
+@router.delete("/reservas/{id_reserva}")
+async def liberar_reserva_horario(
+    id_reserva: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Libera uma reserva temporária do próprio usuário (checkout abandonado)."""
+    try:
+        result = await db.execute(text("""
+            DELETE FROM tb_agendamento_reservas
+            WHERE id_reserva = CAST(:id_reserva AS UUID)
+              AND id_user = CAST(:id_user AS UUID)
+            RETURNING id_profissional, dt_agendamento, nr_duracao_minutos
+        """), {"id_reserva": id_reserva, "id_user": str(current_user.id_user)})
+        row = result.fetchone()
+        await db.commit()
+
+        if not row:
+            raise HTTPException(status_code=404, detail="Reserva não encontrada ou já expirada")
+
+        await invalidar_calendario(row.id_profissional, [(row.dt_agendamento, row.nr_duracao_minutos)])
+
+        return {"message": "Reserva liberada com sucesso"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Erro ao liberar reserva: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao liberar reserva: {str(e)}")
+
+
 # ============================================
 # Disponibilidade de Horários
 # ============================================
@@ -313,9 +545,9 @@ async def obter_disponibilidade(
     Retorna horários disponíveis para um profissional em uma data específica
 
     Lógica:
-    - Horário comercial: 08:00 às 18:00
-    - Intervalo de 30 minutos entre slots
-    - Verifica conflitos com agendamentos existentes
+    - Expediente do profissional (ds_horarios_atendimento; padrão 08:00 às 18:00)
+    - Intervalo de 30 minutos entre slots, sem ultrapassar o fim do turno
+    - Verifica conflitos com agendamentos existentes (bitmap de ocupação)
     - Considera a duração do procedimento
 
     Args:
@@ -343,73 +575,16 @@ async def obter_disponibilidade(
         if duracao_minutos < 15 or duracao_minutos > 480:
             raise HTTPException(status_code=400, detail="Duração deve estar entre 15 e 480 minutos")
 
-        # Buscar agendamentos existentes do profissional nesta data
-        # Suporta profissionais com ou sem clínica
-        query = text("""
-            SELECT a.dt_agendamento, a.nr_duracao_minutos
-            FROM tb_agendamentos a
-            LEFT JOIN tb_clinicas c ON a.id_clinica = c.id_clinica
-            WHERE a.id_profissional = :id_profissional
-              AND DATE(a.dt_agendamento) = :data
-              AND a.ds_status NOT IN ('cancelado')
-              AND (c.id_empresa = :id_empresa OR a.id_clinica IS NULL)
-            ORDER BY a.dt_agendamento
-        """)
-
-        result = await db.execute(query, {
-            "id_profissional": id_profissional,
-            "data": data_agendamento,
-            "id_empresa": str(current_user.id_empresa)
-        })
-
-        agendamentos_existentes = [
-            {
-                "inicio": row.dt_agendamento,
-                "fim": row.dt_agendamento + timedelta(minutes=row.nr_duracao_minutos)
-            }
-            for row in result.fetchall()
-        ]
-
-        # Gerar slots de horário (08:00 às 18:00, intervalos de 30 minutos)
-        horarios_disponiveis = []
-        horario_inicio = time(8, 0)  # 08:00
-        horario_fim = time(18, 0)    # 18:00
-
-        horario_atual = datetime.combine(data_agendamento, horario_inicio)
-        horario_limite = datetime.combine(data_agendamento, horario_fim)
-
-        while horario_atual < horario_limite:
-            # Calcular fim do slot considerando a duração do procedimento
-            fim_slot = horario_atual + timedelta(minutes=duracao_minutos)
-
-            # Verificar se o slot cabe no horário comercial
-            if fim_slot > horario_limite:
-                break
-
-            # Verificar conflitos com agendamentos existentes
-            conflito = False
-            motivo_indisponivel = None
-
-            for agendamento in agendamentos_existentes:
-                # Verifica se há sobreposição de horários
-                if (horario_atual < agendamento["fim"] and fim_slot > agendamento["inicio"]):
-                    conflito = True
-                    motivo_indisponivel = "Horário já reservado"
-                    break
-
-            # Verificar se é no passado
-            if horario_atual < datetime.now():
-                conflito = True
-                motivo_indisponivel = "Horário no passado"
-
-            horarios_disponiveis.append(HorarioDisponivel(
-                dt_horario=horario_atual,
-                disponivel=not conflito,
-                motivo=motivo_indisponivel
-            ))
-
-            # Próximo slot (intervalo de 30 minutos)
-            horario_atual += timedelta(minutes=30)
+        # Bitmap de ocupação + expediente do profissional (consultas por intervalo)
+        disponibilidade = await obter_disponibilidade_profissionais(
+            db,
+            [id_profissional],
+            data_agendamento,
+            data_agendamento,
+            duracao_minutos,
+            id_empresa=str(current_user.id_empresa),
+        )
+        horarios_disponiveis = _para_horarios(disponibilidade[str(uuid.UUID(id_profissional))])
 
         logger.info(
             f"Disponibilidade consultada: profissional={id_profissional}, "
@@ -438,9 +613,9 @@ async def obter_disponibilidade_periodo(
     Retorna horários disponíveis para um profissional em um período
 
     Lógica:
-    - Horário comercial: 08:00 às 18:00
-    - Intervalo de 30 minutos entre slots
-    - Verifica conflitos com agendamentos existentes
+    - Expediente do profissional (ds_horarios_atendimento; padrão 08:00 às 18:00)
+    - Intervalo de 30 minutos entre slots, sem ultrapassar o fim do turno
+    - Verifica conflitos com agendamentos existentes (bitmap de ocupação)
     - Considera a duração do procedimento
     - Retorna slots de todos os dias no período
 
@@ -480,80 +655,16 @@ async def obter_disponibilidade_periodo(
         if duracao_minutos < 15 or duracao_minutos > 480:
             raise HTTPException(status_code=400, detail="Duração deve estar entre 15 e 480 minutos")
 
-        # Buscar todos os agendamentos do profissional no período
-        # Suporta profissionais com ou sem clínica
-        query = text("""
-            SELECT a.dt_agendamento, a.nr_duracao_minutos
-            FROM tb_agendamentos a
-            LEFT JOIN tb_clinicas c ON a.id_clinica = c.id_clinica
-            WHERE a.id_profissional = :id_profissional
-              AND DATE(a.dt_agendamento) BETWEEN :data_inicio AND :data_fim
-              AND a.ds_status NOT IN ('cancelado')
-              AND (c.id_empresa = :id_empresa OR a.id_clinica IS NULL)
-            ORDER BY a.dt_agendamento
-        """)
-
-        result = await db.execute(query, {
-            "id_profissional": id_profissional,
-            "data_inicio": data_inicio,
-            "data_fim": data_fim,
-            "id_empresa": str(current_user.id_empresa)
-        })
-
-        agendamentos_existentes = [
-            {
-                "inicio": row.dt_agendamento,
-                "fim": row.dt_agendamento + timedelta(minutes=row.nr_duracao_minutos)
-            }
-            for row in result.fetchall()
-        ]
-
-        # Gerar slots para cada dia do período
-        horarios_disponiveis = []
-        data_atual = data_inicio
-
-        while data_atual <= data_fim:
-            # Horário comercial: 08:00 às 18:00
-            horario_inicio = time(8, 0)
-            horario_fim = time(18, 0)
-
-            horario_atual = datetime.combine(data_atual, horario_inicio)
-            horario_limite = datetime.combine(data_atual, horario_fim)
-
-            while horario_atual < horario_limite:
-                # Calcular fim do slot considerando a duração
-                fim_slot = horario_atual + timedelta(minutes=duracao_minutos)
-
-                # Verificar se cabe no horário comercial
-                if fim_slot > horario_limite:
-                    break
-
-                # Verificar conflitos
-                conflito = False
-                motivo_indisponivel = None
-
-                for agendamento in agendamentos_existentes:
-                    if (horario_atual < agendamento["fim"] and fim_slot > agendamento["inicio"]):
-                        conflito = True
-                        motivo_indisponivel = "Horário já reservado"
-                        break
-
-                # Verificar se é no passado
-                if horario_atual < datetime.now():
-                    conflito = True
-                    motivo_indisponivel = "Horário no passado"
-
-                horarios_disponiveis.append(HorarioDisponivel(
-                    dt_horario=horario_atual,
-                    disponivel=not conflito,
-                    motivo=motivo_indisponivel
-                ))
-
-                # Próximo slot (30 minutos)
-                horario_atual += timedelta(minutes=30)
-
-            # Próximo dia
-            data_atual += timedelta(days=1)
+        # Bitmap de ocupação do período inteiro + expediente do profissional
+        disponibilidade = await obter_disponibilidade_profissionais(
+            db,
+            [id_profissional],
+            data_inicio,
+            data_fim,
+            duracao_minutos,
+            id_empresa=str(current_user.id_empresa),
+        )
+        horarios_disponiveis = _para_horarios(disponibilidade[str(uuid.UUID(id_profissional))])
 
         logger.info(
             f"Disponibilidade consultada (período): profissional={id_profissional}, "
@@ -603,6 +714,8 @@ async def buscar_profissionais_disponiveis(
     3. Quando informado, possuem o horário exato livre
 
     Se data_fim não for informada, considera apenas data_inicio.
+    Disponibilidade vem do calendário em cache (expediente real de cada
+    profissional e ocupação por dia), invalidado pelas alterações de agenda.
     Retorna lista ordenada por: disponibilidade total > avaliação > nome
     """
     try:
@@ -640,119 +753,76 @@ async def buscar_profissionais_disponiveis(
 
             data_horario_fim = data_horario_inicio + timedelta(minutes=duracao_minutos)
 
-        # Query complexa que busca profissionais disponíveis no período
+        # Profissionais ativos das clínicas da empresa que oferecem o procedimento
         query = text("""
-            WITH clinicas_procedimento AS (
-                SELECT DISTINCT
-                    p.id_clinica,
-                    c.nm_clinica,
-                    c.ds_endereco,
-                    c.nm_cidade,
-                    c.nm_estado
-                FROM tb_procedimentos p
-                INNER JOIN tb_clinicas c ON p.id_clinica = c.id_clinica
-                WHERE p.id_procedimento = :id_procedimento
-                    AND p.st_ativo = TRUE
-                    AND c.st_ativo = TRUE
-                    AND c.id_empresa = :id_empresa
-            ),
-            profissionais_clinicas AS (
-                SELECT
-                    p.id_profissional,
-                    p.id_clinica,
-                    p.nm_profissional,
-                    p.ds_especialidades,
-                    p.nr_avaliacao_media,
-                    p.nr_total_avaliacoes,
-                    p.ds_foto,
-                    c.nm_clinica,
-                    c.ds_endereco,
-                    c.nm_cidade,
-                    c.nm_estado
-                FROM tb_profissionais p
-                INNER JOIN clinicas_procedimento c ON p.id_clinica = c.id_clinica
-                WHERE p.st_ativo = TRUE
-            ),
-            horarios_ocupados AS (
-                SELECT
-                    a.id_profissional,
-                    a.dt_agendamento,
-                    a.nr_duracao_minutos
-                FROM tb_agendamentos a
-                WHERE DATE(a.dt_agendamento) BETWEEN :data_inicio AND :data_fim
-                    AND a.ds_status NOT IN ('cancelado', 'nao_compareceu')
-            )
-            SELECT
-                pc.id_profissional::text,
-                pc.nm_profissional,
-                pc.ds_especialidades,
-                pc.nr_avaliacao_media,
-                pc.nr_total_avaliacoes,
-                pc.ds_foto as ds_foto_perfil,
-                pc.id_clinica::text,
-                pc.nm_clinica,
-                CONCAT(pc.ds_endereco, ' - ', pc.nm_cidade, '/', pc.nm_estado) as ds_endereco_clinica,
-                CASE
-                    WHEN :data_horario_inicio::timestamp IS NOT NULL THEN
-                        CASE WHEN SUM(CASE WHEN conflito.id_agendamento IS NOT NULL THEN 1 ELSE 0 END) = 0 THEN 1 ELSE 0 END
-                    ELSE GREATEST(0, 20 - COUNT(ho.id_profissional))
-                END as total_horarios_disponiveis,
-                CASE
-                    WHEN :data_horario_inicio::timestamp IS NOT NULL THEN TO_CHAR(:data_horario_inicio::time, 'HH24:MI')
-                    ELSE '08:00'
-                END as primeiro_horario_disponivel,
-                CASE
-                    WHEN :data_horario_inicio::timestamp IS NOT NULL THEN TO_CHAR(:data_horario_inicio::time, 'HH24:MI')
-                    ELSE '18:00'
-                END as ultimo_horario_disponivel
-            FROM profissionais_clinicas pc
-            LEFT JOIN horarios_ocupados ho ON pc.id_profissional = ho.id_profissional
-            LEFT JOIN tb_agendamentos conflito
-                ON :data_horario_inicio::timestamp IS NOT NULL
-                AND conflito.id_profissional = pc.id_profissional
-                AND conflito.ds_status NOT IN ('cancelado', 'nao_compareceu')
-                AND conflito.dt_agendamento < :data_horario_fim
-                AND (conflito.dt_agendamento + (conflito.nr_duracao_minutos || ' minutes')::interval) > :data_horario_inicio
-            GROUP BY
-                pc.id_profissional,
-                pc.nm_profissional,
-                pc.ds_especialidades,
-                pc.nr_avaliacao_media,
-                pc.nr_total_avaliacoes,
-                pc.ds_foto,
-                pc.id_clinica,
-                pc.nm_clinica,
-                pc.ds_endereco,
-                pc.nm_cidade,
-                pc.nm_estado
-            HAVING
-                (
-                    :data_horario_inicio::timestamp IS NULL
-                    AND GREATEST(0, 20 - COUNT(ho.id_profissional)) > 0
-                )
-                OR (
-                    :data_horario_inicio::timestamp IS NOT NULL
-                    AND SUM(CASE WHEN conflito.id_agendamento IS NOT NULL THEN 1 ELSE 0 END) = 0
-                )
-            ORDER BY
-                total_horarios_disponiveis DESC,
-                pc.nr_avaliacao_media DESC NULLS LAST,
-                pc.nm_profissional ASC
+            SELECT DISTINCT ON (pr.id_profissional)
+                pr.id_profissional::text,
+                pr.nm_profissional,
+                pr.ds_especialidades,
+                pr.nr_avaliacao_media,
+                pr.nr_total_avaliacoes,
+                pr.ds_foto AS ds_foto_perfil,
+                c.id_clinica::text,
+                c.nm_clinica,
+                CONCAT(c.ds_endereco, ' - ', c.nm_cidade, '/', c.nm_estado) AS ds_endereco_clinica
+            FROM tb_procedimentos p
+            INNER JOIN tb_clinicas c ON p.id_clinica = c.id_clinica
+            INNER JOIN tb_profissionais pr ON pr.id_clinica = c.id_clinica
+            WHERE p.id_procedimento = :id_procedimento
+              AND p.st_ativo = TRUE
+              AND c.st_ativo = TRUE
+              AND c.id_empresa = :id_empresa
+              AND pr.st_ativo = TRUE
+            ORDER BY pr.id_profissional, c.nm_clinica
         """)
 
         result = await db.execute(query, {
             "id_procedimento": id_procedimento,
             "id_empresa": str(current_user.id_empresa),
-            "data_inicio": data_inicio_obj,
-            "data_fim": data_fim_obj,
-            "data_horario_inicio": data_horario_inicio,
-            "data_horario_fim": data_horario_fim
         })
-
         rows = result.fetchall()
 
+        # Ocupação/expediente do calendário em cache: uma leitura no Redis
+        # para todos os profissionais e dias (banco só nos dias ausentes)
+        ocupacao, expedientes = await carregar_calendario(
+            db, [row.id_profissional for row in rows], data_inicio_obj, data_fim_obj
+        )
+        datas = [
+            data_inicio_obj + timedelta(days=i)
+            for i in range((data_fim_obj - data_inicio_obj).days + 1)
+        ]
+        agora = datetime.now()
+
         profissionais = []
         for row in rows:
+            if data_horario_inicio:
+                if not horario_livre(
+                    expedientes[row.id_profissional],
+                    ocupacao[row.id_profissional],
+                    data_horario_inicio,
+                    duracao_minutos,
+                ):
+                    continue
+                total_disponiveis = 1
+                primeiro = ultimo = data_horario_inicio.strftime("%H:%M")
+            else:
+                livres = [
+                    slot.dt_horario
+                    for slot in calcular_slots(
+                        expedientes[row.id_profissional],
+                        ocupacao[row.id_profissional],
+                        datas,
+                        duracao_minutos,
+                        agora,
+                    )
+                    if slot.disponivel
+                ]
+                if not livres:
+                    continue
+                total_disponiveis = len(livres)
+                primeiro = livres[0].strftime("%H:%M")
+                ultimo = livres[-1].strftime("%H:%M")
+
             profissionais.append(ProfissionalDisponivelResponse(
                 id_profissional=row.id_profissional,
                 nm_profissional=row.nm_profissional,
@@ -763,11 +833,18 @@ async def buscar_profissionais_disponiveis(
                 id_clinica=row.id_clinica,
                 nm_clinica=row.nm_clinica,
                 ds_endereco_clinica=row.ds_endereco_clinica,
-                total_horarios_disponiveis=row.total_horarios_disponiveis,
-                primeiro_horario_disponivel=row.primeiro_horario_disponivel,
-                ultimo_horario_disponivel=row.ultimo_horario_disponivel,
+                total_horarios_disponiveis=total_disponiveis,
+                primeiro_horario_disponivel=primeiro,
+                ultimo_horario_disponivel=ultimo,
             ))
 
+        # Ordenação: disponibilidade total > avaliação > nome
+        profissionais.sort(key=lambda p: (
+            -p.total_horarios_disponiveis,
+            -(p.nr_avaliacao_media or 0),
+            p.nm_profissional,
+        ))
+
         logger.info(
             f"Encontrados {len(profissionais)} profissionais disponíveis para procedimento {id_procedimento} "
             f"no período {data_inicio} a {data_fim} "
@@ -776,6 +853,8 @@ async def buscar_profissionais_disponiveis(
 
         return profissionais
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Período inválido: {str(e)}")
     except Exception as e:
@@ -1088,7 +1167,7 @@ async def confirmar_agendamento(
               AND a.id_clinica = c.id_clinica
               AND c.id_empresa = :id_empresa
               AND a.ds_status = 'agendado'
-            RETURNING a.id_agendamento
+            RETURNING a.id_agendamento, a.id_profissional, a.dt_agendamento, a.nr_duracao_minutos
         """)
 
         result = await db.execute(query, {
@@ -1107,6 +1186,8 @@ async def confirmar_agendamento(
                 detail="Agendamento não encontrado, não pode ser confirmado ou você não tem permissão"
             )
 
+        await invalidar_calendario(row.id_profissional, [(row.dt_agendamento, row.nr_duracao_minutos)])
+
         logger.info(f"Agendamento {id_agendamento} confirmado por {confirmado_por}")
 
         return {"message": "Agendamento confirmado com sucesso"}
@@ -1148,7 +1229,7 @@ async def cancelar_agendamento(
               AND a.id_clinica = c.id_clinica
               AND c.id_empresa = :id_empresa
               AND a.ds_status NOT IN ('cancelado', 'concluido')
-            RETURNING a.id_agendamento
+            RETURNING a.id_agendamento, a.id_profissional, a.dt_agendamento, a.nr_duracao_minutos
         """)
 
         result = await db.execute(query, {
@@ -1168,6 +1249,8 @@ async def cancelar_agendamento(
                 detail="Agendamento não encontrado, não pode ser cancelado ou você não tem permissão"
             )
 
+        await invalidar_calendario(row.id_profissional, [(row.dt_agendamento, row.nr_duracao_minutos)])
+
         logger.info(f"Agendamento {id_agendamento} cancelado por {cancelado_por}")
 
         return {"message": "Agendamento cancelado com sucesso"}
@@ -1238,7 +1321,7 @@ async def cancelar_agendamento_paciente(
             WHERE id_agendamento = :id_agendamento
               AND id_paciente = :id_paciente
               AND ds_status NOT IN ('cancelado', 'concluido')
-            RETURNING id_agendamento
+            RETURNING id_agendamento, id_profissional, dt_agendamento, nr_duracao_minutos
         """)
 
         result = await db.execute(query, {
@@ -1257,7 +1340,9 @@ async def cancelar_agendamento_paciente(
                 detail="Agendamento não encontrado, já foi cancelado/concluído, ou você não tem permissão"
             )
 
-        logger.info(f"Agendamento {id_agendamento} cancelado pelo paciente {user_id}")
+        await invalidar_calendario(row.id_profissional, [(row.dt_agendamento, row.nr_duracao_minutos)])
+
+        logger.info(f"Agendamento {id_agendamento} cancelado pelo paciente {paciente_id}")
 
         return {"message": "Agendamento cancelado com sucesso", "id_agendamento": id_agendamento}
 
@@ -1327,15 +1412,52 @@ async def remarcar_agendamento_paciente(
             raise HTTPException(status_code=400, detail="A nova data deve ser no futuro")
 
         # Verificar se o agendamento pertence ao paciente e pode ser remarcado
-        query = text("""
-            UPDATE tb_agendamentos
-            SET dt_agendamento = :nova_data,
-                ds_observacoes = COALESCE(ds_observacoes, '') || ' | Remarcado: ' || :motivo,
-                dt_atualizacao = NOW()
+        atual = await db.execute(text("""
+            SELECT id_profissional
+            FROM tb_agendamentos
             WHERE id_agendamento = :id_agendamento
               AND id_paciente = :id_paciente
               AND ds_status NOT IN ('cancelado', 'concluido')
-            RETURNING id_agendamento, dt_agendamento
+        """), {"id_agendamento": id_agendamento, "id_paciente": paciente_id})
+        agendamento = atual.fetchone()
+
+        if not agendamento:
+            raise HTTPException(
+                status_code=404,
+                detail="Agendamento não encontrado, já foi cancelado/concluído, ou você não tem permissão"
+            )
+
+        await _travar_agenda_profissional(db, agendamento.id_profissional)
+
+        # Como na criação: conflito entre agendamentos vira 409 pela constraint
+        # de exclusão; reservas ativas de checkout bloqueiam o novo horário
+        query = text("""
+            WITH anterior AS (
+                SELECT id_agendamento, dt_agendamento
+                FROM tb_agendamentos
+                WHERE id_agendamento = :id_agendamento
+                FOR UPDATE
+            )
+            UPDATE tb_agendamentos a
+            SET dt_agendamento = :nova_data,
+                ds_observacoes = COALESCE(a.ds_observacoes, '') || ' | Remarcado: ' || :motivo,
+                dt_atualizacao = NOW()
+            FROM anterior
+            WHERE a.id_agendamento = anterior.id_agendamento
+              AND a.id_paciente = :id_paciente
+              AND a.ds_status NOT IN ('cancelado', 'concluido')
+              AND NOT EXISTS (
+                  SELECT 1 FROM tb_agendamento_reservas r
+                  WHERE r.id_profissional = a.id_profissional
+                    AND r.tr_periodo && tsrange(
+                        CAST(:nova_data AS TIMESTAMP),
+                        CAST(:nova_data AS TIMESTAMP) + make_interval(mins => a.nr_duracao_minutos),
+                        '[)'
+                    )
+                    AND r.dt_expiracao > NOW()
+              )
+            RETURNING a.id_agendamento, a.id_profissional, a.dt_agendamento,
+                      a.nr_duracao_minutos, anterior.dt_agendamento AS dt_anterior
         """)
 
         result = await db.execute(query, {
@@ -1344,17 +1466,22 @@ async def remarcar_agendamento_paciente(
             "motivo": request_data.motivo or "Remarcado pelo paciente",
             "id_paciente": paciente_id
         })
-
-        await db.commit()
-
         row = result.fetchone()
 
         if not row:
+            await db.rollback()
             raise HTTPException(
-                status_code=404,
-                detail="Agendamento não encontrado, já foi cancelado/concluído, ou você não tem permissão"
+                status_code=409,
+                detail="Horário reservado temporariamente por outro paciente. Escolha outro horário."
             )
 
+        await db.commit()
+
+        await invalidar_calendario(
+            row.id_profissional,
+            [(row.dt_anterior, row.nr_duracao_minutos), (row.dt_agendamento, row.nr_duracao_minutos)],
+        )
+
         logger.info(f"Agendamento {id_agendamento} remarcado pelo paciente {paciente_id} para {nova_data}")
 
         return {
@@ -1367,6 +1494,11 @@ async def remarcar_agendamento_paciente(
         raise
     except Exception as e:
         await db.rollback()
+        if _eh_conflito_horario(e):
+            raise HTTPException(
+                status_code=409,
+                detail="Horário indisponível. Já existe agendamento conflitante neste período."
+            )
         logger.error(f"Erro ao remarcar agendamento pelo paciente: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao remarcar: {str(e)}")
 
@@ -1406,8 +1538,9 @@ async def obter_disponibilidade_batch(
 
     **Performance:**
     - Reduz drasticamente o número de requisições HTTP
-    - Evita sobrecarga no pool de conexões do banco
-    - Tempo de resposta ~2-3x mais rápido
+    - Calendário de ocupação em cache (Redis), invalidado pelas alterações de agenda
+    - Conflitos resolvidos por AND em bitmap de ocupação por dia
+    - Respeita o expediente de cada profissional (ds_horarios_atendimento)
 
     **Busca Pública:**
     - Não requer autenticação - disponível para busca pública
@@ -1438,105 +1571,26 @@ async def obter_disponibilidade_batch(
         if request.num_dias < 1 or request.num_dias > 30:
             raise HTTPException(status_code=400, detail="Número de dias deve estar entre 1 e 30")
         
-        # Gerar lista de datas
-        datas = [data_inicio + timedelta(days=i) for i in range(request.num_dias)]
-        
-        # Buscar TODOS os agendamentos de TODOS os profissionais no período de UMA VEZ
-        data_fim = data_inicio + timedelta(days=request.num_dias)
-        
-        # ✅ Converter lista de IDs para UUIDs
-        ids_uuid = [uuid.UUID(id_prof) for id_prof in request.ids_profissionais]
-
-        # ✅ Usar bindparam com expanding=True para IN clause
-        from sqlalchemy import bindparam
+        # Busca pública: sem filtro de empresa, todos os profissionais e dias
+        # resolvidos com uma leitura do calendário em cache (MGET); dias
+        # ausentes saem de uma consulta por intervalo e voltam para o cache
+        data_fim = data_inicio + timedelta(days=request.num_dias - 1)
+        disponibilidade = await obter_disponibilidade_cacheada(
+            db,
+            request.ids_profissionais,
+            data_inicio,
+            data_fim,
+            request.duracao_minutos,
+        )
 
-        # ✅ Busca pública: Sem filtro de empresa para mostrar disponibilidade de todos os profissionais
-        query_agendamentos = text("""
-            SELECT
-                a.id_profissional::text,
-                a.dt_agendamento,
-                a.nr_duracao_minutos
-            FROM tb_agendamentos a
-            WHERE a.id_profissional IN :ids_profissionais
-              AND DATE(a.dt_agendamento) >= :data_inicio
-              AND DATE(a.dt_agendamento) < :data_fim
-              AND a.ds_status NOT IN ('cancelado')
-            ORDER BY a.id_profissional, a.dt_agendamento
-        """).bindparams(bindparam("ids_profissionais", expanding=True))
-
-        result = await db.execute(query_agendamentos, {
-            "ids_profissionais": ids_uuid,  # ✅ Lista de UUIDs com expanding
-            "data_inicio": data_inicio,
-            "data_fim": data_fim
-        })
-        
-        # Organizar agendamentos por profissional e data
-        agendamentos_por_prof = {}
-        for row in result.fetchall():
-            id_prof = row[0]
-            dt_agend = row[1]
-            duracao = row[2]
-            
-            if id_prof not in agendamentos_por_prof:
-                agendamentos_por_prof[id_prof] = []
-            
-            agendamentos_por_prof[id_prof].append({
-                "inicio": dt_agend,
-                "fim": dt_agend + timedelta(minutes=duracao)
-            })
-        
-        # Gerar horários disponíveis para cada profissional
-        resultado = []
-        
-        for id_profissional in request.ids_profissionais:
-            horarios_todos = []
-            agendamentos_prof = agendamentos_por_prof.get(id_profissional, [])
-            
-            # Para cada data, gerar os slots
-            for data in datas:
-                horario_inicio = time(8, 0)  # 08:00
-                horario_fim = time(18, 0)    # 18:00
-                
-                horario_atual = datetime.combine(data, horario_inicio)
-                horario_limite = datetime.combine(data, horario_fim)
-                
-                while horario_atual < horario_limite:
-                    fim_slot = horario_atual + timedelta(minutes=request.duracao_minutos)
-                    
-                    # Verificar se cabe no horário comercial
-                    if fim_slot > horario_limite:
-                        break
-                    
-                    # Verificar conflitos
-                    conflito = False
-                    motivo_indisponivel = None
-                    
-                    # Verificar se é no passado
-                    if horario_atual < datetime.now():
-                        conflito = True
-                        motivo_indisponivel = "Horário no passado"
-                    else:
-                        # Verificar conflitos com agendamentos
-                        for agendamento in agendamentos_prof:
-                            if (horario_atual < agendamento["fim"] and fim_slot > agendamento["inicio"]):
-                                conflito = True
-                                motivo_indisponivel = "Horário já reservado"
-                                break
-                    
-                    horarios_todos.append(HorarioDisponivel(
-                        dt_horario=horario_atual,
-                        disponivel=not conflito,
-                        motivo=motivo_indisponivel
-                    ))
-                    
-                    # Próximo slot (30 minutos)
-                    horario_atual += timedelta(minutes=30)
-            
-            resultado.append(ProfissionalDisponibilidade(
+        resultado = [
+            ProfissionalDisponibilidade(
                 id_profissional=id_profissional,
-                horarios=horarios_todos
-            ))
-        
+                horarios=_para_horarios(disponibilidade[str(uuid.UUID(id_profissional))]),
+            )
+            for id_profissional in request.ids_profissionais
+        ]
+
         logger.info(
             f"Disponibilidade batch: {len(request.ids_profissionais)} profissionais, "
             f"{request.num_dias} dias, total de {sum(len(r.horarios) for r in resultado)} slots"
@@ -22,6 +22,7 @@ from src.models.analytics import (
     UsageAnalytics,
     UserAnalytics,
 )
+from src.services.analytics_ingestao_service import get_ingestor_eventos
 from src.services.analytics_service import AnalyticsService, get_analytics_service
 from src.utils.auth import get_current_apikey
 
@@ -60,9 +61,9 @@ async def track_event(
     ```
     """
     try:
-        event = await analytics_service.track_event(event_data)
+        id_event = await analytics_service.track_event(event_data)
         return {
-            "id_event": str(event.id_event),
+            "id_event": str(id_event),
             "message": "Evento registrado com sucesso",
         }
     except Exception as e:
@@ -138,6 +139,19 @@ async def get_events(
         ) from e
 
 
+@router.get("/events/ingestao", response_model=dict)
+async def get_ingestao_metrics(_: object = Depends(get_current_apikey)):
+    """
+    Métricas da ingestão bufferizada de eventos
+
+    - `nr_backlog`: eventos no buffer aguardando gravação
+    - `nr_descartados`: eventos perdidos (buffer ou spool cheios)
+    - `nr_eventos_spool` / `nr_arquivos_spool`: eventos desviados para o
+      spool local por lentidão/falha do banco
+    """
+    return get_ingestor_eventos().metricas()
+
+
 # =============================================================================
 # SNAPSHOTS
 # =============================================================================
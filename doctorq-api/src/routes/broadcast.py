@@ -213,10 +213,10 @@ async def enviar_campanha(
 
     **Processo:**
     1. Valida se campanha pode ser enviada (status = rascunho ou agendada)
-    2. Atualiza status para "processando"
-    3. Processa destinatários em batch (100 por vez)
-    4. Envia por canal apropriado (email, WhatsApp, SMS, push, mensagem interna)
-    5. Atualiza estatísticas (enviados, falhas)
+    2. Atualiza status para "processando" e retorna imediatamente
+    3. O worker de broadcast processa os destinatários em lotes (keyset)
+    4. Envia por canal apropriado com concorrência limitada
+    5. Atualiza estatísticas (enviados, falhas) e checkpoint a cada lote
     6. Marca status como "enviada" ao concluir
 
     **Canais de Envio:**
@@ -228,7 +228,9 @@ async def enviar_campanha(
 
     **Observações:**
     - Envio é processado de forma assíncrona em background
-    - Estatísticas são atualizadas em tempo real
+    - Estatísticas são atualizadas a cada lote (acompanhe via GET da campanha,
+      campo nr_progresso_percentual)
+    - Se a instância cair, outra retoma o envio do último lote gravado
     - Destinatários com falha recebem mensagem de erro
     - Processo irreversível após iniciado
     """
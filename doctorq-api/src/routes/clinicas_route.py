@@ -14,6 +14,15 @@ from src.config.orm_config import get_db
 from src.models.user import User
 from src.utils.auth import get_current_apikey, get_current_user
 from src.utils.auth_helpers import validate_empresa_access, get_user_empresa_id
+from src.services.busca_marketplace_service import (
+    Ordenacao,
+    aplicar_keyset,
+    clausula_contem,
+    clausula_geo,
+    clausula_texto,
+    proximo_cursor,
+    resolver_ordenacao,
+)
 
 router = APIRouter(prefix="/clinicas", tags=["Clínicas"])
 
@@ -50,6 +59,8 @@ class ClinicaResponse(BaseModel):
     # Dados relacionados
     nm_empresa: Optional[str] = None
     total_profissionais: Optional[int] = None
+    # Preenchido apenas na busca por proximidade
+    nr_distancia_km: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -159,7 +170,12 @@ async def listar_clinicas(
     ds_estado: Optional[str] = Query(None),
     ds_especialidade: Optional[str] = Query(None),
     st_ativa: Optional[bool] = Query(None),
-    busca: Optional[str] = Query(None, description="Buscar por nome ou descrição"),
+    busca: Optional[str] = Query(None, description="Buscar por nome, especialidades ou descrição"),
+    nr_latitude: Optional[float] = Query(None, ge=-90, le=90, description="Latitude para busca por proximidade"),
+    nr_longitude: Optional[float] = Query(None, ge=-180, le=180, description="Longitude para busca por proximidade"),
+    nr_raio_km: float = Query(10, gt=0, le=200, description="Raio da busca por proximidade (km)"),
+    ordenar: Optional[str] = Query(None, description="recentes | relevancia | distancia"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (meta.nextCursor)"),
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
     current_user: User = Depends(get_current_user),
@@ -170,6 +186,9 @@ async def listar_clinicas(
 
     - Admin pode filtrar por qualquer empresa passando id_empresa
     - Outros usuários verão apenas clínicas de sua própria empresa
+    - busca: full-text sem acento + nome aproximado (trigramas), ordenado por relevância
+    - nr_latitude/nr_longitude: apenas clínicas no raio, da mais próxima para a mais distante
+    - cursor: paginação keyset (meta.nextCursor); sem cursor, page/size continuam valendo
     """
     try:
         # WHERE conditions
@@ -186,31 +205,58 @@ async def listar_clinicas(
             )
         where_clauses.append("c.id_empresa = :id_empresa")
 
+        params = {
+            "limit": size + 1,
+            "id_empresa": str(empresa_filtro)
+        }
+
         if ds_cidade:
-            where_clauses.append("c.nm_cidade ILIKE :cidade")
+            where_clauses.append(
+                clausula_contem("f_unaccent(lower(c.nm_cidade))", ds_cidade, "cidade", params)
+            )
 
         if ds_estado:
             where_clauses.append("c.nm_estado = :estado")
+            params["estado"] = ds_estado
 
         if ds_especialidade:
             where_clauses.append("c.ds_especialidades @> ARRAY[:especialidade]::text[]")
+            params["especialidade"] = ds_especialidade
 
         if st_ativa is not None:
             where_clauses.append("c.st_ativo = :st_ativa")
+            params["st_ativa"] = st_ativa
 
-        if busca:
-            where_clauses.append(
-                "(c.nm_clinica ILIKE :busca OR c.ds_clinica ILIKE :busca)"
-            )
-
+        relevancia = "NULL::float8"
+        tem_busca = bool(busca and busca.strip())
+        if tem_busca:
+            where_texto, relevancia = clausula_texto("c", "nm_clinica", busca, params)
+            where_clauses.append(where_texto)
+
+        tem_geo = nr_latitude is not None and nr_longitude is not None
+        distancia_km = "NULL::float8"
+        knn = None
+        if tem_geo:
+            where_geo, distancia_km, knn = clausula_geo("c", nr_latitude, nr_longitude, nr_raio_km, params)
+            where_clauses.append(where_geo)
+
+        modo = resolver_ordenacao(ordenar, tem_busca, tem_geo)
+        if modo == "distancia":
+            ordenacao = Ordenacao(knn, "c.id_clinica", "float8", descendente=False)
+        elif modo == "relevancia":
+            ordenacao = Ordenacao(relevancia, "c.id_clinica", "float8", descendente=True)
+        else:
+            ordenacao = Ordenacao("c.dt_criacao", "c.id_clinica", "timestamp", descendente=True)
+
+        # Filtros sem o cursor: base do totalItems
+        where_filtros = " AND ".join(where_clauses)
+        order_by = aplicar_keyset(ordenacao, cursor, where_clauses, params)
         where_clause = " AND ".join(where_clauses)
 
-        # Count total
-        count_query = text(f"""
-            SELECT COUNT(*)
-            FROM tb_clinicas c
-            WHERE {where_clause}
-        """)
+        paginacao = "LIMIT :limit"
+        if not cursor:
+            paginacao += " OFFSET :offset"
+            params["offset"] = (page - 1) * size
 
         # Query principal com LATERAL para contar profissionais
         query = text(f"""
@@ -241,7 +287,9 @@ async def listar_clinicas(
                 NULL::jsonb as ds_redes_sociais,
                 c.dt_criacao,
                 e.nm_empresa,
-                prof.total as total_profissionais
+                prof.total as total_profissionais,
+                {distancia_km} as nr_distancia_km,
+                {ordenacao.expressao} as chave_ordenacao
             FROM tb_clinicas c
             LEFT JOIN tb_empresas e ON c.id_empresa = e.id_empresa
             LEFT JOIN LATERAL (
@@ -250,38 +298,25 @@ async def listar_clinicas(
                 WHERE p.id_clinica = c.id_clinica AND p.st_ativo = TRUE
             ) prof ON TRUE
             WHERE {where_clause}
-            ORDER BY c.dt_criacao DESC
-            LIMIT :limit OFFSET :offset
+            ORDER BY {order_by}
+            {paginacao}
         """)
 
-        # Parâmetros
-        params = {
-            "limit": size,
-            "offset": (page - 1) * size,
-            "id_empresa": str(empresa_filtro)
-        }
-
-        if ds_cidade:
-            params["cidade"] = f"%{ds_cidade}%"
-
-        if ds_estado:
-            params["estado"] = ds_estado
-
-        if ds_especialidade:
-            params["especialidade"] = ds_especialidade
-
-        if st_ativa is not None:
-            params["st_ativa"] = st_ativa
-
-        if busca:
-            params["busca"] = f"%{busca}%"
-
-        # Executar queries
-        count_result = await db.execute(count_query, params)
-        total = count_result.scalar()
-
         result = await db.execute(query, params)
         rows = result.fetchall()
+        next_cursor = proximo_cursor(rows, size, "id_clinica")
+        rows = rows[:size]
+
+        # COUNT só na primeira página: com cursor o cliente já conhece o total
+        total = None
+        if not cursor:
+            count_query = text(f"""
+                SELECT COUNT(*)
+                FROM tb_clinicas c
+                WHERE {where_filtros}
+            """)
+            count_result = await db.execute(count_query, params)
+            total = count_result.scalar()
 
         # Montar resposta
         clinicas = []
@@ -313,18 +348,27 @@ async def listar_clinicas(
                 dt_criacao=row.dt_criacao,
                 nm_empresa=row.nm_empresa,
                 total_profissionais=row.total_profissionais,
+                nr_distancia_km=round(float(row.nr_distancia_km), 2) if row.nr_distancia_km is not None else None,
             ))
 
-        return ClinicasResponse(
-            items=clinicas,
-            meta={
+        meta = {
+            "itemsPerPage": size,
+            "nextCursor": next_cursor,
+            "ordenacao": modo,
+        }
+        if total is not None:
+            meta.update({
                 "totalItems": total,
-                "itemsPerPage": size,
                 "totalPages": (total + size - 1) // size,
                 "currentPage": page,
-            }
-        )
+            })
+
+        return ClinicasResponse(items=clinicas, meta=meta)
 
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar clínicas: {str(e)}")
 
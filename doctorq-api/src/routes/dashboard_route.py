@@ -14,6 +14,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.config.logger_config import get_logger
 from src.config.orm_config import get_db
 from src.models.user import User
+from src.services.dashboard_rollup_service import (
+    DashboardRollupService,
+    ranking_procedimentos,
+    resumir_periodo,
+)
 from src.utils.auth import get_current_user
 
 logger = get_logger(__name__)
@@ -110,7 +115,9 @@ async def get_dashboard_summary(
 
     **Filtros de data:**
     - Se não especificado, usa últimos 30 dias
-    - Todas as métricas são calculadas para o período especificado
+    - Agendamentos, receita e ranking de procedimentos são lidos dos rollups
+      diários (tb_dashboard_diario); dias com alterações ainda não
+      consolidadas são agregados ao vivo
     """
     try:
         # Validar empresa do usuário
@@ -129,36 +136,21 @@ async def get_dashboard_summary(
         id_empresa = str(current_user.id_empresa)
 
         # ===================
-        # MÉTRICAS DE AGENDAMENTOS
+        # AGREGADOS DIÁRIOS (rollups + dias pendentes ao vivo)
         # ===================
-        query_agendamentos = text("""
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN ds_status = 'confirmado' THEN 1 ELSE 0 END) as confirmados,
-                SUM(CASE WHEN ds_status = 'pendente' THEN 1 ELSE 0 END) as pendentes,
-                SUM(CASE WHEN ds_status = 'cancelado' THEN 1 ELSE 0 END) as cancelados,
-                SUM(CASE WHEN ds_status = 'concluido' THEN 1 ELSE 0 END) as concluidos,
-                SUM(CASE WHEN DATE(dt_agendamento) = CURRENT_DATE THEN 1 ELSE 0 END) as hoje,
-                SUM(CASE WHEN dt_agendamento >= CURRENT_DATE - INTERVAL '7 days' THEN 1 ELSE 0 END) as semana,
-                SUM(CASE WHEN dt_agendamento >= CURRENT_DATE - INTERVAL '30 days' THEN 1 ELSE 0 END) as mes
-            FROM tb_agendamentos a
-            INNER JOIN tb_clinicas c ON a.id_clinica = c.id_clinica
-            WHERE c.id_empresa = :id_empresa
-              AND a.dt_agendamento BETWEEN :start_date AND :end_date
-        """)
-
-        result = await db.execute(query_agendamentos, {
-            "id_empresa": id_empresa,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        row_agend = result.fetchone()
+        dias, procedimentos_periodo = await DashboardRollupService.obter_periodo(
+            db, current_user.id_empresa, start_date, end_date
+        )
+        periodo = resumir_periodo(dias, date.today())
 
-        total_agend = row_agend[0] or 0
-        confirmados = row_agend[1] or 0
-        pendentes = row_agend[2] or 0
-        cancelados = row_agend[3] or 0
-        concluidos = row_agend[4] or 0
+        # ===================
+        # MÉTRICAS DE AGENDAMENTOS
+        # ===================
+        total_agend = periodo["nr_agendamentos"]
+        confirmados = periodo["nr_confirmados"]
+        pendentes = periodo["nr_pendentes"]
+        cancelados = periodo["nr_cancelados"]
+        concluidos = periodo["nr_concluidos"]
 
         taxa_confirmacao = (confirmados / total_agend * 100) if total_agend > 0 else 0
         taxa_cancelamento = (cancelados / total_agend * 100) if total_agend > 0 else 0
@@ -173,9 +165,9 @@ async def get_dashboard_summary(
             taxa_confirmacao=round(taxa_confirmacao, 2),
             taxa_cancelamento=round(taxa_cancelamento, 2),
             taxa_conclusao=round(taxa_conclusao, 2),
-            agendamentos_hoje=row_agend[5] or 0,
-            agendamentos_semana=row_agend[6] or 0,
-            agendamentos_mes=row_agend[7] or 0,
+            agendamentos_hoje=periodo["agendamentos_hoje"],
+            agendamentos_semana=periodo["agendamentos_semana"],
+            agendamentos_mes=periodo["agendamentos_mes"],
         )
 
         # ===================
@@ -215,22 +207,22 @@ async def get_dashboard_summary(
         # ===================
         query_pacientes = text("""
             SELECT
-                COUNT(DISTINCT p.id_paciente) as total,
-                SUM(CASE WHEN EXISTS(
-                    SELECT 1 FROM tb_agendamentos a
-                    WHERE a.id_paciente = p.id_paciente
-                      AND a.dt_agendamento >= CURRENT_DATE - INTERVAL '90 days'
-                ) THEN 1 ELSE 0 END) as ativos,
-                SUM(CASE WHEN p.dt_criacao >= CURRENT_DATE - INTERVAL '30 days' THEN 1 ELSE 0 END) as novos_mes,
-                SUM(CASE WHEN (
-                    SELECT COUNT(*) FROM tb_agendamentos a
-                    WHERE a.id_paciente = p.id_paciente
-                ) > 1 THEN 1 ELSE 0 END) as recorrentes,
-                SUM(CASE WHEN p.ds_genero = 'M' THEN 1 ELSE 0 END) as masculino,
-                SUM(CASE WHEN p.ds_genero = 'F' THEN 1 ELSE 0 END) as feminino,
-                SUM(CASE WHEN p.ds_genero NOT IN ('M', 'F') OR p.ds_genero IS NULL THEN 1 ELSE 0 END) as outros
+                COUNT(*) as total,
+                COUNT(*) FILTER (WHERE h.dt_ultimo >= CURRENT_DATE - INTERVAL '90 days') as ativos,
+                COUNT(*) FILTER (WHERE p.dt_criacao >= CURRENT_DATE - INTERVAL '30 days') as novos_mes,
+                COUNT(*) FILTER (WHERE h.nr_agendamentos > 1) as recorrentes,
+                COUNT(*) FILTER (WHERE p.nm_genero = 'M') as masculino,
+                COUNT(*) FILTER (WHERE p.nm_genero = 'F') as feminino,
+                COUNT(*) FILTER (WHERE p.nm_genero NOT IN ('M', 'F') OR p.nm_genero IS NULL) as outros
             FROM tb_pacientes p
             INNER JOIN tb_users u ON p.id_user = u.id_user
+            LEFT JOIN (
+                SELECT a.id_paciente, COUNT(*) as nr_agendamentos, MAX(a.dt_agendamento) as dt_ultimo
+                FROM tb_agendamentos a
+                INNER JOIN tb_clinicas c ON a.id_clinica = c.id_clinica
+                WHERE c.id_empresa = :id_empresa
+                GROUP BY a.id_paciente
+            ) h ON h.id_paciente = p.id_paciente
             WHERE u.id_empresa = :id_empresa
         """)
 
@@ -283,26 +275,14 @@ async def get_dashboard_summary(
         result = await db.execute(query_categorias, {"id_empresa": id_empresa})
         categorias = {row[0]: row[1] for row in result.fetchall()}
 
-        # Procedimento mais agendado
-        query_mais_agendado = text("""
-            SELECT p.nm_procedimento, COUNT(*) as total
-            FROM tb_agendamentos a
-            INNER JOIN tb_procedimentos p ON a.id_procedimento = p.id_procedimento
-            INNER JOIN tb_clinicas c ON a.id_clinica = c.id_clinica
-            WHERE c.id_empresa = :id_empresa
-              AND a.dt_agendamento BETWEEN :start_date AND :end_date
-            GROUP BY p.nm_procedimento
-            ORDER BY total DESC
-            LIMIT 1
-        """)
-        result = await db.execute(query_mais_agendado, {
-            "id_empresa": id_empresa,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        mais_agendado_row = result.fetchone()
-        mais_agendado = mais_agendado_row[0] if mais_agendado_row else None
-        total_agend_proc = mais_agendado_row[1] if mais_agendado_row else 0
+        # Procedimento mais agendado e top receita (rollups por procedimento)
+        mais_agendados = ranking_procedimentos(procedimentos_periodo, "nr_agendamentos", 1)
+        top_por_receita = ranking_procedimentos(procedimentos_periodo, "vl_receita", 5)
+        nomes = await DashboardRollupService.nomes_procedimentos(
+            db, {id_procedimento for id_procedimento, _ in mais_agendados + top_por_receita}
+        )
+        mais_agendado = nomes.get(mais_agendados[0][0]) if mais_agendados else None
+        total_agend_proc = mais_agendados[0][1]["nr_agendamentos"] if mais_agendados else 0
 
         procedimentos_metrics = ProcedimentosMetrics(
             total_procedimentos=row_proc[0] or 0,
@@ -317,58 +297,19 @@ async def get_dashboard_summary(
         # ===================
         # MÉTRICAS DE RECEITA
         # ===================
-        query_receita = text("""
-            SELECT
-                SUM(vl_total) as receita_total,
-                SUM(CASE WHEN EXTRACT(MONTH FROM dt_agendamento) = EXTRACT(MONTH FROM CURRENT_DATE)
-                         AND EXTRACT(YEAR FROM dt_agendamento) = EXTRACT(YEAR FROM CURRENT_DATE)
-                    THEN vl_total ELSE 0 END) as receita_mes_atual,
-                SUM(CASE WHEN EXTRACT(MONTH FROM dt_agendamento) = EXTRACT(MONTH FROM CURRENT_DATE - INTERVAL '1 month')
-                         AND EXTRACT(YEAR FROM dt_agendamento) = EXTRACT(YEAR FROM CURRENT_DATE - INTERVAL '1 month')
-                    THEN vl_total ELSE 0 END) as receita_mes_anterior,
-                AVG(vl_total) as ticket_medio
-            FROM tb_agendamentos a
-            INNER JOIN tb_clinicas c ON a.id_clinica = c.id_clinica
-            WHERE c.id_empresa = :id_empresa
-              AND a.dt_agendamento BETWEEN :start_date AND :end_date
-              AND a.ds_status IN ('confirmado', 'concluido')
-        """)
-
-        result = await db.execute(query_receita, {
-            "id_empresa": id_empresa,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        row_rec = result.fetchone()
-
-        receita_total = float(row_rec[0] or 0)
-        receita_mes_atual = float(row_rec[1] or 0)
-        receita_mes_anterior = float(row_rec[2] or 0)
-        ticket_medio = float(row_rec[3] or 0)
+        receita_total = float(periodo["vl_receita"])
+        receita_mes_atual = float(periodo["receita_mes_atual"])
+        receita_mes_anterior = float(periodo["receita_mes_anterior"])
+        ticket_medio = receita_total / periodo["nr_receita"] if periodo["nr_receita"] else 0
 
         variacao_mensal = 0
         if receita_mes_anterior > 0:
             variacao_mensal = ((receita_mes_atual - receita_mes_anterior) / receita_mes_anterior) * 100
 
-        # Top procedimentos por receita
-        query_top_receita = text("""
-            SELECT p.nm_procedimento, SUM(a.vl_total) as receita
-            FROM tb_agendamentos a
-            INNER JOIN tb_procedimentos p ON a.id_procedimento = p.id_procedimento
-            INNER JOIN tb_clinicas c ON a.id_clinica = c.id_clinica
-            WHERE c.id_empresa = :id_empresa
-              AND a.dt_agendamento BETWEEN :start_date AND :end_date
-              AND a.ds_status IN ('confirmado', 'concluido')
-            GROUP BY p.nm_procedimento
-            ORDER BY receita DESC
-            LIMIT 5
-        """)
-        result = await db.execute(query_top_receita, {
-            "id_empresa": id_empresa,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        top_receita = [{"procedimento": row[0], "receita": float(row[1])} for row in result.fetchall()]
+        top_receita = [
+            {"procedimento": nomes.get(id_procedimento), "receita": float(valores["vl_receita"])}
+            for id_procedimento, valores in top_por_receita
+        ]
 
         receita_por_prof = receita_total / total_prof if total_prof > 0 else 0
         receita_por_proc = receita_total / (row_proc[0] or 1)
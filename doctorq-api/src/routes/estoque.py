@@ -14,6 +14,7 @@ from src.models.estoque import (
     MovimentacaoResponse,
     MovimentacaoListResponse,
     ReservaEstoqueCreate,
+    ReservaEstoqueLoteCreate,
     ReservaEstoqueResponse,
     EstoqueAlertaResponse,
     EstoqueResumoResponse
@@ -43,8 +44,9 @@ async def criar_movimentacao(
     - devolucao: Devolução de produto
 
     **Regras:**
-    - Valida estoque disponível para saídas
-    - Atualiza nr_quantidade_estoque em tb_produtos
+    - Valida estoque disponível (estoque - reservado) para saídas, na mesma
+      instrução que atualiza nr_quantidade_estoque em tb_produtos
+    - Saída com id_agendamento consome as reservas ativas do agendamento
     - Registra usuário responsável
     """
     try:
@@ -119,7 +121,7 @@ async def criar_reserva(
     **Regras:**
     - Reserva por 24h (dt_expiracao automático)
     - Status inicial: "ativa"
-    - Não consome estoque ainda (apenas reserva)
+    - Compromete a quantidade (reduz o disponível), sem baixar o estoque
     """
     try:
         reserva = await EstoqueService.criar_reserva(
@@ -143,6 +145,42 @@ async def criar_reserva(
         )
 
 
+@router.post("/reservas/lote/", response_model=list[ReservaEstoqueResponse], status_code=status.HTTP_201_CREATED)
+async def criar_reservas_lote(
+    data: ReservaEstoqueLoteCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_role(["admin", "gestor_clinica", "profissional", "recepcionista"]))
+):
+    """
+    Reserva vários produtos para um agendamento
+
+    **Permissões:** admin, gestor_clinica, profissional, recepcionista
+
+    **Regras:**
+    - Tudo ou nada: se algum produto não tiver disponível, nenhuma reserva é criada
+    - Itens repetidos são somados
+    """
+    try:
+        reservas = await EstoqueService.criar_reservas(
+            db=db,
+            id_empresa=current_user.id_empresa,
+            id_agendamento=data.id_agendamento,
+            itens=[(item.id_produto, item.nr_quantidade) for item in data.itens]
+        )
+        return [ReservaEstoqueResponse.model_validate(reserva) for reserva in reservas]
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao criar reservas: {str(e)}"
+        )
+
+
 @router.delete("/reservas/{id_reserva}/", status_code=status.HTTP_204_NO_CONTENT)
 async def cancelar_reserva(
     id_reserva: UUID,
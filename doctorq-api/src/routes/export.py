@@ -1,11 +1,12 @@
 """
 Rotas de Exportação de Relatórios - UC115
 """
+from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.orm_config import get_db
@@ -18,10 +19,13 @@ from src.models.export import (
     ExportAgendamentoUpdate,
     ExportAgendamentoResponse,
     ExportAgendamentoListResponse,
-    ExportEstatisticas
+    ExportEstatisticas,
+    FormatoExport,
+    TipoRelatorio
 )
 from src.models.user import User
 from src.services.export_service import ExportService
+from src.services.export_stream_service import EXTENSOES, MEDIA_TYPES
 
 router = APIRouter(prefix="/exports", tags=["Exports"])
 
@@ -43,7 +47,8 @@ async def criar_export_job(
     - excel: Planilha Excel (.xlsx)
     - csv: CSV (.csv)
     - json: JSON (.json)
-    - pdf: PDF (.pdf) - em desenvolvimento
+    - ndjson: JSON Lines (.ndjson)
+    - pdf: PDF (.pdf) - em desenvolvimento (retorna 400)
 
     **Tipos de Relatório:**
     - agendamentos: Relatório de agendamentos
@@ -56,8 +61,9 @@ async def criar_export_job(
     - broadcast: Campanhas de broadcast
 
     **Processamento:**
-    - Job é processado imediatamente (modo síncrono)
-    - Em produção, usar Celery para processamento assíncrono
+    - Job é criado como "pendente" e processado em background pelo ExportWorker
+    - Dados lidos em páginas por cursor server-side (memória constante)
+    - Acompanhe nr_registros_processados / nr_progresso_percentual em GET /exports/jobs/{id}/
     - Arquivo expira em 7 dias
 
     **Filtros:**
@@ -191,6 +197,57 @@ async def download_export(
     )
 
 
+@router.get("/stream/{tp_relatorio}/")
+async def stream_export(
+    tp_relatorio: TipoRelatorio,
+    tp_formato: FormatoExport = Query(FormatoExport.CSV, description="csv ou ndjson"),
+    dt_inicio: Optional[datetime] = Query(None, description="Data início"),
+    dt_fim: Optional[datetime] = Query(None, description="Data fim"),
+    id_clinica: Optional[UUID] = Query(None, description="Filtrar por clínica"),
+    id_profissional: Optional[UUID] = Query(None, description="Filtrar por profissional"),
+    status_filtro: Optional[str] = Query(None, alias="status", description="Filtrar por status"),
+    current_user: User = Depends(require_role(["admin", "gestor_clinica", "financeiro"]))
+):
+    """
+    Download do relatório em streaming, sem criar job
+
+    **Permissões:** admin, gestor_clinica, financeiro
+
+    **Formatos:** csv, ndjson
+
+    **Observações:**
+    - Linhas são lidas por cursor server-side e enviadas conforme chegam
+    - Memória constante independente do tamanho do relatório
+    - Para Excel, use POST /exports/jobs/
+    """
+    filtros = {
+        "dt_inicio": dt_inicio,
+        "dt_fim": dt_fim,
+        "id_clinica": id_clinica,
+        "id_profissional": id_profissional,
+        "status": status_filtro,
+    }
+    try:
+        corpo = ExportService.stream_relatorio(
+            id_empresa=current_user.id_empresa,
+            tp_relatorio=tp_relatorio.value,
+            tp_formato=tp_formato.value,
+            filtros=filtros
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    nome_arquivo = f"{tp_relatorio.value}_{datetime.utcnow():%Y%m%d%H%M%S}.{EXTENSOES[tp_formato.value]}"
+    return StreamingResponse(
+        corpo,
+        media_type=MEDIA_TYPES[tp_formato.value],
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'},
+    )
+
+
 # ========== Agendamentos ==========
 
 @router.post("/agendamentos/", response_model=ExportAgendamentoResponse, status_code=status.HTTP_201_CREATED)
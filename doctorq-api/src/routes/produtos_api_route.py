@@ -24,6 +24,7 @@ from src.models.produto import (
 )
 from src.models.produto_orm import ProdutoORM, CategoriaProdutoORM, ProdutoVariacaoORM
 from src.models.fornecedor_orm import FornecedorORM
+from src.services.estoque_service import EstoqueService
 from src.utils.auth import get_current_apikey
 
 logger = get_logger(__name__)
@@ -356,6 +357,15 @@ async def obter_produto(
 # ============================================================================
 
 
+async def _definir_estoque(db: AsyncSession, id_produto: uuid.UUID, nr_estoque: int, ds_motivo: str):
+    """Estoque do cadastro/edição via ledger; recusa (400) desfaz a transação."""
+    try:
+        await EstoqueService.definir_estoque(db, id_produto, nr_estoque, ds_motivo=ds_motivo)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
 @router.post("/", status_code=201, response_model=ProdutoResponse)
 async def criar_produto(
     produto_data: ProdutoCreate,
@@ -380,11 +390,16 @@ async def criar_produto(
             slug = slug.replace(' ', '-').replace('ã', 'a').replace('á', 'a').replace('ç', 'c')
             produto_dict['ds_slug'] = slug
 
+        # Estoque inicial entra pelo ledger (movimentação de entrada)
+        nr_estoque = produto_dict.pop('nr_quantidade_estoque', None) or 0
+
         # Criar instância ORM
-        novo_produto = ProdutoORM(**produto_dict)
+        novo_produto = ProdutoORM(**produto_dict, nr_quantidade_estoque=0)
 
         # Adicionar ao banco
         db.add(novo_produto)
+        await db.flush()
+        await _definir_estoque(db, novo_produto.id_produto, nr_estoque, "Estoque inicial do produto")
         await db.commit()
         await db.refresh(novo_produto)
 
@@ -424,10 +439,17 @@ async def atualizar_produto(
         if not update_data:
             raise HTTPException(status_code=400, detail="Nenhum dado para atualizar")
 
+        # Estoque só muda pelo ledger (entrada ou ajuste da diferença)
+        nr_estoque = update_data.pop('nr_quantidade_estoque', None)
+
         # Atualizar campos
         for field, value in update_data.items():
             setattr(produto, field, value)
 
+        if nr_estoque is not None:
+            await db.flush()
+            await _definir_estoque(db, produto.id_produto, nr_estoque, "Ajuste na edição do produto")
+
         await db.commit()
         await db.refresh(produto)
 
@@ -15,6 +15,16 @@ from src.config.orm_config import get_db
 from src.models.user import User
 from src.utils.auth import get_current_apikey, get_current_user
 from src.utils.auth_helpers import validate_empresa_access, get_user_empresa_id
+from src.middleware.auth_middleware import require_role
+from src.services.busca_marketplace_service import (
+    Ordenacao,
+    aplicar_keyset,
+    clausula_contem,
+    clausula_geo,
+    clausula_texto,
+    proximo_cursor,
+    resolver_ordenacao,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +58,8 @@ class ProfissionalResponse(BaseModel):
     ds_email: Optional[str] = None
     nr_telefone: Optional[str] = None
     nr_whatsapp: Optional[str] = None
+    # Preenchido apenas na busca por proximidade
+    nr_distancia_km: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -119,7 +131,12 @@ async def listar_profissionais(
     ds_especialidade: Optional[str] = Query(None),
     st_ativo: Optional[bool] = Query(None),
     st_aceita_novos_pacientes: Optional[bool] = Query(None),
-    busca: Optional[str] = Query(None, description="Buscar por nome ou especialidade"),
+    busca: Optional[str] = Query(None, description="Buscar por nome, especialidade ou biografia"),
+    nr_latitude: Optional[float] = Query(None, ge=-90, le=90, description="Latitude para busca por proximidade"),
+    nr_longitude: Optional[float] = Query(None, ge=-180, le=180, description="Longitude para busca por proximidade"),
+    nr_raio_km: float = Query(10, gt=0, le=200, description="Raio da busca por proximidade (km)"),
+    ordenar: Optional[str] = Query(None, description="recentes | relevancia | distancia"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (meta.nextCursor)"),
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
     db: AsyncSession = Depends(get_db),
@@ -128,11 +145,18 @@ async def listar_profissionais(
     Lista profissionais com filtros e paginação.
     - Admin pode filtrar por qualquer empresa passando id_empresa
     - Outros usuários verão apenas profissionais de sua própria empresa
+    - busca: full-text sem acento (nome, especialidades, biografia) + nome aproximado
+    - nr_latitude/nr_longitude: profissionais cuja clínica está no raio, do mais próximo ao mais distante
+    - cursor: paginação keyset (meta.nextCursor); sem cursor, page/size continuam valendo
     """
     try:
         # WHERE conditions - por padrão, só lista profissionais ativos
         where_clauses = ["p.st_ativo = TRUE"]  # Apenas ativos por padrão
 
+        params = {
+            "limit": size + 1,
+        }
+
         # ⚠️ BUSCA PÚBLICA: Apenas filtrar por empresa se explicitamente fornecido
         # Não usar id_empresa da API Key ou JWT para permitir busca pública
         empresa_filtro = id_empresa  # Apenas o parâmetro explícito da query string
@@ -142,35 +166,61 @@ async def listar_profissionais(
         # Se não houver empresa_filtro, mostra TODOS profissionais ativos (busca pública)
         if empresa_filtro:
             where_clauses.append(f"c.id_empresa = :id_empresa")
+            params["id_empresa"] = str(empresa_filtro)
 
         if id_user:
             where_clauses.append(f"p.id_user = :id_user")
+            params["id_user"] = id_user
 
         if ds_especialidade:
-            where_clauses.append(f"p.ds_especialidades ILIKE :especialidade")
+            # ds_especialidades é text[]: substring sem acento sobre o array achatado
+            where_clauses.append(clausula_contem(
+                "f_unaccent(lower(f_texto_array(p.ds_especialidades)))",
+                ds_especialidade,
+                "especialidade",
+                params,
+            ))
 
         # Se st_ativo for explicitamente passado, sobrescreve o filtro padrão
         if st_ativo is not None:
             where_clauses[0] = f"p.st_ativo = :st_ativo"
+            params["st_ativo"] = st_ativo
 
         # st_aceita_novos_pacientes column doesn't exist in tb_profissionais
         # if st_aceita_novos_pacientes is not None:
         #     where_clauses.append(f"p.st_aceita_novos_pacientes = :aceita_novos")
 
-        if busca:
-            where_clauses.append(
-                "(p.nm_profissional ILIKE :busca OR p.ds_especialidades::text ILIKE :busca)"
-            )
+        relevancia = "NULL::float8"
+        tem_busca = bool(busca and busca.strip())
+        if tem_busca:
+            where_texto, relevancia = clausula_texto("p", "nm_profissional", busca, params)
+            where_clauses.append(where_texto)
+
+        # Localização do profissional = coordenadas da clínica
+        tem_geo = nr_latitude is not None and nr_longitude is not None
+        distancia_km = "NULL::float8"
+        knn = None
+        if tem_geo:
+            where_geo, distancia_km, knn = clausula_geo("c", nr_latitude, nr_longitude, nr_raio_km, params)
+            where_clauses.append(where_geo)
+
+        modo = resolver_ordenacao(ordenar, tem_busca, tem_geo)
+        if modo == "distancia":
+            ordenacao = Ordenacao(knn, "p.id_profissional", "float8", descendente=False)
+        elif modo == "relevancia":
+            ordenacao = Ordenacao(relevancia, "p.id_profissional", "float8", descendente=True)
+        else:
+            ordenacao = Ordenacao("p.dt_criacao", "p.id_profissional", "timestamp", descendente=True)
 
+        # Filtros sem o cursor: base do totalItems
+        where_filtros = " AND ".join(where_clauses)
+        order_by = aplicar_keyset(ordenacao, cursor, where_clauses, params)
         where_clause = " AND ".join(where_clauses)
 
-        # Count total
-        count_query = text(f"""
-            SELECT COUNT(*)
-            FROM tb_profissionais p
-            LEFT JOIN tb_clinicas c ON p.id_clinica = c.id_clinica
-            WHERE {where_clause}
-        """)
+        paginacao = "LIMIT :limit"
+        if not cursor:
+            paginacao += " OFFSET :offset"
+            params["offset"] = (page - 1) * size
 
         # Query principal (ajustado para schema correto)
         query = text(f"""
@@ -196,47 +246,37 @@ async def listar_profissionais(
                 u.nm_completo as nm_user,
                 u.nm_email as ds_email,
                 p.nr_telefone,
-                p.nr_whatsapp
+                p.nr_whatsapp,
+                {distancia_km} as nr_distancia_km,
+                {ordenacao.expressao} as chave_ordenacao
             FROM tb_profissionais p
             LEFT JOIN tb_clinicas c ON p.id_clinica = c.id_clinica
             LEFT JOIN tb_users u ON p.id_user = u.id_user
             WHERE {where_clause}
-            ORDER BY p.dt_criacao DESC
-            LIMIT :limit OFFSET :offset
+            ORDER BY {order_by}
+            {paginacao}
         """)
 
-        # Parâmetros
-        params = {
-            "limit": size,
-            "offset": (page - 1) * size,
-        }
-
-        # Adicionar id_empresa apenas se houver filtro de empresa
-        if empresa_filtro:
-            params["id_empresa"] = str(empresa_filtro)
-
-        if id_user:
-            params["id_user"] = id_user
-
-        if ds_especialidade:
-            params["especialidade"] = f"%{ds_especialidade}%"
-
-        if st_ativo is not None:
-            params["st_ativo"] = st_ativo
-
         # st_aceita_novos_pacientes doesn't exist
         # if st_aceita_novos_pacientes is not None:
         #     params["aceita_novos"] = st_aceita_novos_pacientes
 
-        if busca:
-            params["busca"] = f"%{busca}%"
-
-        # Executar queries
-        count_result = await db.execute(count_query, params)
-        total = count_result.scalar()
-
         result = await db.execute(query, params)
         rows = result.fetchall()
+        next_cursor = proximo_cursor(rows, size, "id_profissional")
+        rows = rows[:size]
+
+        # COUNT só na primeira página: com cursor o cliente já conhece o total
+        total = None
+        if not cursor:
+            count_query = text(f"""
+                SELECT COUNT(*)
+                FROM tb_profissionais p
+                LEFT JOIN tb_clinicas c ON p.id_clinica = c.id_clinica
+                WHERE {where_filtros}
+            """)
+            count_result = await db.execute(count_query, params)
+            total = count_result.scalar()
 
         # Montar resposta
         profissionais = []
@@ -264,18 +304,25 @@ async def listar_profissionais(
                 ds_email=row.ds_email,
                 nr_telefone=row.nr_telefone,
                 nr_whatsapp=row.nr_whatsapp,
+                nr_distancia_km=round(float(row.nr_distancia_km), 2) if row.nr_distancia_km is not None else None,
             ))
 
-        return ProfissionaisResponse(
-            items=profissionais,
-            meta={
+        meta = {
+            "itemsPerPage": size,
+            "nextCursor": next_cursor,
+            "ordenacao": modo,
+        }
+        if total is not None:
+            meta.update({
                 "totalItems": total,
-                "itemsPerPage": size,
                 "totalPages": (total + size - 1) // size,
                 "currentPage": page,
-            }
-        )
+            })
+
+        return ProfissionaisResponse(items=profissionais, meta=meta)
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar profissionais: {str(e)}")
 
@@ -1145,7 +1192,7 @@ Dúvidas? suporte@doctorq.app
 © 2025 DoctorQ. Todos os direitos reservados.
 """
 
-            email_enviado = email_service.send_email(
+            email_enviado = await email_service.send_email_async(
                 to=request.ds_email,
                 subject=f"🎉 Bem-vindo à Equipe - DoctorQ",
                 html_body=html_body,
@@ -1216,11 +1263,11 @@ async def busca_inteligente_profissionais(
     Busca inteligente de profissionais usando IA Gisele para matching de leads.
 
     **Fluxo:**
-    1. Recebe respostas do lead do paciente
-    2. Busca profissionais ativos no banco
-    3. Para cada profissional, busca dados do lead da clínica
-    4. Usa IA Gisele para fazer matching semântico
-    5. Retorna profissionais ranqueados por compatibilidade
+    1. Recebe respostas do lead do paciente (resultado em cache por hash do questionário)
+    2. Recupera candidatos por similaridade com os embeddings de perfil + localização,
+       já com clínica e lead da clínica em uma única consulta
+    3. Pré-ranqueia e envia só os melhores candidatos para a IA Gisele
+    4. Retorna profissionais ranqueados por compatibilidade
 
     **Parâmetros:**
     - respostas_lead: Dict com respostas do questionário do paciente
@@ -1255,3 +1302,29 @@ async def busca_inteligente_profissionais(
             status_code=500,
             detail=f"Erro ao realizar busca inteligente: {str(e)}"
         )
+
+
+@router.post("/busca-inteligente/indexar/")
+async def indexar_perfis_busca_inteligente(
+    ids_profissionais: Optional[List[str]] = None,
+    current_user: User = Depends(require_role(["admin"])),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Gera/atualiza os embeddings de perfil usados pela busca inteligente.
+
+    Só perfis alterados desde a última indexação são reprocessados.
+    Sem corpo, avalia todos os profissionais ativos.
+    """
+    try:
+        from src.services.busca_inteligente_service import BuscaInteligenteService
+
+        service = BuscaInteligenteService(db)
+        return await service.indexar_perfis(ids_profissionais)
+
+    except Exception as e:
+        logger.error(f"Erro ao indexar perfis da busca inteligente: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao indexar perfis: {str(e)}"
+        )
@@ -0,0 +1,39 @@
+"""
+Status dos jobs singleton (papel do processo e dono de cada lease)
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.orm_config import get_db
+from src.services.coordenador_jobs import (
+    get_coordenador_jobs,
+    identificador_instancia,
+    listar_leases,
+    papel_processo,
+)
+from src.utils.auth import get_current_apikey
+
+router = APIRouter(prefix="/workers", tags=["Workers"])
+
+
+@router.get("/status")
+async def status_workers(
+    db: AsyncSession = Depends(get_db),
+    _: object = Depends(get_current_apikey),
+):
+    """Instância dona de cada job singleton e jobs executados nesta instância."""
+    coordenador = get_coordenador_jobs()
+    return {
+        "instancia": (
+            coordenador.status_local()
+            if coordenador
+            else {
+                "nm_instancia": identificador_instancia(),
+                "nm_papel": papel_processo(),
+                "st_coordenador_ativo": False,
+                "jobs_registrados": [],
+                "jobs_locais": [],
+            }
+        ),
+        "leases": await listar_leases(db),
+    }
@@ -0,0 +1,328 @@
+"""
+Ingestão bufferizada de eventos de analytics (tb_analytics_events)
+
+- track_event/track_search só enfileiram o evento em um buffer circular em
+  memória (limitado): nenhum round trip ao banco na request
+- O IngestorEventos descarrega o buffer a cada LOTE eventos ou INTERVALO ms
+  com um INSERT multi-linha (unnest), em sessão própria
+- Banco lento ou indisponível: o lote vai para um arquivo de spool local
+  (JSONL) e é reenviado quando uma gravação voltar a funcionar
+- id_event é gerado na aplicação e o INSERT ignora conflitos: reenvio do
+  spool após timeout não duplica eventos
+- Buffer cheio descarta o evento mais antigo (contado em nr_descartados)
+
+Sem o ingestor iniciado (scripts, testes), os serviços gravam direto na
+sessão da request.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.logger_config import get_logger
+from src.config.orm_config import get_async_session_context
+
+logger = get_logger(__name__)
+
+TAMANHO_LOTE = int(os.getenv("ANALYTICS_LOTE", "500"))
+INTERVALO_MS = float(os.getenv("ANALYTICS_FLUSH_MS", "1000"))
+CAPACIDADE_BUFFER = int(os.getenv("ANALYTICS_BUFFER_CAPACIDADE", "20000"))
+TIMEOUT_GRAVACAO_SEGUNDOS = float(os.getenv("ANALYTICS_GRAVACAO_TIMEOUT", "5"))
+SPOOL_DIR = os.getenv(
+    "ANALYTICS_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "doctorq-analytics-spool")
+)
+SPOOL_MAX_ARQUIVOS = int(os.getenv("ANALYTICS_SPOOL_MAX_ARQUIVOS", "1000"))
+# Arquivos de spool reenviados por ciclo (não atrasa o buffer corrente)
+SPOOL_ARQUIVOS_POR_CICLO = 10
+
+# Usuário/empresa inexistente vira NULL (mesmo efeito do ON DELETE SET NULL):
+# um evento com FK inválida não derruba o lote inteiro
+SQL_INSERIR_EVENTOS = text("""
+    INSERT INTO tb_analytics_events (
+        id_event, id_user, id_empresa, nm_event_type, ds_event_data, ds_metadata, dt_event
+    )
+    SELECT e.id_event, u.id_user, emp.id_empresa, e.nm_event_type,
+           CAST(e.ds_event_data AS jsonb), CAST(e.ds_metadata AS jsonb), e.dt_event
+    FROM unnest(
+        CAST(:ids AS uuid[]),
+        CAST(:usuarios AS uuid[]),
+        CAST(:empresas AS uuid[]),
+        CAST(:tipos AS text[]),
+        CAST(:dados AS text[]),
+        CAST(:metadados AS text[]),
+        CAST(:datas AS timestamp[])
+    ) AS e(id_event, id_user, id_empresa, nm_event_type, ds_event_data, ds_metadata, dt_event)
+    LEFT JOIN tb_users u ON u.id_user = e.id_user
+    LEFT JOIN tb_empresas emp ON emp.id_empresa = e.id_empresa
+    ON CONFLICT (id_event) DO NOTHING
+""")
+
+
+def novo_evento(
+    nm_event_type: str,
+    ds_event_data: Optional[Dict] = None,
+    ds_metadata: Optional[Dict] = None,
+    id_user: Optional[uuid.UUID] = None,
+    id_empresa: Optional[uuid.UUID] = None,
+) -> dict:
+    """Evento serializável (buffer e spool usam o mesmo formato)."""
+    return {
+        "id_event": str(uuid.uuid4()),
+        "id_user": str(id_user) if id_user else None,
+        "id_empresa": str(id_empresa) if id_empresa else None,
+        "nm_event_type": nm_event_type,
+        "ds_event_data": ds_event_data,
+        "ds_metadata": ds_metadata,
+        "dt_event": datetime.now().isoformat(),
+    }
+
+
+def colunas_lote(eventos: List[dict]) -> dict:
+    """Parâmetros do INSERT multi-linha: uma lista por coluna."""
+
+    def _json(valor):
+        return json.dumps(valor, default=str) if valor is not None else None
+
+    return {
+        "ids": [e["id_event"] for e in eventos],
+        "usuarios": [e["id_user"] for e in eventos],
+        "empresas": [e["id_empresa"] for e in eventos],
+        "tipos": [e["nm_event_type"] for e in eventos],
+        "dados": [_json(e["ds_event_data"]) for e in eventos],
+        "metadados": [_json(e["ds_metadata"]) for e in eventos],
+        "datas": [datetime.fromisoformat(e["dt_event"]) for e in eventos],
+    }
+
+
+async def gravar_eventos(db: AsyncSession, eventos: List[dict]):
+    """INSERT multi-linha dos eventos (sem commit)."""
+    if eventos:
+        await db.execute(SQL_INSERIR_EVENTOS, colunas_lote(eventos))
+
+
+class BufferEventos:
+    """Buffer circular limitado; cheio, descarta o evento mais antigo."""
+
+    def __init__(self, capacidade: int):
+        self._eventos: deque = deque(maxlen=capacidade)
+        self.nr_descartados = 0
+
+    def __len__(self) -> int:
+        return len(self._eventos)
+
+    def adicionar(self, evento: dict):
+        if len(self._eventos) == self._eventos.maxlen:
+            self.nr_descartados += 1
+        self._eventos.append(evento)
+
+    def retirar(self, limite: int) -> List[dict]:
+        return [self._eventos.popleft() for _ in range(min(limite, len(self._eventos)))]
+
+
+def escrever_spool(diretorio: str, eventos: List[dict]) -> str:
+    """Grava o lote em um arquivo JSONL novo (rename atômico)."""
+    os.makedirs(diretorio, exist_ok=True)
+    nome = f"eventos-{time.time_ns()}-{uuid.uuid4().hex[:8]}.jsonl"
+    caminho = os.path.join(diretorio, nome)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+        for evento in eventos:
+            arquivo.write(json.dumps(evento, default=str) + "\n")
+    os.replace(caminho + ".tmp", caminho)
+    return caminho
+
+
+def ler_spool(caminho: str) -> List[dict]:
+    with open(caminho, encoding="utf-8") as arquivo:
+        return [json.loads(linha) for linha in arquivo if linha.strip()]
+
+
+def listar_spool(diretorio: str) -> List[str]:
+    """Arquivos de spool em ordem de gravação."""
+    if not os.path.isdir(diretorio):
+        return []
+    return sorted(
+        os.path.join(diretorio, nome)
+        for nome in os.listdir(diretorio)
+        if nome.startswith("eventos-") and nome.endswith(".jsonl")
+    )
+
+
+class IngestorEventos:
+    """Worker que descarrega o buffer de eventos no Postgres (ou no spool)."""
+
+    def __init__(
+        self,
+        capacidade: int = CAPACIDADE_BUFFER,
+        lote: int = TAMANHO_LOTE,
+        intervalo_ms: float = INTERVALO_MS,
+        spool_dir: str = SPOOL_DIR,
+    ):
+        self._buffer = BufferEventos(capacidade)
+        self._capacidade = capacidade
+        self._lote = lote
+        self._intervalo = intervalo_ms / 1000
+        self._spool_dir = spool_dir
+        self._acordar = asyncio.Event()
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self._nr_gravados = 0
+        self._nr_spool = 0
+        self._nr_spool_descartados = 0
+        self._nr_falhas = 0
+        self._nr_arquivos_spool = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self._running
+
+    def registrar(self, evento: dict) -> bool:
+        """Enfileira o evento (não bloqueia). False se o ingestor não está ativo."""
+        if not self._running:
+            return False
+        self._buffer.adicionar(evento)
+        if len(self._buffer) >= self._lote:
+            self._acordar.set()
+        return True
+
+    def metricas(self) -> dict:
+        return {
+            "st_ativo": self._running,
+            "nr_backlog": len(self._buffer),
+            "nr_capacidade": self._capacidade,
+            "nr_descartados": self._buffer.nr_descartados + self._nr_spool_descartados,
+            "nr_gravados": self._nr_gravados,
+            "nr_falhas_gravacao": self._nr_falhas,
+            "nr_eventos_spool": self._nr_spool,
+            "nr_arquivos_spool": self._nr_arquivos_spool,
+        }
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._nr_arquivos_spool = len(await asyncio.to_thread(listar_spool, self._spool_dir))
+        self._task = asyncio.create_task(self._loop())
+        logger.info("IngestorEventos iniciado")
+
+    async def stop(self):
+        self._running = False
+        if self._task:
+            # Sem cancelar: um lote já retirado do buffer pode estar em
+            # _gravar e se perderia. O loop acorda, termina o ciclo e sai
+            # (cada gravação tem timeout e a falha vai para o spool).
+            self._acordar.set()
+            await asyncio.wait({self._task})
+            self._task = None
+        # Drena o buffer (banco ou spool) antes de encerrar
+        await self.descarregar()
+        logger.info("IngestorEventos parado")
+
+    async def descarregar(self) -> int:
+        """Grava o buffer em lotes; após uma falha, o restante vai para o spool."""
+        gravados = 0
+        banco_ok = True
+        while len(self._buffer):
+            lote = self._buffer.retirar(self._lote)
+            if banco_ok and await self._gravar(lote):
+                gravados += len(lote)
+                continue
+            banco_ok = False
+            await self._enviar_spool(lote)
+
+        if banco_ok and self._nr_arquivos_spool:
+            gravados += await self._reenviar_spool()
+        return gravados
+
+    async def _gravar(self, eventos: List[dict]) -> bool:
+        try:
+            async with get_async_session_context() as db:
+                await asyncio.wait_for(self._inserir(db, eventos), TIMEOUT_GRAVACAO_SEGUNDOS)
+            self._nr_gravados += len(eventos)
+            return True
+        except Exception as e:
+            self._nr_falhas += 1
+            logger.warning(f"Falha ao gravar {len(eventos)} eventos de analytics: {e}")
+            return False
+
+    @staticmethod
+    async def _inserir(db: AsyncSession, eventos: List[dict]):
+        await gravar_eventos(db, eventos)
+        await db.commit()
+
+    async def _enviar_spool(self, eventos: List[dict]):
+        if self._nr_arquivos_spool >= SPOOL_MAX_ARQUIVOS:
+            self._nr_spool_descartados += len(eventos)
+            logger.error(f"Spool de analytics cheio: {len(eventos)} eventos descartados")
+            return
+        try:
+            await asyncio.to_thread(escrever_spool, self._spool_dir, eventos)
+            self._nr_spool += len(eventos)
+            self._nr_arquivos_spool += 1
+        except Exception as e:
+            self._nr_spool_descartados += len(eventos)
+            logger.error(f"Erro ao gravar spool de analytics: {e}")
+
+    async def _reenviar_spool(self) -> int:
+        arquivos = await asyncio.to_thread(listar_spool, self._spool_dir)
+        self._nr_arquivos_spool = len(arquivos)
+        gravados = 0
+        for caminho in arquivos[:SPOOL_ARQUIVOS_POR_CICLO]:
+            eventos = await asyncio.to_thread(ler_spool, caminho)
+            if not await self._gravar(eventos):
+                break
+            await asyncio.to_thread(os.remove, caminho)
+            self._nr_arquivos_spool -= 1
+            gravados += len(eventos)
+        if gravados:
+            logger.info(f"Spool de analytics: {gravados} eventos reenviados")
+        return gravados
+
+    async def _loop(self):
+        while self._running:
+            try:
+                try:
+                    await asyncio.wait_for(self._acordar.wait(), self._intervalo)
+                except asyncio.TimeoutError:
+                    pass
+                self._acordar.clear()
+                await self.descarregar()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Erro na ingestão de analytics: {e}")
+
+
+_ingestor_eventos: Optional[IngestorEventos] = None
+
+
+def get_ingestor_eventos() -> IngestorEventos:
+    """Retorna instância singleton do ingestor."""
+    global _ingestor_eventos
+    if _ingestor_eventos is None:
+        _ingestor_eventos = IngestorEventos()
+    return _ingestor_eventos
+
+
+async def registrar_evento(evento: dict, db: AsyncSession):
+    """Enfileira o evento; sem ingestor ativo, grava direto na sessão."""
+    if get_ingestor_eventos().registrar(evento):
+        return
+    await gravar_eventos(db, [evento])
+    await db.commit()
+
+
+async def iniciar_ingestor_eventos():
+    await get_ingestor_eventos().start()
+
+
+async def parar_ingestor_eventos():
+    if _ingestor_eventos:
+        await _ingestor_eventos.stop()
@@ -3,7 +3,6 @@ Serviço de Analytics para Busca Avançada
 Fase 4 - Analytics e Monitoramento
 """
 
-import json
 from datetime import datetime
 from typing import Dict, List
 
@@ -18,6 +17,7 @@ from src.models.analytics_schemas import (
     TopDocument,
     TopQuery,
 )
+from src.services.analytics_ingestao_service import novo_evento, registrar_evento
 
 logger = get_logger(__name__)
 
@@ -263,37 +263,21 @@ class AnalyticsSearchService:
     ):
         """
         Registra um evento de busca para análise futura
+
+        Enfileirado no IngestorEventos (gravação em lote fora da request).
         """
         try:
-            # Inserir evento na tabela de analytics
-            insert_query = text(
-                """
-                INSERT INTO tb_analytics_events (
-                    id_event,
-                    nm_event_type,
-                    ds_event_data,
-                    dt_criacao
-                ) VALUES (
-                    gen_random_uuid(),
-                    'search_executed',
-                    :event_data::jsonb,
-                    NOW()
-                )
-            """
-            )
-
-            event_data = json.dumps(
-                {
+            evento = novo_evento(
+                nm_event_type="search_executed",
+                ds_event_data={
                     "query": query,
                     "execution_time_ms": execution_time_ms,
                     "total_results": total_results,
                     "success": success,
                     "filters_used": filters_used,
-                }
+                },
             )
-
-            await self.db.execute(insert_query, {"event_data": event_data})
-            await self.db.commit()
+            await registrar_evento(evento, self.db)
 
             logger.debug(f"Evento de busca rastreado: '{query[:50]}...'")
 
@@ -26,6 +26,7 @@ from src.models.analytics import (
 )
 from src.models.billing import Subscription, SubscriptionStatus, UsageMetric
 from src.models.template import Template, TemplateInstallation, TemplateReview
+from src.services.analytics_ingestao_service import novo_evento, registrar_evento
 from src.models.user import User
 
 logger = get_logger(__name__)
@@ -41,33 +42,32 @@ class AnalyticsService:
     # EVENT TRACKING
     # =============================================================================
 
-    async def track_event(self, event_data: AnalyticsEventCreate) -> AnalyticsEvent:
+    async def track_event(self, event_data: AnalyticsEventCreate) -> uuid.UUID:
         """
         Registra um evento de analytics
 
+        O evento entra no buffer do IngestorEventos e é gravado em lote, fora
+        da request (sem ingestor ativo, grava direto nesta sessão).
+
         Args:
             event_data: Dados do evento
 
         Returns:
-            Evento criado
+            ID do evento
         """
         try:
-            event = AnalyticsEvent(
+            evento = novo_evento(
+                nm_event_type=event_data.nm_event_type,
+                ds_event_data=event_data.ds_properties,
                 id_user=event_data.id_user,
                 id_empresa=event_data.id_empresa,
-                nm_event_type=event_data.nm_event_type,
-                ds_event_data=event_data.ds_event_data,
-                ds_metadata=event_data.ds_metadata,
             )
+            await registrar_evento(evento, self.db)
 
-            self.db.add(event)
-            await self.db.commit()
-            await self.db.refresh(event)
-
-            logger.info(
-                f"Evento registrado: {event.nm_event_type} para user {event.id_user}"
+            logger.debug(
+                f"Evento registrado: {event_data.nm_event_type} para user {event_data.id_user}"
             )
-            return event
+            return uuid.UUID(evento["id_event"])
 
         except Exception as e:
             await self.db.rollback()
@@ -301,23 +301,32 @@ class AnalyticsService:
             if not start_date:
                 start_date = end_date - timedelta(days=30)
 
-            # Query SQL direto para contar conversas e mensagens
-            # Assumindo que existe tb_conversas e tb_messages
+            # Uma passada agrupada, restrita ao período: mensagens das conversas
+            # do período não são anteriores ao início (poda das partições
+            # mensais de tb_messages); ativas = mensagens dos últimos 7 dias
             query = text(
                 """
+                WITH conversas AS (
+                    SELECT id_conversa
+                    FROM tb_conversas
+                    WHERE dt_criacao >= :start_date
+                      AND dt_criacao <= :end_date
+                ),
+                mensagens AS (
+                    SELECT m.id_conversa, COUNT(*) as nr_mensagens
+                    FROM tb_messages m
+                    INNER JOIN conversas c ON c.id_conversa = m.id_conversa
+                    WHERE m.dt_criacao >= :start_date
+                    GROUP BY m.id_conversa
+                )
                 SELECT
-                    COUNT(DISTINCT c.id_conversa) as total_conversations,
-                    COUNT(m.id_message) as total_messages,
-                    COALESCE(AVG(msg_count.msg_per_conv), 0) as avg_messages_per_conversation
-                FROM tb_conversas c
-                LEFT JOIN tb_messages m ON m.id_conversa = c.id_conversa
-                LEFT JOIN (
-                    SELECT id_conversa, COUNT(*) as msg_per_conv
-                    FROM tb_messages
-                    GROUP BY id_conversa
-                ) msg_count ON msg_count.id_conversa = c.id_conversa
-                WHERE c.dt_criacao >= :start_date
-                  AND c.dt_criacao <= :end_date
+                    (SELECT COUNT(*) FROM conversas) as total_conversations,
+                    (SELECT COALESCE(SUM(nr_mensagens), 0) FROM mensagens) as total_messages,
+                    (
+                        SELECT COUNT(DISTINCT id_conversa)
+                        FROM tb_messages
+                        WHERE dt_criacao >= :seven_days_ago
+                    ) as active_conversations
             """
             )
 
@@ -326,27 +335,19 @@ class AnalyticsService:
                 {
                     "start_date": datetime.combine(start_date, datetime.min.time()),
                     "end_date": datetime.combine(end_date, datetime.max.time()),
+                    "seven_days_ago": datetime.now() - timedelta(days=7),
                 },
             )
             row = result.fetchone()
 
             total_conversations = row[0] or 0
             total_messages = row[1] or 0
-            avg_messages = Decimal(str(row[2] or 0))
-
-            # Conversas ativas (com mensagem nos últimos 7 dias)
-            active_query = text(
-                """
-                SELECT COUNT(DISTINCT c.id_conversa)
-                FROM tb_conversas c
-                INNER JOIN tb_messages m ON m.id_conversa = c.id_conversa
-                WHERE m.dt_criacao >= :seven_days_ago
-            """
-            )
-            active_result = await self.db.execute(
-                active_query, {"seven_days_ago": datetime.now() - timedelta(days=7)}
+            active_conversations = row[2] or 0
+            avg_messages = (
+                Decimal(total_messages) / Decimal(total_conversations)
+                if total_conversations > 0
+                else Decimal(0)
             )
-            active_conversations = active_result.scalar() or 0
 
             # Taxa de engajamento
             engagement_rate = (
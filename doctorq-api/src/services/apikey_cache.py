@@ -0,0 +1,150 @@
+"""
+Resolução de API Keys com cache em processo
+
+- Busca pelo SHA-256 da chave (índice único nm_api_key_hash), nunca pela chave em claro
+- Cache TTL em memória por hash, incluindo resultado negativo (chave inexistente)
+- Revogação (exclusão/alteração) propagada às demais instâncias via Redis pub/sub
+"""
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from src.config.logger_config import get_logger
+from src.utils.cache_local import CacheLocalTTL, CanalInvalidacao
+
+logger = get_logger(__name__)
+
+CANAL_REVOGACAO = "apikey:revogacao"
+CACHE_TTL_SEGUNDOS = float(os.getenv("APIKEY_CACHE_TTL", "300"))
+CACHE_NEGATIVO_TTL_SEGUNDOS = float(os.getenv("APIKEY_CACHE_NEGATIVO_TTL", "30"))
+CACHE_MAX_ENTRADAS = int(os.getenv("APIKEY_CACHE_MAX_ENTRADAS", "10000"))
+
+# Mensagem de revogação que limpa o cache inteiro
+REVOGAR_TODAS = "*"
+
+
+def hash_api_key(api_key: str) -> str:
+    """SHA-256 (hex) da chave, igual ao calculado pela trigger do banco."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class ApiKeyAutenticada:
+    """Dados da API Key necessários após a autenticação (sem a chave em claro)"""
+
+    id: uuid.UUID
+    keyName: Optional[str]
+    id_empresa: Optional[uuid.UUID]
+    id_user: Optional[uuid.UUID]
+    apiKeyHash: str
+    dt_expiracao: Optional[datetime] = None
+
+    def expirada(self, agora: Optional[datetime] = None) -> bool:
+        return self.dt_expiracao is not None and self.dt_expiracao <= (agora or datetime.now())
+
+
+class ApiKeyCache:
+    """Cache TTL (LRU limitado) de API Keys indexado pelo hash da chave."""
+
+    def __init__(
+        self,
+        ttl: float = CACHE_TTL_SEGUNDOS,
+        ttl_negativo: float = CACHE_NEGATIVO_TTL_SEGUNDOS,
+        max_entradas: int = CACHE_MAX_ENTRADAS,
+    ):
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self._cache = CacheLocalTTL(ttl, max_entradas)
+        self._canal = CanalInvalidacao(CANAL_REVOGACAO, self.invalidar, self.invalidar)
+
+    def obter(self, chave_hash: str) -> Tuple[bool, Optional[ApiKeyAutenticada]]:
+        """(encontrado, valor); valor None em hit negativo."""
+        return self._cache.obter(chave_hash)
+
+    def armazenar(self, chave_hash: str, valor: Optional[ApiKeyAutenticada]) -> None:
+        ttl = self.ttl if valor else self.ttl_negativo
+        if valor and valor.dt_expiracao:
+            # Não manter no cache além da expiração da própria chave
+            ttl = min(ttl, max(0.0, (valor.dt_expiracao - datetime.now()).total_seconds()))
+        self._cache.armazenar(chave_hash, valor, ttl)
+
+    def invalidar(self, chave_hash: Optional[str] = None) -> None:
+        self._cache.invalidar(None if chave_hash == REVOGAR_TODAS else chave_hash)
+
+    async def resolver(self, api_key: str) -> Optional[ApiKeyAutenticada]:
+        """API Key ativa e não expirada correspondente ao token, ou None."""
+        chave_hash = hash_api_key(api_key)
+        encontrado, valor = self.obter(chave_hash)
+        if not encontrado:
+            valor = await self._carregar(chave_hash)
+            self.armazenar(chave_hash, valor)
+        if valor and valor.expirada():
+            self.invalidar(chave_hash)
+            return None
+        return valor
+
+    async def _carregar(self, chave_hash: str) -> Optional[ApiKeyAutenticada]:
+        from src.config.orm_config import get_async_session_context
+        from src.services.apikey_service import ApiKeyService
+
+        async with get_async_session_context() as db:
+            apikey = await ApiKeyService(db).get_apikey_by_hash(chave_hash)
+            if not apikey or apikey.st_ativo is False:
+                return None
+            return ApiKeyAutenticada(
+                id=apikey.id,
+                keyName=apikey.keyName,
+                id_empresa=apikey.id_empresa,
+                id_user=apikey.id_user,
+                apiKeyHash=apikey.apiKeyHash,
+                dt_expiracao=apikey.dt_expiracao,
+            )
+
+    async def iniciar(self) -> None:
+        """Assina o canal de revogação (sem Redis, vale só o TTL local)."""
+        if not await self._canal.iniciar():
+            logger.info("Redis indisponível - revogação de API Keys limitada ao TTL do cache")
+
+    async def parar(self) -> None:
+        await self._canal.parar()
+
+    async def publicar_revogacao(self, chave_hash: str) -> None:
+        self.invalidar(chave_hash)
+        await self._canal.publicar(chave_hash)
+
+
+_apikey_cache: Optional[ApiKeyCache] = None
+
+
+def get_apikey_cache() -> ApiKeyCache:
+    """Cache global de API Keys (um por processo)"""
+    global _apikey_cache
+    if _apikey_cache is None:
+        _apikey_cache = ApiKeyCache()
+    return _apikey_cache
+
+
+async def resolver_apikey(api_key: str) -> Optional[ApiKeyAutenticada]:
+    """Atalho para get_apikey_cache().resolver()"""
+    return await get_apikey_cache().resolver(api_key)
+
+
+async def publicar_revogacao(chave_hash: str = REVOGAR_TODAS) -> None:
+    """
+    Remove a chave do cache desta instância e avisa as demais.
+
+    Chamar após o commit de exclusão/alteração da API Key.
+    """
+    await get_apikey_cache().publicar_revogacao(chave_hash)
+
+
+async def iniciar_apikey_cache() -> None:
+    await get_apikey_cache().iniciar()
+
+
+async def parar_apikey_cache() -> None:
+    if _apikey_cache:
+        await _apikey_cache.parar()
@@ -12,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.config.logger_config import get_logger
 from src.config.orm_config import get_db
 from src.models.apikey import ApiKey, ApiKeyCreate, ApiKeyUpdate
+from src.services.apikey_cache import hash_api_key, publicar_revogacao
 from src.utils.crypto import get_crypto_service
 
 logger = get_logger(__name__)
@@ -62,6 +63,7 @@ class ApiKeyService:
             # Criar o modelo SQLAlchemy
             db_apikey = ApiKey(
                 apiKey=api_key,
+                apiKeyHash=hash_api_key(api_key),
                 apiSecret=encrypted_secret,
                 keyName=apikey_data.keyName,
             )
@@ -100,19 +102,21 @@ class ApiKeyService:
             raise RuntimeError(f"Erro ao buscar API key: {str(e)}") from e
 
     async def get_apikey_by_key(self, api_key: str) -> Optional[ApiKey]:
-        """Obter uma API key pela chave pÃºblica"""
+        """Obter uma API key pela chave pública (busca pelo hash da chave)"""
+        apikey = await self.get_apikey_by_hash(hash_api_key(api_key))
+        if not apikey:
+            logger.debug(f"API Key não encontrada: {api_key[:8]}...")
+        return apikey
+
+    async def get_apikey_by_hash(self, api_key_hash: str) -> Optional[ApiKey]:
+        """Obter uma API key pelo SHA-256 da chave (índice idx_api_keys_hash)"""
         try:
-            stmt = select(ApiKey).where(ApiKey.apiKey == api_key)
+            stmt = select(ApiKey).where(ApiKey.apiKeyHash == api_key_hash)
             result = await self.db.execute(stmt)
-            apikey = result.scalar_one_or_none()
-
-            if not apikey:
-                logger.debug(f"API Key nÃ£o encontrada: {api_key[:8]}...")
-
-            return apikey
+            return result.scalar_one_or_none()
 
         except Exception as e:
-            logger.error(f"Erro ao buscar API key por chave: {str(e)}")
+            logger.error(f"Erro ao buscar API key por hash: {str(e)}")
             raise RuntimeError(f"Erro ao buscar API key: {str(e)}") from e
 
     async def get_apikey_by_name(self, name: str) -> Optional[ApiKey]:
@@ -250,6 +254,7 @@ class ApiKeyService:
             # Salvar
             await self.db.commit()
             await self.db.refresh(apikey)
+            await publicar_revogacao(apikey.apiKeyHash)
             logger.info(f"API Key atualizada: {apikey.keyName}")
             return apikey
 
@@ -268,8 +273,10 @@ class ApiKeyService:
                 logger.warning(f"API Key nÃ£o encontrada para deleÃ§Ã£o: {apikey_id}")
                 return False
 
+            api_key_hash = apikey.apiKeyHash
             await self.db.delete(apikey)
             await self.db.commit()
+            await publicar_revogacao(api_key_hash)
             logger.info(f"API Key deletada: {apikey.keyName}")
             return True
 
@@ -37,6 +37,14 @@ from src.models.billing import (
     UsageMetricType,
     UsageSummary,
 )
+from src.services.medidor_uso_service import (
+    ContextoCobranca,
+    MedidorUso,
+    avaliar_quota,
+    campo_pendente,
+    get_medidor_uso,
+    somar_uso_banco,
+)
 
 logger = get_logger(__name__)
 
@@ -187,6 +195,7 @@ class BillingService:
 
             await self.db.commit()
             await self.db.refresh(plan)
+            await self._invalidar_cache_cobranca(id_plan=plan.id_plan)
 
             logger.info(f"Plano atualizado: {plan.nm_plan}")
             return plan
@@ -249,6 +258,7 @@ class BillingService:
             self.db.add(db_subscription)
             await self.db.commit()
             await self.db.refresh(db_subscription)
+            await self._invalidar_cache_cobranca(id_user=db_subscription.id_user)
 
             logger.info(
                 f"Assinatura criada: user={subscription_data.id_user}, "
@@ -322,6 +332,7 @@ class BillingService:
 
             await self.db.commit()
             await self.db.refresh(subscription)
+            await self._invalidar_cache_cobranca(id_user=subscription.id_user)
 
             logger.info(f"Assinatura atualizada: {subscription_id}")
             return subscription
@@ -351,6 +362,7 @@ class BillingService:
 
             await self.db.commit()
             await self.db.refresh(subscription)
+            await self._invalidar_cache_cobranca(id_user=subscription.id_user)
 
             logger.info(
                 f"Assinatura cancelada: {subscription_id} (immediately={immediately}, reason={reason})"
@@ -439,6 +451,7 @@ class BillingService:
 
             await db.commit()
             await db.refresh(subscription)
+            await self._invalidar_cache_cobranca(id_user=subscription.id_user)
 
             logger.info(f"Assinatura atualizada via Stripe: {subscription.id_subscription}")
             return subscription
@@ -538,6 +551,7 @@ class BillingService:
 
             await db.commit()
             await db.refresh(subscription)
+            await self._invalidar_cache_cobranca(id_user=subscription.id_user)
 
             # 6. Registrar evento de analytics
             from src.models.analytics import TbAnalyticsEvents
@@ -635,13 +649,127 @@ class BillingService:
     # USAGE TRACKING
     # =========================================================================
 
+    async def _invalidar_cache_cobranca(
+        self, id_user: Optional[uuid.UUID] = None, id_plan: Optional[uuid.UUID] = None
+    ) -> None:
+        """Remove assinatura vigente/quotas em cache após alteração (best-effort)."""
+        try:
+            medidor = await get_medidor_uso()
+            if not medidor:
+                return
+            if id_user:
+                await medidor.invalidar_contexto(id_user)
+            if id_plan:
+                await medidor.invalidar_quotas(id_plan)
+        except Exception as e:
+            logger.warning(f"Erro ao invalidar cache de cobrança: {str(e)}")
+
+    async def _contexto_cobranca(
+        self, medidor: MedidorUso, user_id: uuid.UUID
+    ) -> Optional[ContextoCobranca]:
+        """Assinatura vigente + quotas do plano, do cache ou do banco."""
+        contexto = await medidor.obter_contexto(user_id)
+        if contexto:
+            return contexto
+
+        subscription = await self.get_active_subscription_by_user(user_id)
+        if (
+            not subscription
+            or not subscription.dt_current_period_start
+            or not subscription.dt_current_period_end
+        ):
+            return None
+
+        plan = await self.get_plan_by_id(subscription.id_plan)
+        contexto = ContextoCobranca(
+            id_subscription=str(subscription.id_subscription),
+            id_plan=str(subscription.id_plan),
+            dt_period_start=subscription.dt_current_period_start,
+            dt_period_end=subscription.dt_current_period_end,
+            quotas=(plan.ds_quotas if plan else None) or {},
+        )
+        await medidor.armazenar_contexto(user_id, contexto)
+        return contexto
+
+    async def _uso_periodo(
+        self,
+        medidor: MedidorUso,
+        user_id: uuid.UUID,
+        contexto: ContextoCobranca,
+        metricas: List[str],
+    ) -> Dict[str, float]:
+        """Contadores do período; os ainda não semeados vêm do SUM do banco."""
+        usos = await medidor.ler(user_id, metricas, contexto)
+        faltantes = [metrica for metrica, valor in usos.items() if valor is None]
+        if faltantes:
+            totais = await somar_uso_banco(self.db, user_id, faltantes, contexto)
+            await medidor.semear(user_id, totais, contexto)
+            usos.update(await medidor.ler(user_id, faltantes, contexto))
+        return {metrica: valor or 0.0 for metrica, valor in usos.items()}
+
     async def track_usage(self, metric_data: UsageMetricCreate) -> UsageMetric:
-        """Registrar uso de recursos"""
+        """
+        Registrar uso de recursos
+
+        Uso do período corrente incrementa o contador no Redis e é gravado de
+        forma agregada pelo compactador; com ds_metadata (ou sem Redis) a
+        linha é gravada na hora, como antes.
+        """
+        metric_type = metric_data.nm_metric_type.value
+        valor = float(metric_data.nr_value)
+        medidor = None
+        contexto = None
+        try:
+            medidor = await get_medidor_uso()
+            if medidor:
+                contexto = await self._contexto_cobranca(medidor, metric_data.id_user)
+            if contexto and not contexto.contem(metric_data.dt_period_start, metric_data.dt_period_end):
+                contexto = None
+        except Exception as e:
+            logger.warning(f"Contador de uso indisponível, gravando direto: {str(e)}")
+            medidor = contexto = None
+
+        if contexto and not metric_data.ds_metadata:
+            try:
+                await self._uso_periodo(medidor, metric_data.id_user, contexto, [metric_type])
+                await medidor.incrementar(
+                    metric_data.id_user,
+                    metric_type,
+                    valor,
+                    contexto,
+                    campo_pendente(
+                        metric_data.id_subscription,
+                        metric_data.id_user,
+                        metric_type,
+                        metric_data.dt_period_start,
+                        metric_data.dt_period_end,
+                    ),
+                )
+                logger.debug(
+                    f"Uso contabilizado: user={metric_data.id_user}, "
+                    f"type={metric_data.nm_metric_type}, value={metric_data.nr_value}"
+                )
+                # Registro ainda não persistido (gravado agregado pelo compactador)
+                return UsageMetric(
+                    id_metric=uuid.uuid4(),
+                    id_subscription=metric_data.id_subscription,
+                    id_user=metric_data.id_user,
+                    nm_metric_type=metric_type,
+                    nr_value=metric_data.nr_value,
+                    dt_period_start=metric_data.dt_period_start,
+                    dt_period_end=metric_data.dt_period_end,
+                    ds_metadata=None,
+                    dt_criacao=datetime.now(),
+                )
+            except Exception as e:
+                logger.warning(f"Contador de uso indisponível, gravando direto: {str(e)}")
+                medidor = contexto = None
+
         try:
             db_metric = UsageMetric(
                 id_subscription=metric_data.id_subscription,
                 id_user=metric_data.id_user,
-                nm_metric_type=metric_data.nm_metric_type.value,
+                nm_metric_type=metric_type,
                 nr_value=metric_data.nr_value,
                 dt_period_start=metric_data.dt_period_start,
                 dt_period_end=metric_data.dt_period_end,
@@ -656,18 +784,72 @@ class BillingService:
                 f"Uso registrado: user={metric_data.id_user}, "
                 f"type={metric_data.nm_metric_type}, value={metric_data.nr_value}"
             )
-            return db_metric
 
         except Exception as e:
             logger.error(f"Erro ao registrar uso: {str(e)}")
             await self.db.rollback()
             raise RuntimeError(f"Erro ao registrar uso: {str(e)}") from e
 
+        if contexto:
+            try:
+                await medidor.incrementar_se_existir(metric_data.id_user, metric_type, valor, contexto)
+            except Exception as e:
+                # Sem Redis o contador não recebe este valor (fail-open, como check_quota)
+                logger.warning(f"Erro ao incrementar contador de uso: {str(e)}")
+        return db_metric
+
+    @staticmethod
+    def _montar_resumo(
+        user_id: uuid.UUID,
+        start_date: datetime,
+        end_date: datetime,
+        metrics: Dict[str, Decimal],
+        quotas: Dict,
+    ) -> UsageSummary:
+        # Calcular percentual de uso
+        usage_percentage = {}
+        for metric_type, quota in quotas.items():
+            if quota > 0:  # Quota positiva
+                current_usage = float(metrics.get(metric_type, 0))
+                usage_percentage[metric_type] = (current_usage / quota) * 100
+            elif quota == -1:  # Ilimitado
+                usage_percentage[metric_type] = 0.0
+            else:  # Quota zero (feature bloqueada)
+                usage_percentage[metric_type] = 0.0
+
+        return UsageSummary(
+            id_user=user_id,
+            current_period_start=start_date,
+            current_period_end=end_date,
+            metrics=metrics,
+            quotas=quotas,
+            usage_percentage=usage_percentage,
+        )
+
     async def get_usage_summary(
         self, user_id: uuid.UUID, start_date: Optional[datetime] = None
     ) -> UsageSummary:
         """Obter resumo de uso do usuário"""
         try:
+            # Período corrente: contadores em tempo real
+            medidor = await get_medidor_uso()
+            contexto = await self._contexto_cobranca(medidor, user_id) if medidor else None
+            if contexto and (start_date is None or start_date == contexto.dt_period_start):
+                metricas = sorted(set(contexto.quotas) | {m.value for m in UsageMetricType})
+                usos = await self._uso_periodo(medidor, user_id, contexto, metricas)
+                metrics = {
+                    metric_type: Decimal(str(total))
+                    for metric_type, total in usos.items()
+                    if total
+                }
+                return self._montar_resumo(
+                    user_id,
+                    contexto.dt_period_start,
+                    contexto.dt_period_end,
+                    metrics,
+                    contexto.quotas,
+                )
+
             # Buscar assinatura ativa
             subscription = await self.get_active_subscription_by_user(user_id)
             if not subscription:
@@ -702,25 +884,7 @@ class BillingService:
             plan = await self.get_plan_by_id(subscription.id_plan)
             quotas = plan.ds_quotas or {}
 
-            # Calcular percentual de uso
-            usage_percentage = {}
-            for metric_type, quota in quotas.items():
-                if quota > 0:  # Quota positiva
-                    current_usage = float(metrics.get(metric_type, 0))
-                    usage_percentage[metric_type] = (current_usage / quota) * 100
-                elif quota == -1:  # Ilimitado
-                    usage_percentage[metric_type] = 0.0
-                else:  # Quota zero (feature bloqueada)
-                    usage_percentage[metric_type] = 0.0
-
-            return UsageSummary(
-                id_user=user_id,
-                current_period_start=start_date,
-                current_period_end=end_date,
-                metrics=metrics,
-                quotas=quotas,
-                usage_percentage=usage_percentage,
-            )
+            return self._montar_resumo(user_id, start_date, end_date, metrics, quotas)
 
         except ValueError:
             raise
@@ -731,44 +895,29 @@ class BillingService:
     async def check_quota(
         self, user_id: uuid.UUID, metric_type: UsageMetricType
     ) -> Tuple[bool, Dict]:
-        """Verificar se usuário está dentro da quota"""
+        """
+        Verificar se usuário está dentro da quota
+
+        Com Redis: contexto em cache + um contador (O(1), independente do
+        número de registros de uso no período).
+        """
         try:
+            medidor = await get_medidor_uso()
+            contexto = await self._contexto_cobranca(medidor, user_id) if medidor else None
+            if contexto:
+                usos = await self._uso_periodo(medidor, user_id, contexto, [metric_type.value])
+                return avaliar_quota(
+                    contexto.quotas.get(metric_type.value, 0),
+                    usos[metric_type.value],
+                    metric_type.value,
+                )
+
             summary = await self.get_usage_summary(user_id)
 
             # Obter quota e uso atual
             quota = summary.quotas.get(metric_type.value, 0)
             current_usage = float(summary.metrics.get(metric_type.value, 0))
-
-            # -1 = ilimitado
-            if quota == -1:
-                return True, {
-                    "allowed": True,
-                    "quota": -1,
-                    "current_usage": current_usage,
-                    "remaining": -1,
-                }
-
-            # 0 = feature bloqueada
-            if quota == 0:
-                return False, {
-                    "allowed": False,
-                    "quota": 0,
-                    "current_usage": current_usage,
-                    "remaining": 0,
-                    "message": f"Feature {metric_type.value} não incluída no plano",
-                }
-
-            # Quota normal
-            remaining = quota - current_usage
-            allowed = remaining > 0
-
-            return allowed, {
-                "allowed": allowed,
-                "quota": quota,
-                "current_usage": current_usage,
-                "remaining": max(0, remaining),
-                "usage_percentage": summary.usage_percentage.get(metric_type.value, 0),
-            }
+            return avaliar_quota(quota, current_usage, metric_type.value)
 
         except Exception as e:
             logger.error(f"Erro ao verificar quota: {str(e)}")
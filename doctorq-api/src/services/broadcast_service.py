@@ -4,7 +4,7 @@ Envio de mensagens em massa com segmentação e agendamento
 """
 import re
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from uuid import UUID
 
 from sqlalchemy import select, func, and_, or_
@@ -24,6 +24,9 @@ from src.models.broadcast import (
 )
 from src.models.user import User
 
+# Placeholder {{variavel}} dos templates de campanha
+_PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+
 
 class BroadcastService:
     """Serviço para gerenciar campanhas de broadcast"""
@@ -304,11 +307,32 @@ class BroadcastService:
         - Variáveis: {"nome": "João", "clinica": "Clínica X"}
         - Output: "Olá João, bem-vindo à Clínica X!"
         """
-        mensagem = template
-        for chave, valor in variaveis.items():
-            placeholder = f"{{{{{chave}}}}}"
-            mensagem = mensagem.replace(placeholder, str(valor))
-        return mensagem
+        return BroadcastService._compilar_template(template)(variaveis)
+
+    @staticmethod
+    def _compilar_template(template: str) -> Callable[[Dict[str, Any]], str]:
+        """
+        Pré-processa o template uma única vez para renderização em lote
+
+        O template é quebrado em partes literais e nomes de variáveis; cada
+        renderização é só um join, sem varrer o texto por placeholder.
+        Variáveis ausentes permanecem como {{var}} (mesmo comportamento do replace).
+        """
+        partes = _PLACEHOLDER_RE.split(template)
+        literais = partes[0::2]
+        nomes = partes[1::2]
+
+        if not nomes:
+            return lambda variaveis: template
+
+        def renderizar(variaveis: Dict[str, Any]) -> str:
+            saida = [literais[0]]
+            for nome, literal in zip(nomes, literais[1:]):
+                saida.append(str(variaveis[nome]) if nome in variaveis else f"{{{{{nome}}}}}")
+                saida.append(literal)
+            return "".join(saida)
+
+        return renderizar
 
     @staticmethod
     async def enviar_campanha(
@@ -317,14 +341,14 @@ class BroadcastService:
         id_empresa: UUID
     ) -> TbBroadcastCampanha:
         """
-        Envia campanha imediatamente
+        Inicia o envio da campanha em background
 
         Processo:
         1. Valida se campanha pode ser enviada
-        2. Atualiza status para PROCESSANDO
-        3. Processa destinatários em batch
-        4. Chama serviço de envio apropriado
-        5. Atualiza estatísticas
+        2. Atualiza status para PROCESSANDO e zera o checkpoint
+        3. Acorda o BroadcastWorker, que processa os destinatários em lotes
+           (keyset), atualizando nr_enviados/nr_falhas a cada lote
+        4. O worker marca a campanha como ENVIADA ao concluir
         """
         campanha = await BroadcastService.buscar_campanha(db, id_campanha, id_empresa)
         if not campanha:
@@ -340,54 +364,16 @@ class BroadcastService:
         # Atualizar status
         campanha.st_campanha = StatusCampanha.PROCESSANDO.value
         campanha.dt_inicio_envio = datetime.utcnow()
+        campanha.id_checkpoint_destinatario = None
+        campanha.ds_worker_envio = None
+        campanha.dt_heartbeat_envio = None
         await db.commit()
+        await db.refresh(campanha)
 
-        # Buscar destinatários
-        query = select(TbBroadcastDestinatario).where(
-            TbBroadcastDestinatario.id_campanha == id_campanha,
-            TbBroadcastDestinatario.st_envio == StatusDestinatario.PENDENTE.value
-        )
-        result = await db.execute(query)
-        destinatarios = result.scalars().all()
-
-        # Processar envio em batch
-        batch_size = 100
-        enviados = 0
-        falhas = 0
-
-        for i in range(0, len(destinatarios), batch_size):
-            batch = destinatarios[i:i + batch_size]
-
-            for dest in batch:
-                try:
-                    # TODO: Implementar envio real por canal
-                    # await BroadcastService._enviar_por_canal(
-                    #     canal=campanha.tp_canal,
-                    #     destinatario=dest,
-                    #     mensagem=campanha.ds_mensagem,
-                    #     assunto=campanha.ds_assunto
-                    # )
-
-                    # Mock: Marca como enviado
-                    dest.st_envio = StatusDestinatario.ENVIADO.value
-                    dest.dt_enviado = datetime.utcnow()
-                    enviados += 1
-
-                except Exception as e:
-                    dest.st_envio = StatusDestinatario.FALHA.value
-                    dest.ds_mensagem_erro = str(e)
-                    falhas += 1
-
-            await db.commit()
-
-        # Atualizar estatísticas da campanha
-        campanha.st_campanha = StatusCampanha.ENVIADA.value
-        campanha.dt_fim_envio = datetime.utcnow()
-        campanha.nr_enviados = enviados
-        campanha.nr_falhas = falhas
+        # Import tardio: broadcast_worker depende deste módulo
+        from src.services.broadcast_worker import notificar_broadcast_worker
 
-        await db.commit()
-        await db.refresh(campanha)
+        notificar_broadcast_worker()
 
         return campanha
 
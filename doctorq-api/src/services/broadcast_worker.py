@@ -0,0 +1,542 @@
+"""
+Worker de envio de campanhas de broadcast - UC096
+
+Pipeline de envio fora do ciclo da requisição:
+1. Reivindica campanhas em "processando" com lease via SKIP LOCKED; o lease é
+   renovado por uma task de heartbeat enquanto os lotes são enviados
+2. Lê destinatários pendentes em lotes por keyset (id_destinatario > checkpoint)
+3. Renderiza o template do lote de uma vez
+4. Despacha por canal: email vai em lote para o motor de entrega (orçamento
+   de taxa próprio, conclusão acompanhada por lote SMTP); os demais canais
+   com concorrência limitada
+5. Grava status com um único UPDATE ... FROM (VALUES ...) por lote, junto com
+   contadores da campanha e o checkpoint (mesma transação)
+
+Se o processo cair, outra instância assume a campanha quando o lease expira
+e continua do checkpoint, sem reenviar lotes já gravados.
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime
+from html import escape
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+
+from src.config.logger_config import get_logger
+from src.config.orm_config import get_async_session_context
+from src.models.broadcast import CanalEnvio, StatusCampanha, StatusDestinatario
+from src.services.broadcast_service import BroadcastService
+from src.services.email_service import email_service
+
+logger = get_logger(__name__)
+
+
+class BroadcastWorker:
+    """
+    Worker para envio de campanhas de broadcast.
+
+    Features:
+    - Lotes por keyset pagination (sem OFFSET, sem carregar a campanha inteira)
+    - Concorrência limitada por canal
+    - Status gravados em bulk + contadores ao vivo na campanha
+    - Checkpoint e lease para retomada após falha
+    - Promoção automática de campanhas agendadas vencidas
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        concorrencia: int = 20,
+        poll_interval: float = 30.0,
+        lease_segundos: float = 120,
+    ):
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._batch_size = int(os.getenv("BROADCAST_BATCH_SIZE", str(batch_size)))
+        self._concorrencia = int(os.getenv("BROADCAST_CONCORRENCIA", str(concorrencia)))
+        self._poll_interval = poll_interval
+        self._lease_segundos = lease_segundos
+        # Renovação bem antes do vencimento: um lote de email cadenciado pelo
+        # orçamento "broadcast" pode levar mais que o lease inteiro
+        self._heartbeat_interval = lease_segundos / 4
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+    async def start(self):
+        """Inicia o worker."""
+        if self._running:
+            logger.warning("BroadcastWorker já está em execução")
+            return
+
+        self._running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"BroadcastWorker iniciado ({self._worker_id})")
+
+    async def stop(self):
+        """Para o worker (a campanha em andamento é retomada pelo checkpoint)."""
+        self._running = False
+        self._wakeup.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        logger.info("BroadcastWorker parado")
+
+    def notificar(self):
+        """Acorda o loop para processar uma campanha recém-disparada."""
+        self._wakeup.set()
+
+    async def _loop(self):
+        """Loop principal do worker."""
+        while self._running:
+            try:
+                await self._promover_agendadas()
+                while self._running:
+                    id_campanha = await self._reivindicar_campanha()
+                    if not id_campanha:
+                        break
+                    await self._processar_campanha(id_campanha)
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Erro no loop do BroadcastWorker: {e}")
+                await asyncio.sleep(10)
+
+    async def _promover_agendadas(self):
+        """Campanhas agendadas com horário vencido passam para 'processando'."""
+        async with get_async_session_context() as db:
+            await db.execute(
+                text(
+                    """
+                    UPDATE tb_broadcast_campanhas
+                    SET st_campanha = :processando,
+                        dt_inicio_envio = :agora,
+                        dt_atualizacao = :agora
+                    WHERE st_campanha = :agendada
+                      AND dt_agendamento <= :agora
+                      AND fg_ativo = true
+                    """
+                ),
+                {
+                    "processando": StatusCampanha.PROCESSANDO.value,
+                    "agendada": StatusCampanha.AGENDADA.value,
+                    # Colunas de data do módulo são gravadas em UTC (datetime.utcnow)
+                    "agora": datetime.utcnow(),
+                },
+            )
+            await db.commit()
+
+    async def _reivindicar_campanha(self) -> Optional[UUID]:
+        """Assume uma campanha sem dono ou com lease expirado."""
+        async with get_async_session_context() as db:
+            result = await db.execute(
+                text(
+                    """
+                    UPDATE tb_broadcast_campanhas
+                    SET ds_worker_envio = :worker,
+                        dt_heartbeat_envio = now()
+                    WHERE id_campanha = (
+                        SELECT id_campanha FROM tb_broadcast_campanhas
+                        WHERE st_campanha = :processando
+                          AND (
+                              dt_heartbeat_envio IS NULL
+                              OR dt_heartbeat_envio < now() - make_interval(secs => :lease)
+                          )
+                        ORDER BY dt_inicio_envio NULLS FIRST
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id_campanha
+                    """
+                ),
+                {
+                    "worker": self._worker_id,
+                    "processando": StatusCampanha.PROCESSANDO.value,
+                    "lease": self._lease_segundos,
+                },
+            )
+            id_campanha = result.scalar_one_or_none()
+            await db.commit()
+            return id_campanha
+
+    async def _processar_campanha(self, id_campanha: UUID):
+        """Processa a campanha lote a lote a partir do checkpoint."""
+        async with get_async_session_context() as db:
+            campanha = (
+                await db.execute(
+                    text(
+                        """
+                        SELECT tp_canal, ds_assunto, ds_mensagem, ds_metadados,
+                               id_checkpoint_destinatario
+                        FROM tb_broadcast_campanhas
+                        WHERE id_campanha = :id_campanha
+                        """
+                    ),
+                    {"id_campanha": id_campanha},
+                )
+            ).mappings().one()
+
+        canal = campanha["tp_canal"]
+        variaveis_campanha = (campanha["ds_metadados"] or {}).get("variaveis", {})
+        renderizar = BroadcastService._compilar_template(campanha["ds_mensagem"])
+        renderizar_assunto = BroadcastService._compilar_template(campanha["ds_assunto"] or "")
+        checkpoint = campanha["id_checkpoint_destinatario"]
+        inicio = datetime.utcnow()
+        total_lote = 0
+
+        lease = asyncio.create_task(self._manter_lease(id_campanha))
+        try:
+            while self._running:
+                lote = await self._buscar_lote(id_campanha, checkpoint)
+                if not lote:
+                    break
+
+                if not await self._processar_lote(
+                    id_campanha, lease, canal, lote, variaveis_campanha,
+                    renderizar, renderizar_assunto,
+                ):
+                    logger.warning(f"Campanha {id_campanha}: lease perdido, interrompendo envio")
+                    return
+                checkpoint = lote[-1]["id_destinatario"]
+                total_lote += len(lote)
+        finally:
+            lease.cancel()
+            await asyncio.gather(lease, return_exceptions=True)
+
+        if not self._running:
+            return
+
+        await self._finalizar_campanha(id_campanha)
+        logger.info(
+            f"Campanha {id_campanha} concluída: {total_lote} destinatários "
+            f"em {(datetime.utcnow() - inicio).total_seconds():.1f}s"
+        )
+
+    async def _processar_lote(
+        self,
+        id_campanha: UUID,
+        lease: asyncio.Task,
+        canal: str,
+        lote: List[Dict[str, Any]],
+        variaveis_campanha: Dict[str, Any],
+        renderizar,
+        renderizar_assunto,
+    ) -> bool:
+        """
+        Renderiza, despacha e grava um lote.
+
+        Returns:
+            False se o lease foi perdido (o despacho em curso é cancelado)
+        """
+        variaveis = [
+            {
+                **variaveis_campanha,
+                "nome": dest["nm_completo"] or "",
+                "email": dest["ds_email"] or "",
+                "telefone": dest["ds_telefone"] or "",
+                **(dest["ds_metadados"] or {}),
+            }
+            for dest in lote
+        ]
+        mensagens = [renderizar(v) for v in variaveis]
+        assuntos = [renderizar_assunto(v) for v in variaveis]
+
+        despacho = asyncio.create_task(self._despachar_lote(canal, lote, mensagens, assuntos))
+        try:
+            await asyncio.wait({despacho, lease}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not despacho.done():
+                despacho.cancel()
+                await asyncio.gather(despacho, return_exceptions=True)
+        if despacho.cancelled():
+            return False
+
+        return await self._gravar_resultados(
+            id_campanha, despacho.result(), lote[-1]["id_destinatario"]
+        )
+
+    async def _manter_lease(self, id_campanha: UUID):
+        """
+        Renova dt_heartbeat_envio enquanto a campanha é enviada.
+
+        Em sessão própria, a cada lease/4. Termina (e com isso interrompe o
+        lote em curso) quando outra instância assumiu a campanha.
+        """
+        while True:
+            await asyncio.sleep(self._heartbeat_interval)
+            try:
+                async with get_async_session_context() as db:
+                    result = await db.execute(
+                        text(
+                            """
+                            UPDATE tb_broadcast_campanhas
+                            SET dt_heartbeat_envio = now()
+                            WHERE id_campanha = :id_campanha
+                              AND ds_worker_envio = :worker
+                            """
+                        ),
+                        {"id_campanha": id_campanha, "worker": self._worker_id},
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"Falha ao renovar o lease da campanha {id_campanha}: {e}")
+                continue
+
+            if not result.rowcount:
+                return
+
+    async def _buscar_lote(
+        self, id_campanha: UUID, checkpoint: Optional[UUID]
+    ) -> List[Dict[str, Any]]:
+        """Próximo lote de pendentes por keyset (usa o índice parcial de pendentes)."""
+        filtro_checkpoint = "AND d.id_destinatario > :checkpoint" if checkpoint else ""
+        async with get_async_session_context() as db:
+            result = await db.execute(
+                text(
+                    f"""
+                    SELECT d.id_destinatario, d.ds_email, d.ds_telefone, d.ds_push_token,
+                           d.ds_metadados, u.nm_completo
+                    FROM tb_broadcast_destinatarios d
+                    LEFT JOIN tb_users u ON u.id_user = d.id_user
+                    WHERE d.id_campanha = :id_campanha
+                      AND d.st_envio = :pendente
+                      {filtro_checkpoint}
+                    ORDER BY d.id_destinatario
+                    LIMIT :limite
+                    """
+                ),
+                {
+                    "id_campanha": id_campanha,
+                    "pendente": StatusDestinatario.PENDENTE.value,
+                    "checkpoint": checkpoint,
+                    "limite": self._batch_size,
+                },
+            )
+            return [dict(row) for row in result.mappings().all()]
+
+    async def _despachar_lote(
+        self,
+        canal: str,
+        lote: List[Dict[str, Any]],
+        mensagens: List[str],
+        assuntos: List[str],
+    ) -> List[Tuple[UUID, str, Optional[str]]]:
+        """Envia o lote com no máximo ``concorrencia`` envios simultâneos."""
+        if canal == CanalEnvio.EMAIL.value:
+            return await self._despachar_emails(lote, mensagens, assuntos)
+
+        semaforo = asyncio.Semaphore(self._concorrencia)
+
+        async def enviar(dest, mensagem, assunto) -> Tuple[UUID, str, Optional[str]]:
+            async with semaforo:
+                try:
+                    await self._enviar_por_canal(canal, dest, mensagem, assunto)
+                    return dest["id_destinatario"], StatusDestinatario.ENVIADO.value, None
+                except Exception as e:
+                    return dest["id_destinatario"], StatusDestinatario.FALHA.value, str(e)[:1000]
+
+        return await asyncio.gather(
+            *(enviar(d, m, a) for d, m, a in zip(lote, mensagens, assuntos))
+        )
+
+    async def _despachar_emails(
+        self,
+        lote: List[Dict[str, Any]],
+        mensagens: List[str],
+        assuntos: List[str],
+    ) -> List[Tuple[UUID, str, Optional[str]]]:
+        """
+        Entrega os emails do lote de uma vez pelo motor de entrega.
+
+        O lote entra na fila em lotes SMTP cadenciados pelo orçamento
+        "broadcast" (EMAIL_RATE_LIMIT_BROADCAST) e só a conclusão do lote
+        inteiro é aguardada, sem disputar o limite dos emails transacionais.
+        """
+        resultados: Dict[UUID, Tuple[UUID, str, Optional[str]]] = {}
+        emails = []
+        destinos = []
+        for dest, mensagem, assunto in zip(lote, mensagens, assuntos):
+            if not dest["ds_email"]:
+                resultados[dest["id_destinatario"]] = (
+                    dest["id_destinatario"],
+                    StatusDestinatario.FALHA.value,
+                    "Destinatário sem email",
+                )
+                continue
+            emails.append(
+                {
+                    "to": dest["ds_email"],
+                    "subject": assunto or "Mensagem da DoctorQ",
+                    "html_body": escape(mensagem).replace("\n", "<br>"),
+                    "text_body": mensagem,
+                }
+            )
+            destinos.append(dest["id_destinatario"])
+
+        try:
+            entregues = await email_service.send_batch_async(emails, orcamento="broadcast")
+            erro = "Falha ao enviar email"
+        except Exception as e:
+            entregues = [False] * len(emails)
+            erro = str(e)[:1000]
+
+        for id_dest, ok in zip(destinos, entregues):
+            resultados[id_dest] = (
+                (id_dest, StatusDestinatario.ENVIADO.value, None)
+                if ok
+                else (id_dest, StatusDestinatario.FALHA.value, erro)
+            )
+        return [resultados[dest["id_destinatario"]] for dest in lote]
+
+    async def _enviar_por_canal(
+        self, canal: str, dest: Dict[str, Any], mensagem: str, assunto: str
+    ):
+        """Envia uma mensagem (canais sem envio em lote); lança exceção em caso de falha."""
+        if canal in (CanalEnvio.WHATSAPP.value, CanalEnvio.SMS.value):
+            if not dest["ds_telefone"]:
+                raise ValueError("Destinatário sem telefone")
+            # TODO: Integrar provedor de WhatsApp/SMS (Twilio) - mantém comportamento mock
+
+        elif canal == CanalEnvio.PUSH.value:
+            # TODO: Enviar via Firebase Cloud Messaging - mantém comportamento mock
+            pass
+
+        elif canal == CanalEnvio.MENSAGEM_INTERNA.value:
+            # TODO: Criar registro em tb_mensagens_usuarios - mantém comportamento mock
+            pass
+
+        else:
+            raise ValueError(f"Canal {canal} não suportado")
+
+    async def _gravar_resultados(
+        self,
+        id_campanha: UUID,
+        resultados: List[Tuple[UUID, str, Optional[str]]],
+        checkpoint: UUID,
+    ) -> bool:
+        """
+        Grava status do lote, contadores e checkpoint em uma transação.
+
+        Returns:
+            False se o lease foi assumido por outra instância (nada é gravado)
+        """
+        valores = []
+        params: Dict[str, Any] = {}
+        for i, (id_dest, status, erro) in enumerate(resultados):
+            valores.append(f"(CAST(:id{i} AS uuid), CAST(:st{i} AS varchar), CAST(:erro{i} AS text))")
+            params[f"id{i}"] = id_dest
+            params[f"st{i}"] = status
+            params[f"erro{i}"] = erro
+
+        enviados = sum(1 for _, st, _ in resultados if st == StatusDestinatario.ENVIADO.value)
+        falhas = len(resultados) - enviados
+
+        async with get_async_session_context() as db:
+            # Renova o lease e trava a linha da campanha; se outro worker assumiu, aborta
+            lease = await db.execute(
+                text(
+                    """
+                    UPDATE tb_broadcast_campanhas
+                    SET nr_enviados = COALESCE(nr_enviados, 0) + :enviados,
+                        nr_falhas = COALESCE(nr_falhas, 0) + :falhas,
+                        id_checkpoint_destinatario = :checkpoint,
+                        dt_heartbeat_envio = now(),
+                        dt_atualizacao = now()
+                    WHERE id_campanha = :id_campanha
+                      AND ds_worker_envio = :worker
+                    """
+                ),
+                {
+                    "enviados": enviados,
+                    "falhas": falhas,
+                    "checkpoint": checkpoint,
+                    "id_campanha": id_campanha,
+                    "worker": self._worker_id,
+                },
+            )
+            if lease.rowcount == 0:
+                await db.rollback()
+                return False
+
+            await db.execute(
+                text(
+                    f"""
+                    UPDATE tb_broadcast_destinatarios AS d
+                    SET st_envio = v.st_envio,
+                        ds_mensagem_erro = v.ds_mensagem_erro,
+                        dt_enviado = CASE WHEN v.st_envio = :enviado THEN now() ELSE d.dt_enviado END,
+                        dt_atualizacao = now()
+                    FROM (VALUES {", ".join(valores)}) AS v(id_destinatario, st_envio, ds_mensagem_erro)
+                    WHERE d.id_destinatario = v.id_destinatario
+                    """
+                ),
+                {**params, "enviado": StatusDestinatario.ENVIADO.value},
+            )
+            await db.commit()
+            return True
+
+    async def _finalizar_campanha(self, id_campanha: UUID):
+        """Marca a campanha como enviada e libera o lease."""
+        async with get_async_session_context() as db:
+            await db.execute(
+                text(
+                    """
+                    UPDATE tb_broadcast_campanhas
+                    SET st_campanha = :enviada,
+                        dt_fim_envio = now(),
+                        ds_worker_envio = NULL,
+                        dt_heartbeat_envio = NULL,
+                        dt_atualizacao = now()
+                    WHERE id_campanha = :id_campanha
+                      AND ds_worker_envio = :worker
+                    """
+                ),
+                {
+                    "enviada": StatusCampanha.ENVIADA.value,
+                    "id_campanha": id_campanha,
+                    "worker": self._worker_id,
+                },
+            )
+            await db.commit()
+
+
+# Singleton do worker
+_broadcast_worker: Optional[BroadcastWorker] = None
+
+
+def get_broadcast_worker() -> BroadcastWorker:
+    """Retorna instância singleton do worker."""
+    global _broadcast_worker
+    if _broadcast_worker is None:
+        _broadcast_worker = BroadcastWorker()
+    return _broadcast_worker
+
+
+def notificar_broadcast_worker():
+    """Sinaliza que há campanha para enviar (no-op se o worker não estiver rodando)."""
+    if _broadcast_worker is not None:
+        _broadcast_worker.notificar()
+
+
+async def iniciar_broadcast_worker():
+    """Inicia o worker de broadcast."""
+    worker = get_broadcast_worker()
+    await worker.start()
+
+
+async def parar_broadcast_worker():
+    """Para o worker de broadcast."""
+    worker = get_broadcast_worker()
+    await worker.stop()
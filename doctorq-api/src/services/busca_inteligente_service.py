@@ -1,19 +1,109 @@
 """
 Service para Busca Inteligente de Profissionais com IA Gisele
+
+Pipeline em dois estágios:
+1. Recuperação: questionário do lead vetorizado e comparado aos embeddings de
+   perfil pré-calculados (tb_profissionais_embeddings), com filtros de
+   localização, em uma única consulta que já traz clínica e lead da clínica
+2. Ranqueamento: só os melhores candidatos vão para a IA; o resultado fica em
+   cache por hash do questionário
 """
 
+import hashlib
 import json
 import logging
+import os
 from typing import Dict, List, Optional
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
 # from src.agents.doctorq_agent import DoctorQAgent  # Comentado por enquanto
+from src.config.cache_config import get_cache_client
 from src.config.orm_config import ORMConfig
+from src.services.busca_marketplace_service import clausula_contem
+from src.utils.cache_helper import CacheHelper
 
 logger = logging.getLogger(__name__)
 
+# Candidatos recuperados por similaridade antes do ranqueamento
+NR_CANDIDATOS = int(os.getenv("BUSCA_INTELIGENTE_CANDIDATOS", "30"))
+# Quantos candidatos (no máximo) são enviados à IA para justificativa
+NR_TOP_IA = int(os.getenv("BUSCA_INTELIGENTE_TOP_IA", "10"))
+# Peso da similaridade vetorial no score de pré-ranqueamento
+PESO_SIMILARIDADE = 0.6
+
+PREFIXO_CACHE = "busca_inteligente"
+CACHE_TTL_SEGUNDOS = int(os.getenv("BUSCA_INTELIGENTE_CACHE_TTL", "1800"))
+
+_servico_embedding = None
+
+
+def _get_servico_embedding():
+    """Serviço de embeddings compartilhado (reaproveita o cliente Azure OpenAI)"""
+    global _servico_embedding
+    if _servico_embedding is None:
+        from src.services.azure_openai_embedding_service import AzureOpenAIEmbeddingService
+        from src.services.credencial_service import CredencialService
+
+        _servico_embedding = AzureOpenAIEmbeddingService(CredencialService())
+    return _servico_embedding
+
+
+def _vetor_literal(embedding: List[float]) -> str:
+    """Formato textual do pgvector ('[0.1,0.2,...]') para CAST(:vetor AS vector)"""
+    return "[" + ",".join(f"{valor:.7g}" for valor in embedding) + "]"
+
+
+def texto_questionario(respostas_lead: Dict) -> str:
+    """Texto do questionário do paciente usado para gerar o embedding"""
+    linhas = []
+    for chave, valor in respostas_lead.items():
+        if valor in (None, "", [], {}):
+            continue
+        if isinstance(valor, (list, tuple)):
+            valor = ", ".join(str(item) for item in valor)
+        elif isinstance(valor, dict):
+            valor = json.dumps(valor, ensure_ascii=False, sort_keys=True)
+        linhas.append(f"{chave}: {valor}")
+    return "\n".join(linhas)
+
+
+def texto_perfil(perfil: Dict) -> str:
+    """Texto do perfil do profissional que é vetorizado (especialidades, bio, procedimentos)"""
+    partes = [
+        ("Especialidades", ", ".join(perfil.get("ds_especialidades") or [])),
+        ("Procedimentos", ", ".join(perfil.get("ds_procedimentos") or [])),
+        ("Formação", perfil.get("ds_formacao")),
+        ("Biografia", perfil.get("ds_biografia")),
+        ("Serviços da clínica", perfil.get("ds_servicos")),
+        ("Diferenciais da clínica", perfil.get("ds_diferenciais")),
+    ]
+    return "\n".join(f"{rotulo}: {valor.strip()}" for rotulo, valor in partes if valor and valor.strip())
+
+
+def chave_cache_questionario(
+    respostas_lead: Dict, nm_cidade: Optional[str], nm_estado: Optional[str], limit: int
+) -> str:
+    """Chave de cache = hash do questionário normalizado + filtros"""
+    conteudo = json.dumps(
+        {
+            "respostas": respostas_lead,
+            "cidade": (nm_cidade or "").strip().lower(),
+            "estado": (nm_estado or "").strip().lower(),
+            "limit": limit,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return f"{PREFIXO_CACHE}:{hashlib.sha256(conteudo.encode()).hexdigest()}"
+
+
+async def _get_cache() -> Optional[CacheHelper]:
+    redis_client = await get_cache_client()
+    return CacheHelper(redis_client) if redis_client else None
+
 
 class BuscaInteligenteService:
     """Service para matching inteligente de profissionais usando IA Gisele"""
@@ -42,8 +132,18 @@ class BuscaInteligenteService:
             Dict com profissionais ranqueados, scores e justificativas
         """
         try:
-            # 1. Buscar profissionais ativos do banco
-            profissionais = await self._buscar_profissionais_ativos(nm_cidade, nm_estado)
+            chave_cache = chave_cache_questionario(respostas_lead, nm_cidade, nm_estado, limit)
+            cache = await _get_cache()
+            if cache:
+                resultado_cache = await cache.get(chave_cache)
+                if resultado_cache:
+                    return resultado_cache
+
+            # 1. Vetorizar o questionário (sem embedding, recupera por avaliação)
+            vetor = await self._gerar_embedding_questionario(respostas_lead)
+
+            # 2. Candidatos por similaridade + localização, já com clínica e lead
+            profissionais = await self._buscar_profissionais_ativos(nm_cidade, nm_estado, vetor)
 
             if not profissionais:
                 return {
@@ -52,12 +152,12 @@ class BuscaInteligenteService:
                     "total_encontrados": 0,
                 }
 
-            # 2. Para cada profissional, buscar dados da clínica/lead
-            profissionais_com_contexto = await self._enriquecer_profissionais_com_lead(profissionais)
+            # 3. Pré-ranquear e mandar só os melhores para a IA
+            profissionais.sort(key=self._calcular_score_simples, reverse=True)
+            finalistas = profissionais[:max(limit, NR_TOP_IA)]
 
-            # 3. Usar IA Gisele para fazer matching
             profissionais_ranqueados = await self._fazer_matching_com_ia(
-                respostas_lead, profissionais_com_contexto
+                respostas_lead, finalistas
             )
 
             # 4. Limitar resultados
@@ -66,72 +166,146 @@ class BuscaInteligenteService:
             # 5. Gerar resumo da análise
             resumo = await self._gerar_resumo_analise(respostas_lead, profissionais_ranqueados)
 
-            return {
+            resultado = {
                 "profissionais": profissionais_ranqueados,
                 "ds_resumo_analise": resumo,
                 "total_encontrados": len(profissionais_ranqueados),
             }
+            if cache:
+                await cache.set(chave_cache, resultado, ttl=CACHE_TTL_SEGUNDOS)
+            return resultado
 
         except Exception as e:
             logger.error(f"Erro na busca inteligente: {e}", exc_info=True)
             raise
 
+    async def _gerar_embedding_questionario(self, respostas_lead: Dict) -> Optional[str]:
+        """Embedding do questionário no formato do pgvector; None se indisponível"""
+        texto = texto_questionario(respostas_lead)
+        if not texto:
+            return None
+        try:
+            embedding = await _get_servico_embedding().create_embedding(texto)
+            return _vetor_literal(embedding)
+        except Exception as e:
+            logger.warning(f"Embedding do questionário indisponível, usando ranqueamento simples: {e}")
+            return None
+
     async def _buscar_profissionais_ativos(
-        self, nm_cidade: Optional[str], nm_estado: Optional[str]
+        self,
+        nm_cidade: Optional[str],
+        nm_estado: Optional[str],
+        vetor: Optional[str] = None,
     ) -> List[Dict]:
-        """Busca profissionais ativos do banco, com filtros opcionais de localização"""
-        query = """
-        SELECT
-            p.id_profissional,
-            p.id_user,
-            p.id_empresa,
-            p.id_clinica,
-            p.nm_profissional,
-            p.ds_especialidades,
-            p.ds_biografia,
-            p.ds_foto,
-            p.ds_formacao,
-            p.nr_registro_profissional,
-            p.nr_anos_experiencia,
-            p.nr_avaliacao_media,
-            p.nr_total_avaliacoes,
-            p.st_ativo,
-            p.st_aceita_online,
-            p.dt_criacao,
-            p.ds_email,
-            p.nr_telefone as prof_telefone,
-            p.nr_whatsapp as prof_whatsapp,
-            c.id_empresa,
-            e.nm_razao_social as nm_empresa,
-            u.nm_completo as nm_user,
-            c.nm_clinica,
-            c.ds_endereco,
-            c.nm_cidade as clinica_cidade,
-            c.nm_estado as clinica_estado
-        FROM tb_profissionais p
-        LEFT JOIN tb_clinicas c ON p.id_clinica = c.id_clinica
-        LEFT JOIN tb_empresas e ON c.id_empresa = e.id_empresa
-        LEFT JOIN tb_users u ON p.id_user = u.id_user
-        WHERE p.st_ativo = true
         """
+        Candidatos ativos com filtros opcionais de localização.
 
-        params = {}
+        Com vetor, ordena pela distância de cosseno ao perfil; sem filtros de
+        localização a ordenação usa o índice HNSW (só perfis já indexados).
+        Clínica, empresa e lead mais recente da clínica vêm na mesma consulta.
+        """
+        params = {"limite": NR_CANDIDATOS}
+        filtros = ["p.st_ativo = true"]
 
-        # Filtro por cidade
         if nm_cidade:
-            query += " AND (c.nm_cidade ILIKE :cidade OR :cidade IS NULL)"
-            params["cidade"] = f"%{nm_cidade}%"
+            filtros.append(clausula_contem("f_unaccent(lower(c.nm_cidade))", nm_cidade, "cidade", params))
 
-        # Filtro por estado
         if nm_estado:
-            query += " AND (c.nm_estado ILIKE :estado OR :estado IS NULL)"
-            params["estado"] = f"%{nm_estado}%"
-
-        query += " ORDER BY p.nr_avaliacao_media DESC NULLS LAST, p.dt_criacao DESC"
-        query += " LIMIT 50"  # Limitar para não sobrecarregar a IA
+            filtros.append(clausula_contem("f_unaccent(lower(c.nm_estado))", nm_estado, "estado", params))
 
-        result = await self.db.execute(text(query), params)
-        rows = result.fetchall()
+        if vetor:
+            params["vetor"] = vetor
+            distancia = "(pe.embedding <=> CAST(:vetor AS vector))"
+            similaridade = f"(1 - {distancia})"
+        else:
+            similaridade = "NULL::float8"
+
+        def montar_query(join_embedding: str, ordem: str) -> str:
+            return f"""
+            SELECT
+                p.id_profissional,
+                p.id_user,
+                COALESCE(c.id_empresa, p.id_empresa) as id_empresa,
+                p.id_clinica,
+                p.nm_profissional,
+                p.ds_especialidades,
+                p.ds_biografia,
+                p.ds_foto,
+                p.ds_formacao,
+                p.nr_registro_profissional,
+                p.nr_anos_experiencia,
+                p.nr_avaliacao_media,
+                p.nr_total_avaliacoes,
+                p.st_ativo,
+                p.st_aceita_online,
+                p.dt_criacao,
+                p.ds_email,
+                p.nr_telefone as prof_telefone,
+                p.nr_whatsapp as prof_whatsapp,
+                e.nm_razao_social as nm_empresa,
+                u.nm_completo as nm_user,
+                c.nm_clinica,
+                c.ds_endereco,
+                c.nm_cidade as clinica_cidade,
+                c.nm_estado as clinica_estado,
+                lead.id_partner_lead,
+                lead.ds_servicos,
+                lead.ds_diferenciais,
+                lead.nr_tamanho_equipe,
+                lead.ds_observacoes,
+                lead.nm_cidade as lead_cidade,
+                lead.nm_estado as lead_estado,
+                {similaridade} as nr_similaridade
+            FROM tb_profissionais p
+            {join_embedding}
+            LEFT JOIN tb_clinicas c ON p.id_clinica = c.id_clinica
+            LEFT JOIN tb_empresas e ON c.id_empresa = e.id_empresa
+            LEFT JOIN tb_users u ON p.id_user = u.id_user
+            LEFT JOIN LATERAL (
+                SELECT
+                    l.id_partner_lead,
+                    l.ds_servicos,
+                    l.ds_diferenciais,
+                    l.nr_tamanho_equipe,
+                    l.ds_observacoes,
+                    l.nm_cidade,
+                    l.nm_estado
+                FROM tb_partner_leads l
+                WHERE l.id_empresa = COALESCE(c.id_empresa, p.id_empresa)
+                  AND l.tp_partner = 'clinica'
+                ORDER BY l.dt_criacao DESC
+                LIMIT 1
+            ) lead ON TRUE
+            WHERE {" AND ".join(filtros)}
+            ORDER BY {ordem}
+            LIMIT :limite
+            """
+
+        ordem_padrao = "p.nr_avaliacao_media DESC NULLS LAST, p.dt_criacao DESC"
+        rows = []
+
+        if vetor and not (nm_cidade or nm_estado):
+            # Vizinhos mais próximos pelo índice HNSW
+            result = await self.db.execute(
+                text(montar_query(
+                    "JOIN tb_profissionais_embeddings pe ON pe.id_profissional = p.id_profissional",
+                    distancia,
+                )),
+                params,
+            )
+            rows = result.fetchall()
+
+        if not rows:
+            # Filtros de localização (conjunto pequeno: distância exata) ou sem
+            # perfis indexados: perfis sem embedding entram depois dos demais
+            if vetor:
+                join_embedding = "LEFT JOIN tb_profissionais_embeddings pe ON pe.id_profissional = p.id_profissional"
+                ordem = f"{distancia} ASC NULLS LAST, {ordem_padrao}"
+            else:
+                join_embedding = ""
+                ordem = ordem_padrao
+            result = await self.db.execute(text(montar_query(join_embedding, ordem)), params)
+            rows = result.fetchall()
 
         profissionais = []
         for row in rows:
@@ -161,55 +335,121 @@ class BuscaInteligenteService:
                 "ds_endereco": row.ds_endereco,
                 "clinica_cidade": row.clinica_cidade,
                 "clinica_estado": row.clinica_estado,
+                "nr_similaridade": float(row.nr_similaridade) if row.nr_similaridade is not None else None,
+                "lead_clinica": {
+                    "ds_servicos": row.ds_servicos,
+                    "ds_diferenciais": row.ds_diferenciais,
+                    "nr_tamanho_equipe": row.nr_tamanho_equipe,
+                    "ds_observacoes": row.ds_observacoes,
+                    "nm_cidade": row.lead_cidade,
+                    "nm_estado": row.lead_estado,
+                } if row.id_partner_lead else None,
             }
             profissionais.append(prof)
 
-        logger.info(f"Encontrados {len(profissionais)} profissionais ativos")
+        logger.info(f"Encontrados {len(profissionais)} profissionais candidatos")
         return profissionais
 
-    async def _enriquecer_profissionais_com_lead(self, profissionais: List[Dict]) -> List[Dict]:
-        """Enriquece dados dos profissionais com informações do lead da clínica"""
-        for prof in profissionais:
-            if prof["id_empresa"]:
-                # Buscar lead da clínica
-                query = """
-                SELECT
-                    id_partner_lead,
-                    tp_partner,
-                    nm_contato,
-                    nm_email,
-                    nr_telefone,
-                    nm_empresa,
-                    nr_cnpj,
-                    nm_cidade,
-                    nm_estado,
-                    ds_servicos,
-                    ds_diferenciais,
-                    nr_tamanho_equipe,
-                    ds_observacoes
-                FROM tb_partner_leads
-                WHERE id_empresa = :id_empresa
-                  AND tp_partner = 'clinica'
-                ORDER BY dt_criacao DESC
+    async def indexar_perfis(self, ids_profissionais: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Gera/atualiza embeddings de perfil dos profissionais ativos.
+
+        Só perfis cujo texto mudou (hash diferente) são enviados ao modelo,
+        em lotes; rodar periodicamente ou após editar perfis.
+
+        Args:
+            ids_profissionais: Restringe a estes profissionais (None = todos)
+
+        Returns:
+            Dict com total de perfis avaliados e atualizados
+        """
+        filtro_ids = ""
+        params = {}
+        if ids_profissionais:
+            filtro_ids = "AND p.id_profissional IN :ids"
+            params["ids"] = [UUID(str(id_prof)) for id_prof in ids_profissionais]
+
+        query = text(f"""
+            SELECT
+                p.id_profissional,
+                p.ds_especialidades,
+                p.ds_biografia,
+                p.ds_formacao,
+                p.ds_procedimentos_realizados,
+                proc.nomes as procedimentos_clinica,
+                lead.ds_servicos,
+                lead.ds_diferenciais,
+                pe.ds_hash_perfil
+            FROM tb_profissionais p
+            LEFT JOIN tb_clinicas c ON p.id_clinica = c.id_clinica
+            LEFT JOIN tb_profissionais_embeddings pe ON pe.id_profissional = p.id_profissional
+            LEFT JOIN LATERAL (
+                SELECT array_agg(pr.nm_procedimento ORDER BY pr.nm_procedimento) as nomes
+                FROM tb_procedimentos pr
+                WHERE pr.id_clinica = p.id_clinica AND pr.st_ativo = true
+            ) proc ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT l.ds_servicos, l.ds_diferenciais
+                FROM tb_partner_leads l
+                WHERE l.id_empresa = COALESCE(c.id_empresa, p.id_empresa)
+                  AND l.tp_partner = 'clinica'
+                ORDER BY l.dt_criacao DESC
                 LIMIT 1
-                """
-
-                result = await self.db.execute(text(query), {"id_empresa": prof["id_empresa"]})
-                lead_row = result.fetchone()
-
-                if lead_row:
-                    prof["lead_clinica"] = {
-                        "ds_servicos": lead_row.ds_servicos,
-                        "ds_diferenciais": lead_row.ds_diferenciais,
-                        "nr_tamanho_equipe": lead_row.nr_tamanho_equipe,
-                        "ds_observacoes": lead_row.ds_observacoes,
-                        "nm_cidade": lead_row.nm_cidade,
-                        "nm_estado": lead_row.nm_estado,
+            ) lead ON TRUE
+            WHERE p.st_ativo = true {filtro_ids}
+        """)
+        if ids_profissionais:
+            query = query.bindparams(bindparam("ids", expanding=True))
+
+        result = await self.db.execute(query, params)
+        pendentes = []
+        total = 0
+        for row in result.fetchall():
+            total += 1
+            procedimentos = list(row.ds_procedimentos_realizados or []) + list(row.procedimentos_clinica or [])
+            texto = texto_perfil({
+                "ds_especialidades": row.ds_especialidades,
+                "ds_procedimentos": list(dict.fromkeys(procedimentos)),
+                "ds_formacao": row.ds_formacao,
+                "ds_biografia": row.ds_biografia,
+                "ds_servicos": row.ds_servicos,
+                "ds_diferenciais": row.ds_diferenciais,
+            })
+            if not texto:
+                continue
+            hash_perfil = hashlib.sha256(texto.encode()).hexdigest()
+            if hash_perfil != row.ds_hash_perfil:
+                pendentes.append((row.id_profissional, texto, hash_perfil))
+
+        if pendentes:
+            embeddings = await _get_servico_embedding().create_embeddings_batch(
+                [texto for _, texto, _ in pendentes]
+            )
+            await self.db.execute(
+                text("""
+                    INSERT INTO tb_profissionais_embeddings
+                        (id_profissional, ds_texto_perfil, ds_hash_perfil, embedding, dt_atualizacao)
+                    VALUES (:id_profissional, :texto, :hash, CAST(:embedding AS vector), now())
+                    ON CONFLICT (id_profissional) DO UPDATE SET
+                        ds_texto_perfil = EXCLUDED.ds_texto_perfil,
+                        ds_hash_perfil = EXCLUDED.ds_hash_perfil,
+                        embedding = EXCLUDED.embedding,
+                        dt_atualizacao = EXCLUDED.dt_atualizacao
+                """),
+                [
+                    {
+                        "id_profissional": id_prof,
+                        "texto": texto,
+                        "hash": hash_perfil,
+                        "embedding": _vetor_literal(embedding),
                     }
-                else:
-                    prof["lead_clinica"] = None
+                    for (id_prof, texto, hash_perfil), embedding in zip(pendentes, embeddings)
+                ],
+            )
+            await self.db.commit()
 
-        return profissionais
+        logger.info(f"Embeddings de perfil: {len(pendentes)} atualizados de {total} avaliados")
+        return {"total_avaliados": total, "total_atualizados": len(pendentes)}
 
     async def _fazer_matching_com_ia(
         self, respostas_lead_paciente: Dict, profissionais: List[Dict]
@@ -252,7 +492,7 @@ class BuscaInteligenteService:
         for i, prof in enumerate(profissionais, 1):
             especialidades = ", ".join(prof["ds_especialidades"]) if prof["ds_especialidades"] else "Não informado"
             cidade = prof.get("clinica_cidade", "Não informado")
-            bio = (prof.get("ds_bio") or "")[:200]  # Limitar tamanho
+            bio = (prof.get("ds_biografia") or "")[:200]  # Limitar tamanho
             lead = prof.get("lead_clinica", {}) or {}
             servicos = lead.get("ds_servicos", "Não informado")
 
@@ -264,7 +504,7 @@ Profissional #{i}:
 - Bio: {bio}
 - Cidade: {cidade}
 - Serviços da clínica: {servicos}
-- Avaliação: {prof.get('vl_avaliacao_media', 'Sem avaliações')}
+- Avaliação: {prof.get('nr_avaliacao_media') or 'Sem avaliações'}
 ---
 """
 
@@ -414,7 +654,14 @@ Retorne APENAS o JSON, sem texto adicional.
         if prof.get("ds_formacao") and len(prof.get("ds_formacao", "")) > 0:
             score += 0.1
 
-        return min(score, 1.0)  # Cap em 1.0
+        score = min(score, 1.0)  # Cap em 1.0
+
+        # Aderência ao questionário (similaridade de cosseno com o perfil)
+        similaridade = prof.get("nr_similaridade")
+        if similaridade is not None:
+            score = PESO_SIMILARIDADE * max(similaridade, 0.0) + (1 - PESO_SIMILARIDADE) * score
+
+        return score
 
     def _gerar_justificativa_simples(self, prof: Dict, score: float) -> str:
         """Gera justificativa baseada no score"""
@@ -0,0 +1,200 @@
+"""
+Busca do marketplace (clínicas e profissionais)
+
+Fragmentos SQL compartilhados pelas listagens públicas:
+- Texto: full-text (tsvector ts_busca, português sem acento) + trigramas no nome
+- Geo: raio e vizinhos mais próximos sobre ll_to_earth(lat, lon) (cube/earthdistance)
+- Paginação keyset: cursor opaco com a última chave de ordenação + id
+
+Os índices correspondentes são criados na migration 122; as expressões aqui
+precisam ser idênticas às dos índices para que o planner os utilize.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from uuid import UUID
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Configuração de texto do full-text (mesma das colunas geradas ts_busca)
+TS_CONFIG = "portuguese"
+
+ORDENACOES = ("recentes", "relevancia", "distancia")
+
+
+@dataclass(frozen=True)
+class Ordenacao:
+    """Chave de ordenação keyset: expressão SQL + id como desempate"""
+
+    expressao: str
+    coluna_id: str
+    tipo_sql: str
+    descendente: bool
+
+
+def _escapar_like(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def clausula_contem(expressao_normalizada: str, valor: str, nome_param: str, params: Dict[str, Any]) -> str:
+    """
+    Substring sem acento/caixa sobre uma expressão já normalizada
+    (f_unaccent(lower(...))), atendida por índice GIN de trigramas.
+    """
+    params[nome_param] = f"%{_escapar_like(valor.strip())}%"
+    return f"{expressao_normalizada} LIKE f_unaccent(lower(:{nome_param}))"
+
+
+def clausula_texto(
+    alias: str, coluna_nome: str, busca: str, params: Dict[str, Any]
+) -> Tuple[str, str]:
+    """
+    Busca textual: full-text em ts_busca OU nome parecido/contendo o termo.
+
+    Returns:
+        (condição WHERE, expressão de relevância)
+    """
+    nome = f"f_unaccent(lower({alias}.{coluna_nome}))"
+    params["busca"] = busca.strip()
+    params["busca_like"] = f"%{_escapar_like(busca.strip())}%"
+    consulta_ts = f"websearch_to_tsquery('{TS_CONFIG}', f_unaccent(:busca))"
+
+    where = (
+        f"({alias}.ts_busca @@ {consulta_ts}"
+        f" OR {nome} % f_unaccent(lower(:busca))"
+        f" OR {nome} LIKE f_unaccent(lower(:busca_like)))"
+    )
+    relevancia = (
+        f"(ts_rank_cd({alias}.ts_busca, {consulta_ts})"
+        f" + similarity({nome}, f_unaccent(lower(:busca))))"
+    )
+    return where, relevancia
+
+
+def expressao_ponto(alias: str) -> str:
+    """Ponto da clínica na superfície terrestre (igual ao índice GiST)."""
+    return f"ll_to_earth({alias}.ds_latitude::float8, {alias}.ds_longitude::float8)"
+
+
+def clausula_geo(
+    alias: str, latitude: float, longitude: float, raio_km: float, params: Dict[str, Any]
+) -> Tuple[str, str, str]:
+    """
+    Filtro por raio em torno de (latitude, longitude).
+
+    Returns:
+        (condição WHERE, distância em km, expressão KNN para ORDER BY)
+    """
+    params["geo_lat"] = latitude
+    params["geo_lon"] = longitude
+    params["geo_raio_m"] = raio_km * 1000.0
+    ponto = expressao_ponto(alias)
+    origem = "ll_to_earth(:geo_lat, :geo_lon)"
+
+    where = (
+        f"({alias}.ds_latitude IS NOT NULL AND {alias}.ds_longitude IS NOT NULL"
+        f" AND earth_box({origem}, :geo_raio_m) @> {ponto}"
+        f" AND earth_distance({origem}, {ponto}) <= :geo_raio_m)"
+    )
+    distancia_km = f"(earth_distance({origem}, {ponto}) / 1000.0)"
+    # <-> (distância do cubo) é monotônica com a distância real e usa o índice GiST
+    knn = f"({ponto} <-> {origem})"
+    return where, distancia_km, knn
+
+
+def codificar_cursor(chave: Any, id_registro: Any) -> str:
+    """Cursor opaco (base64 url-safe) com a última chave e id da página."""
+    bruto = json.dumps([chave, str(id_registro)], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[Any, str]:
+    """Inverso de codificar_cursor; ValueError se o cursor for inválido."""
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        chave, id_registro = json.loads(base64.urlsafe_b64decode(preenchido.encode()))
+        return chave, id_registro
+    except Exception as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def _valor_cursor(chave: Any, tipo_sql: str) -> Any:
+    """
+    Chave do cursor (JSON) no tipo Python do parâmetro: o asyncpg não aceita
+    str para timestamp nem converte str para float8.
+    """
+    if chave is None:
+        return None
+    try:
+        if tipo_sql.startswith("timestamp"):
+            return datetime.fromisoformat(chave)
+        if tipo_sql in ("float8", "numeric", "double precision"):
+            return float(chave)
+        if tipo_sql in ("int", "integer", "bigint"):
+            return int(chave)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Cursor inválido") from e
+    return chave
+
+
+def aplicar_keyset(
+    ordenacao: Ordenacao,
+    cursor: Optional[str],
+    where: List[str],
+    params: Dict[str, Any],
+) -> str:
+    """
+    Acrescenta a condição "depois do cursor" em ``where`` e retorna o ORDER BY.
+
+    Comparação por linha (chave, id) na mesma direção da ordenação, então a
+    página N custa o mesmo que a primeira.
+    """
+    direcao = "DESC" if ordenacao.descendente else "ASC"
+    if cursor:
+        chave, id_registro = decodificar_cursor(cursor)
+        try:
+            id_registro = UUID(id_registro)
+        except (TypeError, ValueError, AttributeError) as e:
+            raise ValueError("Cursor inválido") from e
+        operador = "<" if ordenacao.descendente else ">"
+        params["cursor_chave"] = _valor_cursor(chave, ordenacao.tipo_sql)
+        params["cursor_id"] = id_registro
+        where.append(
+            f"({ordenacao.expressao}, {ordenacao.coluna_id}) {operador} "
+            f"(CAST(:cursor_chave AS {ordenacao.tipo_sql}), CAST(:cursor_id AS UUID))"
+        )
+    return f"{ordenacao.expressao} {direcao}, {ordenacao.coluna_id} {direcao}"
+
+
+def proximo_cursor(rows: Sequence[Any], limite: int, atributo_id: str) -> Optional[str]:
+    """
+    Cursor da próxima página a partir das linhas buscadas com LIMIT limite + 1.
+
+    As linhas devem trazer a chave de ordenação na coluna ``chave_ordenacao``.
+    """
+    if len(rows) <= limite:
+        return None
+    ultima = rows[limite - 1]
+    chave = ultima.chave_ordenacao
+    if hasattr(chave, "isoformat"):
+        chave = chave.isoformat()
+    elif chave is not None and not isinstance(chave, (int, float, str)):
+        chave = float(chave)
+    return codificar_cursor(chave, getattr(ultima, atributo_id))
+
+
+def resolver_ordenacao(ordenar: Optional[str], tem_busca: bool, tem_geo: bool) -> str:
+    """Ordenação explícita ou a mais natural para os filtros informados."""
+    if ordenar:
+        if ordenar not in ORDENACOES:
+            raise ValueError(f"Ordenação inválida. Use: {', '.join(ORDENACOES)}")
+        if ordenar == "distancia" and not tem_geo:
+            raise ValueError("Ordenação por distância requer nr_latitude e nr_longitude")
+        if ordenar == "relevancia" and not tem_busca:
+            raise ValueError("Ordenação por relevância requer o parâmetro busca")
+        return ordenar
+    if tem_geo:
+        return "distancia"
+    if tem_busca:
+        return "relevancia"
+    return "recentes"
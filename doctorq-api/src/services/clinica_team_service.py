@@ -21,6 +21,7 @@ from src.config.logger_config import get_logger
 from src.models.empresa import Empresa
 from src.models.perfil import Perfil
 from src.models.user import User
+from src.services.permissao_cache import invalidar_permissoes_usuario
 from src.services.email_service import email_service
 from src.utils.security import hash_password
 
@@ -196,9 +197,9 @@ class ClinicaTeamService:
 
                 admin, perfil = row
 
-                # Enviar email de notificação (não bloqueia se falhar)
+                # Enfileirar email de notificação (entrega em background; não falha a operação)
                 try:
-                    email_enviado = email_service.send_user_limit_warning_email(
+                    email_enfileirado = await email_service.send_user_limit_warning_email(
                         email=admin.nm_email,
                         empresa_name=empresa.nm_razao_social or empresa.nm_fantasia or "Empresa",
                         admin_name=admin.nm_completo or admin.nm_email,
@@ -207,14 +208,14 @@ class ClinicaTeamService:
                         percentage=percentual,
                     )
 
-                    if email_enviado:
+                    if email_enfileirado:
                         logger.info(
-                            f"Notificação de limite ({percentual:.1f}%) enviada para {admin.nm_email} "
+                            f"Notificação de limite ({percentual:.1f}%) enfileirada para {admin.nm_email} "
                             f"da empresa {empresa.nm_fantasia or empresa.nm_razao_social}"
                         )
                     else:
                         logger.warning(
-                            f"Falha ao enviar notificação de limite para {admin.nm_email}"
+                            f"Falha ao enfileirar notificação de limite para {admin.nm_email}"
                         )
 
                 except Exception as email_error:
@@ -563,6 +564,7 @@ class ClinicaTeamService:
             user.dt_atualizacao = datetime.now()
 
             await self.db.commit()
+            await invalidar_permissoes_usuario(user.id_user)
 
             logger.info(
                 f"Usuário {user.nm_email} removido da equipe por {id_usuario_solicitante}"
@@ -691,6 +693,7 @@ class ClinicaTeamService:
             user.dt_atualizacao = datetime.now()
 
             await self.db.commit()
+            await invalidar_permissoes_usuario(user.id_user)
 
             logger.info(
                 f"Perfil do usuário {user.nm_email} alterado de '{perfil_anterior}' "
@@ -0,0 +1,346 @@
+"""
+Papel do processo e coordenação dos jobs singleton entre instâncias
+
+APP_ROLE define o que o processo executa:
+- api: só atende requests (caches, WebSockets, webhooks, ingestão)
+- worker: só os jobs singleton (entry point: python -m src.worker)
+- all (padrão): os dois, como na implantação de processo único
+
+Jobs singleton são os pollers de banco (fila, campanhas, broadcast,
+exportação, estoque, partições, rollups do dashboard, compactação de uso):
+rodam em uma única instância por vez, mesmo com várias réplicas.
+
+O lease de cada job é um advisory lock de sessão do Postgres, mantido em uma
+conexão dedicada do coordenador:
+- a cada LEASE_INTERVALO segundos o coordenador confere em pg_locks
+  (pid = pg_backend_pid()) que a sessão ainda tem o lock de cada job local,
+  para os jobs cujo lock sumiu, grava o heartbeat dos demais e tenta
+  adquirir os livres
+- processo ou conexão caem: o servidor libera os locks e outra instância
+  assume os jobs no ciclo seguinte (failover)
+- erro na conexão dedicada: os jobs locais são parados antes de reconectar
+
+O lease não garante um dono só a todo instante: entre o servidor liberar o
+lock e o heartbeat seguinte perceber a perda, o dono antigo e o novo podem
+ter o mesmo job iniciado (até LEASE_INTERVALO segundos). Jobs em que uma
+execução dupla causa dano rodam cada ciclo sob execucao_exclusiva
+(pg_try_advisory_xact_lock); os demais já toleram a sobreposição (lock
+próprio por execução, claims com SKIP LOCKED ou por RENAME).
+tb_worker_leases registra dono e heartbeat de cada job (GET /workers/status).
+"""
+import asyncio
+import os
+import socket
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.config.logger_config import get_logger
+from src.config.orm_config import ORMConfig
+
+logger = get_logger(__name__)
+
+PAPEL_API = "api"
+PAPEL_WORKER = "worker"
+PAPEL_TODOS = "all"
+PAPEIS = (PAPEL_API, PAPEL_WORKER, PAPEL_TODOS)
+
+LEASE_INTERVALO = float(os.getenv("WORKER_LEASE_INTERVALO", "10"))
+# Heartbeat parado há mais de N intervalos: lease expirado no status
+LEASE_INTERVALOS_EXPIRACAO = 3
+# Namespace dos advisory locks de lease (segunda chave = hashtext do job)
+CHAVE_LEASE = 743100
+# Namespace do lock por execução dos jobs críticos (execucao_exclusiva)
+CHAVE_EXECUCAO = 743101
+
+SQL_ADQUIRIR_LEASE = text("SELECT pg_try_advisory_lock(:chave, hashtext(:nm_job))")
+SQL_LIBERAR_LEASE = text("SELECT pg_advisory_unlock(:chave, hashtext(:nm_job))")
+SQL_TRAVAR_EXECUCAO = text("SELECT pg_try_advisory_xact_lock(:chave, hashtext(:nm_job))")
+
+# Jobs locais cujo lock de lease a sessão ainda tem. Lock de duas chaves int4:
+# classid = primeira, objid = segunda (como oid), objsubid = 2
+SQL_LEASES_MANTIDOS = text("""
+    SELECT j.nm_job
+    FROM unnest(CAST(:jobs AS text[])) AS j(nm_job)
+    JOIN pg_locks l ON l.locktype = 'advisory'
+                   AND l.pid = pg_backend_pid()
+                   AND l.granted
+                   AND l.objsubid = 2
+                   AND l.classid = CAST(:chave AS oid)
+                   AND l.objid = CAST(hashtext(j.nm_job) AS oid)
+""")
+
+SQL_REGISTRAR_LEASE = text("""
+    INSERT INTO tb_worker_leases (nm_job, nm_instancia, nm_papel, dt_adquirido, dt_heartbeat)
+    VALUES (:nm_job, :nm_instancia, :nm_papel, now(), now())
+    ON CONFLICT (nm_job) DO UPDATE SET
+        nm_instancia = EXCLUDED.nm_instancia,
+        nm_papel = EXCLUDED.nm_papel,
+        dt_adquirido = EXCLUDED.dt_adquirido,
+        dt_heartbeat = EXCLUDED.dt_heartbeat
+""")
+
+# Também valida a conexão dedicada a cada ciclo (mesmo sem jobs próprios)
+SQL_HEARTBEAT = text("""
+    UPDATE tb_worker_leases
+    SET dt_heartbeat = now()
+    WHERE nm_instancia = :nm_instancia
+      AND nm_job = ANY(CAST(:jobs AS text[]))
+""")
+
+SQL_REMOVER_LEASES = text("DELETE FROM tb_worker_leases WHERE nm_instancia = :nm_instancia")
+
+SQL_LISTAR_LEASES = text("""
+    SELECT nm_job, nm_instancia, nm_papel, dt_adquirido, dt_heartbeat, now() AS dt_agora
+    FROM tb_worker_leases
+    ORDER BY nm_job
+""")
+
+
+@dataclass(frozen=True)
+class JobSingleton:
+    """Job que deve rodar em uma única instância (iniciar/parar reentrantes)."""
+
+    nm_job: str
+    iniciar: Callable[[], Awaitable[None]]
+    parar: Callable[[], Awaitable[None]]
+
+
+def papel_processo(valor: Optional[str] = None) -> str:
+    """Papel do processo (APP_ROLE); valor inválido cai no padrão 'all'."""
+    papel = (valor if valor is not None else os.getenv("APP_ROLE", PAPEL_TODOS)).strip().lower()
+    if papel not in PAPEIS:
+        logger.warning(f"APP_ROLE inválido '{papel}', usando '{PAPEL_TODOS}'")
+        return PAPEL_TODOS
+    return papel
+
+
+def executa_jobs(papel: str) -> bool:
+    return papel in (PAPEL_WORKER, PAPEL_TODOS)
+
+
+def identificador_instancia() -> str:
+    return os.getenv("INSTANCE_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def situacao_lease(
+    dt_heartbeat: Optional[datetime],
+    agora: datetime,
+    intervalo: float = LEASE_INTERVALO,
+) -> str:
+    """'ativo' ou 'expirado' (dono sem heartbeat há mais de N intervalos)."""
+    if dt_heartbeat is None:
+        return "expirado"
+    atraso = (agora - dt_heartbeat).total_seconds()
+    return "expirado" if atraso > intervalo * LEASE_INTERVALOS_EXPIRACAO else "ativo"
+
+
+@asynccontextmanager
+async def execucao_exclusiva(nm_job: str) -> AsyncIterator[bool]:
+    """
+    Lock de um ciclo de job crítico (pg_try_advisory_xact_lock).
+
+    Cobre a janela da troca de dono do lease: duas instâncias com o job
+    iniciado, só uma executa cada ciclo. A transação do lock fica aberta em
+    uma conexão própria até o fim do bloco, então o ciclo pode fazer commit
+    nas suas sessões. Produz False se outra instância está no ciclo.
+    """
+    async with ORMConfig.async_engine.connect() as conexao:
+        async with conexao.begin():
+            adquirido = (
+                await conexao.execute(
+                    SQL_TRAVAR_EXECUCAO, {"chave": CHAVE_EXECUCAO, "nm_job": nm_job}
+                )
+            ).scalar()
+            yield bool(adquirido)
+
+
+async def listar_leases(db: AsyncSession, intervalo: float = LEASE_INTERVALO) -> List[dict]:
+    """Dono de cada job singleton, de todas as instâncias."""
+    result = await db.execute(SQL_LISTAR_LEASES)
+    return [
+        {
+            "nm_job": row["nm_job"],
+            "nm_instancia": row["nm_instancia"],
+            "nm_papel": row["nm_papel"],
+            "dt_adquirido": row["dt_adquirido"],
+            "dt_heartbeat": row["dt_heartbeat"],
+            "st_lease": situacao_lease(row["dt_heartbeat"], row["dt_agora"], intervalo),
+        }
+        for row in result.mappings().all()
+    ]
+
+
+class CoordenadorJobs:
+    """Adquire/renova os leases dos jobs singleton e inicia/para os jobs locais."""
+
+    def __init__(
+        self,
+        jobs: List[JobSingleton],
+        papel: str,
+        instancia: Optional[str] = None,
+        intervalo: float = LEASE_INTERVALO,
+    ):
+        self._jobs: Dict[str, JobSingleton] = {job.nm_job: job for job in jobs}
+        self._papel = papel
+        self._instancia = instancia or identificador_instancia()
+        self._intervalo = intervalo
+        self._ativos: Dict[str, datetime] = {}
+        self._conexao: Optional[AsyncConnection] = None
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def instancia(self) -> str:
+        return self._instancia
+
+    def status_local(self) -> dict:
+        return {
+            "nm_instancia": self._instancia,
+            "nm_papel": self._papel,
+            "st_coordenador_ativo": self._running,
+            "jobs_registrados": list(self._jobs),
+            "jobs_locais": [
+                {"nm_job": nm_job, "dt_adquirido": dt_adquirido}
+                for nm_job, dt_adquirido in self._ativos.items()
+            ],
+        }
+
+    async def start(self):
+        """Inicia o coordenador (jobs sobem à medida que os leases são adquiridos)."""
+        if self._running:
+            logger.warning("CoordenadorJobs já está em execução")
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"CoordenadorJobs iniciado ({self._instancia}, papel={self._papel})")
+
+    async def stop(self):
+        """Para os jobs locais e libera os leases."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._parar_jobs()
+        await self._fechar_conexao(remover_leases=True)
+        logger.info("CoordenadorJobs parado")
+
+    async def executar(self):
+        """Um ciclo: conferência e heartbeat dos leases próprios e aquisição dos livres."""
+        if self._conexao is None:
+            self._conexao = await ORMConfig.async_engine.connect()
+        conexao = self._conexao
+
+        if self._ativos:
+            mantidos = set(
+                (
+                    await conexao.execute(
+                        SQL_LEASES_MANTIDOS, {"chave": CHAVE_LEASE, "jobs": list(self._ativos)}
+                    )
+                ).scalars()
+            )
+            for nm_job in [nm_job for nm_job in self._ativos if nm_job not in mantidos]:
+                logger.error(f"Lease do job {nm_job} perdido por {self._instancia}, parando job")
+                await self._parar_job(nm_job)
+
+        await conexao.execute(
+            SQL_HEARTBEAT, {"nm_instancia": self._instancia, "jobs": list(self._ativos)}
+        )
+        await conexao.commit()
+
+        for nm_job, job in self._jobs.items():
+            if nm_job in self._ativos or not self._running:
+                continue
+            parametros = {"chave": CHAVE_LEASE, "nm_job": nm_job}
+            adquirido = (await conexao.execute(SQL_ADQUIRIR_LEASE, parametros)).scalar()
+            if not adquirido:
+                await conexao.commit()
+                continue
+
+            try:
+                await job.iniciar()
+            except Exception as e:
+                logger.error(f"Erro ao iniciar job {nm_job}: {e}")
+                await conexao.execute(SQL_LIBERAR_LEASE, parametros)
+                await conexao.commit()
+                continue
+
+            self._ativos[nm_job] = datetime.now()
+            await conexao.execute(
+                SQL_REGISTRAR_LEASE,
+                {"nm_job": nm_job, "nm_instancia": self._instancia, "nm_papel": self._papel},
+            )
+            await conexao.commit()
+            logger.info(f"Job {nm_job} assumido por {self._instancia}")
+
+    async def _parar_job(self, nm_job: str):
+        try:
+            await self._jobs[nm_job].parar()
+        except Exception as e:
+            logger.warning(f"Erro ao parar job {nm_job}: {e}")
+        self._ativos.pop(nm_job, None)
+
+    async def _parar_jobs(self):
+        for nm_job in reversed(list(self._ativos)):
+            await self._parar_job(nm_job)
+
+    async def _fechar_conexao(self, remover_leases: bool = False):
+        conexao, self._conexao = self._conexao, None
+        if conexao is None:
+            return
+        try:
+            if remover_leases:
+                await conexao.execute(SQL_REMOVER_LEASES, {"nm_instancia": self._instancia})
+                await conexao.commit()
+        except Exception as e:
+            logger.warning(f"Erro ao remover leases de {self._instancia}: {e}")
+        finally:
+            # Descarta a conexão física (não volta ao pool): o servidor
+            # libera os advisory locks da sessão
+            try:
+                await conexao.invalidate()
+                await conexao.close()
+            except Exception:
+                pass
+
+    async def _loop(self):
+        while self._running:
+            try:
+                await self.executar()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Conexão de leases perdida, parando jobs locais: {e}")
+                await self._parar_jobs()
+                await self._fechar_conexao()
+            try:
+                await asyncio.sleep(self._intervalo)
+            except asyncio.CancelledError:
+                break
+
+
+_coordenador_jobs: Optional[CoordenadorJobs] = None
+
+
+def get_coordenador_jobs() -> Optional[CoordenadorJobs]:
+    """Coordenador do processo (None se o papel não executa jobs)."""
+    return _coordenador_jobs
+
+
+async def iniciar_coordenador_jobs(jobs: List[JobSingleton], papel: str):
+    """Inicia o coordenador de jobs singleton do processo."""
+    global _coordenador_jobs
+    if _coordenador_jobs is None:
+        _coordenador_jobs = CoordenadorJobs(jobs, papel)
+    await _coordenador_jobs.start()
+
+
+async def parar_coordenador_jobs():
+    """Para os jobs locais e libera os leases."""
+    if _coordenador_jobs:
+        await _coordenador_jobs.stop()
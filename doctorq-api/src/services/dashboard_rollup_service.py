@@ -0,0 +1,313 @@
+"""
+Rollups diários do dashboard de clínicas
+
+tb_dashboard_diario e tb_dashboard_procedimentos_diario guardam, por empresa e
+dia, os agregados de agendamentos e receita. O trigger de tb_agendamentos
+registra os dias alterados em tb_dashboard_eventos; o DashboardRollupWorker
+recalcula só esses dias. Na leitura, os dias ainda pendentes no change-log são
+agregados ao vivo e somados aos rollups (custo proporcional aos dias do período,
+não aos agendamentos).
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Chave do pg_try_advisory_xact_lock (uma instância consolida por vez)
+LOCK_DASHBOARD_ROLLUP = 743002
+
+CAMPOS_DIARIOS = (
+    "nr_agendamentos",
+    "nr_confirmados",
+    "nr_pendentes",
+    "nr_cancelados",
+    "nr_concluidos",
+    "vl_receita",
+    "nr_receita",
+)
+CAMPOS_PROCEDIMENTOS = ("nr_agendamentos", "vl_receita")
+
+# Agregações sobre tb_agendamentos; {filtro} restringe empresa/dias
+_AGREGADO_DIARIO = """
+    SELECT c.id_empresa,
+           a.dt_agendamento::date AS dt_dia,
+           COUNT(*) AS nr_agendamentos,
+           COUNT(*) FILTER (WHERE a.ds_status = 'confirmado') AS nr_confirmados,
+           COUNT(*) FILTER (WHERE a.ds_status = 'pendente') AS nr_pendentes,
+           COUNT(*) FILTER (WHERE a.ds_status = 'cancelado') AS nr_cancelados,
+           COUNT(*) FILTER (WHERE a.ds_status = 'concluido') AS nr_concluidos,
+           COALESCE(SUM(a.vl_valor) FILTER (WHERE a.ds_status IN ('confirmado', 'concluido')), 0) AS vl_receita,
+           COUNT(a.vl_valor) FILTER (WHERE a.ds_status IN ('confirmado', 'concluido')) AS nr_receita
+    FROM tb_agendamentos a
+    JOIN tb_clinicas c ON c.id_clinica = a.id_clinica
+    {filtro}
+    GROUP BY c.id_empresa, a.dt_agendamento::date
+"""
+
+_AGREGADO_PROCEDIMENTOS = """
+    SELECT c.id_empresa,
+           a.dt_agendamento::date AS dt_dia,
+           a.id_procedimento,
+           COUNT(*) AS nr_agendamentos,
+           COALESCE(SUM(a.vl_valor) FILTER (WHERE a.ds_status IN ('confirmado', 'concluido')), 0) AS vl_receita
+    FROM tb_agendamentos a
+    JOIN tb_clinicas c ON c.id_clinica = a.id_clinica
+    {filtro}
+      AND a.id_procedimento IS NOT NULL
+    GROUP BY c.id_empresa, a.dt_agendamento::date, a.id_procedimento
+"""
+
+# Dias alvo do recálculo: pares (empresa, dia) passados como arrays
+_ALVOS = """
+    WITH alvos AS (
+        SELECT * FROM unnest(CAST(:empresas AS uuid[]), CAST(:dias AS date[])) AS t(id_empresa, dt_dia)
+    )
+"""
+_FILTRO_ALVOS = """
+    JOIN alvos t ON t.id_empresa = c.id_empresa
+                AND a.dt_agendamento >= t.dt_dia
+                AND a.dt_agendamento < t.dt_dia + 1
+    WHERE TRUE
+"""
+_FILTRO_AO_VIVO = """
+    WHERE c.id_empresa = :id_empresa
+      AND a.dt_agendamento >= :inicio
+      AND a.dt_agendamento < :fim
+      AND a.dt_agendamento::date = ANY(CAST(:dias AS date[]))
+"""
+
+# =============================================================================
+# CONSOLIDAÇÃO (worker)
+# =============================================================================
+
+SQL_CONSUMIR_EVENTOS = text("""
+    DELETE FROM tb_dashboard_eventos
+     WHERE nr_evento IN (
+        SELECT nr_evento FROM tb_dashboard_eventos ORDER BY nr_evento LIMIT :limite
+     )
+    RETURNING id_clinica, dt_dia
+""")
+
+SQL_EMPRESAS_DIAS = text("""
+    SELECT DISTINCT c.id_empresa, e.dt_dia
+    FROM unnest(CAST(:clinicas AS uuid[]), CAST(:dias AS date[])) AS e(id_clinica, dt_dia)
+    JOIN tb_clinicas c ON c.id_clinica = e.id_clinica
+    WHERE c.id_empresa IS NOT NULL
+""")
+
+SQL_LIMPAR_DIARIO = text(_ALVOS + """
+    DELETE FROM tb_dashboard_diario r
+     USING alvos t
+     WHERE r.id_empresa = t.id_empresa AND r.dt_dia = t.dt_dia
+""")
+
+SQL_LIMPAR_PROCEDIMENTOS = text(_ALVOS + """
+    DELETE FROM tb_dashboard_procedimentos_diario r
+     USING alvos t
+     WHERE r.id_empresa = t.id_empresa AND r.dt_dia = t.dt_dia
+""")
+
+SQL_GRAVAR_DIARIO = text(_ALVOS + f"""
+    INSERT INTO tb_dashboard_diario (id_empresa, dt_dia, {", ".join(CAMPOS_DIARIOS)})
+    SELECT id_empresa, dt_dia, {", ".join(CAMPOS_DIARIOS)}
+    FROM ({_AGREGADO_DIARIO.format(filtro=_FILTRO_ALVOS)}) agregado
+""")
+
+SQL_GRAVAR_PROCEDIMENTOS = text(_ALVOS + f"""
+    INSERT INTO tb_dashboard_procedimentos_diario (id_empresa, dt_dia, id_procedimento, {", ".join(CAMPOS_PROCEDIMENTOS)})
+    SELECT id_empresa, dt_dia, id_procedimento, {", ".join(CAMPOS_PROCEDIMENTOS)}
+    FROM ({_AGREGADO_PROCEDIMENTOS.format(filtro=_FILTRO_ALVOS)}) agregado
+""")
+
+# =============================================================================
+# LEITURA (dashboard)
+# =============================================================================
+
+SQL_DIAS_PENDENTES = text("""
+    SELECT DISTINCT e.dt_dia
+    FROM tb_dashboard_eventos e
+    JOIN tb_clinicas c ON c.id_clinica = e.id_clinica
+    WHERE c.id_empresa = :id_empresa
+      AND e.dt_dia BETWEEN :start_date AND :end_date
+""")
+
+SQL_ROLLUP_DIAS = text(f"""
+    SELECT dt_dia, {", ".join(CAMPOS_DIARIOS)}
+    FROM tb_dashboard_diario
+    WHERE id_empresa = :id_empresa
+      AND dt_dia BETWEEN :start_date AND :end_date
+      AND NOT (dt_dia = ANY(CAST(:dias AS date[])))
+""")
+
+SQL_ROLLUP_PROCEDIMENTOS = text("""
+    SELECT id_procedimento,
+           SUM(nr_agendamentos) AS nr_agendamentos,
+           SUM(vl_receita) AS vl_receita
+    FROM tb_dashboard_procedimentos_diario
+    WHERE id_empresa = :id_empresa
+      AND dt_dia BETWEEN :start_date AND :end_date
+      AND NOT (dt_dia = ANY(CAST(:dias AS date[])))
+    GROUP BY id_procedimento
+""")
+
+SQL_AO_VIVO_DIAS = text(_AGREGADO_DIARIO.format(filtro=_FILTRO_AO_VIVO))
+SQL_AO_VIVO_PROCEDIMENTOS = text(_AGREGADO_PROCEDIMENTOS.format(filtro=_FILTRO_AO_VIVO))
+
+SQL_NOMES_PROCEDIMENTOS = text("""
+    SELECT id_procedimento, nm_procedimento
+    FROM tb_procedimentos
+    WHERE id_procedimento = ANY(CAST(:ids AS uuid[]))
+""")
+
+
+def somar_por(linhas: Iterable[dict], chave: str, campos: Tuple[str, ...]) -> Dict:
+    """Soma os campos das linhas agrupando por chave (rollup + ao vivo)."""
+    totais: Dict = {}
+    for linha in linhas:
+        acumulado = totais.setdefault(linha[chave], {campo: 0 for campo in campos})
+        for campo in campos:
+            acumulado[campo] += linha.get(campo) or 0
+    return totais
+
+
+def resumir_periodo(dias: Dict[date, dict], hoje: date) -> dict:
+    """
+    Totais do período e janelas relativas a hoje a partir dos agregados diários.
+
+    hoje/semana/mes seguem a regra anterior do dashboard: dias do período a
+    partir de hoje, hoje-7 e hoje-30. Receita do mês atual/anterior por mês
+    calendário, também restrita ao período.
+    """
+    inicio_mes = hoje.replace(day=1)
+    inicio_mes_anterior = (inicio_mes - timedelta(days=1)).replace(day=1)
+
+    resumo = {campo: 0 for campo in CAMPOS_DIARIOS}
+    resumo.update(
+        agendamentos_hoje=0,
+        agendamentos_semana=0,
+        agendamentos_mes=0,
+        receita_mes_atual=0,
+        receita_mes_anterior=0,
+    )
+    for dia, valores in dias.items():
+        for campo in CAMPOS_DIARIOS:
+            resumo[campo] += valores.get(campo) or 0
+
+        nr_agendamentos = valores.get("nr_agendamentos") or 0
+        if dia == hoje:
+            resumo["agendamentos_hoje"] += nr_agendamentos
+        if dia >= hoje - timedelta(days=7):
+            resumo["agendamentos_semana"] += nr_agendamentos
+        if dia >= hoje - timedelta(days=30):
+            resumo["agendamentos_mes"] += nr_agendamentos
+
+        vl_receita = valores.get("vl_receita") or 0
+        if dia.replace(day=1) == inicio_mes:
+            resumo["receita_mes_atual"] += vl_receita
+        elif dia.replace(day=1) == inicio_mes_anterior:
+            resumo["receita_mes_anterior"] += vl_receita
+
+    return resumo
+
+
+def ranking_procedimentos(procedimentos: Dict, campo: str, limite: int) -> List[Tuple]:
+    """Procedimentos ordenados pelo campo (desc), sem os zerados."""
+    ordenados = sorted(procedimentos.items(), key=lambda item: item[1][campo], reverse=True)
+    return [(id_procedimento, valores) for id_procedimento, valores in ordenados if valores[campo]][:limite]
+
+
+class DashboardRollupService:
+    """Consolidação e leitura dos rollups diários do dashboard"""
+
+    @staticmethod
+    async def processar_eventos(db: AsyncSession, limite: int = 5000) -> Optional[int]:
+        """
+        Consome um lote do change-log e recalcula os dias afetados.
+
+        O DELETE dos eventos vem antes da agregação (statement seguinte, snapshot
+        mais novo): evento não visível ao DELETE continua no change-log para a
+        próxima rodada. Retorna o número de eventos consumidos, ou None se outra
+        instância está consolidando.
+        """
+        adquirido = await db.scalar(
+            text("SELECT pg_try_advisory_xact_lock(:chave)"), {"chave": LOCK_DASHBOARD_ROLLUP}
+        )
+        if not adquirido:
+            return None
+
+        result = await db.execute(SQL_CONSUMIR_EVENTOS, {"limite": limite})
+        eventos = {(row.id_clinica, row.dt_dia) for row in result}
+        if not eventos:
+            await db.commit()
+            return 0
+
+        result = await db.execute(
+            SQL_EMPRESAS_DIAS,
+            {
+                "clinicas": [id_clinica for id_clinica, _ in eventos],
+                "dias": [dt_dia for _, dt_dia in eventos],
+            },
+        )
+        alvos = result.all()
+        if alvos:
+            params = {
+                "empresas": [row.id_empresa for row in alvos],
+                "dias": [row.dt_dia for row in alvos],
+            }
+            await db.execute(SQL_LIMPAR_DIARIO, params)
+            await db.execute(SQL_LIMPAR_PROCEDIMENTOS, params)
+            await db.execute(SQL_GRAVAR_DIARIO, params)
+            await db.execute(SQL_GRAVAR_PROCEDIMENTOS, params)
+
+        await db.commit()
+        return len(eventos)
+
+    @staticmethod
+    async def obter_periodo(
+        db: AsyncSession, id_empresa: UUID, start_date: date, end_date: date
+    ) -> Tuple[Dict[date, dict], Dict]:
+        """
+        Agregados por dia e por procedimento no período (dias inclusivos).
+
+        Dias com eventos pendentes são agregados ao vivo em tb_agendamentos;
+        os demais vêm dos rollups.
+        """
+        periodo = {"id_empresa": id_empresa, "start_date": start_date, "end_date": end_date}
+
+        result = await db.execute(SQL_DIAS_PENDENTES, periodo)
+        pendentes = sorted(row.dt_dia for row in result)
+
+        params = {**periodo, "dias": pendentes}
+        result = await db.execute(SQL_ROLLUP_DIAS, params)
+        linhas_dias = [dict(row._mapping) for row in result]
+        result = await db.execute(SQL_ROLLUP_PROCEDIMENTOS, params)
+        linhas_procedimentos = [dict(row._mapping) for row in result]
+
+        if pendentes:
+            ao_vivo = {
+                "id_empresa": id_empresa,
+                "dias": pendentes,
+                "inicio": pendentes[0],
+                "fim": pendentes[-1] + timedelta(days=1),
+            }
+            result = await db.execute(SQL_AO_VIVO_DIAS, ao_vivo)
+            linhas_dias.extend(dict(row._mapping) for row in result)
+            result = await db.execute(SQL_AO_VIVO_PROCEDIMENTOS, ao_vivo)
+            linhas_procedimentos.extend(dict(row._mapping) for row in result)
+
+        dias = somar_por(linhas_dias, "dt_dia", CAMPOS_DIARIOS)
+        procedimentos = somar_por(linhas_procedimentos, "id_procedimento", CAMPOS_PROCEDIMENTOS)
+        return dias, procedimentos
+
+    @staticmethod
+    async def nomes_procedimentos(db: AsyncSession, ids: Iterable[UUID]) -> Dict[UUID, str]:
+        if not ids:
+            return {}
+        result = await db.execute(SQL_NOMES_PROCEDIMENTOS, {"ids": list(ids)})
+        return {row.id_procedimento: row.nm_procedimento for row in result}
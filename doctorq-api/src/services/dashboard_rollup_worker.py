@@ -0,0 +1,96 @@
+"""
+Worker de consolidação dos rollups do dashboard
+
+Consome tb_dashboard_eventos (dias com agendamentos alterados) e recalcula
+tb_dashboard_diario/tb_dashboard_procedimentos_diario só para esses dias.
+"""
+import asyncio
+import os
+from typing import Optional
+
+from src.config.logger_config import get_logger
+from src.config.orm_config import get_async_session_context
+from src.services.dashboard_rollup_service import DashboardRollupService
+
+logger = get_logger(__name__)
+
+INTERVALO_SEGUNDOS = float(os.getenv("DASHBOARD_ROLLUP_INTERVALO", "60"))
+TAMANHO_LOTE = int(os.getenv("DASHBOARD_ROLLUP_LOTE", "5000"))
+
+
+class DashboardRollupWorker:
+    """Executa DashboardRollupService.processar_eventos em intervalo fixo."""
+
+    def __init__(self, intervalo: float = INTERVALO_SEGUNDOS, lote: int = TAMANHO_LOTE):
+        self._intervalo = intervalo
+        self._lote = lote
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Inicia o worker."""
+        if self._running:
+            logger.warning("DashboardRollupWorker já está em execução")
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info("DashboardRollupWorker iniciado")
+
+    async def stop(self):
+        """Para o worker."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logger.info("DashboardRollupWorker parado")
+
+    async def executar(self) -> int:
+        """Consome lotes até esvaziar o change-log (ou outra instância assumir)."""
+        total = 0
+        while self._running:
+            async with get_async_session_context() as db:
+                consumidos = await DashboardRollupService.processar_eventos(db, self._lote)
+            if not consumidos:
+                break
+            total += consumidos
+            if consumidos < self._lote:
+                break
+        if total:
+            logger.debug(f"Rollups do dashboard: {total} eventos consolidados")
+        return total
+
+    async def _loop(self):
+        while self._running:
+            try:
+                await self.executar()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Erro na consolidação do dashboard: {e}")
+            try:
+                await asyncio.sleep(self._intervalo)
+            except asyncio.CancelledError:
+                break
+
+
+_dashboard_rollup_worker: Optional[DashboardRollupWorker] = None
+
+
+def get_dashboard_rollup_worker() -> DashboardRollupWorker:
+    """Retorna instância singleton do worker."""
+    global _dashboard_rollup_worker
+    if _dashboard_rollup_worker is None:
+        _dashboard_rollup_worker = DashboardRollupWorker()
+    return _dashboard_rollup_worker
+
+
+async def iniciar_dashboard_rollup_worker():
+    """Inicia o worker de rollups do dashboard."""
+    await get_dashboard_rollup_worker().start()
+
+
+async def parar_dashboard_rollup_worker():
+    """Para o worker de rollups do dashboard."""
+    if _dashboard_rollup_worker:
+        await _dashboard_rollup_worker.stop()
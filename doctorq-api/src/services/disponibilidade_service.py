@@ -0,0 +1,577 @@
+"""
+Motor de disponibilidade da Agenda Inteligente
+
+Monta, a partir de UMA consulta por intervalo em tb_agendamentos, um bitmap de
+ocupação por profissional e por dia (célula de GRANULARIDADE_MINUTOS) e responde
+livre/ocupado de cada slot com uma operação AND sobre esse bitmap.
+
+O expediente vem de tb_profissionais.ds_horarios_atendimento. Formatos aceitos
+por dia da semana (segunda ... domingo):
+- "08:00-18:00" ou "08:00-12:00,14:00-18:00" ou "FECHADO"
+- {"ativo": true, "hr_inicio": "08:00", "hr_fim": "18:00"}
+- {"ativo": true, "inicio": "08:00", "fim": "18:00"}
+- lista de qualquer um dos formatos acima (vários turnos)
+
+Sem configuração (ou JSON sem nenhum dia reconhecido) vale o horário comercial
+padrão de 08:00 às 18:00 todos os dias, como antes.
+"""
+import os
+import unicodedata
+import uuid
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.cache_config import get_cache_client
+from src.config.logger_config import get_logger
+from src.utils.cache_helper import CacheHelper
+
+logger = get_logger(__name__)
+
+# Resolução do bitmap de ocupação (minutos por célula)
+GRANULARIDADE_MINUTOS = 5
+CELULAS_DIA = 24 * 60 // GRANULARIDADE_MINUTOS
+
+# Intervalo entre inícios de slots oferecidos ao paciente
+INTERVALO_SLOTS_MINUTOS = 30
+
+# Duração máxima de um agendamento (nr_duracao_minutos <= 480): limita quanto
+# antes do período um agendamento pode começar e ainda invadi-lo
+DURACAO_MAXIMA_MINUTOS = 480
+
+EXPEDIENTE_PADRAO: List[Tuple[int, int]] = [(8 * 60, 18 * 60)]
+
+# Status que não ocupam horário (mesmos da constraint ex_agendamentos_profissional_periodo)
+STATUS_LIVRES = ("cancelado", "nao_compareceu")
+
+MOTIVO_PASSADO = "Horário no passado"
+MOTIVO_RESERVADO = "Horário já reservado"
+
+_DIAS_SEMANA = {
+    "segunda": 0,
+    "terca": 1,
+    "quarta": 2,
+    "quinta": 3,
+    "sexta": 4,
+    "sabado": 5,
+    "domingo": 6,
+}
+
+# Expediente por dia da semana (0 = segunda) em minutos desde 00:00
+Expediente = Dict[int, List[Tuple[int, int]]]
+
+
+class Slot(NamedTuple):
+    """Slot de atendimento calculado pelo motor"""
+
+    dt_horario: datetime
+    disponivel: bool
+    motivo: Optional[str] = None
+
+
+# =====================================================
+# Expediente (ds_horarios_atendimento)
+# =====================================================
+
+
+def _normalizar_dia(chave: str) -> Optional[int]:
+    sem_acento = unicodedata.normalize("NFKD", chave).encode("ascii", "ignore").decode()
+    nome = sem_acento.strip().lower().split("-")[0]
+    return _DIAS_SEMANA.get(nome)
+
+
+def _minutos(valor: str) -> int:
+    horas, _, minutos = valor.strip().partition(":")
+    return int(horas) * 60 + int(minutos or 0)
+
+
+def _parse_turnos(valor: Any) -> List[Tuple[int, int]]:
+    """Converte a configuração de um dia em turnos [(inicio, fim)] em minutos."""
+    if valor is None or valor is False:
+        return []
+
+    if isinstance(valor, list):
+        return [turno for item in valor for turno in _parse_turnos(item)]
+
+    if isinstance(valor, dict):
+        if valor.get("ativo") is False:
+            return []
+        inicio = valor.get("hr_inicio") or valor.get("inicio")
+        fim = valor.get("hr_fim") or valor.get("fim")
+        if not inicio or not fim:
+            return []
+        turnos = [(_minutos(inicio), _minutos(fim))]
+        # Pausa opcional dentro do turno (ex: almoço)
+        pausa_inicio = valor.get("hr_pausa_inicio") or valor.get("pausa_inicio")
+        pausa_fim = valor.get("hr_pausa_fim") or valor.get("pausa_fim")
+        if pausa_inicio and pausa_fim:
+            turnos = [
+                (turnos[0][0], _minutos(pausa_inicio)),
+                (_minutos(pausa_fim), turnos[0][1]),
+            ]
+        return [(i, f) for i, f in turnos if f > i]
+
+    if isinstance(valor, str):
+        turnos = []
+        for trecho in valor.split(","):
+            inicio, sep, fim = trecho.partition("-")
+            if not sep:
+                continue  # "FECHADO" e afins
+            try:
+                i, f = _minutos(inicio), _minutos(fim)
+            except ValueError:
+                continue
+            if f > i:
+                turnos.append((i, f))
+        return turnos
+
+    return []
+
+
+def parse_expediente(ds_horarios_atendimento: Optional[Dict[str, Any]]) -> Expediente:
+    """Interpreta ds_horarios_atendimento; sem dias reconhecidos usa o padrão."""
+    expediente: Expediente = {}
+    for chave, valor in (ds_horarios_atendimento or {}).items():
+        dia = _normalizar_dia(str(chave))
+        if dia is None:
+            continue  # ex: "intervalo_consultas"
+        try:
+            expediente[dia] = sorted(_parse_turnos(valor))
+        except (TypeError, ValueError):
+            expediente[dia] = []
+
+    if not expediente:
+        return {dia: list(EXPEDIENTE_PADRAO) for dia in range(7)}
+    return {dia: expediente.get(dia, []) for dia in range(7)}
+
+
+# =====================================================
+# Bitmap de ocupação
+# =====================================================
+
+
+def _mascara(inicio_min: int, fim_min: int) -> int:
+    """Bits das células que cobrem [inicio_min, fim_min) do dia."""
+    primeira = max(0, inicio_min // GRANULARIDADE_MINUTOS)
+    ultima = min(CELULAS_DIA, -(-fim_min // GRANULARIDADE_MINUTOS))
+    if ultima <= primeira:
+        return 0
+    return ((1 << (ultima - primeira)) - 1) << primeira
+
+
+def marcar_ocupacao(
+    ocupacao: Dict[date, int], inicio: datetime, duracao_minutos: int
+) -> None:
+    """Marca um agendamento no bitmap, dividindo entre dias se cruzar a meia-noite."""
+    dia = inicio.date()
+    inicio_min = inicio.hour * 60 + inicio.minute
+    if inicio_min + duracao_minutos <= 24 * 60 and not (inicio.second or inicio.microsecond):
+        # Caso comum: agendamento dentro do próprio dia
+        ocupacao[dia] = ocupacao.get(dia, 0) | _mascara(inicio_min, inicio_min + duracao_minutos)
+        return
+
+    fim = inicio + timedelta(minutes=duracao_minutos)
+    while datetime.combine(dia, time.min) < fim:
+        base = datetime.combine(dia, time.min)
+        inicio_min = max(0, int((inicio - base).total_seconds() // 60))
+        fim_min = min(24 * 60, -int(-(fim - base).total_seconds() // 60))
+        mascara = _mascara(inicio_min, fim_min)
+        if mascara:
+            ocupacao[dia] = ocupacao.get(dia, 0) | mascara
+        dia += timedelta(days=1)
+
+
+async def _consultar_ocupacao(
+    db: AsyncSession,
+    ids_profissionais: Sequence[str],
+    data_inicio: date,
+    data_fim: date,
+    id_empresa: Optional[str] = None,
+):
+    """Agendamentos ativos e reservas válidas que tocam [data_inicio, data_fim]."""
+    filtro_empresa = ""
+    if id_empresa:
+        filtro_empresa = """
+              AND (a.id_clinica IS NULL OR EXISTS (
+                  SELECT 1 FROM tb_clinicas c
+                  WHERE c.id_clinica = a.id_clinica AND c.id_empresa = :id_empresa
+              ))"""
+
+    query = text(f"""
+        SELECT a.id_profissional::text AS id_profissional,
+               a.dt_agendamento,
+               a.nr_duracao_minutos,
+               NULL::integer AS nr_segundos_reserva
+        FROM tb_agendamentos a
+        WHERE a.id_profissional IN :ids_profissionais
+          AND a.dt_agendamento >= :inicio
+          AND a.dt_agendamento < :fim
+          AND a.ds_status NOT IN :status_livres{filtro_empresa}
+        UNION ALL
+        SELECT r.id_profissional::text,
+               r.dt_agendamento,
+               r.nr_duracao_minutos,
+               CEIL(EXTRACT(EPOCH FROM r.dt_expiracao - NOW()))::integer
+        FROM tb_agendamento_reservas r
+        WHERE r.id_profissional IN :ids_profissionais
+          AND r.dt_agendamento >= :inicio
+          AND r.dt_agendamento < :fim
+          AND r.dt_expiracao > NOW()
+    """).bindparams(
+        bindparam("ids_profissionais", expanding=True),
+        bindparam("status_livres", expanding=True),
+    )
+
+    params = {
+        "ids_profissionais": [uuid.UUID(str(i)) for i in ids_profissionais],
+        "inicio": datetime.combine(data_inicio, time.min) - timedelta(minutes=DURACAO_MAXIMA_MINUTOS),
+        "fim": datetime.combine(data_fim + timedelta(days=1), time.min),
+        "status_livres": list(STATUS_LIVRES),
+    }
+    if id_empresa:
+        params["id_empresa"] = id_empresa
+
+    result = await db.execute(query, params)
+    return result.fetchall()
+
+
+async def carregar_ocupacao(
+    db: AsyncSession,
+    ids_profissionais: Sequence[str],
+    data_inicio: date,
+    data_fim: date,
+    id_empresa: Optional[str] = None,
+) -> Dict[str, Dict[date, int]]:
+    """
+    Bitmaps de ocupação {id_profissional: {dia: bits}} para [data_inicio, data_fim].
+
+    Uma única consulta por intervalo em dt_agendamento (usa o índice
+    (id_profissional, dt_agendamento)); com id_empresa, considera só
+    agendamentos da empresa ou sem clínica. Reservas de checkout ainda
+    válidas também ocupam o horário.
+    """
+    ocupacao: Dict[str, Dict[date, int]] = {str(i): {} for i in ids_profissionais}
+    if not ids_profissionais:
+        return ocupacao
+
+    for row in await _consultar_ocupacao(db, ids_profissionais, data_inicio, data_fim, id_empresa):
+        marcar_ocupacao(
+            ocupacao.setdefault(row.id_profissional, {}),
+            row.dt_agendamento,
+            row.nr_duracao_minutos,
+        )
+    return ocupacao
+
+
+async def carregar_expedientes(
+    db: AsyncSession, ids_profissionais: Sequence[str]
+) -> Dict[str, Expediente]:
+    """Expediente semanal de cada profissional (padrão para os não encontrados)."""
+    expedientes: Dict[str, Expediente] = {
+        str(i): parse_expediente(None) for i in ids_profissionais
+    }
+    if not ids_profissionais:
+        return expedientes
+
+    query = text("""
+        SELECT id_profissional::text AS id_profissional, ds_horarios_atendimento
+        FROM tb_profissionais
+        WHERE id_profissional IN :ids_profissionais
+    """).bindparams(bindparam("ids_profissionais", expanding=True))
+
+    result = await db.execute(query, {"ids_profissionais": [uuid.UUID(str(i)) for i in ids_profissionais]})
+    for row in result:
+        expedientes[row.id_profissional] = parse_expediente(row.ds_horarios_atendimento)
+    return expedientes
+
+
+# =====================================================
+# Cálculo de slots
+# =====================================================
+
+
+@lru_cache(maxsize=1024)
+def _grade_slots(
+    turnos: Tuple[Tuple[int, int], ...], duracao_minutos: int
+) -> Tuple[Tuple[timedelta, int], ...]:
+    """Inícios de slot (deslocamento desde 00:00, máscara) de um expediente/duração."""
+    grade = []
+    for inicio_turno, fim_turno in turnos:
+        inicio = inicio_turno
+        while inicio + duracao_minutos <= fim_turno:
+            grade.append((timedelta(minutes=inicio), _mascara(inicio, inicio + duracao_minutos)))
+            inicio += INTERVALO_SLOTS_MINUTOS
+    return tuple(grade)
+
+
+def calcular_slots_dia(
+    dia: date,
+    turnos: Iterable[Tuple[int, int]],
+    ocupado: int,
+    duracao_minutos: int,
+    agora: datetime,
+) -> List[Slot]:
+    """Slots de um dia: cada turno a cada INTERVALO_SLOTS_MINUTOS, sem ultrapassar o fim do turno."""
+    base = datetime.combine(dia, time.min)
+    slots = []
+    for deslocamento, mascara in _grade_slots(tuple(turnos), duracao_minutos):
+        dt_horario = base + deslocamento
+        if dt_horario < agora:
+            slots.append(Slot(dt_horario, False, MOTIVO_PASSADO))
+        elif ocupado & mascara:
+            slots.append(Slot(dt_horario, False, MOTIVO_RESERVADO))
+        else:
+            slots.append(Slot(dt_horario, True))
+    return slots
+
+
+def calcular_slots(
+    expediente: Expediente,
+    ocupacao: Dict[date, int],
+    datas: Iterable[date],
+    duracao_minutos: int,
+    agora: Optional[datetime] = None,
+) -> List[Slot]:
+    """Slots de vários dias de um profissional, em ordem cronológica."""
+    agora = agora or datetime.now()
+    slots: List[Slot] = []
+    for dia in datas:
+        slots.extend(
+            calcular_slots_dia(
+                dia, expediente[dia.weekday()], ocupacao.get(dia, 0), duracao_minutos, agora
+            )
+        )
+    return slots
+
+
+async def obter_disponibilidade_profissionais(
+    db: AsyncSession,
+    ids_profissionais: Sequence[str],
+    data_inicio: date,
+    data_fim: date,
+    duracao_minutos: int,
+    id_empresa: Optional[str] = None,
+) -> Dict[str, List[Slot]]:
+    """
+    Disponibilidade de vários profissionais em [data_inicio, data_fim].
+
+    Duas consultas no total (agendamentos do período e expedientes),
+    independente do número de profissionais e de dias. As chaves do
+    resultado são os UUIDs em forma canônica (minúsculas).
+    """
+    ids = [str(uuid.UUID(str(i))) for i in ids_profissionais]
+    ocupacao = await carregar_ocupacao(db, ids, data_inicio, data_fim, id_empresa)
+    expedientes = await carregar_expedientes(db, ids)
+
+    datas = [data_inicio + timedelta(days=i) for i in range((data_fim - data_inicio).days + 1)]
+    agora = datetime.now()
+    return {
+        id_prof: calcular_slots(expedientes[id_prof], ocupacao[id_prof], datas, duracao_minutos, agora)
+        for id_prof in ids
+    }
+
+
+def horario_livre(
+    expediente: Expediente,
+    ocupacao: Dict[date, int],
+    inicio: datetime,
+    duracao_minutos: int,
+) -> bool:
+    """Se [inicio, inicio + duração) está dentro de um turno e sem ocupação."""
+    inicio_min = inicio.hour * 60 + inicio.minute
+    fim_min = inicio_min + duracao_minutos
+    dentro_do_turno = any(
+        i <= inicio_min and fim_min <= f for i, f in expediente[inicio.weekday()]
+    )
+    return dentro_do_turno and not (
+        ocupacao.get(inicio.date(), 0) & _mascara(inicio_min, fim_min)
+    )
+
+
+# =====================================================
+# Calendário em cache (Redis)
+# =====================================================
+# Ocupação por profissional/dia fica no Redis como bitmap hexadecimal
+# (72 caracteres por dia) e é invalidada pelos eventos que mudam a agenda:
+# criar, confirmar, cancelar e remarcar agendamento, reservar/liberar horário.
+# O TTL é só uma rede de segurança para escritas fora destas rotas; dias com
+# reserva de checkout expiram junto com a reserva mais próxima de vencer.
+# Cada dia tem uma geração que a invalidação incrementa: a leitura guarda a
+# geração antes de consultar o banco e só grava de volta se ela não mudou,
+# então um bitmap calculado antes de uma alteração não volta para o cache.
+
+PREFIXO_CACHE = "agenda:disponibilidade"
+CACHE_TTL_SEGUNDOS = int(os.getenv("AGENDA_DISPONIBILIDADE_CACHE_TTL", str(6 * 3600)))
+# Geração precisa viver mais que o bitmap para a comparação valer
+GERACAO_TTL_SEGUNDOS = 2 * CACHE_TTL_SEGUNDOS
+
+
+def _chave_ocupacao(id_profissional: str, dia: date) -> str:
+    return f"{PREFIXO_CACHE}:ocupacao:{id_profissional}:{dia.isoformat()}"
+
+
+def _chave_geracao(id_profissional: str, dia: date) -> str:
+    return f"{PREFIXO_CACHE}:geracao:{id_profissional}:{dia.isoformat()}"
+
+
+def _chave_expediente(id_profissional: str) -> str:
+    return f"{PREFIXO_CACHE}:expediente:{id_profissional}"
+
+
+def _dias_periodo(inicio: datetime, duracao_minutos: int) -> List[date]:
+    fim = inicio + timedelta(minutes=duracao_minutos)
+    ultimo = (fim - timedelta(microseconds=1)).date()
+    return [inicio.date() + timedelta(days=i) for i in range((ultimo - inicio.date()).days + 1)]
+
+
+async def _get_cache() -> Optional[CacheHelper]:
+    redis_client = await get_cache_client()
+    return CacheHelper(redis_client) if redis_client else None
+
+
+async def carregar_calendario(
+    db: AsyncSession,
+    ids_profissionais: Sequence[str],
+    data_inicio: date,
+    data_fim: date,
+) -> Tuple[Dict[str, Dict[date, int]], Dict[str, Expediente]]:
+    """
+    Ocupação e expediente (sem filtro de empresa) lidos do cache em um MGET.
+
+    Só os profissionais com algum dia ausente no cache vão ao banco, em uma
+    consulta por intervalo cobrindo os dias faltantes; o resultado é gravado
+    de volta apenas nos dias cuja geração não mudou durante a consulta. Sem
+    Redis, equivale a carregar_ocupacao + carregar_expedientes.
+    """
+    ids = [str(uuid.UUID(str(i))) for i in ids_profissionais]
+    cache = await _get_cache()
+    if not cache:
+        return (
+            await carregar_ocupacao(db, ids, data_inicio, data_fim),
+            await carregar_expedientes(db, ids),
+        )
+
+    datas = [data_inicio + timedelta(days=i) for i in range((data_fim - data_inicio).days + 1)]
+    chaves = [_chave_ocupacao(id_prof, dia) for id_prof in ids for dia in datas]
+    chaves += [_chave_geracao(id_prof, dia) for id_prof in ids for dia in datas]
+    chaves += [_chave_expediente(id_prof) for id_prof in ids]
+    valores = dict(zip(chaves, await cache.get_many(chaves)))
+
+    ocupacao: Dict[str, Dict[date, int]] = {id_prof: {} for id_prof in ids}
+    expedientes: Dict[str, Expediente] = {}
+    dias_faltantes: Dict[str, List[date]] = {}
+    sem_expediente: List[str] = []
+
+    for id_prof in ids:
+        for dia in datas:
+            valor = valores[_chave_ocupacao(id_prof, dia)]
+            if valor is None:
+                dias_faltantes.setdefault(id_prof, []).append(dia)
+            else:
+                ocupacao[id_prof][dia] = int(valor, 16)
+
+        expediente = valores[_chave_expediente(id_prof)]
+        if expediente is None:
+            sem_expediente.append(id_prof)
+        else:
+            expedientes[id_prof] = {int(dia): [tuple(t) for t in turnos] for dia, turnos in expediente.items()}
+
+    novos: Dict[str, Any] = {}
+    geracoes: Dict[str, tuple] = {}
+    ttls: Dict[str, int] = {}
+
+    if dias_faltantes:
+        inicio = min(dias[0] for dias in dias_faltantes.values())
+        fim = max(dias[-1] for dias in dias_faltantes.values())
+        calculado: Dict[str, Dict[date, int]] = {id_prof: {} for id_prof in dias_faltantes}
+
+        for row in await _consultar_ocupacao(db, list(dias_faltantes), inicio, fim):
+            marcar_ocupacao(calculado[row.id_profissional], row.dt_agendamento, row.nr_duracao_minutos)
+            if row.nr_segundos_reserva is not None:
+                for dia in _dias_periodo(row.dt_agendamento, row.nr_duracao_minutos):
+                    chave = _chave_ocupacao(row.id_profissional, dia)
+                    ttls[chave] = min(ttls.get(chave, CACHE_TTL_SEGUNDOS), row.nr_segundos_reserva)
+
+        for id_prof, dias in dias_faltantes.items():
+            for dia in dias:
+                bits = calculado[id_prof].get(dia, 0)
+                ocupacao[id_prof][dia] = bits
+                chave = _chave_ocupacao(id_prof, dia)
+                novos[chave] = format(bits, "x")
+                chave_geracao = _chave_geracao(id_prof, dia)
+                geracoes[chave] = (chave_geracao, valores[chave_geracao])
+
+    if novos:
+        await cache.set_many_if_version(novos, geracoes, ttl=CACHE_TTL_SEGUNDOS, ttls=ttls)
+
+    if sem_expediente:
+        novos_expedientes: Dict[str, Any] = {}
+        for id_prof, expediente in (await carregar_expedientes(db, sem_expediente)).items():
+            expedientes[id_prof] = expediente
+            novos_expedientes[_chave_expediente(id_prof)] = {
+                str(dia): turnos for dia, turnos in expediente.items()
+            }
+        await cache.set_many(novos_expedientes, ttl=CACHE_TTL_SEGUNDOS)
+
+    return ocupacao, expedientes
+
+
+async def obter_disponibilidade_cacheada(
+    db: AsyncSession,
+    ids_profissionais: Sequence[str],
+    data_inicio: date,
+    data_fim: date,
+    duracao_minutos: int,
+) -> Dict[str, List[Slot]]:
+    """Como obter_disponibilidade_profissionais (sem filtro de empresa), via calendário em cache."""
+    ocupacao, expedientes = await carregar_calendario(db, ids_profissionais, data_inicio, data_fim)
+    datas = [data_inicio + timedelta(days=i) for i in range((data_fim - data_inicio).days + 1)]
+    agora = datetime.now()
+    return {
+        id_prof: calcular_slots(expedientes[id_prof], ocupacao[id_prof], datas, duracao_minutos, agora)
+        for id_prof in ocupacao
+    }
+
+
+async def invalidar_calendario(
+    id_profissional: Any, periodos: Iterable[Tuple[datetime, int]]
+) -> None:
+    """
+    Remove do cache os dias tocados pelos períodos (início, duração) de um
+    profissional e incrementa a geração desses dias (leituras em andamento
+    não gravam de volta).
+
+    Chamar após o commit da alteração na agenda. Falhas de cache só geram log.
+    """
+    try:
+        cache = await _get_cache()
+        if not cache:
+            return
+        id_prof = str(uuid.UUID(str(id_profissional)))
+        dias = sorted({
+            dia
+            for inicio, duracao in periodos
+            if inicio is not None
+            for dia in _dias_periodo(inicio, duracao)
+        })
+        if dias:
+            await cache.delete_many_and_bump(
+                [_chave_ocupacao(id_prof, dia) for dia in dias],
+                [_chave_geracao(id_prof, dia) for dia in dias],
+                GERACAO_TTL_SEGUNDOS,
+            )
+    except Exception as e:
+        logger.warning(f"Erro ao invalidar calendário do profissional {id_profissional}: {e}")
+
+
+async def invalidar_expediente(id_profissional: Any) -> None:
+    """Remove do cache o expediente do profissional (após alterar ds_horarios_atendimento)."""
+    try:
+        cache = await _get_cache()
+        if cache:
+            await cache.delete(_chave_expediente(str(uuid.UUID(str(id_profissional)))))
+    except Exception as e:
+        logger.warning(f"Erro ao invalidar expediente do profissional {id_profissional}: {e}")
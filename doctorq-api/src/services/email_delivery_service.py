@@ -0,0 +1,620 @@
+# src/services/email_delivery_service.py
+"""
+Motor assíncrono de entrega de emails.
+
+Mantém um pool de conexões SMTP persistentes (STARTTLS + login uma única vez
+por conexão), uma fila com retentativas e rate limiting processada por workers
+em background, e envio em lote reaproveitando a mesma conexão para vários
+destinatários. O I/O SMTP roda em threads (``asyncio.to_thread``) para não
+bloquear o event loop.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.message import Message
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Queda de conexão e timeout; respostas SMTP 4xx (temporárias pela RFC 5321)
+# são tratadas pelo código em _erro_transitorio
+_ERROS_TRANSITORIOS = (
+    smtplib.SMTPServerDisconnected,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+def _erro_transitorio(erro: Exception) -> bool:
+    """Indica se o erro SMTP justifica uma nova tentativa"""
+    if isinstance(erro, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(erro, smtplib.SMTPResponseException):
+        return 400 <= erro.smtp_code < 500
+    if isinstance(erro, smtplib.SMTPRecipientsRefused):
+        return False
+    return isinstance(erro, _ERROS_TRANSITORIOS)
+
+
+@dataclass
+class _ConexaoSMTP:
+    """Conexão SMTP autenticada com controle de idade e ociosidade"""
+
+    server: smtplib.SMTP
+    criada_em: float = field(default_factory=time.monotonic)
+    usada_em: float = field(default_factory=time.monotonic)
+    mensagens_enviadas: int = 0
+
+
+class SMTPConnectionPool:
+    """
+    Pool thread-safe de conexões SMTP persistentes.
+
+    Conexões são reutilizadas entre envios; ficam ociosas no pool até
+    ``max_idle_seconds`` e são recicladas após ``max_messages_per_connection``
+    mensagens (muitos provedores derrubam sessões longas).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        max_size: int = 4,
+        timeout: float = 30.0,
+        max_idle_seconds: float = 120.0,
+        max_messages_per_connection: int = 100,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.max_messages_per_connection = max_messages_per_connection
+
+        self._ociosas: "queue.LifoQueue[_ConexaoSMTP]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._abertas = 0
+        self._fechado = False
+
+    def _abrir(self) -> _ConexaoSMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if server.has_extn("starttls"):
+                server.starttls()
+                server.ehlo()
+            server.login(self.user, self.password)
+        except Exception:
+            self._fechar_servidor(server)
+            raise
+
+        with self._lock:
+            self._abertas += 1
+        logger.debug("Nova conexão SMTP aberta com %s:%s", self.host, self.port)
+        return _ConexaoSMTP(server=server)
+
+    @staticmethod
+    def _fechar_servidor(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _descartar(self, conexao: _ConexaoSMTP) -> None:
+        self._fechar_servidor(conexao.server)
+        with self._lock:
+            self._abertas = max(0, self._abertas - 1)
+
+    def _valida(self, conexao: _ConexaoSMTP) -> bool:
+        """Verifica se uma conexão ociosa ainda pode ser usada"""
+        agora = time.monotonic()
+        if conexao.mensagens_enviadas >= self.max_messages_per_connection:
+            return False
+        if agora - conexao.usada_em > self.max_idle_seconds:
+            return False
+        # Conexões paradas há alguns segundos podem ter sido derrubadas pelo servidor
+        if agora - conexao.usada_em > 5:
+            try:
+                return conexao.server.noop()[0] == 250
+            except Exception:
+                return False
+        return True
+
+    @contextmanager
+    def connection(self) -> Iterator[_ConexaoSMTP]:
+        """
+        Empresta uma conexão autenticada do pool.
+
+        Em caso de erro durante o uso a conexão é descartada em vez de
+        devolvida, evitando reaproveitar sessões em estado inconsistente.
+        """
+        if self._fechado:
+            raise RuntimeError("Pool SMTP encerrado")
+
+        self._slots.acquire()
+        conexao: Optional[_ConexaoSMTP] = None
+        try:
+            while conexao is None:
+                try:
+                    candidata = self._ociosas.get_nowait()
+                except queue.Empty:
+                    conexao = self._abrir()
+                    break
+                if self._valida(candidata):
+                    conexao = candidata
+                else:
+                    self._descartar(candidata)
+
+            try:
+                yield conexao
+            except Exception:
+                self._descartar(conexao)
+                conexao = None
+                raise
+            else:
+                conexao.usada_em = time.monotonic()
+                if self._fechado:
+                    self._descartar(conexao)
+                else:
+                    self._ociosas.put(conexao)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Fecha todas as conexões ociosas e impede novos empréstimos"""
+        self._fechado = True
+        while True:
+            try:
+                conexao = self._ociosas.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(conexao)
+
+    @property
+    def abertas(self) -> int:
+        return self._abertas
+
+
+class _RateLimiter:
+    """Token bucket assíncrono para limitar mensagens por segundo"""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._atualizado_em = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int = 1) -> None:
+        """
+        Consome ``tokens`` do balde; lotes maiores que a capacidade deixam o
+        saldo negativo e aguardam o tempo proporcional ao déficit.
+        """
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            agora = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (agora - self._atualizado_em) * self.rate,
+            )
+            self._atualizado_em = agora
+            self._tokens -= tokens
+            if self._tokens < 0:
+                await asyncio.sleep(-self._tokens / self.rate)
+
+
+@dataclass
+class EmailJob:
+    """Lote de mensagens entregues sobre uma mesma conexão SMTP"""
+
+    mensagens: List[Message]
+    tentativa: int = 0
+    enviados: int = 0
+    resultado: Optional["asyncio.Future[int]"] = None
+    # False quando o lote já foi cadenciado por um orçamento próprio no enqueue
+    limitar: bool = True
+
+
+class EmailDeliveryEngine:
+    """
+    Entrega assíncrona de emails com pool SMTP, fila, retentativas e rate limit.
+
+    Configuração via variáveis de ambiente (mesmas do ``EmailService``):
+    - SMTP_POOL_SIZE: conexões SMTP simultâneas (padrão 4)
+    - EMAIL_WORKERS: workers consumindo a fila (padrão = SMTP_POOL_SIZE)
+    - EMAIL_QUEUE_MAXSIZE: capacidade da fila (padrão 10000)
+    - EMAIL_RATE_LIMIT: mensagens por segundo, 0 desabilita (padrão 10)
+    - EMAIL_RATE_LIMIT_<ORCAMENTO>: taxa de um orçamento nomeado, separado do
+      geral (ex: EMAIL_RATE_LIMIT_BROADCAST, padrão 5)
+    - EMAIL_MAX_RETRIES: retentativas para erros transitórios (padrão 3)
+    - EMAIL_BATCH_SIZE: mensagens por conexão em envios em lote (padrão 50)
+    """
+
+    def __init__(
+        self,
+        smtp_host: Optional[str] = None,
+        smtp_port: Optional[int] = None,
+        smtp_user: Optional[str] = None,
+        smtp_password: Optional[str] = None,
+    ):
+        self.smtp_host = smtp_host or os.getenv("SMTP_HOST", "smtp.gmail.com")
+        self.smtp_port = smtp_port or int(os.getenv("SMTP_PORT", "587"))
+        self.smtp_user = smtp_user if smtp_user is not None else os.getenv("SMTP_USER", "")
+        self.smtp_password = (
+            smtp_password if smtp_password is not None else os.getenv("SMTP_PASSWORD", "")
+        )
+
+        pool_size = int(os.getenv("SMTP_POOL_SIZE", "4"))
+        self.num_workers = int(os.getenv("EMAIL_WORKERS", str(pool_size)))
+        self.queue_maxsize = int(os.getenv("EMAIL_QUEUE_MAXSIZE", "10000"))
+        self.max_retries = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+        self.batch_size = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+        rate = float(os.getenv("EMAIL_RATE_LIMIT", "10"))
+
+        self.pool = SMTPConnectionPool(
+            host=self.smtp_host,
+            port=self.smtp_port,
+            user=self.smtp_user,
+            password=self.smtp_password,
+            max_size=pool_size,
+        )
+        self._rate_limiter = _RateLimiter(rate, burst=max(1, int(rate)))
+        self._orcamentos: Dict[str, _RateLimiter] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # Retentativas aguardando o backoff (task -> job) para o stop() drenar
+        self._retries_pendentes: Dict[asyncio.Task, EmailJob] = {}
+        self._running = False
+        self._parando = False
+
+        self._stats: Dict[str, int] = {
+            "enviados": 0,
+            "falhas": 0,
+            "retentativas": 0,
+            "descartados_fila_cheia": 0,
+        }
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.smtp_user and self.smtp_password)
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Inicia os workers de entrega"""
+        self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        if self._running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_maxsize)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"email-worker-{i}")
+            for i in range(max(1, self.num_workers))
+        ]
+        self._running = True
+        self._parando = False
+        logger.info(
+            "EmailDeliveryEngine iniciado (%d workers, pool=%d)",
+            len(self._workers),
+            self.pool.max_size,
+        )
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """
+        Drena a fila (até ``drain_timeout``) e encerra os workers.
+
+        Retentativas ainda no backoff voltam para a fila na hora, em vez de
+        serem canceladas; o que não for entregue no prazo é contado como falha
+        e os chamadores com ``aguardar`` recebem o total parcial.
+        """
+        if not self._running:
+            self.pool.close()
+            return
+
+        self._parando = True
+        for task, job in list(self._retries_pendentes.items()):
+            if not task.done():
+                task.cancel()
+                self._reenfileirar_agora(job)
+        self._retries_pendentes.clear()
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        nao_entregues = 0
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            self._queue.task_done()
+            nao_entregues += self._descartar_job(job)
+        if nao_entregues:
+            logger.warning(
+                "EmailDeliveryEngine encerrado com %d mensagem(ns) não entregue(s)",
+                nao_entregues,
+            )
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._running = False
+
+        await asyncio.to_thread(self.pool.close)
+        logger.info("EmailDeliveryEngine parado")
+
+    # ------------------------------------------------------------------
+    # API de envio
+    # ------------------------------------------------------------------
+
+    def deliver_now(self, mensagens: List[Message]) -> int:
+        """
+        Entrega síncrona reaproveitando o pool (para chamadores não-async).
+
+        Returns:
+            Quantidade de mensagens aceitas pelo servidor
+        """
+        return self._entregar_lote(mensagens)
+
+    async def enqueue(
+        self, mensagens: List[Message], aguardar: bool = False
+    ) -> int:
+        """
+        Enfileira mensagens para entrega em background.
+
+        Com a fila cheia os lotes restantes são descartados, mas os que já
+        entraram seguem para entrega; por isso o retorno é uma contagem.
+
+        Args:
+            mensagens: Mensagens MIME já montadas
+            aguardar: Se True, aguarda a entrega e retorna o resultado real
+
+        Returns:
+            Quantidade de mensagens enfileiradas (ou entregues, quando ``aguardar``)
+        """
+        jobs = await self._enfileirar(mensagens, aguardar)
+        if not aguardar:
+            return sum(len(job.mensagens) for job in jobs)
+
+        enviados = await asyncio.gather(*(job.resultado for job in jobs))
+        return sum(enviados)
+
+    async def entregar_lote(
+        self, mensagens: List[Message], orcamento: Optional[str] = None
+    ) -> List[bool]:
+        """
+        Enfileira um lote grande e aguarda a conclusão dos lotes SMTP, não de
+        cada mensagem.
+
+        Com ``orcamento`` o lote é cadenciado na entrada da fila pela taxa
+        ``EMAIL_RATE_LIMIT_<ORCAMENTO>``, sem consumir o limite geral nem
+        ocupar os workers esperando token (envios transacionais seguem).
+
+        Returns:
+            Para cada mensagem, se foi aceita pelo servidor
+        """
+        jobs = await self._enfileirar(mensagens, True, orcamento)
+        await asyncio.gather(*(job.resultado for job in jobs))
+
+        entregues: List[bool] = []
+        for job in jobs:
+            entregues += [True] * job.enviados
+            entregues += [False] * (len(job.mensagens) - job.enviados)
+        return entregues + [False] * (len(mensagens) - len(entregues))
+
+    async def _enfileirar(
+        self,
+        mensagens: List[Message],
+        aguardar: bool,
+        orcamento: Optional[str] = None,
+    ) -> List[EmailJob]:
+        """Divide em lotes de ``batch_size`` e enfileira; devolve os que entraram"""
+        if not mensagens:
+            return []
+        if not self.is_configured:
+            logger.error("Configurações de email não definidas")
+            return []
+
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        limitador = self._orcamento(orcamento) if orcamento else None
+
+        jobs: List[EmailJob] = []
+        enfileiradas = 0
+        for inicio in range(0, len(mensagens), self.batch_size):
+            job = EmailJob(
+                mensagens=mensagens[inicio : inicio + self.batch_size],
+                limitar=limitador is None,
+            )
+            if aguardar:
+                job.resultado = loop.create_future()
+            if limitador is not None:
+                await limitador.acquire(len(job.mensagens))
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                descartadas = len(mensagens) - enfileiradas
+                self._stats["descartados_fila_cheia"] += descartadas
+                logger.error(
+                    "Fila de emails cheia (%d lotes) - %d de %d mensagem(ns) descartada(s)",
+                    self.queue_maxsize,
+                    descartadas,
+                    len(mensagens),
+                )
+                break
+            enfileiradas += len(job.mensagens)
+            jobs.append(job)
+        return jobs
+
+    def _orcamento(self, nome: str) -> _RateLimiter:
+        """Token bucket de um orçamento nomeado (criado na primeira chamada)"""
+        limitador = self._orcamentos.get(nome)
+        if limitador is None:
+            rate = float(os.getenv(f"EMAIL_RATE_LIMIT_{nome.upper()}", "5"))
+            limitador = _RateLimiter(rate, burst=max(1, int(rate)))
+            self._orcamentos[nome] = limitador
+        return limitador
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas do motor de entrega"""
+        return {
+            **self._stats,
+            "fila": self._queue.qsize() if self._queue is not None else 0,
+            "retentativas_agendadas": len(self._retries_pendentes),
+            "conexoes_abertas": self.pool.abertas,
+            "workers": len(self._workers),
+        }
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    def _entregar_lote(self, mensagens: List[Message]) -> int:
+        """Envia um lote sobre uma única conexão do pool"""
+        job = EmailJob(mensagens=mensagens)
+        self._entregar_job(job)
+        return job.enviados
+
+    def _entregar_job(self, job: EmailJob) -> None:
+        """
+        Envia as mensagens ainda pendentes do job (executa em thread).
+
+        ``job.enviados`` avança a cada mensagem aceita, de modo que uma
+        retentativa após falha parcial não reenvia o que já foi entregue.
+        """
+        with self.pool.connection() as conexao:
+            for msg in job.mensagens[job.enviados :]:
+                conexao.server.send_message(msg)
+                conexao.mensagens_enviadas += 1
+                job.enviados += 1
+                logger.info("Email enviado com sucesso para %s", msg["To"])
+
+    async def _worker(self, indice: int) -> None:
+        while True:
+            job: EmailJob = await self._queue.get()
+            try:
+                await self._processar(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Erro inesperado no email-worker-%d: %s", indice, e)
+                self._finalizar(job, job.enviados)
+            finally:
+                self._queue.task_done()
+
+    async def _processar(self, job: EmailJob) -> None:
+        if job.limitar:
+            await self._rate_limiter.acquire(len(job.mensagens) - job.enviados)
+
+        ja_enviados = job.enviados
+        try:
+            await asyncio.to_thread(self._entregar_job, job)
+            self._stats["enviados"] += job.enviados - ja_enviados
+            self._finalizar(job, job.enviados)
+        except Exception as e:
+            self._stats["enviados"] += job.enviados - ja_enviados
+            if _erro_transitorio(e) and job.tentativa < self.max_retries:
+                self._agendar_retentativa(job, e)
+                return
+
+            pendentes = job.mensagens[job.enviados :]
+            self._stats["falhas"] += len(pendentes)
+            if isinstance(e, smtplib.SMTPAuthenticationError):
+                logger.error("Erro de autenticação SMTP - verifique usuário e senha")
+            else:
+                logger.error(
+                    "Falha definitiva ao enviar %d email(s) após %d tentativa(s): %s",
+                    len(pendentes),
+                    job.tentativa + 1,
+                    e,
+                )
+            self._finalizar(job, job.enviados)
+
+    def _agendar_retentativa(self, job: EmailJob, erro: Exception) -> None:
+        job.tentativa += 1
+        self._stats["retentativas"] += 1
+        # Backoff exponencial com jitter para não sincronizar retentativas
+        atraso = min(60.0, (2 ** job.tentativa)) * (0.5 + random.random())
+        logger.warning(
+            "Erro transitório ao enviar email (%s) - tentativa %d/%d em %.1fs",
+            erro,
+            job.tentativa,
+            self.max_retries,
+            atraso,
+        )
+
+        if self._parando:
+            # Encerrando: sem backoff, o stop() está drenando a fila agora
+            self._reenfileirar_agora(job)
+            return
+
+        async def _reenfileirar():
+            await asyncio.sleep(atraso)
+            await self._queue.put(job)
+
+        task = asyncio.create_task(_reenfileirar())
+        self._retries_pendentes[task] = job
+        task.add_done_callback(lambda t: self._retries_pendentes.pop(t, None))
+
+    def _reenfileirar_agora(self, job: EmailJob) -> None:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._descartar_job(job)
+
+    def _descartar_job(self, job: EmailJob) -> int:
+        """Conta como falha o que o job não entregou e libera quem aguarda"""
+        pendentes = len(job.mensagens) - job.enviados
+        self._stats["falhas"] += pendentes
+        self._finalizar(job, job.enviados)
+        return pendentes
+
+    @staticmethod
+    def _finalizar(job: EmailJob, enviados: int) -> None:
+        if job.resultado is not None and not job.resultado.done():
+            job.resultado.set_result(enviados)
+
+
+# Singleton do motor
+_email_delivery_engine: Optional[EmailDeliveryEngine] = None
+
+
+def get_email_delivery_engine() -> EmailDeliveryEngine:
+    """Retorna instância singleton do motor de entrega"""
+    global _email_delivery_engine
+    if _email_delivery_engine is None:
+        _email_delivery_engine = EmailDeliveryEngine()
+    return _email_delivery_engine
+
+
+async def iniciar_email_delivery():
+    """Inicia os workers de entrega de email"""
+    await get_email_delivery_engine().start()
+
+
+async def parar_email_delivery():
+    """Drena a fila e encerra o motor de entrega de email"""
+    await get_email_delivery_engine().stop()
@@ -5,7 +5,13 @@ import os
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import List, Optional
+from string import Template
+from typing import Any, Dict, List, Optional
+
+from src.services.email_delivery_service import (
+    EmailDeliveryEngine,
+    get_email_delivery_engine,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +30,9 @@ class EmailService:
             os.getenv("URL_PERMITIDA", "http://localhost:3000"),
         )
 
+        # Motor compartilhado: pool SMTP persistente + fila assíncrona
+        self.delivery: EmailDeliveryEngine = get_email_delivery_engine()
+
         # Validar configurações
         if not self.smtp_user or not self.smtp_password:
             logger.warning(
@@ -76,19 +85,14 @@ class EmailService:
         try:
             # Converter para lista se for string
             recipients = [to] if isinstance(to, str) else to
+            mensagens = [
+                self._create_message(recipient, subject, html_body, text_body)
+                for recipient in recipients
+            ]
 
-            # Criar conexão SMTP
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-
-                # Enviar para cada destinatário
-                for recipient in recipients:
-                    msg = self._create_message(recipient, subject, html_body, text_body)
-                    server.send_message(msg)
-                    logger.info(f"Email enviado com sucesso para {recipient}")
-
-            return True
+            # Reaproveita conexão autenticada do pool (sem STARTTLS/login por envio)
+            enviados = self.delivery.deliver_now(mensagens)
+            return enviados == len(mensagens)
 
         except smtplib.SMTPAuthenticationError:
             logger.error("Erro de autenticação SMTP - verifique usuário e senha")
@@ -100,9 +104,120 @@ class EmailService:
             logger.error(f"Erro inesperado ao enviar email: {e}")
             return False
 
-    def send_password_reset_email(self, email: str, token: str, user_name: str) -> bool:
+    async def send_email_async(
+        self,
+        to: str | List[str],
+        subject: str,
+        html_body: str,
+        text_body: Optional[str] = None,
+        aguardar: bool = False,
+    ) -> bool:
+        """
+        Enfileira email para entrega em background, sem bloquear o event loop
+
+        Args:
+            to: Email(s) de destino
+            subject: Assunto do email
+            html_body: Corpo do email em HTML
+            text_body: Corpo do email em texto plano (opcional)
+            aguardar: Se True, aguarda a entrega e retorna o resultado do SMTP
+
+        Returns:
+            True se enfileirado (ou entregue, quando aguardar=True)
+        """
+        recipients = [to] if isinstance(to, str) else to
+        mensagens = [
+            self._create_message(recipient, subject, html_body, text_body)
+            for recipient in recipients
+        ]
+        if not mensagens:
+            return True
+        return await self.delivery.enqueue(mensagens, aguardar=aguardar) == len(mensagens)
+
+    async def send_batch_async(
+        self,
+        emails: List[Dict[str, Any]],
+        orcamento: Optional[str] = None,
+    ) -> List[bool]:
+        """
+        Entrega um lote de emails já renderizados e aguarda o lote inteiro
+
+        Args:
+            emails: Dicts com ``to``, ``subject``, ``html_body`` e ``text_body`` (opcional)
+            orcamento: Orçamento de taxa próprio (ex: "broadcast"), separado do geral
+
+        Returns:
+            Para cada email, se foi aceito pelo servidor SMTP
+        """
+        mensagens = [
+            self._create_message(
+                email["to"], email["subject"], email["html_body"], email.get("text_body")
+            )
+            for email in emails
+        ]
+        return await self.delivery.entregar_lote(mensagens, orcamento=orcamento)
+
+    async def send_bulk_email(
+        self,
+        destinatarios: List[Dict[str, Any]],
+        subject_template: str,
+        html_template: str,
+        text_template: Optional[str] = None,
+        aguardar: bool = False,
+    ) -> bool:
+        """
+        Envio em massa com templates compilados uma única vez
+
+        Os templates usam placeholders ``$nome``/``${nome}`` (string.Template)
+        substituídos pelo contexto de cada destinatário. As mensagens são
+        entregues em lotes sobre conexões SMTP reaproveitadas.
+
+        Args:
+            destinatarios: Lista de dicts com ``email`` e demais variáveis do template
+            subject_template: Template do assunto
+            html_template: Template do corpo HTML
+            text_template: Template do corpo texto plano (opcional)
+            aguardar: Se True, aguarda a entrega de todos os lotes
+
+        Returns:
+            True se todos foram enfileirados (ou entregues, quando aguardar=True)
+
+        Example:
+            await email_service.send_bulk_email(
+                [{"email": "ana@x.com", "nome": "Ana", "data": "10/11 14:00"}],
+                subject_template="Lembrete: consulta em $data",
+                html_template="<p>Olá $nome, sua consulta é em $data.</p>",
+            )
         """
-        Envia email de recuperação de senha
+        subject_tpl = Template(subject_template)
+        html_tpl = Template(html_template)
+        text_tpl = Template(text_template) if text_template else None
+        base_context = {"frontend_url": self.frontend_url}
+
+        mensagens = []
+        for destinatario in destinatarios:
+            email = destinatario.get("email")
+            if not email:
+                continue
+            context = {**base_context, **destinatario}
+            mensagens.append(
+                self._create_message(
+                    email,
+                    subject_tpl.safe_substitute(context),
+                    html_tpl.safe_substitute(context),
+                    text_tpl.safe_substitute(context) if text_tpl else None,
+                )
+            )
+
+        if not mensagens:
+            return True
+        enfileiradas = await self.delivery.enqueue(mensagens, aguardar=aguardar)
+        logger.info(f"Envio em massa: {enfileiradas}/{len(mensagens)} email(s) enfileirado(s)")
+        return enfileiradas == len(mensagens)
+
+    async def send_password_reset_email(self, email: str, token: str, user_name: str) -> bool:
+        """
+        Envia email de recuperação de senha pelo motor de entrega (aguarda o SMTP)
 
         Args:
             email: Email do usuário
@@ -231,16 +346,17 @@ Esta é uma mensagem automática, por favor não responda.
 © 2025 DoctorQ. Todos os direitos reservados.
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email,
             subject="Recuperação de Senha - DoctorQ",
             html_body=html_body,
             text_body=text_body,
+            aguardar=True,
         )
 
-    def send_password_changed_notification(self, email: str, user_name: str) -> bool:
+    async def send_password_changed_notification(self, email: str, user_name: str) -> bool:
         """
-        Envia notificação de senha alterada
+        Enfileira notificação de senha alterada (entrega em background)
 
         Args:
             email: Email do usuário
@@ -324,14 +440,14 @@ Esta é uma mensagem automática, por favor não responda.
 © 2025 DoctorQ. Todos os direitos reservados.
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email,
             subject="Senha Alterada - DoctorQ",
             html_body=html_body,
             text_body=text_body,
         )
 
-    def send_user_limit_warning_email(
+    async def send_user_limit_warning_email(
         self,
         email: str,
         empresa_name: str,
@@ -341,7 +457,7 @@ Esta é uma mensagem automática, por favor não responda.
         percentage: float,
     ) -> bool:
         """
-        Envia notificação de limite de usuários atingindo 90%
+        Enfileira notificação de limite de usuários atingindo 90% (entrega em background)
 
         Args:
             email: Email do administrador
@@ -352,7 +468,7 @@ Esta é uma mensagem automática, por favor não responda.
             percentage: Percentual de uso (ex: 92.5)
 
         Returns:
-            True se enviado com sucesso
+            True se enfileirado
         """
         # Link para gerenciar usuários
         manage_link = f"{self.frontend_url}/admin/usuarios"
@@ -559,7 +675,7 @@ Precisa de ajuda? suporte@doctorq.app
 © 2025 DoctorQ. Todos os direitos reservados.
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email,
             subject=f"⚠️ {empresa_name}: {percentage:.0f}% do limite de usuários atingido",
             html_body=html_body,
@@ -695,7 +811,7 @@ Precisa de ajuda? suporte@doctorq.app
 © 2025 DoctorQ. Todos os direitos reservados.
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email,
             subject=f"✨ {empresa_name}: Upgrade para {new_plan} realizado!",
             html_body=html_body,
@@ -864,7 +980,7 @@ Precisa de ajuda? suporte@doctorq.app
 © 2025 DoctorQ. Todos os direitos reservados.
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email,
             subject=f"{alert_icon} {empresa_name}: Trial termina em {days_remaining} {'dia' if days_remaining == 1 else 'dias'}",
             html_body=html_body,
@@ -978,7 +1094,7 @@ Precisa de ajuda? suporte@doctorq.app
 © 2025 DoctorQ
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email,
             subject=f"🎉 Bem-vindo ao DoctorQ, {user_name}!",
             html_body=html_body,
@@ -1084,7 +1200,7 @@ Precisa de ajuda? suporte@doctorq.app
 </html>
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email,
             subject=f"✅ Agendamento Confirmado - {procedimento_nome}",
             html_body=html_body,
@@ -1169,7 +1285,7 @@ Precisa de ajuda? suporte@doctorq.app
 </html>
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email,
             subject=f"💰 Pagamento Confirmado - R$ {valor:.2f}",
             html_body=html_body,
@@ -1326,7 +1442,7 @@ Esta é uma mensagem automática, por favor não responda.
 © 2025 DoctorQ
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email_empresa,
             subject=f"🎉 Nova Candidatura: {nm_cargo}",
             html_body=html_body,
@@ -1557,7 +1673,7 @@ Esta é uma mensagem automática, por favor não responda.
 © 2025 DoctorQ
 """
 
-        return self.send_email(
+        return await self.send_email_async(
             to=email_candidato,
             subject=f"{status_info['emoji']} {nm_cargo} - {status_info['titulo']}",
             html_body=html_body,
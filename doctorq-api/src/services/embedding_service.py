@@ -1,4 +1,5 @@
 ﻿import hashlib
+import logging
 import uuid
 from datetime import datetime
 from typing import Any, Dict, List, Optional
@@ -280,23 +281,34 @@ class EmbeddingService:
         user_unidades: Optional[List[str]] = None,
     ) -> List[DocumentSearchResult]:
         """Buscar embeddings similares usando pgvector"""
-        logger.debug(
-            f"ðŸ” Iniciando busca vetorial - namespace: {namespace}, threshold: {threshold}, limit: {limit}"
-        )
-        logger.debug(f"ðŸ”§ Filtros de metadados: {metadata_filters}")
-        logger.debug(f"ðŸ¢ Unidades do usuÃ¡rio: {user_unidades}")
+        # Hot path: logs por linha só quando DEBUG está ativo para este logger
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(
+                "Iniciando busca vetorial - namespace=%s threshold=%s limit=%s "
+                "filtros=%s unidades=%s",
+                namespace,
+                threshold,
+                limit,
+                metadata_filters,
+                user_unidades,
+            )
 
         try:
-            # Primeiro, verificar quantos documentos existem
-            count_stmt = select(func.count(DocumentVector.id))
-            if namespace:
-                count_stmt = count_stmt.where(
-                    DocumentVector.doc_metadata.op("->>")("record_manager_namespace")
-                    == namespace
+            if debug:
+                # COUNT só para diagnóstico (não roda por busca fora do DEBUG)
+                count_stmt = select(func.count(DocumentVector.id))
+                if namespace:
+                    count_stmt = count_stmt.where(
+                        DocumentVector.doc_metadata.op("->>")("record_manager_namespace")
+                        == namespace
+                    )
+                count_result = await self.db.execute(count_stmt)
+                logger.debug(
+                    "Total de documentos no namespace '%s': %s",
+                    namespace,
+                    count_result.scalar(),
                 )
-            count_result = await self.db.execute(count_stmt)
-            total_docs = count_result.scalar()
-            logger.info(f"Total de documentos no namespace '{namespace}': {total_docs}")
 
             # Usar operador de similaridade de cosseno do pgvector
             # <=> Ã© o operador de distÃ¢ncia de cosseno
@@ -316,7 +328,6 @@ class EmbeddingService:
                     DocumentVector.doc_metadata.op("->>")("record_manager_namespace")
                     == namespace
                 )
-                logger.debug(f"Aplicando filtro de namespace: {namespace}")
 
             # Aplicar filtros de metadados SEI se especificados
             if metadata_filters:
@@ -325,7 +336,6 @@ class EmbeddingService:
                         stmt = stmt.where(
                             DocumentVector.doc_metadata.op("->>")(key) == str(value)
                         )
-                        logger.debug(f"Aplicando filtro SEI: {key} = {value}")
 
             # Aplicar filtro por unidades do usuÃ¡rio (para SEI)
             if user_unidades and len(user_unidades) > 0:
@@ -341,9 +351,6 @@ class EmbeddingService:
                     from sqlalchemy import or_
 
                     stmt = stmt.where(or_(*unidade_conditions))
-                    logger.debug(
-                        f"Aplicando filtro por unidades do usuÃ¡rio: {user_unidades}"
-                    )
 
             stmt = stmt.order_by(
                 DocumentVector.embedding.cosine_distance(query_vector)
@@ -351,15 +358,19 @@ class EmbeddingService:
 
             result = await self.db.execute(stmt)
             rows = result.fetchall()
-            logger.debug(f"ðŸ“Š Query retornou {len(rows)} linhas brutas")
 
             # Converter distÃ¢ncia para similaridade (1 - distÃ¢ncia)
             search_results = []
             for i, row in enumerate(rows):
                 similarity = 1 - row.distance
-                logger.debug(
-                    f"ðŸ“ Doc {i+1}: distÃ¢ncia={row.distance:.4f}, similaridade={similarity:.4f}"
-                )
+                if debug:
+                    logger.debug(
+                        "Doc %d: distancia=%.4f similaridade=%.4f %s",
+                        i + 1,
+                        row.distance,
+                        similarity,
+                        "incluido" if similarity >= threshold else "rejeitado",
+                    )
 
                 if similarity >= threshold:
                     search_result = DocumentSearchResult(
@@ -370,21 +381,16 @@ class EmbeddingService:
                         created_at=row.created_at,
                     )
                     search_results.append(search_result)
-                    logger.debug(
-                        f"âœ… Doc {i+1} incluÃ­do (similaridade {similarity:.4f} >= {threshold})"
-                    )
-                else:
-                    logger.debug(
-                        f"âŒ Doc {i+1} rejeitado (similaridade {similarity:.4f} < {threshold})"
-                    )
 
             logger.debug(
-                f"ðŸŽ¯ Busca vetorial encontrou {len(search_results)} resultados apÃ³s filtro de threshold"
+                "Busca vetorial: %d linhas, %d resultados acima do threshold",
+                len(rows),
+                len(search_results),
             )
             return search_results
 
         except Exception as e:
-            logger.error(f"âŒ Erro na busca vetorial: {str(e)}")
+            logger.error("Erro na busca vetorial: %s", e)
             # Fallback para busca manual
             return await self._search_manual_similarity(
                 query_vector, limit, threshold, namespace, metadata_filters
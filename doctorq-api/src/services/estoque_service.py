@@ -1,11 +1,18 @@
 """
 Service para Gestão de Estoque - UC043
+
+tb_produtos.nr_quantidade_estoque é a fonte da verdade e só muda por UPDATE
+condicional (``... WHERE disponível >= :n RETURNING``): a verificação e a
+baixa acontecem na mesma instrução, sob o lock da linha, sem somar o
+histórico. A movimentação (ledger) é gravada na mesma transação, depois do
+UPDATE, e a reconciliação periódica compara os dois (migration 125).
 """
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Dict, Iterable, List, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, and_, func, update
+from sqlalchemy import select, and_, func, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models.estoque import TbMovimentacaoEstoque, TbReservaEstoque, MovimentacaoCreate
@@ -13,41 +20,178 @@ from src.config.logger_config import get_logger
 
 logger = get_logger("estoque_service")
 
+TIPOS_ENTRADA = ("entrada", "devolucao")
+
+# Chave do advisory lock da manutenção (uma instância por vez)
+LOCK_MANUTENCAO_ESTOQUE = 743001
+
+SQL_MOVIMENTAR = text("""
+    UPDATE tb_produtos
+       SET nr_quantidade_estoque = COALESCE(nr_quantidade_estoque, 0) + :delta,
+           nr_quantidade_reservada = GREATEST(nr_quantidade_reservada - :liberar, 0),
+           dt_atualizacao = now()
+     WHERE id_produto = :id_produto
+       AND (:delta >= 0
+            OR COALESCE(nr_quantidade_estoque, 0)
+               - GREATEST(nr_quantidade_reservada - :liberar, 0) + :delta >= 0)
+ RETURNING nr_quantidade_estoque
+""")
+
+SQL_RESERVAR = text("""
+    UPDATE tb_produtos
+       SET nr_quantidade_reservada = nr_quantidade_reservada + :quantidade
+     WHERE id_produto = :id_produto
+       AND COALESCE(nr_quantidade_estoque, 0) - nr_quantidade_reservada >= :quantidade
+ RETURNING nr_quantidade_reservada
+""")
+
+# Reservas ativas do agendamento para o produto, consumidas em ordem de criação
+SQL_RESERVAS_AGENDAMENTO = text("""
+    SELECT id_reserva, nr_quantidade
+      FROM tb_reservas_estoque
+     WHERE id_agendamento = :id_agendamento
+       AND id_produto = :id_produto
+       AND st_reserva = 'ativa'
+     ORDER BY dt_criacao, id_reserva
+       FOR UPDATE
+""")
+
+# Consumo total confirma a reserva; parcial mantém ativa só o que sobrou
+SQL_CONSUMIR_RESERVA = text("""
+    UPDATE tb_reservas_estoque
+       SET st_reserva = CASE WHEN nr_quantidade = :consumido THEN 'confirmada' ELSE st_reserva END,
+           nr_quantidade = CASE WHEN nr_quantidade = :consumido THEN nr_quantidade
+                                ELSE nr_quantidade - :consumido END,
+           dt_atualizacao = now()
+     WHERE id_reserva = :id_reserva
+""")
+
+# Estoque atual travado e a empresa dona do ledger (a do fornecedor, se o
+# produto não tiver uma)
+SQL_PRODUTO_PARA_AJUSTE = text("""
+    SELECT COALESCE(p.nr_quantidade_estoque, 0) AS nr_estoque,
+           COALESCE(p.id_empresa, f.id_empresa) AS id_empresa
+      FROM tb_produtos p
+      LEFT JOIN tb_fornecedores f ON f.id_fornecedor = p.id_fornecedor
+     WHERE p.id_produto = :id_produto
+       FOR UPDATE OF p
+""")
+
+SQL_LIBERAR_RESERVA = text("""
+    UPDATE tb_produtos
+       SET nr_quantidade_reservada = GREATEST(nr_quantidade_reservada - :quantidade, 0)
+     WHERE id_produto = :id_produto
+""")
+
+# Snapshot = snapshot anterior + movimentações com sequência posterior.
+# Numa única instrução ledger e tb_produtos são lidos no mesmo instante.
+SQL_SNAPSHOT = text("""
+    WITH ultimo AS (
+        SELECT DISTINCT ON (id_produto) id_produto, nr_sequencia, nr_estoque
+        FROM tb_estoque_snapshots
+        ORDER BY id_produto, nr_sequencia DESC
+    ),
+    delta AS (
+        SELECT m.id_produto,
+               SUM(CASE WHEN m.tp_movimentacao IN ('entrada', 'devolucao')
+                        THEN m.nr_quantidade ELSE -m.nr_quantidade END) AS nr_delta,
+               MAX(m.nr_sequencia) AS nr_sequencia
+        FROM tb_movimentacoes_estoque m
+        LEFT JOIN ultimo u ON u.id_produto = m.id_produto
+        WHERE m.nr_sequencia > COALESCE(u.nr_sequencia, 0)
+        GROUP BY m.id_produto
+    )
+    INSERT INTO tb_estoque_snapshots (id_produto, nr_sequencia, nr_estoque, nr_estoque_produto, nr_divergencia)
+    SELECT d.id_produto,
+           d.nr_sequencia,
+           COALESCE(u.nr_estoque, 0) + d.nr_delta,
+           COALESCE(p.nr_quantidade_estoque, 0),
+           COALESCE(p.nr_quantidade_estoque, 0) - (COALESCE(u.nr_estoque, 0) + d.nr_delta)
+    FROM delta d
+    JOIN tb_produtos p ON p.id_produto = d.id_produto
+    LEFT JOIN ultimo u ON u.id_produto = d.id_produto
+    RETURNING id_produto, nr_estoque, nr_estoque_produto, nr_divergencia
+""")
+
+
+def delta_movimentacao(tp_movimentacao: str, nr_quantidade: int) -> int:
+    """Efeito da movimentação no estoque (entrada/devolução soma, demais subtraem)."""
+    return nr_quantidade if tp_movimentacao in TIPOS_ENTRADA else -nr_quantidade
+
+
+def consolidar_itens(itens: Iterable[Tuple[UUID, int]]) -> List[Tuple[UUID, int]]:
+    """
+    Soma itens repetidos e ordena por id_produto.
+
+    Todas as transações travam produtos na mesma ordem, então reservas
+    concorrentes com itens em comum não entram em deadlock.
+    """
+    totais: Dict[UUID, int] = defaultdict(int)
+    for id_produto, nr_quantidade in itens:
+        totais[id_produto] += nr_quantidade
+    return sorted(totais.items(), key=lambda item: str(item[0]))
+
 
 class EstoqueService:
     """Service para gestão de estoque"""
 
     @staticmethod
-    async def criar_movimentacao(
+    async def _motivo_falha(db: AsyncSession, id_produto: UUID) -> str:
+        """Mensagem quando o UPDATE condicional não afetou linha (caminho de erro)."""
+        result = await db.execute(
+            text("""
+                SELECT COALESCE(nr_quantidade_estoque, 0) AS nr_estoque, nr_quantidade_reservada
+                FROM tb_produtos WHERE id_produto = :id_produto
+            """),
+            {"id_produto": id_produto},
+        )
+        row = result.first()
+        if not row:
+            return f"Produto não encontrado: {id_produto}"
+        disponivel = row.nr_estoque - row.nr_quantidade_reservada
+        return f"Estoque insuficiente para o produto {id_produto} (disponível: {max(disponivel, 0)})"
+
+    @staticmethod
+    async def movimentar(
         db: AsyncSession,
         id_empresa: UUID,
-        id_user: UUID,
-        data: MovimentacaoCreate
+        id_user: Optional[UUID],
+        data: MovimentacaoCreate,
     ) -> TbMovimentacaoEstoque:
-        """Cria movimentação e atualiza estoque"""
+        """
+        Aplica a movimentação e adiciona a linha do ledger, sem commit.
 
-        # Buscar estoque atual
-        query = select(func.coalesce(func.sum(func.case(
-            (TbMovimentacaoEstoque.tp_movimentacao.in_(['entrada', 'devolucao']), TbMovimentacaoEstoque.nr_quantidade),
-            else_=-TbMovimentacaoEstoque.nr_quantidade
-        )), 0)).where(
-            and_(
-                TbMovimentacaoEstoque.id_empresa == id_empresa,
-                TbMovimentacaoEstoque.id_produto == data.id_produto
+        Para compor com outras escritas na mesma transação (ex: pedido).
+        Saídas vinculadas a um agendamento consomem as reservas ativas dele
+        até a quantidade movimentada; o excedente da reserva continua ativo.
+        """
+        delta = delta_movimentacao(data.tp_movimentacao, data.nr_quantidade)
+
+        liberar = 0
+        if delta < 0 and data.id_agendamento:
+            result = await db.execute(
+                SQL_RESERVAS_AGENDAMENTO,
+                {"id_agendamento": data.id_agendamento, "id_produto": data.id_produto},
             )
+            for reserva in result.all():
+                consumido = min(data.nr_quantidade - liberar, reserva.nr_quantidade)
+                if consumido <= 0:
+                    break
+                await db.execute(
+                    SQL_CONSUMIR_RESERVA,
+                    {"id_reserva": reserva.id_reserva, "consumido": consumido},
+                )
+                liberar += consumido
+
+        result = await db.execute(
+            SQL_MOVIMENTAR,
+            {"id_produto": data.id_produto, "delta": delta, "liberar": liberar},
         )
-        result = await db.execute(query)
-        estoque_atual = result.scalar() or 0
-
-        # Calcular novo estoque
-        if data.tp_movimentacao in ['entrada', 'devolucao']:
-            novo_estoque = estoque_atual + data.nr_quantidade
-        else:  # saida, ajuste, reserva
-            novo_estoque = estoque_atual - data.nr_quantidade
-            if novo_estoque < 0:
-                raise ValueError("Estoque insuficiente")
+        novo_estoque = result.scalar_one_or_none()
+        if novo_estoque is None:
+            raise ValueError(await EstoqueService._motivo_falha(db, data.id_produto))
 
-        # Criar movimentação
+        # Depois do UPDATE: a sequência do ledger segue a ordem do lock do produto
         movimentacao = TbMovimentacaoEstoque(
             id_empresa=id_empresa,
             id_produto=data.id_produto,
@@ -56,24 +200,73 @@ class EstoqueService:
             id_pedido=data.id_pedido,
             tp_movimentacao=data.tp_movimentacao,
             nr_quantidade=data.nr_quantidade,
-            nr_estoque_anterior=estoque_atual,
+            nr_estoque_anterior=novo_estoque - delta,
             nr_estoque_atual=novo_estoque,
             vl_custo_unitario=data.vl_custo_unitario,
             ds_motivo=data.ds_motivo,
             ds_lote=data.ds_lote,
             dt_validade=data.dt_validade
         )
-
         db.add(movimentacao)
+        await db.flush()
+        return movimentacao
 
-        # Atualizar estoque na tabela de produtos
-        await db.execute(
-            update(TbMovimentacaoEstoque.__table__.metadata.tables['tb_produtos'])
-            .where(TbMovimentacaoEstoque.__table__.metadata.tables['tb_produtos'].c.id_produto == data.id_produto)
-            .values(nr_quantidade_estoque=novo_estoque)
+    @staticmethod
+    async def definir_estoque(
+        db: AsyncSession,
+        id_produto: UUID,
+        nr_estoque: int,
+        id_user: Optional[UUID] = None,
+        ds_motivo: Optional[str] = None,
+    ) -> Optional[TbMovimentacaoEstoque]:
+        """
+        Leva o estoque do produto a ``nr_estoque`` pelo ledger, sem commit.
+
+        A diferença vira uma entrada ou um ajuste (cadastro e edição de
+        produto). Retorna None se o estoque já era esse.
+        """
+        produto = (
+            await db.execute(SQL_PRODUTO_PARA_AJUSTE, {"id_produto": id_produto})
+        ).first()
+        if not produto:
+            raise ValueError(f"Produto não encontrado: {id_produto}")
+
+        diferenca = nr_estoque - produto.nr_estoque
+        if diferenca == 0:
+            return None
+        if produto.id_empresa is None:
+            raise ValueError(
+                f"Produto {id_produto} sem empresa (nem fornecedor com empresa): "
+                "não é possível registrar a movimentação de estoque"
+            )
+
+        return await EstoqueService.movimentar(
+            db,
+            produto.id_empresa,
+            id_user,
+            MovimentacaoCreate(
+                id_produto=id_produto,
+                tp_movimentacao="entrada" if diferenca > 0 else "ajuste",
+                nr_quantidade=abs(diferenca),
+                ds_motivo=ds_motivo,
+            ),
         )
 
-        await db.commit()
+    @staticmethod
+    async def criar_movimentacao(
+        db: AsyncSession,
+        id_empresa: UUID,
+        id_user: UUID,
+        data: MovimentacaoCreate
+    ) -> TbMovimentacaoEstoque:
+        """Cria movimentação e atualiza estoque (O(1), independente do histórico)"""
+        try:
+            movimentacao = await EstoqueService.movimentar(db, id_empresa, id_user, data)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
         await db.refresh(movimentacao)
 
         logger.info(f"Movimentação criada: {movimentacao.id_movimentacao}")
@@ -103,6 +296,50 @@ class EstoqueService:
         result = await db.execute(query)
         return list(result.scalars().all()), total or 0
 
+    @staticmethod
+    async def criar_reservas(
+        db: AsyncSession,
+        id_empresa: UUID,
+        id_agendamento: UUID,
+        itens: Iterable[Tuple[UUID, int]]
+    ) -> List[TbReservaEstoque]:
+        """
+        Reserva vários produtos para um agendamento (tudo ou nada)
+
+        Cada produto é comprometido por UPDATE condicional sobre o disponível
+        (estoque - reservado), em ordem de id_produto.
+        """
+        itens = consolidar_itens(itens)
+        dt_expiracao = datetime.utcnow() + timedelta(hours=24)
+        reservas = []
+        try:
+            for id_produto, nr_quantidade in itens:
+                result = await db.execute(
+                    SQL_RESERVAR, {"id_produto": id_produto, "quantidade": nr_quantidade}
+                )
+                if result.scalar_one_or_none() is None:
+                    raise ValueError(await EstoqueService._motivo_falha(db, id_produto))
+
+                reserva = TbReservaEstoque(
+                    id_empresa=id_empresa,
+                    id_produto=id_produto,
+                    id_agendamento=id_agendamento,
+                    nr_quantidade=nr_quantidade,
+                    st_reserva="ativa",
+                    dt_expiracao=dt_expiracao
+                )
+                db.add(reserva)
+                reservas.append(reserva)
+
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+        for reserva in reservas:
+            await db.refresh(reserva)
+        return reservas
+
     @staticmethod
     async def criar_reserva(
         db: AsyncSession,
@@ -112,32 +349,85 @@ class EstoqueService:
         nr_quantidade: int
     ) -> TbReservaEstoque:
         """Cria reserva de estoque"""
-        reserva = TbReservaEstoque(
-            id_empresa=id_empresa,
-            id_produto=id_produto,
-            id_agendamento=id_agendamento,
-            nr_quantidade=nr_quantidade,
-            st_reserva="ativa",
-            dt_expiracao=datetime.utcnow() + timedelta(hours=24)
+        reservas = await EstoqueService.criar_reservas(
+            db, id_empresa, id_agendamento, [(id_produto, nr_quantidade)]
         )
-        db.add(reserva)
-        await db.commit()
-        await db.refresh(reserva)
-        return reserva
+        return reservas[0]
 
     @staticmethod
     async def cancelar_reserva(db: AsyncSession, id_reserva: UUID) -> Optional[TbReservaEstoque]:
-        """Cancela reserva"""
-        query = select(TbReservaEstoque).where(TbReservaEstoque.id_reserva == id_reserva)
+        """Cancela reserva (reserva ativa devolve a quantidade ao disponível)"""
+        query = (
+            select(TbReservaEstoque)
+            .where(TbReservaEstoque.id_reserva == id_reserva)
+            .with_for_update()
+        )
         result = await db.execute(query)
         reserva = result.scalar_one_or_none()
 
         if reserva:
+            if reserva.st_reserva == "ativa":
+                await db.execute(
+                    SQL_LIBERAR_RESERVA,
+                    {"id_produto": reserva.id_produto, "quantidade": reserva.nr_quantidade},
+                )
             reserva.st_reserva = "cancelada"
             await db.commit()
             await db.refresh(reserva)
         return reserva
 
+    @staticmethod
+    async def expirar_reservas(db: AsyncSession) -> int:
+        """Expira reservas vencidas e devolve as quantidades (sem commit)."""
+        result = await db.execute(
+            text("""
+                UPDATE tb_reservas_estoque
+                   SET st_reserva = 'expirada', dt_atualizacao = now()
+                 WHERE st_reserva = 'ativa'
+                   AND dt_expiracao IS NOT NULL
+                   AND dt_expiracao < now()
+             RETURNING id_produto, nr_quantidade
+            """)
+        )
+        expiradas = [(row.id_produto, row.nr_quantidade) for row in result]
+        for id_produto, nr_quantidade in consolidar_itens(expiradas):
+            await db.execute(
+                SQL_LIBERAR_RESERVA, {"id_produto": id_produto, "quantidade": nr_quantidade}
+            )
+        return len(expiradas)
+
+    @staticmethod
+    async def executar_manutencao(db: AsyncSession) -> Optional[dict]:
+        """
+        Expira reservas e grava snapshots/reconciliação do ledger.
+
+        Protegido por advisory lock de transação: com várias instâncias da
+        API, só uma executa por vez (as demais retornam None).
+        """
+        adquirido = await db.scalar(
+            text("SELECT pg_try_advisory_xact_lock(:chave)"), {"chave": LOCK_MANUTENCAO_ESTOQUE}
+        )
+        if not adquirido:
+            return None
+
+        reservas_expiradas = await EstoqueService.expirar_reservas(db)
+        result = await db.execute(SQL_SNAPSHOT)
+        snapshots = result.all()
+        await db.commit()
+
+        divergentes = [row for row in snapshots if row.nr_divergencia != 0]
+        for row in divergentes:
+            logger.warning(
+                f"Divergência de estoque: produto={row.id_produto}, "
+                f"ledger={row.nr_estoque}, produto={row.nr_estoque_produto}"
+            )
+
+        return {
+            "nr_reservas_expiradas": reservas_expiradas,
+            "nr_snapshots": len(snapshots),
+            "nr_divergencias": len(divergentes),
+        }
+
     @staticmethod
     async def listar_alertas_estoque(
         db: AsyncSession,
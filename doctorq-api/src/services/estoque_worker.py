@@ -0,0 +1,87 @@
+"""
+Worker de manutenção de estoque - UC043
+
+Periodicamente expira reservas vencidas (devolvendo a quantidade ao
+disponível) e grava snapshots de reconciliação do ledger. Cada rodada custa
+proporcional às movimentações desde o snapshot anterior, não ao histórico.
+"""
+import asyncio
+import os
+from typing import Optional
+
+from src.config.logger_config import get_logger
+from src.config.orm_config import get_async_session_context
+from src.services.estoque_service import EstoqueService
+
+logger = get_logger(__name__)
+
+INTERVALO_SEGUNDOS = float(os.getenv("ESTOQUE_MANUTENCAO_INTERVALO", "900"))
+
+
+class EstoqueWorker:
+    """Executa EstoqueService.executar_manutencao em intervalo fixo."""
+
+    def __init__(self, intervalo: float = INTERVALO_SEGUNDOS):
+        self._intervalo = intervalo
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Inicia o worker."""
+        if self._running:
+            logger.warning("EstoqueWorker já está em execução")
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info("EstoqueWorker iniciado")
+
+    async def stop(self):
+        """Para o worker."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logger.info("EstoqueWorker parado")
+
+    async def executar(self) -> Optional[dict]:
+        async with get_async_session_context() as db:
+            resultado = await EstoqueService.executar_manutencao(db)
+        if resultado:
+            logger.info(f"Manutenção de estoque: {resultado}")
+        return resultado
+
+    async def _loop(self):
+        while self._running:
+            try:
+                await self.executar()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Erro na manutenção de estoque: {e}")
+            try:
+                await asyncio.sleep(self._intervalo)
+            except asyncio.CancelledError:
+                break
+
+
+_estoque_worker: Optional[EstoqueWorker] = None
+
+
+def get_estoque_worker() -> EstoqueWorker:
+    """Retorna instância singleton do worker."""
+    global _estoque_worker
+    if _estoque_worker is None:
+        _estoque_worker = EstoqueWorker()
+    return _estoque_worker
+
+
+async def iniciar_estoque_worker():
+    """Inicia o worker de manutenção de estoque."""
+    await get_estoque_worker().start()
+
+
+async def parar_estoque_worker():
+    """Para o worker de manutenção de estoque."""
+    if _estoque_worker:
+        await _estoque_worker.stop()
@@ -2,16 +2,18 @@
 Serviço de Exportação de Relatórios - UC115
 Exportação de dados em múltiplos formatos com agendamento
 """
+import asyncio
 import os
-import csv
-import json
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.config.orm_config import get_async_session_context
+
 from src.models.export import (
     TbExportJob,
     TbExportAgendamento,
@@ -23,6 +25,15 @@ from src.models.export import (
     TipoRelatorio,
     FrequenciaAgendamento
 )
+from src.services.export_stream_service import (
+    EXTENSOES,
+    FORMATOS_STREAMING,
+    contar_registros,
+    criar_writer,
+    montar_consulta,
+    stream_bytes,
+    stream_paginas,
+)
 
 
 class ExportService:
@@ -31,6 +42,9 @@ class ExportService:
     # Diretório para armazenar arquivos exportados
     EXPORT_DIR = "/tmp/exports"  # TODO: Configurar para storage permanente (S3, MinIO)
 
+    # Intervalo mínimo (s) entre gravações de progresso no job
+    INTERVALO_PROGRESSO = 2.0
+
     @staticmethod
     async def criar_export_job(
         db: AsyncSession,
@@ -42,12 +56,14 @@ class ExportService:
         Cria job de exportação
 
         Processo:
-        1. Valida filtros
+        1. Valida tipo de relatório e formato
         2. Cria job com status "pendente"
-        3. Retorna job (processamento é assíncrono)
+        3. Acorda o ExportWorker e retorna (processamento em background)
         """
-        # Criar diretório se não existe
-        os.makedirs(ExportService.EXPORT_DIR, exist_ok=True)
+        # Validar antes de enfileirar para falhar cedo com 400
+        montar_consulta(data.tp_relatorio.value, id_empresa, {})
+        if data.tp_formato.value not in EXTENSOES:
+            raise ValueError(f"Formato '{data.tp_formato.value}' ainda não suportado para exportação")
 
         job = TbExportJob(
             id_empresa=id_empresa,
@@ -55,7 +71,7 @@ class ExportService:
             tp_relatorio=data.tp_relatorio.value,
             ds_nome_relatorio=data.ds_nome_relatorio,
             tp_formato=data.tp_formato.value,
-            ds_filtros=data.filtros.model_dump() if data.filtros else {},
+            ds_filtros=data.filtros.model_dump(mode="json") if data.filtros else {},
             st_export=StatusExport.PENDENTE.value,
             dt_expiracao=datetime.utcnow() + timedelta(days=7)  # Expira em 7 dias
         )
@@ -64,9 +80,10 @@ class ExportService:
         await db.commit()
         await db.refresh(job)
 
-        # Processar job imediatamente (modo síncrono)
-        # TODO: Em produção, usar Celery para processar assincronamente
-        await ExportService._processar_job(db, job)
+        # Import tardio: export_worker depende deste módulo
+        from src.services.export_worker import notificar_export_worker
+
+        notificar_export_worker()
 
         return job
 
@@ -76,191 +93,156 @@ class ExportService:
         job: TbExportJob
     ):
         """
-        Processa job de exportação
+        Processa job de exportação em streaming
 
         Fluxo:
-        1. Atualiza status para "processando"
-        2. Busca dados do relatório
-        3. Converte para formato solicitado
-        4. Salva arquivo
-        5. Atualiza job com resultado
+        1. Conta registros (total para o progresso)
+        2. Lê o relatório em páginas via cursor server-side
+        3. Grava cada página no writer do formato (em thread)
+        4. Atualiza nr_registros_processados periodicamente
+        5. Finaliza job com caminho, tamanho e total
         """
+        os.makedirs(ExportService.EXPORT_DIR, exist_ok=True)
+
+        arquivo_nome = f"{job.tp_relatorio}_{job.id_export}.{EXTENSOES.get(job.tp_formato, job.tp_formato)}"
+        arquivo_path = os.path.join(ExportService.EXPORT_DIR, arquivo_nome)
+        filtros = job.ds_filtros or {}
+        writer = None
+        concluido = False
+
         try:
-            # Atualizar status
-            job.st_export = StatusExport.PROCESSANDO.value
-            job.dt_inicio_processamento = datetime.utcnow()
-            await db.commit()
+            total = await contar_registros(db, job.tp_relatorio, job.id_empresa, filtros)
+            await ExportService._atualizar_progresso(db, job.id_export, 0, total)
+
+            writer = await asyncio.to_thread(criar_writer, job.tp_formato, arquivo_path)
+            ultimo_progresso = time.monotonic()
+
+            # Sessão dedicada ao cursor: commits de progresso na sessão principal
+            # não podem fechar o cursor server-side aberto
+            async with get_async_session_context() as cursor_db:
+                async for pagina in stream_paginas(
+                    cursor_db, job.tp_relatorio, job.id_empresa, filtros
+                ):
+                    await asyncio.to_thread(writer.write_rows, pagina)
 
-            # Buscar dados
-            dados = await ExportService._buscar_dados_relatorio(
-                db=db,
-                id_empresa=job.id_empresa,
-                tp_relatorio=job.tp_relatorio,
-                filtros=job.ds_filtros or {}
-            )
-
-            # Gerar arquivo
-            arquivo_path = await ExportService._gerar_arquivo(
-                job_id=str(job.id_export),
-                tp_formato=job.tp_formato,
-                tp_relatorio=job.tp_relatorio,
-                dados=dados
-            )
+                    if time.monotonic() - ultimo_progresso >= ExportService.INTERVALO_PROGRESSO:
+                        await ExportService._atualizar_progresso(
+                            db, job.id_export, writer.total_linhas
+                        )
+                        ultimo_progresso = time.monotonic()
+
+            await asyncio.to_thread(writer.close)
 
             # Atualizar job
             job.st_export = StatusExport.CONCLUIDO.value
             job.dt_fim_processamento = datetime.utcnow()
             job.ds_arquivo_path = arquivo_path
-            job.ds_arquivo_url = f"/api/exports/download/{job.id_export}"
-            job.nr_total_registros = len(dados)
-
-            # Calcular tamanho do arquivo
-            if os.path.exists(arquivo_path):
-                job.nr_tamanho_bytes = os.path.getsize(arquivo_path)
+            job.ds_arquivo_url = f"/exports/download/{job.id_export}/"
+            job.nr_total_registros = writer.total_linhas
+            job.nr_registros_processados = writer.total_linhas
+            job.nr_tamanho_bytes = os.path.getsize(arquivo_path) if os.path.exists(arquivo_path) else 0
 
             await db.commit()
+            concluido = True
+
+        except asyncio.CancelledError:
+            # Worker parando ou job recuperado por outro worker: volta para a fila
+            await ExportService._reenfileirar(job.id_export, job.dt_inicio_processamento)
+            raise
 
         except Exception as e:
+            await db.rollback()
             job.st_export = StatusExport.ERRO.value
             job.ds_mensagem_erro = str(e)
             job.dt_fim_processamento = datetime.utcnow()
             await db.commit()
             raise
 
+        finally:
+            # Arquivo parcial nunca fica no disco
+            if not concluido:
+                if writer is not None:
+                    try:
+                        writer.descartar()
+                    except Exception:
+                        pass
+                if os.path.exists(arquivo_path):
+                    os.remove(arquivo_path)
+
     @staticmethod
-    async def _buscar_dados_relatorio(
-        db: AsyncSession,
-        id_empresa: UUID,
-        tp_relatorio: str,
-        filtros: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
+    async def _reenfileirar(id_export: UUID, dt_inicio_processamento: Optional[datetime]):
         """
-        Busca dados do relatório baseado no tipo
+        Devolve o job interrompido para 'pendente' (sessão própria).
 
-        Mock implementation - retorna dados fake
-        TODO: Implementar queries reais para cada tipo de relatório
+        Só se ainda for a mesma reivindicação: se outro worker já recuperou e
+        reivindicou o job, dt_inicio_processamento mudou e nada é alterado.
         """
-        # Mock data for demonstration
-        if tp_relatorio == TipoRelatorio.AGENDAMENTOS.value:
-            return [
-                {
-                    "id": "123e4567-e89b-12d3-a456-426614174000",
-                    "paciente": "João Silva",
-                    "profissional": "Dr. Maria Santos",
-                    "data": "2025-11-08",
-                    "hora": "10:00",
-                    "status": "confirmado",
-                    "procedimento": "Consulta Dermatológica",
-                    "valor": 250.00
-                },
-                {
-                    "id": "123e4567-e89b-12d3-a456-426614174001",
-                    "paciente": "Maria Oliveira",
-                    "profissional": "Dr. João Costa",
-                    "data": "2025-11-08",
-                    "hora": "14:30",
-                    "status": "pendente",
-                    "procedimento": "Limpeza de Pele",
-                    "valor": 150.00
-                }
-            ]
-
-        elif tp_relatorio == TipoRelatorio.FATURAMENTO.value:
-            return [
-                {
-                    "data": "2025-11-01",
-                    "receita": 15000.00,
-                    "despesas": 3000.00,
-                    "lucro": 12000.00,
-                    "num_atendimentos": 45
-                },
-                {
-                    "data": "2025-11-02",
-                    "receita": 18000.00,
-                    "despesas": 3500.00,
-                    "lucro": 14500.00,
-                    "num_atendimentos": 52
-                }
-            ]
-
-        elif tp_relatorio == TipoRelatorio.ESTOQUE.value:
-            return [
-                {
-                    "produto": "Creme Anti-Idade Premium",
-                    "codigo": "EST001",
-                    "estoque_atual": 25,
-                    "estoque_minimo": 10,
-                    "valor_unitario": 89.90,
-                    "valor_total": 2247.50
-                },
-                {
-                    "produto": "Sérum Vitamina C",
-                    "codigo": "EST002",
-                    "estoque_atual": 8,
-                    "estoque_minimo": 15,
-                    "valor_unitario": 65.00,
-                    "valor_total": 520.00
-                }
-            ]
-
-        # Outros tipos de relatório retornam dados vazios por enquanto
-        return []
+        try:
+            async with get_async_session_context() as db:
+                await db.execute(
+                    update(TbExportJob)
+                    .where(
+                        TbExportJob.id_export == id_export,
+                        TbExportJob.st_export == StatusExport.PROCESSANDO.value,
+                        TbExportJob.dt_inicio_processamento == dt_inicio_processamento,
+                    )
+                    .values(
+                        st_export=StatusExport.PENDENTE.value,
+                        dt_heartbeat=None,
+                        nr_registros_processados=0,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Não foi possível reenfileirar o export {id_export}: {e}")
 
     @staticmethod
-    async def _gerar_arquivo(
-        job_id: str,
-        tp_formato: str,
+    async def _atualizar_progresso(
+        db: AsyncSession,
+        id_export: UUID,
+        nr_processados: int,
+        nr_total: Optional[int] = None
+    ):
+        """Grava progresso do job com UPDATE direto (sem recarregar o ORM)"""
+        valores = {"nr_registros_processados": nr_processados}
+        if nr_total is not None:
+            valores["nr_total_registros"] = nr_total
+        await db.execute(
+            update(TbExportJob)
+            .where(TbExportJob.id_export == id_export)
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+    @staticmethod
+    def stream_relatorio(
+        id_empresa: UUID,
         tp_relatorio: str,
-        dados: List[Dict[str, Any]]
-    ) -> str:
+        tp_formato: str,
+        filtros: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[bytes]:
         """
-        Gera arquivo no formato solicitado
+        Iterador de bytes do relatório para download em streaming (CSV/NDJSON)
+
+        Valida de forma imediata (antes do envio dos headers) e abre sessão
+        própria durante a iteração, já que a sessão da requisição é fechada
+        antes do corpo da resposta ser transmitido.
 
-        Formatos suportados:
-        - Excel (.xlsx)
-        - CSV (.csv)
-        - JSON (.json)
-        - PDF (.pdf) - TODO: implementar
+        Raises:
+            ValueError: relatório ou formato não suportado
         """
-        arquivo_nome = f"{tp_relatorio}_{job_id}.{tp_formato}"
-        arquivo_path = os.path.join(ExportService.EXPORT_DIR, arquivo_nome)
+        if tp_formato not in FORMATOS_STREAMING:
+            raise ValueError("Streaming direto disponível apenas para csv e ndjson")
+        montar_consulta(tp_relatorio, id_empresa, filtros)
+
+        async def _gerar():
+            async with get_async_session_context() as db:
+                async for chunk in stream_bytes(db, tp_relatorio, tp_formato, id_empresa, filtros):
+                    yield chunk
 
-        if tp_formato == FormatoExport.CSV.value:
-            # CSV
-            with open(arquivo_path, 'w', newline='', encoding='utf-8') as f:
-                if dados:
-                    writer = csv.DictWriter(f, fieldnames=dados[0].keys())
-                    writer.writeheader()
-                    writer.writerows(dados)
-
-        elif tp_formato == FormatoExport.JSON.value:
-            # JSON
-            with open(arquivo_path, 'w', encoding='utf-8') as f:
-                json.dump(dados, f, indent=2, ensure_ascii=False, default=str)
-
-        elif tp_formato == FormatoExport.EXCEL.value:
-            # Excel - Mock implementation (requires openpyxl)
-            # TODO: Implementar com openpyxl
-            # from openpyxl import Workbook
-            # wb = Workbook()
-            # ws = wb.active
-            # ...
-            # wb.save(arquivo_path)
-
-            # Fallback para CSV temporariamente
-            with open(arquivo_path.replace('.xlsx', '.csv'), 'w', newline='', encoding='utf-8') as f:
-                if dados:
-                    writer = csv.DictWriter(f, fieldnames=dados[0].keys())
-                    writer.writeheader()
-                    writer.writerows(dados)
-            arquivo_path = arquivo_path.replace('.xlsx', '.csv')
-
-        elif tp_formato == FormatoExport.PDF.value:
-            # PDF - Mock implementation (requires reportlab)
-            # TODO: Implementar com reportlab
-            pass
-
-        return arquivo_path
+        return _gerar()
 
     @staticmethod
     async def listar_jobs(
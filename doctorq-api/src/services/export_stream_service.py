@@ -0,0 +1,450 @@
+"""
+Motor de exportação em streaming - UC115
+
+Lê os relatórios com cursores server-side do PostgreSQL, página a página,
+e grava incrementalmente em CSV, JSON, NDJSON ou XLSX (openpyxl em modo
+write-only). A memória usada é proporcional ao tamanho da página, não ao
+tamanho do relatório.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.logger_config import get_logger
+from src.models.export import FormatoExport, TipoRelatorio
+
+logger = get_logger(__name__)
+
+# Linhas buscadas por ida ao cursor server-side
+TAMANHO_PAGINA = 2000
+
+# Extensão do arquivo gerado por formato
+EXTENSOES = {
+    FormatoExport.CSV.value: "csv",
+    FormatoExport.JSON.value: "json",
+    FormatoExport.NDJSON.value: "ndjson",
+    FormatoExport.EXCEL.value: "xlsx",
+}
+
+# Content-Type por formato
+MEDIA_TYPES = {
+    FormatoExport.CSV.value: "text/csv; charset=utf-8",
+    FormatoExport.JSON.value: "application/json",
+    FormatoExport.NDJSON.value: "application/x-ndjson",
+    FormatoExport.EXCEL.value: (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    ),
+}
+
+
+# ========== Consultas por tipo de relatório ==========
+
+# Cada relatório define: SELECT/FROM, coluna de data (filtro de período),
+# coluna de clínica, coluna de profissional, coluna de status e ordenação.
+# O isolamento por empresa é sempre aplicado via tb_clinicas.id_empresa.
+_RELATORIOS: Dict[str, Dict[str, Optional[str]]] = {
+    TipoRelatorio.AGENDAMENTOS.value: {
+        "sql": """
+            SELECT
+                a.id_agendamento AS id,
+                pac.nm_paciente AS paciente,
+                prof.nm_profissional AS profissional,
+                c.nm_clinica AS clinica,
+                proc.nm_procedimento AS procedimento,
+                a.dt_agendamento AS data_hora,
+                a.nr_duracao_minutos AS duracao_minutos,
+                a.ds_status AS status,
+                a.st_confirmado AS confirmado,
+                a.vl_valor AS valor,
+                a.st_pago AS pago
+            FROM tb_agendamentos a
+            JOIN tb_clinicas c ON c.id_clinica = a.id_clinica
+            LEFT JOIN tb_pacientes pac ON pac.id_paciente = a.id_paciente
+            LEFT JOIN tb_profissionais prof ON prof.id_profissional = a.id_profissional
+            LEFT JOIN tb_procedimentos proc ON proc.id_procedimento = a.id_procedimento
+        """,
+        "col_data": "a.dt_agendamento",
+        "col_clinica": "a.id_clinica",
+        "col_profissional": "a.id_profissional",
+        "col_status": "a.ds_status",
+        "order_by": "a.dt_agendamento, a.id_agendamento",
+    },
+    TipoRelatorio.FATURAMENTO.value: {
+        "sql": """
+            SELECT
+                date_trunc('day', a.dt_agendamento)::date AS data,
+                c.nm_clinica AS clinica,
+                COUNT(*) AS num_atendimentos,
+                COALESCE(SUM(a.vl_valor), 0) AS receita,
+                COALESCE(SUM(a.vl_valor) FILTER (WHERE a.st_pago), 0) AS receita_recebida
+            FROM tb_agendamentos a
+            JOIN tb_clinicas c ON c.id_clinica = a.id_clinica
+        """,
+        "col_data": "a.dt_agendamento",
+        "col_clinica": "a.id_clinica",
+        "col_profissional": "a.id_profissional",
+        "col_status": "a.ds_status",
+        "group_by": "1, 2",
+        "order_by": "1, 2",
+    },
+    TipoRelatorio.PACIENTES.value: {
+        "sql": """
+            SELECT
+                pac.id_paciente AS id,
+                pac.nm_paciente AS nome,
+                pac.ds_email AS email,
+                pac.nr_telefone AS telefone,
+                pac.nm_cidade AS cidade,
+                pac.nm_estado AS estado,
+                c.nm_clinica AS clinica,
+                pac.nr_total_consultas AS total_consultas,
+                pac.dt_ultima_consulta AS ultima_consulta,
+                pac.dt_criacao AS data_cadastro
+            FROM tb_pacientes pac
+            JOIN tb_clinicas c ON c.id_clinica = pac.id_clinica
+        """,
+        "col_data": "pac.dt_criacao",
+        "col_clinica": "pac.id_clinica",
+        "col_profissional": "pac.id_profissional",
+        "col_status": None,
+        "order_by": "pac.dt_criacao, pac.id_paciente",
+    },
+    TipoRelatorio.AVALIACOES.value: {
+        "sql": """
+            SELECT
+                av.id_avaliacao AS id,
+                prof.nm_profissional AS profissional,
+                c.nm_clinica AS clinica,
+                av.nr_nota AS nota,
+                av.ds_comentario AS comentario,
+                av.st_recomenda AS recomenda,
+                av.st_verificada AS verificada,
+                av.dt_criacao AS data
+            FROM tb_avaliacoes av
+            JOIN tb_clinicas c ON c.id_clinica = av.id_clinica
+            LEFT JOIN tb_profissionais prof ON prof.id_profissional = av.id_profissional
+        """,
+        "col_data": "av.dt_criacao",
+        "col_clinica": "av.id_clinica",
+        "col_profissional": "av.id_profissional",
+        "col_status": None,
+        "order_by": "av.dt_criacao, av.id_avaliacao",
+    },
+    TipoRelatorio.ESTOQUE.value: {
+        "sql": """
+            SELECT
+                m.dt_criacao AS data,
+                p.nm_produto AS produto,
+                p.ds_sku AS codigo,
+                m.tp_movimentacao AS tipo,
+                m.nr_quantidade AS quantidade,
+                m.nr_estoque_anterior AS estoque_anterior,
+                m.nr_estoque_atual AS estoque_atual,
+                m.vl_custo_unitario AS custo_unitario,
+                m.ds_motivo AS motivo
+            FROM tb_movimentacoes_estoque m
+            JOIN tb_produtos p ON p.id_produto = m.id_produto
+        """,
+        "col_data": "m.dt_criacao",
+        "col_clinica": None,
+        "col_profissional": None,
+        "col_status": "m.tp_movimentacao",
+        # Movimentações já carregam id_empresa
+        "col_empresa": "m.id_empresa",
+        "order_by": "m.dt_criacao, m.id_movimentacao",
+    },
+}
+
+
+def _parse_datetime(valor: Any) -> Optional[datetime]:
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day)
+    return datetime.fromisoformat(str(valor).replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def montar_consulta(
+    tp_relatorio: str,
+    id_empresa: UUID,
+    filtros: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Monta o SQL do relatório com os filtros aplicáveis
+
+    Filtros só entram no WHERE quando informados, para que o planner use os
+    índices de data/clínica/profissional (evita ``(:x IS NULL OR col = :x)``).
+
+    Raises:
+        ValueError: se o tipo de relatório não é suportado
+    """
+    definicao = _RELATORIOS.get(tp_relatorio)
+    if not definicao:
+        raise ValueError(f"Relatório '{tp_relatorio}' ainda não suportado para exportação")
+
+    filtros = filtros or {}
+    col_empresa = definicao.get("col_empresa") or "c.id_empresa"
+    where = [f"{col_empresa} = :id_empresa"]
+    params: Dict[str, Any] = {"id_empresa": id_empresa}
+
+    dt_inicio = _parse_datetime(filtros.get("dt_inicio"))
+    dt_fim = _parse_datetime(filtros.get("dt_fim"))
+    if dt_inicio:
+        where.append(f"{definicao['col_data']} >= :dt_inicio")
+        params["dt_inicio"] = dt_inicio
+    if dt_fim:
+        where.append(f"{definicao['col_data']} <= :dt_fim")
+        params["dt_fim"] = dt_fim
+
+    for filtro, coluna in (
+        ("id_clinica", "col_clinica"),
+        ("id_profissional", "col_profissional"),
+        ("status", "col_status"),
+    ):
+        valor = filtros.get(filtro)
+        if valor and definicao.get(coluna):
+            where.append(f"{definicao[coluna]} = :{filtro}")
+            params[filtro] = valor
+
+    sql = f"{definicao['sql']} WHERE {' AND '.join(where)}"
+    if definicao.get("group_by"):
+        sql += f" GROUP BY {definicao['group_by']}"
+    sql += f" ORDER BY {definicao['order_by']}"
+    return sql, params
+
+
+async def contar_registros(
+    db: AsyncSession,
+    tp_relatorio: str,
+    id_empresa: UUID,
+    filtros: Optional[Dict[str, Any]] = None,
+) -> int:
+    """Conta as linhas do relatório (usado como total para o progresso)"""
+    sql, params = montar_consulta(tp_relatorio, id_empresa, filtros)
+    result = await db.execute(text(f"SELECT COUNT(*) FROM ({sql}) AS relatorio"), params)
+    return result.scalar() or 0
+
+
+async def stream_paginas(
+    db: AsyncSession,
+    tp_relatorio: str,
+    id_empresa: UUID,
+    filtros: Optional[Dict[str, Any]] = None,
+    tamanho_pagina: int = TAMANHO_PAGINA,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Itera o relatório em páginas usando cursor server-side
+
+    ``AsyncSession.stream`` com ``yield_per`` abre um cursor no servidor
+    (asyncpg), então apenas uma página fica em memória por vez.
+    """
+    sql, params = montar_consulta(tp_relatorio, id_empresa, filtros)
+    result = await db.stream(
+        text(sql), params, execution_options={"yield_per": tamanho_pagina}
+    )
+    async for pagina in result.mappings().partitions(tamanho_pagina):
+        yield [dict(linha) for linha in pagina]
+
+
+# ========== Serialização ==========
+
+
+def serializar_valor(valor: Any) -> Any:
+    """Converte tipos do banco para tipos simples (JSON/CSV/XLSX)"""
+    if valor is None or isinstance(valor, (str, int, float, bool)):
+        return valor
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, UUID):
+        return str(valor)
+    if isinstance(valor, (list, tuple)):
+        return ", ".join(str(v) for v in valor)
+    return str(valor)
+
+
+def _serializar_linha(linha: Dict[str, Any]) -> Dict[str, Any]:
+    return {chave: serializar_valor(valor) for chave, valor in linha.items()}
+
+
+# ========== Writers incrementais ==========
+
+
+class ExportWriter:
+    """
+    Writer incremental de arquivo de exportação
+
+    Métodos são síncronos e feitos para rodar em thread (``asyncio.to_thread``),
+    mantendo o I/O de disco fora do event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.total_linhas = 0
+
+    def write_rows(self, linhas: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def descartar(self) -> None:
+        """Libera o arquivo sem finalizá-lo (export interrompido); o caller apaga o arquivo."""
+        self._file.close()
+
+
+class CSVExportWriter(ExportWriter):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer: Optional[csv.DictWriter] = None
+
+    def write_rows(self, linhas: List[Dict[str, Any]]) -> None:
+        if not linhas:
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(linhas[0].keys()))
+            self._writer.writeheader()
+        self._writer.writerows(_serializar_linha(linha) for linha in linhas)
+        self.total_linhas += len(linhas)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class NDJSONExportWriter(ExportWriter):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write_rows(self, linhas: List[Dict[str, Any]]) -> None:
+        for linha in linhas:
+            self._file.write(json.dumps(_serializar_linha(linha), ensure_ascii=False))
+            self._file.write("\n")
+        self.total_linhas += len(linhas)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class JSONExportWriter(ExportWriter):
+    """Array JSON escrito incrementalmente (abre ``[``, vírgulas, fecha ``]``)"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write("[")
+
+    def write_rows(self, linhas: List[Dict[str, Any]]) -> None:
+        for linha in linhas:
+            if self.total_linhas:
+                self._file.write(",")
+            self._file.write("\n  ")
+            self._file.write(json.dumps(_serializar_linha(linha), ensure_ascii=False))
+            self.total_linhas += 1
+
+    def close(self) -> None:
+        self._file.write("\n]\n" if self.total_linhas else "]\n")
+        self._file.close()
+
+
+class XLSXExportWriter(ExportWriter):
+    """XLSX em modo write-only do openpyxl (linhas vão direto para o zip)"""
+
+    def __init__(self, path: str, titulo: str = "Relatorio"):
+        super().__init__(path)
+        try:
+            from openpyxl import Workbook
+        except ImportError as e:
+            raise ValueError("Exportação Excel requer o pacote 'openpyxl'") from e
+
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(title=titulo[:31])
+        self._cabecalho: Optional[List[str]] = None
+
+    def write_rows(self, linhas: List[Dict[str, Any]]) -> None:
+        if not linhas:
+            return
+        if self._cabecalho is None:
+            self._cabecalho = list(linhas[0].keys())
+            self._sheet.append(self._cabecalho)
+        for linha in linhas:
+            valores = _serializar_linha(linha)
+            self._sheet.append([valores.get(col) for col in self._cabecalho])
+        self.total_linhas += len(linhas)
+
+    def close(self) -> None:
+        self._workbook.save(self.path)
+
+    def descartar(self) -> None:
+        # Sem save: só fecha os temporários do modo write-only
+        self._workbook.close()
+
+
+_WRITERS = {
+    FormatoExport.CSV.value: CSVExportWriter,
+    FormatoExport.JSON.value: JSONExportWriter,
+    FormatoExport.NDJSON.value: NDJSONExportWriter,
+    FormatoExport.EXCEL.value: XLSXExportWriter,
+}
+
+
+def criar_writer(tp_formato: str, path: str) -> ExportWriter:
+    """
+    Instancia o writer do formato
+
+    Raises:
+        ValueError: formato não suportado (PDF ainda não implementado)
+    """
+    writer_cls = _WRITERS.get(tp_formato)
+    if not writer_cls:
+        raise ValueError(f"Formato '{tp_formato}' ainda não suportado para exportação")
+    return writer_cls(path)
+
+
+# ========== Streaming HTTP ==========
+
+FORMATOS_STREAMING = (FormatoExport.CSV.value, FormatoExport.NDJSON.value)
+
+
+async def stream_bytes(
+    db: AsyncSession,
+    tp_relatorio: str,
+    tp_formato: str,
+    id_empresa: UUID,
+    filtros: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Gera o relatório diretamente como bytes para ``StreamingResponse``
+
+    Apenas formatos de texto linha a linha (CSV/NDJSON); XLSX precisa do
+    arquivo completo e segue pelo fluxo de job.
+    """
+    if tp_formato not in FORMATOS_STREAMING:
+        raise ValueError("Streaming direto disponível apenas para csv e ndjson")
+
+    writer: Optional[csv.DictWriter] = None
+    buffer = io.StringIO()
+
+    async for pagina in stream_paginas(db, tp_relatorio, id_empresa, filtros):
+        if tp_formato == FormatoExport.CSV.value:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(pagina[0].keys()))
+                writer.writeheader()
+            writer.writerows(_serializar_linha(linha) for linha in pagina)
+        else:
+            for linha in pagina:
+                buffer.write(json.dumps(_serializar_linha(linha), ensure_ascii=False))
+                buffer.write("\n")
+
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
@@ -0,0 +1,262 @@
+"""
+Worker de exportação de relatórios - UC115
+
+Processa jobs pendentes de ``tb_export_jobs`` fora do ciclo das requisições.
+Jobs são reivindicados com ``FOR UPDATE SKIP LOCKED``, então vários processos
+da API podem rodar o worker sem processar o mesmo job duas vezes. Durante o
+processamento o worker atualiza ``dt_heartbeat``; só jobs sem heartbeat
+recente são considerados abandonados.
+"""
+import asyncio
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import select, text
+
+from src.config.logger_config import get_logger
+from src.config.orm_config import get_async_session_context
+from src.models.export import StatusExport, TbExportJob
+from src.services.export_service import ExportService
+
+logger = get_logger(__name__)
+
+
+class ExportWorker:
+    """
+    Worker para processamento de jobs de exportação.
+
+    Features:
+    - Concorrência limitada (jobs simultâneos por processo)
+    - Acordado imediatamente quando um job é criado neste processo
+    - Polling periódico para jobs criados por outros processos
+    - Heartbeat por job; retomada de jobs "processando" sem heartbeat
+      (ex: processo morto durante o export)
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 2,
+        poll_interval: float = 15.0,
+        heartbeat_interval: float = 30.0,
+    ):
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._max_concurrent = max_concurrent
+        self._poll_interval = poll_interval
+        self._em_andamento: set = set()
+        self._heartbeat_interval = heartbeat_interval
+        # Jobs em "processando" sem heartbeat há mais que isso voltam para a fila
+        self._timeout_abandonado_seg = max(300.0, heartbeat_interval * 5)
+
+    async def start(self):
+        """Inicia o worker."""
+        if self._running:
+            logger.warning("ExportWorker já está em execução")
+            return
+
+        self._running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info("ExportWorker iniciado")
+
+    async def stop(self):
+        """Para o worker."""
+        self._running = False
+        self._wakeup.set()
+        tasks = [t for t in [self._task, *self._em_andamento] if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._em_andamento.clear()
+        logger.info("ExportWorker parado")
+
+    def notificar(self):
+        """Acorda o loop para buscar novos jobs sem esperar o polling."""
+        self._wakeup.set()
+
+    async def _loop(self):
+        """Loop principal do worker."""
+        while self._running:
+            try:
+                await self._recuperar_abandonados()
+                await self._despachar_pendentes()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Erro no loop do ExportWorker: {e}")
+                await asyncio.sleep(5)
+
+    async def _despachar_pendentes(self):
+        """Reivindica jobs enquanto houver capacidade livre."""
+        while self._running and len(self._em_andamento) < self._max_concurrent:
+            id_export = await self._reivindicar_job()
+            if not id_export:
+                return
+            task = asyncio.create_task(self._executar(id_export))
+            self._em_andamento.add(task)
+            task.add_done_callback(self._em_andamento.discard)
+
+    async def _reivindicar_job(self) -> Optional[UUID]:
+        """Marca atomicamente o job pendente mais antigo como 'processando'."""
+        async with get_async_session_context() as db:
+            result = await db.execute(
+                text(
+                    """
+                    UPDATE tb_export_jobs
+                    SET st_export = :processando,
+                        dt_inicio_processamento = now(),
+                        dt_heartbeat = now(),
+                        nr_registros_processados = 0
+                    WHERE id_export = (
+                        SELECT id_export FROM tb_export_jobs
+                        WHERE st_export = :pendente
+                        ORDER BY dt_solicitacao
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id_export
+                    """
+                ),
+                {
+                    "processando": StatusExport.PROCESSANDO.value,
+                    "pendente": StatusExport.PENDENTE.value,
+                },
+            )
+            id_export = result.scalar_one_or_none()
+            await db.commit()
+            return id_export
+
+    async def _executar(self, id_export: UUID):
+        """Executa um job reivindicado em sessão própria."""
+        async with self._semaphore:
+            async with get_async_session_context() as db:
+                job = (
+                    await db.execute(
+                        select(TbExportJob).where(TbExportJob.id_export == id_export)
+                    )
+                ).scalar_one_or_none()
+                if not job:
+                    return
+
+                inicio = datetime.utcnow()
+                heartbeat = asyncio.create_task(
+                    self._manter_heartbeat(id_export, asyncio.current_task())
+                )
+                try:
+                    await ExportService._processar_job(db, job)
+                    logger.info(
+                        f"Export {id_export} concluído: {job.nr_total_registros} registros "
+                        f"em {(datetime.utcnow() - inicio).total_seconds():.1f}s"
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Erro ao processar export {id_export}: {e}")
+                finally:
+                    heartbeat.cancel()
+                    await asyncio.gather(heartbeat, return_exceptions=True)
+
+        # Pode haver mais jobs aguardando capacidade
+        self.notificar()
+
+    async def _manter_heartbeat(self, id_export: UUID, processamento: asyncio.Task):
+        """
+        Atualiza dt_heartbeat do job enquanto ele é processado.
+
+        Em sessão própria: a sessão do job fica com o cursor e os commits de
+        progresso. Se o job não está mais em 'processando' (outro worker o
+        recuperou), o processamento local é cancelado.
+        """
+        while True:
+            await asyncio.sleep(self._heartbeat_interval)
+            try:
+                async with get_async_session_context() as db:
+                    result = await db.execute(
+                        text(
+                            """
+                            UPDATE tb_export_jobs
+                            SET dt_heartbeat = now()
+                            WHERE id_export = :id_export
+                              AND st_export = :processando
+                            """
+                        ),
+                        {
+                            "id_export": id_export,
+                            "processando": StatusExport.PROCESSANDO.value,
+                        },
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"Falha no heartbeat do export {id_export}: {e}")
+                continue
+
+            if not result.rowcount:
+                logger.warning(
+                    f"Export {id_export} não está mais em processamento neste worker - cancelando"
+                )
+                processamento.cancel()
+                return
+
+    async def _recuperar_abandonados(self):
+        """Devolve para 'pendente' jobs em 'processando' sem heartbeat recente."""
+        try:
+            async with get_async_session_context() as db:
+                result = await db.execute(
+                    text(
+                        """
+                        UPDATE tb_export_jobs
+                        SET st_export = :pendente,
+                            dt_heartbeat = NULL
+                        WHERE st_export = :processando
+                          AND COALESCE(dt_heartbeat, dt_inicio_processamento)
+                              < now() - make_interval(secs => :segundos)
+                        """
+                    ),
+                    {
+                        "pendente": StatusExport.PENDENTE.value,
+                        "processando": StatusExport.PROCESSANDO.value,
+                        "segundos": self._timeout_abandonado_seg,
+                    },
+                )
+                await db.commit()
+                if result.rowcount:
+                    logger.warning(f"{result.rowcount} export(s) abandonado(s) reenfileirado(s)")
+        except Exception as e:
+            logger.warning(f"Não foi possível recuperar exports abandonados: {e}")
+
+
+# Singleton do worker
+_export_worker: Optional[ExportWorker] = None
+
+
+def get_export_worker() -> ExportWorker:
+    """Retorna instância singleton do worker."""
+    global _export_worker
+    if _export_worker is None:
+        _export_worker = ExportWorker()
+    return _export_worker
+
+
+def notificar_export_worker():
+    """Sinaliza que há job novo (no-op se o worker não estiver rodando)."""
+    if _export_worker is not None:
+        _export_worker.notificar()
+
+
+async def iniciar_export_worker():
+    """Inicia o worker de exportação."""
+    worker = get_export_worker()
+    await worker.start()
+
+
+async def parar_export_worker():
+    """Para o worker de exportação."""
+    worker = get_export_worker()
+    await worker.stop()
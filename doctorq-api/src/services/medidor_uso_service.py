@@ -0,0 +1,451 @@
+"""
+Medição de uso em tempo real (quotas de billing)
+
+- Contador atômico no Redis por (usuário, métrica, período de cobrança):
+  check_quota lê um valor em vez de somar tb_usage_metrics do período inteiro
+- track_usage incrementa o contador e acumula o delta em um hash pendente;
+  o worker de compactação grava periodicamente uma linha agregada por
+  (assinatura, usuário, métrica, período) no Postgres
+- Contador ausente (primeiro acesso no período, Redis reiniciado) é semeado
+  uma vez com o SUM do banco mais o delta ainda pendente no hash
+- Cada descarga renomeia o hash para um lote com horário de criação; lotes
+  deixados por uma instância que caiu são reprocessados depois de
+  USO_LOTE_ORFAO_SEGUNDOS, com ids determinísticos (sem contar em dobro)
+- Assinatura vigente e quotas do plano ficam em cache, invalidadas pelas
+  escritas de plano/assinatura em BillingService
+
+Sem Redis, BillingService mantém o comportamento original (INSERT por evento
+e SUM na verificação).
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.config.logger_config import get_logger
+from src.config.orm_config import get_async_session_context
+from src.models.billing import UsageMetric
+
+logger = get_logger(__name__)
+
+CHAVE_PENDENTE = "uso:pendente"
+PREFIXO_LOTE = f"{CHAVE_PENDENTE}:lote:"
+CONTEXTO_TTL_SEGUNDOS = int(os.getenv("BILLING_CONTEXTO_TTL", "300"))
+QUOTAS_TTL_SEGUNDOS = int(os.getenv("BILLING_QUOTAS_TTL", "600"))
+# Contador sobrevive ao fim do período por esta margem (leituras tardias)
+CONTADOR_MARGEM_SEGUNDOS = 2 * 24 * 3600
+FLUSH_INTERVALO_SEGUNDOS = float(os.getenv("USO_FLUSH_INTERVALO", "30"))
+# Lote sem dono há mais que isso (instância caiu no meio da descarga)
+LOTE_ORFAO_SEGUNDOS = int(os.getenv("USO_LOTE_ORFAO_SEGUNDOS", "300"))
+
+# Incrementa só se o contador já foi semeado; senão a próxima leitura semeia
+# a partir do banco (que já contém o valor gravado)
+_INCREMENTAR_SE_EXISTIR = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBYFLOAT', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+# KEYS[1] = hash pendente, KEYS[2..] = contadores; ARGV[1] = ttl e, por
+# contador, (total do banco, campo pendente). SET NX: outra instância pode
+# ter semeado antes
+_SEMEAR = """
+for i = 2, #KEYS do
+    local j = (i - 1) * 2
+    local pendente = tonumber(redis.call('HGET', KEYS[1], ARGV[j + 1]) or '0')
+    local valor = tonumber(ARGV[j]) + pendente
+    redis.call('SET', KEYS[i], string.format('%.17g', valor), 'NX', 'EX', ARGV[1])
+end
+return #KEYS - 1
+"""
+
+
+@dataclass(frozen=True)
+class ContextoCobranca:
+    """Assinatura vigente do usuário (período e plano) + quotas do plano"""
+
+    id_subscription: str
+    id_plan: str
+    dt_period_start: datetime
+    dt_period_end: datetime
+    quotas: Dict[str, float] = field(default_factory=dict, compare=False)
+
+    def serializar(self) -> str:
+        dados = asdict(self)
+        dados.pop("quotas")
+        dados["dt_period_start"] = self.dt_period_start.isoformat()
+        dados["dt_period_end"] = self.dt_period_end.isoformat()
+        return json.dumps(dados)
+
+    @classmethod
+    def desserializar(cls, bruto: str, quotas: Dict[str, float]) -> "ContextoCobranca":
+        dados = json.loads(bruto)
+        return cls(
+            id_subscription=dados["id_subscription"],
+            id_plan=dados["id_plan"],
+            dt_period_start=datetime.fromisoformat(dados["dt_period_start"]),
+            dt_period_end=datetime.fromisoformat(dados["dt_period_end"]),
+            quotas=quotas,
+        )
+
+    def contem(self, inicio: datetime, fim: datetime) -> bool:
+        """Registro com esse período entra na soma do período corrente?"""
+        return inicio >= self.dt_period_start and fim <= self.dt_period_end
+
+
+def chave_contador(id_user, metric_type: str, periodo_inicio: datetime) -> str:
+    return f"uso:contador:{id_user}:{metric_type}:{periodo_inicio.isoformat()}"
+
+
+def chave_contexto(id_user) -> str:
+    return f"billing:contexto:{id_user}"
+
+
+def chave_quotas(id_plan) -> str:
+    return f"billing:plano:{id_plan}:quotas"
+
+
+def campo_pendente(
+    id_subscription, id_user, metric_type: str, inicio: datetime, fim: datetime
+) -> str:
+    """Campo do hash pendente: identifica a linha agregada que será gravada."""
+    return json.dumps(
+        [str(id_subscription), str(id_user), metric_type, inicio.isoformat(), fim.isoformat()]
+    )
+
+
+def chave_lote(id_lote: str, criado_em: float) -> str:
+    return f"{PREFIXO_LOTE}{int(criado_em)}:{id_lote}"
+
+
+def linhas_pendentes(pendentes: Dict[str, str], id_lote: Optional[str] = None) -> List[dict]:
+    """
+    Converte o hash pendente em linhas para INSERT em tb_usage_metrics.
+
+    Com ``id_lote`` o id de cada linha é derivado do lote e do campo, então
+    regravar o mesmo lote (após queda no meio da descarga) não duplica uso.
+    """
+    linhas = []
+    for campo, valor in pendentes.items():
+        nr_value = Decimal(valor).quantize(Decimal("0.01"))
+        if nr_value <= 0:
+            continue
+        id_subscription, id_user, metric_type, inicio, fim = json.loads(campo)
+        linhas.append({
+            "id_metric": uuid.uuid5(uuid.UUID(id_lote), campo) if id_lote else uuid.uuid4(),
+            "id_subscription": uuid.UUID(id_subscription),
+            "id_user": uuid.UUID(id_user),
+            "nm_metric_type": metric_type,
+            "nr_value": nr_value,
+            "dt_period_start": datetime.fromisoformat(inicio),
+            "dt_period_end": datetime.fromisoformat(fim),
+            "ds_metadata": {"agregado": True},
+        })
+    return linhas
+
+
+def avaliar_quota(quota: float, current_usage: float, metric_type: str) -> Tuple[bool, Dict]:
+    """Decisão de quota (-1 ilimitado, 0 bloqueado, >0 limite do período)."""
+    if quota == -1:
+        return True, {
+            "allowed": True,
+            "quota": -1,
+            "current_usage": current_usage,
+            "remaining": -1,
+        }
+
+    if quota == 0:
+        return False, {
+            "allowed": False,
+            "quota": 0,
+            "current_usage": current_usage,
+            "remaining": 0,
+            "message": f"Feature {metric_type} não incluída no plano",
+        }
+
+    remaining = quota - current_usage
+    allowed = remaining > 0
+    return allowed, {
+        "allowed": allowed,
+        "quota": quota,
+        "current_usage": current_usage,
+        "remaining": max(0, remaining),
+        "usage_percentage": (current_usage / quota) * 100 if quota > 0 else 0.0,
+    }
+
+
+class MedidorUso:
+    """Operações Redis da medição de uso (um cliente por chamada)."""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    # ------------------------------------------------------------------
+    # Contexto de cobrança (assinatura + quotas do plano)
+    # ------------------------------------------------------------------
+
+    async def obter_contexto(self, id_user) -> Optional[ContextoCobranca]:
+        bruto = await self.redis.get(chave_contexto(id_user))
+        if not bruto:
+            return None
+        id_plan = json.loads(bruto)["id_plan"]
+        quotas = await self.redis.get(chave_quotas(id_plan))
+        if quotas is None:
+            return None
+        return ContextoCobranca.desserializar(bruto, json.loads(quotas))
+
+    async def armazenar_contexto(self, id_user, contexto: ContextoCobranca) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(chave_contexto(id_user), contexto.serializar(), ex=CONTEXTO_TTL_SEGUNDOS)
+            pipe.set(chave_quotas(contexto.id_plan), json.dumps(contexto.quotas), ex=QUOTAS_TTL_SEGUNDOS)
+            await pipe.execute()
+
+    async def invalidar_contexto(self, id_user) -> None:
+        await self.redis.delete(chave_contexto(id_user))
+
+    async def invalidar_quotas(self, id_plan) -> None:
+        await self.redis.delete(chave_quotas(id_plan))
+
+    # ------------------------------------------------------------------
+    # Contadores
+    # ------------------------------------------------------------------
+
+    def _ttl_contador(self, contexto: ContextoCobranca) -> int:
+        restante = (contexto.dt_period_end - datetime.now()).total_seconds()
+        return int(max(0, restante) + CONTADOR_MARGEM_SEGUNDOS)
+
+    async def ler(
+        self, id_user, metricas: Iterable[str], contexto: ContextoCobranca
+    ) -> Dict[str, Optional[float]]:
+        """Valor atual de cada contador (None = ainda não semeado)."""
+        metricas = list(metricas)
+        if not metricas:
+            return {}
+        valores = await self.redis.mget(
+            [chave_contador(id_user, m, contexto.dt_period_start) for m in metricas]
+        )
+        return {m: (float(v) if v is not None else None) for m, v in zip(metricas, valores)}
+
+    async def semear(
+        self, id_user, totais: Dict[str, float], contexto: ContextoCobranca
+    ) -> None:
+        """
+        SET NX com o total do banco somado ao delta ainda pendente no hash
+        (incrementos feitos antes do contador sumir e ainda não descarregados).
+        """
+        if not totais:
+            return
+        chaves = [CHAVE_PENDENTE]
+        args: List = [self._ttl_contador(contexto)]
+        for metric_type, total in totais.items():
+            chaves.append(chave_contador(id_user, metric_type, contexto.dt_period_start))
+            args += [
+                repr(float(total)),
+                campo_pendente(
+                    contexto.id_subscription,
+                    id_user,
+                    metric_type,
+                    contexto.dt_period_start,
+                    contexto.dt_period_end,
+                ),
+            ]
+        await self.redis.eval(_SEMEAR, len(chaves), *chaves, *args)
+
+    async def incrementar(
+        self,
+        id_user,
+        metric_type: str,
+        valor: float,
+        contexto: ContextoCobranca,
+        campo: Optional[str] = None,
+    ) -> None:
+        """
+        Incrementa o contador (já semeado) e, com ``campo``, acumula o delta
+        pendente de gravação - na mesma transação MULTI.
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incrbyfloat(chave_contador(id_user, metric_type, contexto.dt_period_start), valor)
+            if campo:
+                pipe.hincrbyfloat(CHAVE_PENDENTE, campo, valor)
+            await pipe.execute()
+
+    async def incrementar_se_existir(
+        self, id_user, metric_type: str, valor: float, contexto: ContextoCobranca
+    ) -> None:
+        await self.redis.eval(
+            _INCREMENTAR_SE_EXISTIR,
+            1,
+            chave_contador(id_user, metric_type, contexto.dt_period_start),
+            valor,
+        )
+
+    # ------------------------------------------------------------------
+    # Compactação
+    # ------------------------------------------------------------------
+
+    async def descarregar(self) -> int:
+        """
+        Grava os deltas pendentes em tb_usage_metrics (uma linha por grupo).
+
+        O hash é renomeado atomicamente antes da leitura: incrementos novos
+        vão para um hash novo e duas instâncias nunca gravam o mesmo lote. Se
+        a gravação falhar (ou a instância cair), o lote fica no Redis e é
+        retomado como órfão; o INSERT ignora linhas já gravadas.
+        """
+        gravadas = await self._recuperar_lotes_orfaos()
+
+        id_lote = str(uuid.uuid4())
+        lote = chave_lote(id_lote, time.time())
+        try:
+            await self.redis.rename(CHAVE_PENDENTE, lote)
+        except Exception:
+            # Nada pendente (RENAME de chave inexistente)
+            return gravadas
+
+        return gravadas + await self._gravar_lote(lote, id_lote)
+
+    async def _gravar_lote(self, lote: str, id_lote: str) -> int:
+        linhas = linhas_pendentes(await self.redis.hgetall(lote), id_lote)
+        if linhas:
+            async with get_async_session_context() as db:
+                await db.execute(
+                    insert(UsageMetric).on_conflict_do_nothing(index_elements=["id_metric"]),
+                    linhas,
+                )
+                await db.commit()
+
+        await self.redis.delete(lote)
+        return len(linhas)
+
+    async def _recuperar_lotes_orfaos(self) -> int:
+        """
+        Regrava lotes criados há mais de LOTE_ORFAO_SEGUNDOS.
+
+        O lote é reivindicado com RENAME para um nome com horário novo (só
+        uma instância consegue) e mantém o id, que determina os ids das linhas.
+        """
+        limite = time.time() - LOTE_ORFAO_SEGUNDOS
+        gravadas = 0
+        async for chave in self.redis.scan_iter(match=f"{PREFIXO_LOTE}*", count=100):
+            criado_em, _, id_lote = chave[len(PREFIXO_LOTE):].rpartition(":")
+            if criado_em.isdigit() and int(criado_em) > limite:
+                continue
+
+            reivindicado = chave_lote(id_lote, time.time())
+            try:
+                await self.redis.rename(chave, reivindicado)
+            except Exception:
+                # Outra instância reivindicou antes
+                continue
+
+            logger.warning(f"Reprocessando lote de uso órfão {id_lote}")
+            try:
+                gravadas += await self._gravar_lote(reivindicado, id_lote)
+            except Exception as e:
+                # Continua no Redis e volta a ser órfão na próxima janela
+                logger.error(f"Erro ao regravar lote de uso {id_lote}: {e}")
+        return gravadas
+
+
+async def somar_uso_banco(
+    db, id_user, metricas: Iterable[str], contexto: ContextoCobranca
+) -> Dict[str, float]:
+    """SUM(nr_value) do período por métrica (semente dos contadores)."""
+    metricas = list(metricas)
+    stmt = (
+        select(UsageMetric.nm_metric_type, func.sum(UsageMetric.nr_value))
+        .where(UsageMetric.id_user == id_user)
+        .where(UsageMetric.nm_metric_type.in_(metricas))
+        .where(UsageMetric.dt_period_start >= contexto.dt_period_start)
+        .where(UsageMetric.dt_period_end <= contexto.dt_period_end)
+        .group_by(UsageMetric.nm_metric_type)
+    )
+    result = await db.execute(stmt)
+    totais = {m: 0.0 for m in metricas}
+    for metric_type, total in result.all():
+        totais[metric_type] = float(total or 0)
+    return totais
+
+
+async def get_medidor_uso() -> Optional[MedidorUso]:
+    """Medidor com o cliente Redis atual (None se o cache estiver desabilitado)."""
+    from src.config.cache_config import get_cache_client
+
+    redis_client = await get_cache_client()
+    return MedidorUso(redis_client) if redis_client else None
+
+
+class CompactadorUso:
+    """Worker que descarrega periodicamente os deltas pendentes no Postgres."""
+
+    def __init__(self, intervalo: float = FLUSH_INTERVALO_SEGUNDOS):
+        self._intervalo = intervalo
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info("CompactadorUso iniciado")
+
+    async def stop(self):
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Última descarga para não deixar deltas só no Redis
+        await self.descarregar()
+        logger.info("CompactadorUso parado")
+
+    async def descarregar(self) -> int:
+        try:
+            medidor = await get_medidor_uso()
+            if not medidor:
+                return 0
+            gravadas = await medidor.descarregar()
+            if gravadas:
+                logger.debug(f"Uso compactado: {gravadas} linhas gravadas")
+            return gravadas
+        except Exception as e:
+            logger.error(f"Erro ao compactar uso: {e}")
+            return 0
+
+    async def _loop(self):
+        while self._running:
+            try:
+                await asyncio.sleep(self._intervalo)
+                await self.descarregar()
+            except asyncio.CancelledError:
+                break
+
+
+_compactador_uso: Optional[CompactadorUso] = None
+
+
+def get_compactador_uso() -> CompactadorUso:
+    """Retorna instância singleton do compactador."""
+    global _compactador_uso
+    if _compactador_uso is None:
+        _compactador_uso = CompactadorUso()
+    return _compactador_uso
+
+
+async def iniciar_compactador_uso():
+    await get_compactador_uso().start()
+
+
+async def parar_compactador_uso():
+    if _compactador_uso:
+        await _compactador_uso.stop()
@@ -37,6 +37,7 @@ from src.models.onboarding import (
 )
 from src.models.profissionais_orm import ProfissionalORM
 from src.models.user import PapelUsuario, User
+from src.services.disponibilidade_service import invalidar_expediente
 
 logger = get_logger(__name__)
 
@@ -1380,6 +1381,7 @@ class OnboardingService:
             profissional.ds_horarios_atendimento = horarios
 
         await self.db.commit()
+        await invalidar_expediente(profissional.id_profissional)
         logger.info(f"Horários de atendimento configurados para profissional {profissional.id_profissional}")
 
         return {
@@ -0,0 +1,135 @@
+"""
+Worker de manutenção das partições mensais de mensagens (migration 128)
+
+- Mantém partições criadas com antecedência (inserções nunca caem na
+  partição DEFAULT)
+- Retenção opcional por partição: MENSAGENS_RETENCAO_MESES > 0 remove os
+  meses inteiros mais antigos que o limite (DROP da partição, sem DELETE)
+"""
+import asyncio
+import os
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+
+from src.config.logger_config import get_logger
+from src.config.orm_config import get_async_session_context
+
+logger = get_logger(__name__)
+
+TABELAS_PARTICIONADAS = ("tb_messages", "tb_mensagens_omni")
+INTERVALO_SEGUNDOS = float(os.getenv("MENSAGENS_PARTICOES_INTERVALO", "21600"))
+MESES_ANTECEDENCIA = int(os.getenv("MENSAGENS_PARTICOES_ANTECEDENCIA_MESES", "3"))
+RETENCAO_MESES = int(os.getenv("MENSAGENS_RETENCAO_MESES", "0"))
+
+# Chave do pg_try_advisory_xact_lock (uma instância por vez)
+LOCK_PARTICOES_MENSAGENS = 743003
+
+
+def somar_meses(dia: date, meses: int) -> date:
+    """Primeiro dia do mês deslocado em `meses` (negativo volta)."""
+    indice = dia.year * 12 + dia.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def limite_retencao(hoje: date, meses: int) -> Optional[date]:
+    """Partições que terminam até esta data são removidas (None = sem retenção)."""
+    if meses <= 0:
+        return None
+    return somar_meses(hoje, -meses)
+
+
+class ParticoesMensagensWorker:
+    """Cria partições futuras e aplica a retenção em intervalo fixo."""
+
+    def __init__(self, intervalo: float = INTERVALO_SEGUNDOS):
+        self._intervalo = intervalo
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Inicia o worker."""
+        if self._running:
+            logger.warning("ParticoesMensagensWorker já está em execução")
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info("ParticoesMensagensWorker iniciado")
+
+    async def stop(self):
+        """Para o worker."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logger.info("ParticoesMensagensWorker parado")
+
+    async def executar(self) -> Optional[dict]:
+        hoje = date.today()
+        limite = limite_retencao(hoje, RETENCAO_MESES)
+        resultado = {"nr_criadas": 0, "nr_removidas": 0}
+
+        async with get_async_session_context() as db:
+            adquirido = await db.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:chave)"),
+                {"chave": LOCK_PARTICOES_MENSAGENS},
+            )
+            if not adquirido:
+                return None
+
+            for tabela in TABELAS_PARTICIONADAS:
+                resultado["nr_criadas"] += await db.scalar(
+                    text("SELECT fn_criar_particoes_mensais(:tabela, :inicio, :fim)"),
+                    {
+                        "tabela": tabela,
+                        "inicio": hoje,
+                        "fim": somar_meses(hoje, MESES_ANTECEDENCIA),
+                    },
+                )
+                if limite:
+                    resultado["nr_removidas"] += await db.scalar(
+                        text("SELECT fn_remover_particoes_antigas(:tabela, :limite)"),
+                        {"tabela": tabela, "limite": limite},
+                    )
+            await db.commit()
+
+        if resultado["nr_criadas"] or resultado["nr_removidas"]:
+            logger.info(f"Partições de mensagens: {resultado}")
+        return resultado
+
+    async def _loop(self):
+        while self._running:
+            try:
+                await self.executar()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Erro na manutenção de partições de mensagens: {e}")
+            try:
+                await asyncio.sleep(self._intervalo)
+            except asyncio.CancelledError:
+                break
+
+
+_particoes_mensagens_worker: Optional[ParticoesMensagensWorker] = None
+
+
+def get_particoes_mensagens_worker() -> ParticoesMensagensWorker:
+    """Retorna instância singleton do worker."""
+    global _particoes_mensagens_worker
+    if _particoes_mensagens_worker is None:
+        _particoes_mensagens_worker = ParticoesMensagensWorker()
+    return _particoes_mensagens_worker
+
+
+async def iniciar_particoes_mensagens_worker():
+    """Inicia o worker de partições de mensagens."""
+    await get_particoes_mensagens_worker().start()
+
+
+async def parar_particoes_mensagens_worker():
+    """Para o worker de partições de mensagens."""
+    if _particoes_mensagens_worker:
+        await _particoes_mensagens_worker.stop()
@@ -24,6 +24,7 @@ from src.config.orm_config import get_db
 from src.models.empresa import Empresa
 from src.models.perfil import Perfil
 from src.models.user import User
+from src.services.permissao_cache import invalidar_permissoes_usuario
 from src.utils.security import hash_password
 from src.models.partner_lead import (
     PartnerLead,
@@ -215,6 +216,8 @@ class PartnerActivationService:
             lead.status = PartnerLeadStatus.APPROVED.value
             await self.db.commit()
             await self.db.refresh(lead)
+            # Usuário existente pode ter trocado de perfil
+            await invalidar_permissoes_usuario(user.id_user)
 
             logger.info(f"✅ Parceiro {business_name} ativado com sucesso!")
 
@@ -169,7 +169,7 @@ class PasswordResetService:
             )
 
             # Enviar email
-            email_sent = email_service.send_password_reset_email(
+            email_sent = await email_service.send_password_reset_email(
                 email=user.nm_email,
                 token=token,
                 user_name=user.nm_completo,
@@ -306,7 +306,7 @@ class PasswordResetService:
 
             # Enviar email de confirmação
             try:
-                email_service.send_password_changed_notification(
+                await email_service.send_password_changed_notification(
                     email=user.nm_email,
                     user_name=user.nm_completo,
                 )
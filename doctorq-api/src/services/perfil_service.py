@@ -11,6 +11,7 @@ from sqlalchemy.orm import selectinload
 from src.config.logger_config import get_logger
 from src.config.orm_config import get_db
 from src.models.perfil import Perfil, PerfilCreate, PerfilUpdate
+from src.services.permissao_cache import invalidar_permissoes_perfil
 
 logger = get_logger(__name__)
 
@@ -217,6 +218,7 @@ class PerfilService:
 
             await self.db.commit()
             await self.db.refresh(perfil)
+            await invalidar_permissoes_perfil(perfil.id_perfil)
 
             logger.info(f"Perfil atualizado: {perfil.nm_perfil}")
             return perfil
@@ -246,6 +248,7 @@ class PerfilService:
             perfil.dt_atualizacao = datetime.now()
 
             await self.db.commit()
+            await invalidar_permissoes_perfil(perfil.id_perfil)
 
             logger.info(f"Perfil desativado: {perfil.nm_perfil}")
             return True
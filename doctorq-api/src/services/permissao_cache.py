@@ -0,0 +1,241 @@
+"""
+Permissões compiladas e em cache
+
+O JSON aninhado do perfil ({grupo: {recurso: {acao: bool}}}) é compilado uma
+vez em um frozenset de tuplas (grupo, recurso, acao), já restrito aos grupos de
+acesso do perfil. A verificação em @require_permission vira um teste de
+pertinência.
+
+- Perfil compilado em cache por id_perfil (versão = dt_atualizacao)
+- Usuário -> perfil em cache por id_user
+- Edição de perfil/usuário invalida as entradas em todas as instâncias
+  via Redis pub/sub (canal permissoes:invalidacao)
+- Opcionalmente (PERMISSOES_NO_JWT=true) o conjunto compilado vai como claim
+  no JWT do login, dispensando até o cache; nesse modo uma alteração de
+  perfil só vale para tokens emitidos depois dela. Já a troca de perfil do
+  usuário vale na hora: as claims só são usadas se "pid" for o perfil atual.
+  Não há claim de versão, pois conferi-la exigiria o cache a cada request.
+"""
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.logger_config import get_logger
+from src.models.perfil import Perfil
+from src.models.user import User
+from src.utils.cache_local import CacheLocalTTL, CanalInvalidacao
+
+logger = get_logger(__name__)
+
+CANAL_INVALIDACAO = "permissoes:invalidacao"
+CACHE_TTL_SEGUNDOS = float(os.getenv("PERMISSOES_CACHE_TTL", "300"))
+PERMISSOES_NO_JWT = os.getenv("PERMISSOES_NO_JWT", "false").lower() == "true"
+
+# Claims do JWT (nomes curtos: vão em todo request)
+CLAIM_PERFIL = "pid"
+CLAIM_PERMISSOES = "perms"
+
+Permissao = Tuple[str, str, str]
+
+
+def compilar_permissoes(
+    grupos_acesso: Optional[Iterable[str]],
+    permissoes_detalhadas: Optional[dict],
+) -> FrozenSet[Permissao]:
+    """Achata {grupo: {recurso: {acao: bool}}} nas tuplas concedidas (só grupos do perfil)."""
+    grupos = set(grupos_acesso or [])
+    concedidas = set()
+    for grupo, recursos in (permissoes_detalhadas or {}).items():
+        if grupo not in grupos or not isinstance(recursos, dict):
+            continue
+        for recurso, acoes in recursos.items():
+            if not isinstance(acoes, dict):
+                continue
+            for acao, permitido in acoes.items():
+                if permitido:
+                    concedidas.add((grupo, recurso, acao))
+    return frozenset(concedidas)
+
+
+@dataclass(frozen=True)
+class PermissoesCompiladas:
+    """Permissões efetivas de um perfil"""
+
+    id_perfil: uuid.UUID
+    nm_perfil: str
+    versao: str
+    grupos: FrozenSet[str]
+    permissoes: FrozenSet[Permissao]
+    # Estrutura original: resposta de get_user_permissions e mensagens de negação
+    grupos_acesso: Tuple[str, ...] = field(default=(), compare=False)
+    permissoes_detalhadas: dict = field(default_factory=dict, compare=False, hash=False)
+
+    @classmethod
+    def de_perfil(cls, perfil: Perfil) -> "PermissoesCompiladas":
+        return cls(
+            id_perfil=perfil.id_perfil,
+            nm_perfil=perfil.nm_perfil,
+            versao=perfil.dt_atualizacao.isoformat() if perfil.dt_atualizacao else "",
+            grupos=frozenset(perfil.ds_grupos_acesso or []),
+            permissoes=compilar_permissoes(perfil.ds_grupos_acesso, perfil.ds_permissoes_detalhadas),
+            grupos_acesso=tuple(perfil.ds_grupos_acesso or ()),
+            permissoes_detalhadas=perfil.ds_permissoes_detalhadas or {},
+        )
+
+    def permite(self, grupo: str, recurso: str, acao: str) -> bool:
+        return (grupo, recurso, acao) in self.permissoes
+
+    def motivo_negacao(self, grupo: str, recurso: str, acao: str) -> str:
+        """Mesmas mensagens da verificação original (só no caminho de negação)."""
+        if grupo not in self.grupos:
+            return f"Perfil não tem acesso ao grupo '{grupo}'"
+        if not self.permissoes_detalhadas:
+            return "Perfil sem permissões detalhadas configuradas"
+        grupo_permissions = self.permissoes_detalhadas.get(grupo) or {}
+        if not grupo_permissions:
+            return f"Sem permissões configuradas para grupo '{grupo}'"
+        if not grupo_permissions.get(recurso):
+            return f"Sem permissões configuradas para recurso '{recurso}'"
+        return f"Sem permissão para '{acao}' em '{recurso}'"
+
+    def como_claims(self) -> dict:
+        """Claims compactos para o JWT."""
+        return {
+            CLAIM_PERFIL: str(self.id_perfil),
+            CLAIM_PERMISSOES: sorted(":".join(permissao) for permissao in self.permissoes),
+        }
+
+
+def permissao_em_claims(payload: Optional[dict], id_perfil, grupo: str, recurso: str, acao: str) -> Optional[bool]:
+    """
+    Verifica a permissão pelas claims do JWT.
+
+    Returns:
+        True/False se o token traz as permissões do perfil atual do usuário;
+        None se não traz (ou o perfil mudou) e é preciso consultar o cache.
+    """
+    if not payload or CLAIM_PERMISSOES not in payload:
+        return None
+    if not id_perfil or payload.get(CLAIM_PERFIL) != str(id_perfil):
+        return None
+    return f"{grupo}:{recurso}:{acao}" in payload[CLAIM_PERMISSOES]
+
+
+class PermissaoCache:
+    """Caches locais de perfil compilado e de usuário -> perfil."""
+
+    def __init__(self, ttl: float = CACHE_TTL_SEGUNDOS):
+        # id_perfil -> PermissoesCompiladas (None = inexistente/inativo)
+        self.perfis = CacheLocalTTL(ttl, max_entradas=5000)
+        # id_user -> id_perfil (None = inativo ou sem perfil)
+        self.usuarios = CacheLocalTTL(ttl, max_entradas=50000)
+        self._canal = CanalInvalidacao(CANAL_INVALIDACAO, self._ao_receber, self.limpar)
+
+    def limpar(self) -> None:
+        self.perfis.invalidar()
+        self.usuarios.invalidar()
+
+    def _ao_receber(self, mensagem: str) -> None:
+        tipo, _, identificador = mensagem.partition(":")
+        if tipo == "perfil" and identificador:
+            self.perfis.invalidar(identificador)
+        elif tipo == "usuario" and identificador:
+            self.usuarios.invalidar(identificador)
+        else:
+            self.limpar()
+
+    async def perfil(self, db: AsyncSession, id_perfil) -> Optional[PermissoesCompiladas]:
+        chave = str(id_perfil)
+        encontrado, compiladas = self.perfis.obter(chave)
+        if encontrado:
+            return compiladas
+
+        result = await db.execute(
+            select(Perfil).where(Perfil.id_perfil == id_perfil, Perfil.st_ativo == "S")
+        )
+        perfil = result.scalar_one_or_none()
+        compiladas = PermissoesCompiladas.de_perfil(perfil) if perfil else None
+        self.perfis.armazenar(chave, compiladas)
+        return compiladas
+
+    async def perfil_do_usuario(self, db: AsyncSession, id_user) -> Tuple[bool, Optional[uuid.UUID]]:
+        """(usuário ativo, id_perfil)"""
+        chave = str(id_user)
+        encontrado, valor = self.usuarios.obter(chave)
+        if not encontrado:
+            result = await db.execute(
+                select(User.id_perfil).where(User.id_user == id_user, User.st_ativo == "S")
+            )
+            row = result.first()
+            valor = (row is not None, row.id_perfil if row else None)
+            self.usuarios.armazenar(chave, valor)
+        return valor
+
+    async def invalidar(self, mensagem: str) -> None:
+        self._ao_receber(mensagem)
+        await self._canal.publicar(mensagem)
+
+    async def iniciar(self) -> None:
+        if not await self._canal.iniciar():
+            logger.info("Redis indisponível - invalidação de permissões limitada ao TTL do cache")
+
+    async def parar(self) -> None:
+        await self._canal.parar()
+
+
+_permissao_cache: Optional[PermissaoCache] = None
+
+
+def get_permissao_cache() -> PermissaoCache:
+    """Cache global de permissões (um por processo)"""
+    global _permissao_cache
+    if _permissao_cache is None:
+        _permissao_cache = PermissaoCache()
+    return _permissao_cache
+
+
+async def obter_permissoes_perfil(db: AsyncSession, id_perfil) -> Optional[PermissoesCompiladas]:
+    """Permissões compiladas do perfil ativo (None se inexistente/inativo)."""
+    if not id_perfil:
+        return None
+    return await get_permissao_cache().perfil(db, id_perfil)
+
+
+async def obter_perfil_usuario(db: AsyncSession, id_user) -> Tuple[bool, Optional[uuid.UUID]]:
+    """(usuário ativo, id_perfil) via cache."""
+    return await get_permissao_cache().perfil_do_usuario(db, id_user)
+
+
+async def claims_permissoes(db: AsyncSession, id_perfil) -> Dict[str, object]:
+    """Claims de permissão para o JWT (vazio se PERMISSOES_NO_JWT desativado)."""
+    if not PERMISSOES_NO_JWT or not id_perfil:
+        return {}
+    try:
+        compiladas = await obter_permissoes_perfil(db, id_perfil)
+        return compiladas.como_claims() if compiladas else {}
+    except Exception as e:
+        logger.warning(f"Não foi possível incluir permissões no JWT: {e}")
+        return {}
+
+
+async def invalidar_permissoes_perfil(id_perfil) -> None:
+    """Chamar após o commit de alteração/desativação do perfil."""
+    await get_permissao_cache().invalidar(f"perfil:{id_perfil}")
+
+
+async def invalidar_permissoes_usuario(id_user) -> None:
+    """Chamar após o commit de troca de perfil, desativação ou exclusão do usuário."""
+    await get_permissao_cache().invalidar(f"usuario:{id_user}")
+
+
+async def iniciar_permissao_cache() -> None:
+    await get_permissao_cache().iniciar()
+
+
+async def parar_permissao_cache() -> None:
+    if _permissao_cache:
+        await _permissao_cache.parar()
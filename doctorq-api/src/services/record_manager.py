@@ -35,7 +35,7 @@ class HybridRecordManager(RecordManager):
         self._redis_client = None
         self._redis_enabled = is_cache_enabled()
 
-        logger.debug(f"HybridRecordManager inicializado para namespace: {namespace}")
+        logger.debug("HybridRecordManager inicializado para namespace: %s", namespace)
 
     async def _get_redis_client(self):
         """Obter cliente Redis se disponÃ­vel"""
@@ -46,7 +46,7 @@ class HybridRecordManager(RecordManager):
             try:
                 self._redis_client = await get_cache_client()
             except Exception as e:
-                logger.warning(f"Erro ao conectar Redis: {e}")
+                logger.warning("Erro ao conectar Redis: %s", e)
                 self._redis_client = None
 
         return self._redis_client
@@ -58,7 +58,7 @@ class HybridRecordManager(RecordManager):
     async def acreate_schema(self) -> None:
         """Criar schema do banco de dados (async)"""
         await self.service.create_schema()
-        logger.debug(f"Schema criado para namespace: {self.namespace}")
+        logger.debug("Schema criado para namespace: %s", self.namespace)
 
     def create_schema(self) -> None:
         """Criar schema do banco de dados (sync)"""
@@ -94,11 +94,13 @@ class HybridRecordManager(RecordManager):
             await self._cache_keys_in_redis(keys, group_ids)
 
             logger.debug(
-                f"Upsert de {len(keys)} keys concluÃ­do no namespace: {self.namespace}"
+                "Upsert de %s keys concluÃ­do no namespace: %s",
+                len(keys),
+                self.namespace,
             )
 
         except Exception as e:
-            logger.error(f"Erro no upsert: {e}")
+            logger.error("Erro no upsert: %s", e)
             raise
 
     def update(
@@ -125,10 +127,10 @@ class HybridRecordManager(RecordManager):
             # Remover do cache Redis se disponÃ­vel
             await self._remove_keys_from_redis(keys)
 
-            logger.debug(f"Deleted {len(keys)} keys do namespace: {self.namespace}")
+            logger.debug("Deleted %s keys do namespace: %s", len(keys), self.namespace)
 
         except Exception as e:
-            logger.error(f"Erro ao deletar keys: {e}")
+            logger.error("Erro ao deletar keys: %s", e)
             raise
 
     def delete_keys(self, keys: Sequence[str]) -> None:
@@ -151,19 +153,21 @@ class HybridRecordManager(RecordManager):
             redis_result = await self._check_keys_in_redis(keys)
             if redis_result is not None:
                 logger.debug(
-                    f"VerificaÃ§Ã£o de existÃªncia via Redis para {len(keys)} keys"
+                    "VerificaÃ§Ã£o de existÃªncia via Redis para %s keys",
+                    len(keys),
                 )
                 return redis_result
 
             # Fallback para PostgreSQL
             result = await self.service.exists(self.namespace, keys)
             logger.debug(
-                f"VerificaÃ§Ã£o de existÃªncia via PostgreSQL para {len(keys)} keys"
+                "VerificaÃ§Ã£o de existÃªncia via PostgreSQL para %s keys",
+                len(keys),
             )
             return result
 
         except Exception as e:
-            logger.error(f"Erro ao verificar existÃªncia: {e}")
+            logger.error("Erro ao verificar existÃªncia: %s", e)
             raise
 
     def exists(self, keys: Sequence[str]) -> List[bool]:
@@ -200,11 +204,11 @@ class HybridRecordManager(RecordManager):
                 limit=limit,
             )
 
-            logger.debug(f"Listadas {len(keys)} keys do namespace: {self.namespace}")
+            logger.debug("Listadas %s keys do namespace: %s", len(keys), self.namespace)
             return keys
 
         except Exception as e:
-            logger.error(f"Erro ao listar keys: {e}")
+            logger.error("Erro ao listar keys: %s", e)
             raise
 
     def list_keys(
@@ -229,7 +233,7 @@ class HybridRecordManager(RecordManager):
         try:
             return await self.service.get_time()
         except Exception as e:
-            logger.error(f"Erro ao obter timestamp: {e}")
+            logger.error("Erro ao obter timestamp: %s", e)
             # Fallback para timestamp local
             return time.time()
 
@@ -259,10 +263,10 @@ class HybridRecordManager(RecordManager):
                 # Cache com TTL de 1 hora
                 await redis_client.setex(cache_key, 3600, group_id or "no_group")
 
-            logger.debug(f"Cached {len(keys)} keys no Redis")
+            logger.debug("Cached %s keys no Redis", len(keys))
 
         except Exception as e:
-            logger.warning(f"Erro ao fazer cache no Redis: {e}")
+            logger.warning("Erro ao fazer cache no Redis: %s", e)
 
     async def _remove_keys_from_redis(self, keys: Sequence[str]) -> None:
         """Remover keys do cache Redis"""
@@ -275,10 +279,10 @@ class HybridRecordManager(RecordManager):
             if cache_keys:
                 await redis_client.delete(*cache_keys)
 
-            logger.debug(f"Removidas {len(keys)} keys do cache Redis")
+            logger.debug("Removidas %s keys do cache Redis", len(keys))
 
         except Exception as e:
-            logger.warning(f"Erro ao remover cache do Redis: {e}")
+            logger.warning("Erro ao remover cache do Redis: %s", e)
 
     async def _check_keys_in_redis(self, keys: Sequence[str]) -> Optional[List[bool]]:
         """Verificar existÃªncia de keys no Redis"""
@@ -297,7 +301,7 @@ class HybridRecordManager(RecordManager):
             return [result is not None for result in exists_results]
 
         except Exception as e:
-            logger.warning(f"Erro ao verificar cache Redis: {e}")
+            logger.warning("Erro ao verificar cache Redis: %s", e)
             return None
 
     # ===========================================
@@ -325,7 +329,7 @@ class HybridRecordManager(RecordManager):
             return stats
 
         except Exception as e:
-            logger.error(f"Erro ao obter estatÃ­sticas: {e}")
+            logger.error("Erro ao obter estatÃ­sticas: %s", e)
             return {"error": str(e)}
 
     async def clear_namespace(self) -> int:
@@ -343,12 +347,14 @@ class HybridRecordManager(RecordManager):
                 await self.adelete_keys(all_keys)
 
             logger.debug(
-                f"Namespace '{self.namespace}' limpo: {len(all_keys)} records removidos"
+                "Namespace '%s' limpo: %s records removidos",
+                self.namespace,
+                len(all_keys),
             )
             return len(all_keys)
 
         except Exception as e:
-            logger.error(f"Erro ao limpar namespace: {e}")
+            logger.error("Erro ao limpar namespace: %s", e)
             raise
 
 
@@ -376,9 +382,9 @@ async def create_hybrid_record_manager(
         # Criar schema se necessÃ¡rio
         await record_manager.acreate_schema()
 
-        logger.debug(f"HybridRecordManager criado para namespace: {namespace}")
+        logger.debug("HybridRecordManager criado para namespace: %s", namespace)
         return record_manager
 
     except Exception as e:
-        logger.error(f"Erro ao criar HybridRecordManager: {e}")
+        logger.error("Erro ao criar HybridRecordManager: %s", e)
         raise
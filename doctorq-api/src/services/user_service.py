@@ -21,6 +21,7 @@ from src.models.user import (
     UserLoginLocal,
     UserUpdate,
 )
+from src.services.permissao_cache import claims_permissoes, invalidar_permissoes_usuario
 from src.services.sei.sei_service import SeiService
 from src.utils.security import (
     hash_password,
@@ -132,6 +133,7 @@ class UserService:
             "uid": str(user.id_user),
             "id_empresa": str(user.id_empresa) if user.id_empresa else None,
         }
+        claims.update(await claims_permissoes(self.db, user.id_perfil))
         token = create_access_token(subject=user.nm_email, additional_claims=claims)
         return token
 
@@ -203,6 +205,7 @@ class UserService:
             "uid": str(user.id_user),
             "id_empresa": str(user.id_empresa) if user.id_empresa else None,
         }
+        claims.update(await claims_permissoes(self.db, user.id_perfil))
         token = create_access_token(subject=user.nm_email, additional_claims=claims)
 
         return user, token
@@ -292,6 +295,7 @@ class UserService:
             # Persistir e retornar
             await self.db.commit()
             await self.db.refresh(user)
+            await invalidar_permissoes_usuario(user.id_user)
             logger.info(f"UsuÃ¡rio atualizado: {user.nm_email}")
             return user
 
@@ -312,6 +316,7 @@ class UserService:
 
             await self.db.delete(user)
             await self.db.commit()
+            await invalidar_permissoes_usuario(user_id)
             logger.info(f"UsuÃ¡rio deletado: {user.nm_email}")
             return True
 
@@ -332,6 +337,7 @@ class UserService:
 
             await self.db.commit()
             await self.db.refresh(user)
+            await invalidar_permissoes_usuario(user.id_user)
             logger.info(f"UsuÃ¡rio desativado: {user.nm_email}")
             return user
 
@@ -9,9 +9,9 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logger_config import get_logger
-from src.config.orm_config import ORMConfig, get_async_session_context
+from src.config.orm_config import ORMConfig
 from src.models.user import User
-from src.services.apikey_service import ApiKeyService
+from src.services.apikey_cache import resolver_apikey
 from src.utils.security import decode_access_token
 
 logger = get_logger(__name__)
@@ -66,20 +66,18 @@ async def get_current_apikey(
     api_key = credentials.credentials
 
     try:
-        # Validar API Key no banco
-        async with get_async_session_context() as db:
-            service = ApiKeyService(db)
-            validated_apikey = await service.get_apikey_by_key(api_key)
-
-            if not validated_apikey:
-                logger.warning(f"API Key invÃ¡lida: {api_key[:8]}...")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="API Key invÃ¡lida",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
+        # Validar API Key (hash + cache em processo; banco apenas em cache miss)
+        validated_apikey = await resolver_apikey(api_key)
 
-            return validated_apikey
+        if not validated_apikey:
+            logger.warning(f"API Key inválida: {api_key[:8]}...")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="API Key inválida",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        return validated_apikey
 
     except HTTPException:
         raise
@@ -227,37 +225,34 @@ async def get_current_user(
 
     # Se não for JWT, tentar validar como API Key global (fallback para testes/integrações)
     try:
-        async with get_async_session_context() as api_db:
-            service = ApiKeyService(api_db)
-            validated_apikey = await service.get_apikey_by_key(token)
-
-            if validated_apikey:
-                # API Key válida - retornar usuário "system" fictício com privilégios admin
-                logger.debug(f"✅ Autenticação via API Key global: {validated_apikey.keyName}")
-
-                # Se a API key tem um user associado, retornar esse user
-                if validated_apikey.id_user:
-                    stmt = select(User).where(
-                        User.id_user == validated_apikey.id_user,
-                        User.st_ativo == "S"
-                    )
-                    result = await db.execute(stmt)
-                    user = result.scalar_one_or_none()
-                    if user:
-                        logger.debug(f"✅ Retornando usuário associado à API Key: {user.nm_email}")
-                        return user
-
-                # Criar User fictício com papel admin (bypass de permissões)
-                # ✅ FIX: Incluir id_empresa da API key para suportar multi-tenant
-                system_user = User(
-                    id_user=uuid.UUID("00000000-0000-0000-0000-000000000000"),
-                    nm_email="system@doctorq.api",
-                    nm_completo="System API Key",
-                    nm_papel="admin",  # Admin bypass habilitado no decorator
-                    st_ativo='S',
-                    id_empresa=validated_apikey.id_empresa,  # ✅ FIX: Incluir empresa da API key
+        validated_apikey = await resolver_apikey(token)
+        if validated_apikey:
+            # API Key válida - retornar usuário "system" fictício com privilégios admin
+            logger.debug(f"✅ Autenticação via API Key global: {validated_apikey.keyName}")
+
+            # Se a API key tem um user associado, retornar esse user
+            if validated_apikey.id_user:
+                stmt = select(User).where(
+                    User.id_user == validated_apikey.id_user,
+                    User.st_ativo == "S"
                 )
-                return system_user
+                result = await db.execute(stmt)
+                user = result.scalar_one_or_none()
+                if user:
+                    logger.debug(f"✅ Retornando usuário associado à API Key: {user.nm_email}")
+                    return user
+
+            # Criar User fictício com papel admin (bypass de permissões)
+            # ✅ FIX: Incluir id_empresa da API key para suportar multi-tenant
+            system_user = User(
+                id_user=uuid.UUID("00000000-0000-0000-0000-000000000000"),
+                nm_email="system@doctorq.api",
+                nm_completo="System API Key",
+                nm_papel="admin",  # Admin bypass habilitado no decorator
+                st_ativo='S',
+                id_empresa=validated_apikey.id_empresa,  # ✅ FIX: Incluir empresa da API key
+            )
+            return system_user
     except Exception as e:
         logger.warning(f"Erro ao validar API Key: {str(e)}")
 
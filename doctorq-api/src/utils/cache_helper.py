@@ -3,7 +3,7 @@ Helper para cache Redis
 """
 import json
 import hashlib
-from typing import Any, Optional, Callable
+from typing import Any, Dict, List, Optional, Callable
 from datetime import timedelta
 import redis.asyncio as redis
 
@@ -11,6 +11,19 @@ from src.config.logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# KEYS: pares (chave, chave de versão); ARGV: (ttl, valor, versão lida) por par
+_SCRIPT_SET_IF_VERSION = """
+local gravadas = 0
+for i = 1, #KEYS, 2 do
+    local j = (i - 1) / 2 * 3
+    if (redis.call('GET', KEYS[i + 1]) or '') == ARGV[j + 3] then
+        redis.call('SETEX', KEYS[i], ARGV[j + 1], ARGV[j + 2])
+        gravadas = gravadas + 1
+    end
+end
+return gravadas
+"""
+
 
 class CacheHelper:
     """Helper para operações de cache Redis"""
@@ -80,6 +93,125 @@ class CacheHelper:
             logger.warning(f"Erro ao deletar cache {key}: {e}")
             return False
 
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Busca várias chaves em uma única ida ao Redis (MGET)
+
+        Returns:
+            Valores deserializados na mesma ordem das chaves (None se ausente)
+        """
+        if not self.redis or not keys:
+            return [None] * len(keys)
+
+        try:
+            values = await self.redis.mget(keys)
+            return [json.loads(value) if value else None for value in values]
+        except Exception as e:
+            logger.warning(f"Erro ao buscar {len(keys)} chaves do cache: {e}")
+            return [None] * len(keys)
+
+    async def set_many(
+        self,
+        items: Dict[str, Any],
+        ttl: int = 300,
+        ttls: Optional[Dict[str, int]] = None
+    ) -> bool:
+        """
+        Armazena várias chaves em um pipeline
+
+        Args:
+            items: Chave -> valor
+            ttl: Time-to-live padrão em segundos
+            ttls: TTL específico por chave (sobrepõe o padrão)
+        """
+        if not self.redis or not items:
+            return False
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in items.items():
+                key_ttl = ttls.get(key, ttl) if ttls else ttl
+                pipe.setex(key, max(1, key_ttl), json.dumps(value, default=str))
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Erro ao armazenar {len(items)} chaves no cache: {e}")
+            return False
+
+    async def delete_many(self, keys: List[str]) -> int:
+        """Deleta várias chaves de uma vez"""
+        if not self.redis or not keys:
+            return 0
+
+        try:
+            return await self.redis.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Erro ao deletar {len(keys)} chaves do cache: {e}")
+            return 0
+
+    async def set_many_if_version(
+        self,
+        items: Dict[str, Any],
+        versions: Dict[str, tuple],
+        ttl: int = 300,
+        ttls: Optional[Dict[str, int]] = None
+    ) -> int:
+        """
+        Grava cada chave só se a chave de versão associada não mudou (script Lua)
+
+        Para cache-aside com invalidação concorrente: a versão é lida antes de
+        consultar a origem e ``delete_many_and_bump`` a incrementa; um valor
+        calculado antes da invalidação não sobrescreve o cache depois dela.
+
+        Args:
+            items: Chave -> valor
+            versions: Chave -> (chave de versão, versão lida; None se ausente)
+            ttl: Time-to-live padrão em segundos
+            ttls: TTL específico por chave (sobrepõe o padrão)
+
+        Returns:
+            Quantidade de chaves gravadas
+        """
+        if not self.redis or not items:
+            return 0
+
+        keys: List[str] = []
+        args: List[Any] = []
+        for key, value in items.items():
+            version_key, version = versions[key]
+            keys += [key, version_key]
+            args += [
+                max(1, ttls.get(key, ttl) if ttls else ttl),
+                json.dumps(value, default=str),
+                "" if version is None else str(version),
+            ]
+
+        try:
+            return await self.redis.eval(_SCRIPT_SET_IF_VERSION, len(keys), *keys, *args)
+        except Exception as e:
+            logger.warning(f"Erro ao armazenar {len(items)} chaves versionadas no cache: {e}")
+            return 0
+
+    async def delete_many_and_bump(
+        self, keys: List[str], version_keys: List[str], version_ttl: int
+    ) -> bool:
+        """Deleta as chaves e incrementa as versões na mesma transação (MULTI)"""
+        if not self.redis or not (keys or version_keys):
+            return False
+
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            for version_key in version_keys:
+                pipe.incr(version_key)
+                pipe.expire(version_key, version_ttl)
+            if keys:
+                pipe.delete(*keys)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Erro ao invalidar {len(keys)} chaves do cache: {e}")
+            return False
+
     async def delete_pattern(self, pattern: str) -> int:
         """
         Deleta chaves que correspondem ao padrão
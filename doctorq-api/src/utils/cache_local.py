@@ -0,0 +1,132 @@
+"""
+Cache em processo com invalidação entre instâncias
+
+- CacheLocalTTL: dicionário com TTL por entrada e limite LRU
+- CanalInvalidacao: assinatura Redis pub/sub que repassa as mensagens a um
+  callback (cada instância da API limpa o próprio cache)
+
+Usado para dados lidos em toda request (API Keys, permissões) em que uma ida
+ao banco ou ao Redis por chamada custaria mais que a própria verificação.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from src.config.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class CacheLocalTTL:
+    """Cache TTL em memória, limitado por número de entradas (LRU)."""
+
+    def __init__(self, ttl: float, max_entradas: int = 10000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def obter(self, chave: Hashable) -> Tuple[bool, Any]:
+        """(encontrado, valor) - valor pode ser None em cache negativo."""
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return False, None
+        expira_em, valor = entrada
+        if expira_em <= time.monotonic():
+            self._entradas.pop(chave, None)
+            return False, None
+        self._entradas.move_to_end(chave)
+        return True, valor
+
+    def armazenar(self, chave: Hashable, valor: Any, ttl: Optional[float] = None) -> None:
+        self._entradas[chave] = (time.monotonic() + (self.ttl if ttl is None else ttl), valor)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def invalidar(self, chave: Optional[Hashable] = None) -> None:
+        """Remove uma chave (ou tudo, sem argumento)."""
+        if chave is None:
+            self._entradas.clear()
+        else:
+            self._entradas.pop(chave, None)
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+class CanalInvalidacao:
+    """Canal Redis pub/sub de invalidação de um cache local."""
+
+    def __init__(
+        self,
+        canal: str,
+        ao_receber: Callable[[str], None],
+        ao_falhar: Optional[Callable[[], None]] = None,
+    ):
+        self.canal = canal
+        self._ao_receber = ao_receber
+        self._ao_falhar = ao_falhar
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def iniciar(self) -> bool:
+        """Assina o canal; False se o Redis não estiver disponível."""
+        if self._task:
+            return True
+        from src.config.cache_config import get_cache_client
+
+        redis_client = await get_cache_client()
+        if not redis_client:
+            return False
+
+        self._pubsub = redis_client.pubsub()
+        await self._pubsub.subscribe(self.canal)
+        self._task = asyncio.create_task(self._escutar())
+        logger.info("Assinando invalidações em %s", self.canal)
+        return True
+
+    async def parar(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub:
+            try:
+                await self._pubsub.unsubscribe(self.canal)
+                await self._pubsub.close()
+            except Exception:
+                pass
+            self._pubsub = None
+
+    async def publicar(self, mensagem: str) -> None:
+        """Envia a mensagem a todas as instâncias (inclusive esta, se assinada)."""
+        try:
+            from src.config.cache_config import get_cache_client
+
+            redis_client = await get_cache_client()
+            if redis_client:
+                await redis_client.publish(self.canal, mensagem)
+        except Exception as e:
+            logger.warning(f"Falha ao publicar invalidação em {self.canal}: {e}")
+
+    async def _escutar(self) -> None:
+        while True:
+            try:
+                mensagem = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if mensagem and mensagem.get("type") == "message":
+                    dados = mensagem.get("data")
+                    if isinstance(dados, bytes):
+                        dados = dados.decode()
+                    self._ao_receber(dados)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Mensagens podem ter sido perdidas durante a falha
+                logger.warning(f"Erro no canal de invalidação {self.canal}: {e}")
+                if self._ao_falhar:
+                    self._ao_falhar()
+                await asyncio.sleep(1)
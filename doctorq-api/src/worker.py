@@ -0,0 +1,106 @@
+# src/worker.py
+"""
+Processo worker (APP_ROLE=worker): jobs singleton sem servidor HTTP
+
+    uv run python -m src.worker
+
+Várias instâncias podem rodar juntas: cada job fica com uma delas (lease do
+CoordenadorJobs) e passa para outra se ela cair. Com APP_ROLE=all a API
+executa os mesmos jobs pelo lifespan.
+"""
+import asyncio
+import signal
+from typing import List
+
+from dotenv import load_dotenv
+
+from src.central_atendimento.services.campanha_worker import (
+    iniciar_campanha_worker,
+    parar_campanha_worker,
+)
+from src.central_atendimento.services.fila_processor_service import (
+    start_fila_processor,
+    stop_fila_processor,
+)
+from src.config.cache_config import init_cache
+from src.config.logger_config import get_logger
+from src.config.orm_config import ORMConfig
+from src.services.broadcast_worker import iniciar_broadcast_worker, parar_broadcast_worker
+from src.services.coordenador_jobs import (
+    PAPEL_WORKER,
+    JobSingleton,
+    iniciar_coordenador_jobs,
+    parar_coordenador_jobs,
+)
+from src.services.dashboard_rollup_worker import (
+    iniciar_dashboard_rollup_worker,
+    parar_dashboard_rollup_worker,
+)
+from src.services.email_delivery_service import iniciar_email_delivery, parar_email_delivery
+from src.services.estoque_worker import iniciar_estoque_worker, parar_estoque_worker
+from src.services.export_worker import iniciar_export_worker, parar_export_worker
+from src.services.medidor_uso_service import iniciar_compactador_uso, parar_compactador_uso
+from src.services.particoes_mensagens_worker import (
+    iniciar_particoes_mensagens_worker,
+    parar_particoes_mensagens_worker,
+)
+
+logger = get_logger("worker")
+
+
+def jobs_singleton() -> List[JobSingleton]:
+    """Pollers de banco que devem rodar em uma única instância."""
+    return [
+        JobSingleton("fila_processor", start_fila_processor, stop_fila_processor),
+        JobSingleton("campanha_worker", iniciar_campanha_worker, parar_campanha_worker),
+        JobSingleton("export_worker", iniciar_export_worker, parar_export_worker),
+        JobSingleton("compactador_uso", iniciar_compactador_uso, parar_compactador_uso),
+        JobSingleton("estoque_worker", iniciar_estoque_worker, parar_estoque_worker),
+        JobSingleton(
+            "particoes_mensagens_worker",
+            iniciar_particoes_mensagens_worker,
+            parar_particoes_mensagens_worker,
+        ),
+        JobSingleton(
+            "dashboard_rollup_worker",
+            iniciar_dashboard_rollup_worker,
+            parar_dashboard_rollup_worker,
+        ),
+        JobSingleton("broadcast_worker", iniciar_broadcast_worker, parar_broadcast_worker),
+    ]
+
+
+async def executar_worker():
+    """Inicializa banco/cache, executa os jobs até SIGTERM/SIGINT e encerra."""
+    await ORMConfig.initialize_database()
+    async with ORMConfig.get_session() as db_session:
+        await init_cache(db_session=db_session, use_credentials=True)
+
+    # Campanhas e broadcast enviam emails pelo motor de entrega local
+    await iniciar_email_delivery()
+    await iniciar_coordenador_jobs(jobs_singleton(), PAPEL_WORKER)
+
+    encerrar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sinal, encerrar.set)
+
+    logger.info("Worker pronto")
+    try:
+        await encerrar.wait()
+    finally:
+        logger.info("Encerrando worker...")
+        try:
+            await parar_coordenador_jobs()
+        except Exception as e:
+            logger.warning(f"Erro ao parar coordenador de jobs: {str(e)}")
+        try:
+            await parar_email_delivery()
+        except Exception as e:
+            logger.warning(f"Erro ao parar motor de emails: {str(e)}")
+        await ORMConfig.close_connections()
+
+
+if __name__ == "__main__":
+    load_dotenv(override=True)
+    asyncio.run(executar_worker())
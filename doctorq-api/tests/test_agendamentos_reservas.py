@@ -0,0 +1,289 @@
+"""
+Testes de conflito de horário nas rotas de agendamento: constraint de exclusão
+(23P01 → 409), reserva temporária → confirmação e remarcação pelo paciente
+
+Rodam contra o Postgres de TEST_DATABASE_URL, num schema temporário com as
+tabelas mínimas e as constraints da migration 121; sem a variável são pulados.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.routes import agendamentos_route
+from src.routes.agendamentos_route import (
+    AgendamentoCreateRequest,
+    RemarcarAgendamentoPacienteRequest,
+    ReservaHorarioRequest,
+    _eh_conflito_horario,
+    remarcar_agendamento_paciente,
+    reservar_horario,
+)
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.requires_db
+
+# Sem o @require_permission (que consulta as permissões do usuário)
+criar_agendamento = agendamentos_route.criar_agendamento.__wrapped__
+
+TABELAS = """
+CREATE TABLE tb_users (
+    id_user UUID PRIMARY KEY,
+    nm_completo VARCHAR, nm_email VARCHAR, nr_telefone VARCHAR
+);
+CREATE TABLE tb_pacientes (
+    id_paciente UUID PRIMARY KEY,
+    id_user UUID, nm_paciente VARCHAR, ds_email VARCHAR, nr_telefone VARCHAR
+);
+CREATE TABLE tb_agendamentos (
+    id_agendamento UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id_paciente UUID NOT NULL,
+    id_profissional UUID NOT NULL,
+    id_clinica UUID,
+    id_procedimento UUID,
+    dt_agendamento TIMESTAMP NOT NULL,
+    nr_duracao_minutos INTEGER NOT NULL,
+    ds_motivo VARCHAR,
+    ds_observacoes TEXT,
+    vl_valor NUMERIC,
+    ds_forma_pagamento VARCHAR,
+    ds_status VARCHAR NOT NULL DEFAULT 'agendado',
+    dt_criacao TIMESTAMP NOT NULL DEFAULT NOW(),
+    dt_atualizacao TIMESTAMP,
+    tr_periodo TSRANGE GENERATED ALWAYS AS (
+        tsrange(dt_agendamento, dt_agendamento + make_interval(mins => nr_duracao_minutos), '[)')
+    ) STORED,
+    CONSTRAINT ex_agendamentos_profissional_periodo
+        EXCLUDE USING gist ({profissional}tr_periodo WITH &&)
+        WHERE (ds_status NOT IN ('cancelado', 'nao_compareceu'))
+);
+CREATE TABLE tb_agendamento_reservas (
+    id_reserva UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id_profissional UUID NOT NULL,
+    id_user UUID,
+    id_procedimento UUID,
+    dt_agendamento TIMESTAMP NOT NULL,
+    nr_duracao_minutos INTEGER NOT NULL,
+    tr_periodo TSRANGE GENERATED ALWAYS AS (
+        tsrange(dt_agendamento, dt_agendamento + make_interval(mins => nr_duracao_minutos), '[)')
+    ) STORED,
+    dt_expiracao TIMESTAMP NOT NULL,
+    dt_criacao TIMESTAMP NOT NULL DEFAULT NOW(),
+    CONSTRAINT ex_agendamento_reservas_periodo
+        EXCLUDE USING gist ({profissional}tr_periodo WITH &&)
+);
+"""
+
+AMANHA_10H = (datetime.now() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+
+
+@pytest.fixture
+async def sessoes(monkeypatch):
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_agenda_{uuid.uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        connect_args={"server_settings": {"search_path": f"{schema},public"}},
+    )
+    async with engine.begin() as conn:
+        btree_gist = (
+            await conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist'"))
+        ).scalar()
+        if btree_gist:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist SCHEMA public"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        raw = await conn.get_raw_connection()
+        # Sem btree_gist (uuid WITH =) a exclusão fica só no período: os testes
+        # usam um único profissional, então o comportamento é o mesmo
+        await raw.driver_connection.execute(
+            TABELAS.format(profissional="id_profissional WITH =, " if btree_gist else "")
+        )
+
+    async def sem_cache(*_args, **_kwargs):
+        return None
+
+    async def agendamento_criado(id_agendamento, _db, _user):
+        return id_agendamento
+
+    monkeypatch.setattr(agendamentos_route, "invalidar_calendario", sem_cache)
+    monkeypatch.setattr(agendamentos_route, "obter_agendamento", agendamento_criado)
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+@pytest.fixture
+async def pacientes(sessoes):
+    """Dois pacientes (cada um também usuário) e um profissional."""
+    ids = [str(uuid.uuid4()) for _ in range(2)]
+    async with sessoes() as db:
+        for id_paciente in ids:
+            await db.execute(
+                text("INSERT INTO tb_pacientes (id_paciente, id_user) VALUES (:id, :id)"),
+                {"id": uuid.UUID(id_paciente)},
+            )
+        await db.commit()
+    return SimpleNamespace(ana=ids[0], bia=ids[1], id_profissional=str(uuid.uuid4()))
+
+
+def usuario(id_user: str):
+    return SimpleNamespace(id_user=id_user, id_empresa=None)
+
+
+def pedido_agendamento(pacientes, id_paciente, dt_agendamento, id_reserva=None):
+    return AgendamentoCreateRequest(
+        id_paciente=id_paciente,
+        id_profissional=pacientes.id_profissional,
+        dt_agendamento=dt_agendamento,
+        nr_duracao_minutos=60,
+        id_reserva=id_reserva,
+    )
+
+
+async def reservar(sessoes, pacientes, id_user, dt_agendamento):
+    async with sessoes() as db:
+        return await reservar_horario(
+            ReservaHorarioRequest(
+                id_profissional=pacientes.id_profissional,
+                dt_agendamento=dt_agendamento,
+                nr_duracao_minutos=60,
+            ),
+            db,
+            usuario(id_user),
+        )
+
+
+async def remarcar(sessoes, id_paciente, id_agendamento, nova_data):
+    request = SimpleNamespace(state=SimpleNamespace(jwt_payload={"uid": id_paciente}))
+    async with sessoes() as db:
+        return await remarcar_agendamento_paciente(
+            id_agendamento,
+            RemarcarAgendamentoPacienteRequest(nova_data_hora=nova_data.isoformat()),
+            request,
+            db,
+        )
+
+
+async def contar(sessoes, tabela: str) -> int:
+    async with sessoes() as db:
+        return (await db.execute(text(f"SELECT COUNT(*) FROM {tabela}"))).scalar()
+
+
+async def test_sobreposicao_viola_a_constraint_e_vira_409(sessoes, pacientes):
+    async with sessoes() as db:
+        await criar_agendamento(pedido_agendamento(pacientes, pacientes.ana, AMANHA_10H), db, usuario(pacientes.ana))
+
+    # A constraint de exclusão dispara com SQLSTATE 23P01
+    async with sessoes() as db:
+        with pytest.raises(Exception) as erro:
+            await db.execute(
+                text("""
+                    INSERT INTO tb_agendamentos (id_paciente, id_profissional, dt_agendamento, nr_duracao_minutos)
+                    VALUES (:id_paciente, :id_profissional, :dt, 60)
+                """),
+                {
+                    "id_paciente": uuid.UUID(pacientes.bia),
+                    "id_profissional": uuid.UUID(pacientes.id_profissional),
+                    "dt": AMANHA_10H + timedelta(minutes=30),
+                },
+            )
+    assert erro.value.orig.sqlstate == "23P01"
+    assert _eh_conflito_horario(erro.value)
+
+    # Pela rota, a mesma violação é 409
+    async with sessoes() as db:
+        with pytest.raises(HTTPException) as http:
+            await criar_agendamento(
+                pedido_agendamento(pacientes, pacientes.bia, AMANHA_10H + timedelta(minutes=30)),
+                db,
+                usuario(pacientes.bia),
+            )
+    assert http.value.status_code == 409
+    assert await contar(sessoes, "tb_agendamentos") == 1
+
+
+async def test_reserva_confirmada_pelo_dono_e_bloqueia_os_demais(sessoes, pacientes):
+    reserva = await reservar(sessoes, pacientes, pacientes.ana, AMANHA_10H)
+
+    # Outro paciente não reserva nem agenda por cima da reserva ativa
+    with pytest.raises(HTTPException) as erro:
+        await reservar(sessoes, pacientes, pacientes.bia, AMANHA_10H + timedelta(minutes=15))
+    assert erro.value.status_code == 409
+    async with sessoes() as db:
+        with pytest.raises(HTTPException) as erro:
+            await criar_agendamento(pedido_agendamento(pacientes, pacientes.bia, AMANHA_10H), db, usuario(pacientes.bia))
+    assert erro.value.status_code == 409
+
+    # A reserva só é consumida pelo próprio usuário
+    async with sessoes() as db:
+        with pytest.raises(HTTPException) as erro:
+            await criar_agendamento(
+                pedido_agendamento(pacientes, pacientes.bia, AMANHA_10H, reserva.id_reserva),
+                db,
+                usuario(pacientes.bia),
+            )
+    assert erro.value.status_code == 409
+
+    async with sessoes() as db:
+        id_agendamento = await criar_agendamento(
+            pedido_agendamento(pacientes, pacientes.ana, AMANHA_10H, reserva.id_reserva),
+            db,
+            usuario(pacientes.ana),
+        )
+
+    assert id_agendamento
+    assert await contar(sessoes, "tb_agendamento_reservas") == 0
+    assert await contar(sessoes, "tb_agendamentos") == 1
+
+    # Com o horário agendado, nem a reserva é aceita
+    with pytest.raises(HTTPException) as erro:
+        await reservar(sessoes, pacientes, pacientes.bia, AMANHA_10H)
+    assert erro.value.status_code == 409
+
+
+async def test_remarcacao_respeita_reservas_e_agendamentos(sessoes, pacientes):
+    async with sessoes() as db:
+        id_ana = await criar_agendamento(pedido_agendamento(pacientes, pacientes.ana, AMANHA_10H), db, usuario(pacientes.ana))
+    async with sessoes() as db:
+        await criar_agendamento(
+            pedido_agendamento(pacientes, pacientes.bia, AMANHA_10H + timedelta(hours=2)),
+            db,
+            usuario(pacientes.bia),
+        )
+    await reservar(sessoes, pacientes, pacientes.bia, AMANHA_10H + timedelta(hours=4))
+
+    # Sobre a reserva ativa de outro paciente
+    with pytest.raises(HTTPException) as erro:
+        await remarcar(sessoes, pacientes.ana, id_ana, AMANHA_10H + timedelta(hours=4, minutes=30))
+    assert erro.value.status_code == 409
+
+    # Sobre outro agendamento (constraint de exclusão)
+    with pytest.raises(HTTPException) as erro:
+        await remarcar(sessoes, pacientes.ana, id_ana, AMANHA_10H + timedelta(hours=1, minutes=30))
+    assert erro.value.status_code == 409
+
+    # Agendamento de outro paciente
+    with pytest.raises(HTTPException) as erro:
+        await remarcar(sessoes, pacientes.bia, id_ana, AMANHA_10H + timedelta(hours=6))
+    assert erro.value.status_code == 404
+
+    resposta = await remarcar(sessoes, pacientes.ana, id_ana, AMANHA_10H + timedelta(hours=6))
+    assert resposta["nova_data_hora"] == (AMANHA_10H + timedelta(hours=6)).isoformat()
+    async with sessoes() as db:
+        dt = (
+            await db.execute(
+                text("SELECT dt_agendamento FROM tb_agendamentos WHERE id_agendamento = :id"),
+                {"id": uuid.UUID(id_ana)},
+            )
+        ).scalar()
+    assert dt == AMANHA_10H + timedelta(hours=6)
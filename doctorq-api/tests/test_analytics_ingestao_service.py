@@ -0,0 +1,174 @@
+"""
+Testes da ingestão bufferizada de analytics (buffer circular, lote e spool)
+O banco é um fake que registra os eventos por id_event (ON CONFLICT DO NOTHING)
+"""
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+
+from src.services import analytics_ingestao_service
+from src.services.analytics_ingestao_service import (
+    BufferEventos,
+    IngestorEventos,
+    colunas_lote,
+    escrever_spool,
+    ler_spool,
+    listar_spool,
+    novo_evento,
+)
+
+
+def test_buffer_cheio_descarta_o_mais_antigo():
+    buffer = BufferEventos(capacidade=2)
+    for tipo in ("a", "b", "c"):
+        buffer.adicionar(novo_evento(tipo))
+
+    assert len(buffer) == 2 and buffer.nr_descartados == 1
+    assert [e["nm_event_type"] for e in buffer.retirar(10)] == ["b", "c"]
+    assert len(buffer) == 0
+
+
+def test_lote_em_colunas():
+    id_user = uuid.uuid4()
+    eventos = [
+        novo_evento("search_executed", {"query": "botox"}, id_user=id_user),
+        novo_evento("user_login"),
+    ]
+    colunas = colunas_lote(eventos)
+
+    assert colunas["ids"] == [e["id_event"] for e in eventos]
+    assert colunas["usuarios"] == [str(id_user), None]
+    assert colunas["tipos"] == ["search_executed", "user_login"]
+    assert json.loads(colunas["dados"][0]) == {"query": "botox"} and colunas["dados"][1] is None
+    assert all(isinstance(dt, datetime) for dt in colunas["datas"])
+
+
+def test_spool_preserva_eventos_e_ordem(tmp_path):
+    diretorio = str(tmp_path / "spool")
+    primeiro = escrever_spool(diretorio, [novo_evento("a"), novo_evento("b")])
+    segundo = escrever_spool(diretorio, [novo_evento("c")])
+
+    assert listar_spool(diretorio) == [primeiro, segundo]
+    assert [e["nm_event_type"] for e in ler_spool(primeiro)] == ["a", "b"]
+    assert listar_spool(str(tmp_path / "inexistente")) == []
+
+
+class FakeBanco:
+    """tb_analytics_events em memória; falhar/atraso simulam banco fora ou lento"""
+
+    def __init__(self):
+        self.eventos = {}
+        self.falhar = False
+        self.atraso = 0.0
+
+    @asynccontextmanager
+    async def sessao(self):
+        banco = self
+
+        class Sessao:
+            async def execute(self, stmt, colunas):
+                if banco.falhar:
+                    raise ConnectionError("banco indisponível")
+                for id_event, tipo in zip(colunas["ids"], colunas["tipos"]):
+                    banco.eventos.setdefault(id_event, tipo)
+
+            async def commit(self):
+                # Commit lento: o INSERT já valeu, mas a gravação estoura o timeout
+                await asyncio.sleep(banco.atraso)
+
+        yield Sessao()
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = FakeBanco()
+    monkeypatch.setattr(analytics_ingestao_service, "get_async_session_context", banco.sessao)
+    return banco
+
+
+@pytest.fixture
+async def ingestor(tmp_path):
+    # Lote maior que os testes: o loop não acorda sozinho, só descarregar() grava
+    ingestor = IngestorEventos(lote=100, intervalo_ms=60_000, spool_dir=str(tmp_path / "spool"))
+    await ingestor.start()
+    yield ingestor
+    await ingestor.stop()
+
+
+def _registrar(ingestor, *tipos):
+    eventos = [novo_evento(tipo) for tipo in tipos]
+    for evento in eventos:
+        assert ingestor.registrar(evento)
+    return eventos
+
+
+async def test_banco_fora_vai_para_o_spool_e_volta_quando_grava(banco, ingestor, tmp_path):
+    banco.falhar = True
+    eventos = _registrar(ingestor, "a", "b", "c")
+    assert await ingestor.descarregar() == 0
+    assert len(listar_spool(str(tmp_path / "spool"))) == 1
+    assert ingestor.metricas()["nr_eventos_spool"] == 3
+
+    banco.falhar = False
+    eventos += _registrar(ingestor, "d")
+    assert await ingestor.descarregar() == 4
+
+    # Buffer corrente primeiro, depois o spool
+    assert list(banco.eventos) == [e["id_event"] for e in eventos[3:] + eventos[:3]]
+    assert listar_spool(str(tmp_path / "spool")) == []
+    assert ingestor.metricas()["nr_arquivos_spool"] == 0
+
+
+async def test_reenvio_apos_timeout_nao_duplica(banco, ingestor, tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics_ingestao_service, "TIMEOUT_GRAVACAO_SEGUNDOS", 0.05)
+    banco.atraso = 0.2
+    eventos = _registrar(ingestor, "a", "b")
+    assert await ingestor.descarregar() == 0
+    assert len(listar_spool(str(tmp_path / "spool"))) == 1
+
+    banco.atraso = 0.0
+    await ingestor.descarregar()
+
+    assert sorted(banco.eventos) == sorted(e["id_event"] for e in eventos)
+    assert listar_spool(str(tmp_path / "spool")) == []
+
+
+async def test_spool_de_execucao_anterior_reenviado_ao_iniciar(banco, tmp_path):
+    diretorio = str(tmp_path / "spool")
+    eventos = [novo_evento("a"), novo_evento("b")]
+    escrever_spool(diretorio, eventos)
+
+    ingestor = IngestorEventos(intervalo_ms=60_000, spool_dir=diretorio)
+    await ingestor.start()
+    assert ingestor.metricas()["nr_arquivos_spool"] == 1
+    await ingestor.stop()
+
+    assert list(banco.eventos) == [e["id_event"] for e in eventos]
+    assert listar_spool(diretorio) == []
+
+
+async def test_stop_espera_o_lote_em_gravacao(banco, tmp_path, monkeypatch):
+    gravando = asyncio.Event()
+    inserir = IngestorEventos._inserir
+
+    async def inserir_lento(db, eventos):
+        # O lote já saiu do buffer e ainda não foi gravado
+        gravando.set()
+        await asyncio.sleep(0.2)
+        await inserir(db, eventos)
+
+    monkeypatch.setattr(IngestorEventos, "_inserir", staticmethod(inserir_lento))
+    ingestor = IngestorEventos(lote=2, intervalo_ms=60_000, spool_dir=str(tmp_path / "spool"))
+    await ingestor.start()
+    eventos = _registrar(ingestor, "a", "b")
+    await asyncio.wait_for(gravando.wait(), timeout=5)
+
+    await ingestor.stop()
+
+    assert sorted(banco.eventos) == sorted(e["id_event"] for e in eventos)
+    assert listar_spool(str(tmp_path / "spool")) == []
+    assert not ingestor.ativo
@@ -0,0 +1,81 @@
+"""
+Testes do cache de API Keys (TTL, cache negativo, revogação)
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from src.services.apikey_cache import ApiKeyAutenticada, ApiKeyCache, hash_api_key
+
+
+def _apikey(**kwargs) -> ApiKeyAutenticada:
+    dados = {
+        "id": uuid.uuid4(),
+        "keyName": "integracao",
+        "id_empresa": None,
+        "id_user": None,
+        "apiKeyHash": hash_api_key("vf_teste"),
+    }
+    dados.update(kwargs)
+    return ApiKeyAutenticada(**dados)
+
+
+class CacheContado(ApiKeyCache):
+    """Cache com banco simulado: conta as consultas"""
+
+    def __init__(self, banco, **kwargs):
+        super().__init__(**kwargs)
+        self.banco = banco
+        self.consultas = 0
+
+    async def _carregar(self, chave_hash):
+        self.consultas += 1
+        return self.banco.get(chave_hash)
+
+
+def test_hash_nao_guarda_chave_em_claro():
+    assert hash_api_key("vf_abc") == hash_api_key("vf_abc")
+    assert "vf_abc" not in hash_api_key("vf_abc")
+    assert len(hash_api_key("vf_abc")) == 64
+
+
+def test_hit_positivo_e_negativo_evitam_banco():
+    apikey = _apikey()
+    cache = CacheContado({apikey.apiKeyHash: apikey})
+
+    async def cenario():
+        assert await cache.resolver("vf_teste") == apikey
+        assert await cache.resolver("vf_teste") == apikey
+        assert await cache.resolver("vf_inexistente") is None
+        assert await cache.resolver("vf_inexistente") is None
+
+    asyncio.run(cenario())
+    assert cache.consultas == 2
+
+
+def test_revogacao_e_ttl_negativo():
+    apikey = _apikey()
+    cache = CacheContado({apikey.apiKeyHash: apikey}, ttl_negativo=0)
+
+    async def cenario():
+        await cache.resolver("vf_teste")
+        cache.banco.clear()
+        cache.invalidar(apikey.apiKeyHash)
+        assert await cache.resolver("vf_teste") is None
+        # TTL negativo zerado: consulta de novo
+        assert await cache.resolver("vf_teste") is None
+
+    asyncio.run(cenario())
+    assert cache.consultas == 3
+
+
+def test_chave_expirada_e_limite_de_entradas():
+    expirada = _apikey(dt_expiracao=datetime.now() - timedelta(minutes=1))
+    cache = CacheContado({expirada.apiKeyHash: expirada}, max_entradas=2)
+
+    assert asyncio.run(cache.resolver("vf_teste")) is None
+
+    for i in range(5):
+        cache.armazenar(f"h{i}", None)
+    assert cache.obter("h0") == (False, None)
+    assert cache.obter("h4") == (True, None)
@@ -0,0 +1,154 @@
+"""
+Testes do despacho de emails e do lease do BroadcastWorker
+O motor de entrega e a sessão são substituídos por fakes - não depende de SMTP nem de banco
+"""
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from src.models.broadcast import CanalEnvio, StatusDestinatario
+from src.services import broadcast_worker
+from src.services.broadcast_worker import BroadcastWorker
+
+
+class FakeEmailService:
+    """Recusa os emails cujo destino está em ``recusados``"""
+
+    def __init__(self, recusados=()):
+        self.recusados = set(recusados)
+        self.chamadas = []
+
+    async def send_batch_async(self, emails, orcamento=None):
+        self.chamadas.append((len(emails), orcamento))
+        return [email["to"] not in self.recusados for email in emails]
+
+
+def _lote(emails):
+    return [
+        {
+            "id_destinatario": uuid.uuid4(),
+            "ds_email": email,
+            "ds_telefone": None,
+            "ds_push_token": None,
+            "ds_metadados": None,
+            "nm_completo": "Paciente",
+        }
+        for email in emails
+    ]
+
+
+@pytest.mark.asyncio
+async def test_emails_do_lote_vao_em_uma_chamada_com_orcamento_broadcast(monkeypatch):
+    fake = FakeEmailService(recusados={"b@teste.com"})
+    monkeypatch.setattr(broadcast_worker, "email_service", fake)
+    lote = _lote(["a@teste.com", None, "b@teste.com", "c@teste.com"])
+
+    resultados = await BroadcastWorker()._despachar_lote(
+        CanalEnvio.EMAIL.value, lote, ["msg"] * 4, ["assunto"] * 4
+    )
+
+    assert fake.chamadas == [(3, "broadcast")]
+    assert [r[0] for r in resultados] == [d["id_destinatario"] for d in lote]
+    assert [r[1] for r in resultados] == [
+        StatusDestinatario.ENVIADO.value,
+        StatusDestinatario.FALHA.value,
+        StatusDestinatario.FALHA.value,
+        StatusDestinatario.ENVIADO.value,
+    ]
+    assert resultados[1][2] == "Destinatário sem email"
+
+
+class FakeSessao:
+    """Sessão falsa: devolve a campanha e registra as renovações do lease."""
+
+    def __init__(self, banco):
+        self.banco = banco
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        if "SELECT tp_canal" in sql:
+            campanha = {
+                "tp_canal": CanalEnvio.EMAIL.value,
+                "ds_assunto": "Olá {{nome}}",
+                "ds_mensagem": "Mensagem para {{nome}}",
+                "ds_metadados": None,
+                "id_checkpoint_destinatario": None,
+            }
+            return SimpleNamespace(mappings=lambda: SimpleNamespace(one=lambda: campanha))
+        self.banco.renovacoes += 1
+        return SimpleNamespace(rowcount=0 if self.banco.lease_perdido else 1)
+
+    async def commit(self):
+        pass
+
+
+class FakeBanco:
+    def __init__(self, lease_perdido=False):
+        self.lease_perdido = lease_perdido
+        self.renovacoes = 0
+
+    @asynccontextmanager
+    async def sessao(self):
+        yield FakeSessao(self)
+
+
+def _worker_lento(monkeypatch, banco, duracao_envio):
+    """Worker com lease de 0,2s e um único lote cujo envio leva ``duracao_envio``."""
+    monkeypatch.setattr(broadcast_worker, "get_async_session_context", banco.sessao)
+    worker = BroadcastWorker(lease_segundos=0.2)
+    worker._running = True
+    lotes = [_lote(["a@teste.com", "b@teste.com"])]
+    gravados = []
+    finalizadas = []
+
+    async def buscar_lote(_id_campanha, _checkpoint):
+        return lotes.pop() if lotes else []
+
+    async def despachar_lote(_canal, lote, _mensagens, _assuntos):
+        await asyncio.sleep(duracao_envio)
+        return [(d["id_destinatario"], StatusDestinatario.ENVIADO.value, None) for d in lote]
+
+    async def gravar_resultados(_id_campanha, resultados, _checkpoint):
+        gravados.append(resultados)
+        return True
+
+    async def finalizar_campanha(id_campanha):
+        finalizadas.append(id_campanha)
+
+    monkeypatch.setattr(worker, "_buscar_lote", buscar_lote)
+    monkeypatch.setattr(worker, "_despachar_lote", despachar_lote)
+    monkeypatch.setattr(worker, "_gravar_resultados", gravar_resultados)
+    monkeypatch.setattr(worker, "_finalizar_campanha", finalizar_campanha)
+    return worker, gravados, finalizadas
+
+
+@pytest.mark.asyncio
+async def test_lease_renovado_durante_lote_mais_longo_que_o_lease(monkeypatch):
+    banco = FakeBanco()
+    worker, gravados, finalizadas = _worker_lento(monkeypatch, banco, duracao_envio=0.5)
+
+    await worker._processar_campanha(uuid.uuid4())
+
+    # Lote de 0,5s com lease de 0,2s: renovado a cada 0,05s, nunca vence
+    assert banco.renovacoes >= 5
+    assert len(gravados) == 1 and len(gravados[0]) == 2
+    assert len(finalizadas) == 1
+
+    # Heartbeat encerrado junto com a campanha
+    renovacoes = banco.renovacoes
+    await asyncio.sleep(0.15)
+    assert banco.renovacoes == renovacoes
+
+
+@pytest.mark.asyncio
+async def test_lease_perdido_interrompe_o_lote_em_curso(monkeypatch):
+    banco = FakeBanco(lease_perdido=True)
+    worker, gravados, finalizadas = _worker_lento(monkeypatch, banco, duracao_envio=5)
+
+    await asyncio.wait_for(worker._processar_campanha(uuid.uuid4()), timeout=1)
+
+    assert banco.renovacoes == 1
+    assert gravados == [] and finalizadas == []
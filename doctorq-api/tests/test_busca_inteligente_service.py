@@ -0,0 +1,33 @@
+"""
+Testes das partes puras da busca inteligente (texto do perfil, cache, score)
+"""
+from src.services.busca_inteligente_service import (
+    BuscaInteligenteService,
+    chave_cache_questionario,
+    texto_perfil,
+    texto_questionario,
+)
+
+
+def test_chave_cache_ignora_ordem_e_caixa():
+    a = chave_cache_questionario({"objetivo": "rugas", "idade": 40}, " São Paulo ", "SP", 10)
+    b = chave_cache_questionario({"idade": 40, "objetivo": "rugas"}, "são paulo", "sp", 10)
+    assert a == b
+    assert a != chave_cache_questionario({"objetivo": "rugas", "idade": 40}, "são paulo", "sp", 5)
+
+
+def test_textos_omitem_campos_vazios():
+    assert texto_questionario({"areas": ["testa", "olhos"], "obs": "", "extra": None}) == "areas: testa, olhos"
+    assert texto_perfil({
+        "ds_especialidades": ["Dermatologia"],
+        "ds_procedimentos": [],
+        "ds_biografia": "  Atua com toxina botulínica. ",
+    }) == "Especialidades: Dermatologia\nBiografia: Atua com toxina botulínica."
+
+
+def test_similaridade_domina_o_score():
+    service = BuscaInteligenteService(db=None)
+    completo = {"ds_especialidades": ["Dermatologia"], "nr_avaliacao_media": 4.9, "nr_similaridade": 0.2}
+    aderente = {"ds_especialidades": ["Dermatologia"], "nr_similaridade": 0.9}
+
+    assert service._calcular_score_simples(aderente) > service._calcular_score_simples(completo)
@@ -0,0 +1,144 @@
+"""
+Testes dos fragmentos de busca do marketplace (cursor keyset + ordenação)
+Funções puras, exceto o teste marcado com requires_db, que roda a paginação
+contra o Postgres de TEST_DATABASE_URL num schema temporário (sem a variável
+é pulado).
+"""
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.services.busca_marketplace_service import (
+    Ordenacao,
+    aplicar_keyset,
+    clausula_contem,
+    codificar_cursor,
+    decodificar_cursor,
+    proximo_cursor,
+    resolver_ordenacao,
+)
+
+Linha = namedtuple("Linha", ["id_clinica", "chave_ordenacao"])
+ID = "5f1c2b1e-9d8a-4c3b-8a7e-1f2e3d4c5b6a"
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def test_cursor_ida_e_volta():
+    cursor = codificar_cursor(0.4375, ID)
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor) == (0.4375, ID)
+
+
+def test_cursor_invalido():
+    with pytest.raises(ValueError):
+        decodificar_cursor("nao-e-um-cursor")
+
+
+def test_proximo_cursor_so_quando_ha_mais_linhas():
+    dt = datetime(2026, 10, 19, 8, 30)
+    linhas = [Linha(ID, dt), Linha("outro", dt)]
+
+    assert proximo_cursor(linhas[:1], 1, "id_clinica") is None
+    cursor = proximo_cursor(linhas, 1, "id_clinica")
+    assert decodificar_cursor(cursor) == ("2026-10-19T08:30:00", ID)
+
+
+def test_keyset_respeita_direcao():
+    params, where = {}, []
+    ordenacao = Ordenacao("c.dt_criacao", "c.id_clinica", "timestamp", descendente=True)
+
+    assert aplicar_keyset(ordenacao, None, where, params) == "c.dt_criacao DESC, c.id_clinica DESC"
+    assert where == [] and params == {}
+
+    aplicar_keyset(ordenacao, codificar_cursor("2026-10-19T08:30:00", ID), where, params)
+    assert "(c.dt_criacao, c.id_clinica) <" in where[0]
+    # Parâmetros nos tipos que o asyncpg aceita para timestamp e uuid
+    assert params == {"cursor_chave": datetime(2026, 10, 19, 8, 30), "cursor_id": UUID(ID)}
+
+    crescente = Ordenacao("(x <-> y)", "c.id_clinica", "float8", descendente=False)
+    where, params = [], {}
+    assert aplicar_keyset(crescente, codificar_cursor(1, ID), where, params).endswith("ASC")
+    assert ") > (" in where[0]
+    assert params["cursor_chave"] == 1.0 and isinstance(params["cursor_chave"], float)
+
+
+def test_keyset_rejeita_cursor_com_chave_ou_id_invalidos():
+    ordenacao = Ordenacao("c.dt_criacao", "c.id_clinica", "timestamp", descendente=True)
+    with pytest.raises(ValueError):
+        aplicar_keyset(ordenacao, codificar_cursor("ontem", ID), [], {})
+    with pytest.raises(ValueError):
+        aplicar_keyset(ordenacao, codificar_cursor("2026-10-19T08:30:00", "x"), [], {})
+
+
+@pytest.mark.requires_db
+async def test_segunda_pagina_recentes_executa_no_postgres():
+    """Cursor da página 1 (dt_criacao timestamp) decodificado e usado na página 2."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_keyset_{uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}}
+    )
+    base = datetime(2026, 10, 19, 8, 30)
+    # Dois registros com o mesmo dt_criacao: o desempate é pelo id
+    linhas = [(uuid4(), base - timedelta(minutes=i // 2)) for i in range(5)]
+    ordenacao = Ordenacao("c.dt_criacao", "c.id_clinica", "timestamp", descendente=True)
+
+    async def pagina(conn, cursor):
+        where, params = ["TRUE"], {"limit": 3}
+        order_by = aplicar_keyset(ordenacao, cursor, where, params)
+        result = await conn.execute(
+            text(
+                f"SELECT c.id_clinica, c.dt_criacao AS chave_ordenacao FROM tb_clinicas c "
+                f"WHERE {' AND '.join(where)} ORDER BY {order_by} LIMIT :limit"
+            ),
+            params,
+        )
+        rows = result.all()
+        return rows[:2], proximo_cursor(rows, 2, "id_clinica")
+
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+            await conn.execute(
+                text(f"CREATE TABLE {schema}.tb_clinicas (id_clinica uuid PRIMARY KEY, dt_criacao timestamp)")
+            )
+            for id_clinica, dt_criacao in linhas:
+                await conn.execute(
+                    text("INSERT INTO tb_clinicas VALUES (:id, :dt)"), {"id": id_clinica, "dt": dt_criacao}
+                )
+
+            vistos, cursor = [], None
+            for _ in range(3):
+                rows, cursor = await pagina(conn, cursor)
+                vistos += [row.id_clinica for row in rows]
+                if cursor is None:
+                    break
+            esperado = sorted(linhas, key=lambda linha: (linha[1], linha[0]), reverse=True)
+            assert vistos == [id_clinica for id_clinica, _ in esperado]
+            assert cursor is None
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        await engine.dispose()
+
+
+def test_contem_escapa_curingas():
+    params = {}
+    clausula_contem("f_unaccent(lower(c.nm_cidade))", " 100%_sp ", "cidade", params)
+    assert params["cidade"] == "%100\\%\\_sp%"
+
+
+def test_resolver_ordenacao():
+    assert resolver_ordenacao(None, tem_busca=True, tem_geo=True) == "distancia"
+    assert resolver_ordenacao(None, tem_busca=True, tem_geo=False) == "relevancia"
+    assert resolver_ordenacao(None, tem_busca=False, tem_geo=False) == "recentes"
+    assert resolver_ordenacao("recentes", tem_busca=True, tem_geo=True) == "recentes"
+    with pytest.raises(ValueError):
+        resolver_ordenacao("distancia", tem_busca=True, tem_geo=False)
@@ -0,0 +1,178 @@
+"""
+Testes do papel do processo e dos leases de jobs singleton
+
+Os testes marcados com requires_db usam o Postgres de TEST_DATABASE_URL
+(tb_worker_leases num schema temporário); sem a variável são pulados.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.config.orm_config import ORMConfig
+from src.services.coordenador_jobs import (
+    PAPEL_API,
+    PAPEL_TODOS,
+    PAPEL_WORKER,
+    CoordenadorJobs,
+    JobSingleton,
+    executa_jobs,
+    execucao_exclusiva,
+    papel_processo,
+    situacao_lease,
+)
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def test_papel_processo_normaliza_e_usa_padrao():
+    assert papel_processo(" Worker ") == PAPEL_WORKER
+    assert papel_processo("api") == PAPEL_API
+    assert papel_processo("desconhecido") == PAPEL_TODOS
+
+
+def test_somente_api_nao_executa_jobs():
+    assert not executa_jobs(PAPEL_API)
+    assert executa_jobs(PAPEL_WORKER)
+    assert executa_jobs(PAPEL_TODOS)
+
+
+def test_situacao_lease_expira_apos_tres_intervalos():
+    agora = datetime(2026, 10, 19, 12, 0, 0)
+    assert situacao_lease(agora - timedelta(seconds=25), agora, 10) == "ativo"
+    assert situacao_lease(agora - timedelta(seconds=31), agora, 10) == "expirado"
+    assert situacao_lease(None, agora, 10) == "expirado"
+
+
+class JobFalso:
+    """Registra início/parada; o nome é único por teste (locks valem no banco todo)."""
+
+    def __init__(self, nm_job: str):
+        self.nm_job = nm_job
+        self.rodando = False
+        self.nr_inicios = 0
+
+    async def iniciar(self):
+        self.rodando = True
+        self.nr_inicios += 1
+
+    async def parar(self):
+        self.rodando = False
+
+    def singleton(self) -> JobSingleton:
+        return JobSingleton(self.nm_job, self.iniciar, self.parar)
+
+
+@pytest.fixture
+async def engine(monkeypatch):
+    """ORMConfig.async_engine num schema descartável com tb_worker_leases."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_leases_{uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}}
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.execute(text("""
+            CREATE TABLE tb_worker_leases (
+                nm_job VARCHAR(100) PRIMARY KEY,
+                nm_instancia VARCHAR(255) NOT NULL,
+                nm_papel VARCHAR(20) NOT NULL,
+                dt_adquirido TIMESTAMP NOT NULL DEFAULT now(),
+                dt_heartbeat TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """))
+    monkeypatch.setattr(ORMConfig, "async_engine", engine)
+    try:
+        yield engine
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+async def _dono(engine, nm_job):
+    async with engine.connect() as conn:
+        return await conn.scalar(
+            text("SELECT nm_instancia FROM tb_worker_leases WHERE nm_job = :nm_job"),
+            {"nm_job": nm_job},
+        )
+
+
+async def _esperar(condicao, timeout=5.0):
+    limite = asyncio.get_running_loop().time() + timeout
+    while not condicao():
+        assert asyncio.get_running_loop().time() < limite, "condição não atingida"
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.requires_db
+async def test_lock_perdido_com_conexao_viva_para_o_job_e_outro_assume(engine):
+    nm_job = f"job_{uuid4().hex[:8]}"
+    job_a, job_b = JobFalso(nm_job), JobFalso(nm_job)
+    a = CoordenadorJobs([job_a.singleton()], PAPEL_WORKER, instancia="a")
+    b = CoordenadorJobs([job_b.singleton()], PAPEL_WORKER, instancia="b")
+    a._running = b._running = True
+    try:
+        await a.executar()
+        await b.executar()
+        assert job_a.rodando and not job_b.rodando
+        assert await _dono(engine, nm_job) == "a"
+
+        # Sessão de A continua viva mas sem o lock (ex.: pooler trocou o backend)
+        await a._conexao.execute(text("SELECT pg_advisory_unlock_all()"))
+        await a._conexao.commit()
+        await b.executar()
+        assert job_b.rodando and await _dono(engine, nm_job) == "b"
+
+        # Heartbeat seguinte de A confere pg_locks e para o job local
+        await a.executar()
+        assert not job_a.rodando
+        assert a.status_local()["jobs_locais"] == []
+        assert await _dono(engine, nm_job) == "b"
+    finally:
+        await a.stop()
+        await b.stop()
+
+
+@pytest.mark.requires_db
+async def test_conexao_derrubada_failover_para_outra_instancia(engine):
+    nm_job = f"job_{uuid4().hex[:8]}"
+    job_a, job_b = JobFalso(nm_job), JobFalso(nm_job)
+    a = CoordenadorJobs([job_a.singleton()], PAPEL_WORKER, instancia="a", intervalo=0.05)
+    b = CoordenadorJobs([job_b.singleton()], PAPEL_WORKER, instancia="b", intervalo=0.05)
+    try:
+        await a.start()
+        await _esperar(lambda: job_a.rodando)
+        await b.start()
+        await asyncio.sleep(0.2)
+        assert not job_b.rodando
+
+        pid = (await a._conexao.execute(text("SELECT pg_backend_pid()"))).scalar()
+        await a._conexao.commit()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": pid})
+
+        await _esperar(lambda: job_b.rodando and not job_a.rodando)
+        await asyncio.sleep(0.2)
+        # A reconecta, mas o lease agora é de B
+        assert job_b.rodando and not job_a.rodando and job_a.nr_inicios == 1
+        assert await _dono(engine, nm_job) == "b"
+    finally:
+        await a.stop()
+        await b.stop()
+
+
+@pytest.mark.requires_db
+async def test_execucao_exclusiva_um_ciclo_por_vez(engine):
+    nm_job = f"job_{uuid4().hex[:8]}"
+    async with execucao_exclusiva(nm_job) as primeiro:
+        async with execucao_exclusiva(nm_job) as segundo:
+            assert primeiro and not segundo
+    async with execucao_exclusiva(nm_job) as depois:
+        assert depois
@@ -0,0 +1,192 @@
+"""
+Testes dos rollups do dashboard (mescla rollup + ao vivo e janelas do período)
+
+Os testes marcados com requires_db aplicam a migration 127 num schema
+temporário do Postgres de TEST_DATABASE_URL; sem a variável são pulados.
+"""
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.services.dashboard_rollup_service import (
+    CAMPOS_DIARIOS,
+    CAMPOS_PROCEDIMENTOS,
+    SQL_AO_VIVO_DIAS,
+    SQL_AO_VIVO_PROCEDIMENTOS,
+    DashboardRollupService,
+    ranking_procedimentos,
+    resumir_periodo,
+    somar_por,
+)
+
+HOJE = date(2026, 10, 19)
+PROC_A = UUID("00000000-0000-0000-0000-00000000000a")
+PROC_B = UUID("00000000-0000-0000-0000-00000000000b")
+EMPRESA = UUID("00000000-0000-0000-0000-0000000000e1")
+OUTRA_EMPRESA = UUID("00000000-0000-0000-0000-0000000000e2")
+CLINICA = UUID("00000000-0000-0000-0000-0000000000c1")
+OUTRA_CLINICA = UUID("00000000-0000-0000-0000-0000000000c2")
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+MIGRATION_127 = (
+    Path(__file__).resolve().parents[1] / "database" / "migration_127_dashboard_rollups.sql"
+)
+
+
+def test_resumo_do_periodo_por_janela():
+    dias = {
+        HOJE: {"nr_agendamentos": 2, "nr_confirmados": 1, "vl_receita": Decimal("100.00"), "nr_receita": 1},
+        date(2026, 10, 15): {"nr_agendamentos": 3, "nr_cancelados": 1, "vl_receita": Decimal("50.00"), "nr_receita": 1},
+        date(2026, 9, 25): {"nr_agendamentos": 4, "nr_concluidos": 4, "vl_receita": Decimal("400.00"), "nr_receita": 4},
+        date(2026, 8, 31): {"nr_agendamentos": 1},
+    }
+    resumo = resumir_periodo(dias, HOJE)
+
+    assert resumo["nr_agendamentos"] == 10
+    assert (resumo["nr_confirmados"], resumo["nr_cancelados"], resumo["nr_concluidos"]) == (1, 1, 4)
+    assert resumo["agendamentos_hoje"] == 2
+    assert resumo["agendamentos_semana"] == 5
+    assert resumo["agendamentos_mes"] == 9
+    assert resumo["vl_receita"] == Decimal("550.00") and resumo["nr_receita"] == 6
+    assert resumo["receita_mes_atual"] == Decimal("150.00")
+    assert resumo["receita_mes_anterior"] == Decimal("400.00")
+
+
+def test_rollup_e_ao_vivo_somados_por_procedimento():
+    rollup = [
+        {"id_procedimento": PROC_A, "nr_agendamentos": 5, "vl_receita": Decimal("0")},
+        {"id_procedimento": PROC_B, "nr_agendamentos": 2, "vl_receita": Decimal("300.00")},
+    ]
+    ao_vivo = [{"id_procedimento": PROC_B, "nr_agendamentos": 4, "vl_receita": Decimal("100.00")}]
+    procedimentos = somar_por(rollup + ao_vivo, "id_procedimento", CAMPOS_PROCEDIMENTOS)
+
+    assert procedimentos[PROC_B] == {"nr_agendamentos": 6, "vl_receita": Decimal("400.00")}
+    assert [id_ for id_, _ in ranking_procedimentos(procedimentos, "nr_agendamentos", 1)] == [PROC_B]
+    # Procedimento sem receita não entra no top receita
+    assert [id_ for id_, _ in ranking_procedimentos(procedimentos, "vl_receita", 5)] == [PROC_B]
+
+
+@pytest.fixture
+async def sessoes():
+    """Schema descartável com tb_clinicas/tb_agendamentos mínimas e a migration 127."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_dashboard_{uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}}
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.execute(text(
+            "CREATE TABLE tb_clinicas (id_clinica uuid PRIMARY KEY, id_empresa uuid)"
+        ))
+        await conn.execute(text("""
+            CREATE TABLE tb_agendamentos (
+                id_agendamento uuid PRIMARY KEY,
+                id_clinica uuid,
+                id_procedimento uuid,
+                dt_agendamento timestamp NOT NULL,
+                ds_status varchar(20),
+                vl_valor numeric(10, 2)
+            )
+        """))
+        await conn.execute(
+            text("INSERT INTO tb_clinicas VALUES (:c1, :e1), (:c2, :e2)"),
+            {"c1": CLINICA, "e1": EMPRESA, "c2": OUTRA_CLINICA, "e2": OUTRA_EMPRESA},
+        )
+        bruta = await conn.get_raw_connection()
+        await bruta.driver_connection.execute(MIGRATION_127.read_text(encoding="utf-8"))
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+async def _agendar(db, id_clinica, dt_agendamento, ds_status, vl_valor=None, id_procedimento=None):
+    id_agendamento = uuid4()
+    await db.execute(
+        text("INSERT INTO tb_agendamentos VALUES (:id, :clinica, :procedimento, :dt, :status, :valor)"),
+        {
+            "id": id_agendamento,
+            "clinica": id_clinica,
+            "procedimento": id_procedimento,
+            "dt": dt_agendamento,
+            "status": ds_status,
+            "valor": vl_valor,
+        },
+    )
+    return id_agendamento
+
+
+async def _tudo_ao_vivo(db, inicio: date, fim: date):
+    """Referência: o período inteiro agregado direto de tb_agendamentos."""
+    params = {
+        "id_empresa": EMPRESA,
+        "dias": [date.fromordinal(d) for d in range(inicio.toordinal(), fim.toordinal() + 1)],
+        "inicio": inicio,
+        "fim": date.fromordinal(fim.toordinal() + 1),
+    }
+    dias = somar_por(
+        [dict(row._mapping) for row in await db.execute(SQL_AO_VIVO_DIAS, params)],
+        "dt_dia",
+        CAMPOS_DIARIOS,
+    )
+    procedimentos = somar_por(
+        [dict(row._mapping) for row in await db.execute(SQL_AO_VIVO_PROCEDIMENTOS, params)],
+        "id_procedimento",
+        CAMPOS_PROCEDIMENTOS,
+    )
+    return dias, procedimentos
+
+
+@pytest.mark.requires_db
+async def test_rollup_consolidado_e_dias_pendentes_batem_com_agregacao_ao_vivo(sessoes):
+    inicio, fim = date(2026, 10, 1), date(2026, 10, 31)
+    async with sessoes() as db:
+        await _agendar(db, CLINICA, datetime(2026, 10, 5, 9), "confirmado", Decimal("200.00"), PROC_A)
+        await _agendar(db, CLINICA, datetime(2026, 10, 5, 23, 30), "pendente", Decimal("80.00"), PROC_B)
+        await _agendar(db, CLINICA, datetime(2026, 10, 12, 14), "concluido", Decimal("150.00"), PROC_B)
+        remarcado = await _agendar(db, CLINICA, datetime(2026, 10, 12, 16), "confirmado", Decimal("90.00"), PROC_A)
+        cancelado = await _agendar(db, CLINICA, datetime(2026, 10, 19, 10), "confirmado", Decimal("300.00"), PROC_A)
+        # Outra empresa e fora do período: não entram
+        await _agendar(db, OUTRA_CLINICA, datetime(2026, 10, 5, 9), "confirmado", Decimal("999.00"), PROC_A)
+        await _agendar(db, CLINICA, datetime(2026, 11, 1, 0), "confirmado", Decimal("999.00"), PROC_A)
+        await db.commit()
+
+        # Tudo pendente no change-log: leitura 100% ao vivo
+        esperado = await _tudo_ao_vivo(db, inicio, fim)
+        assert await DashboardRollupService.obter_periodo(db, EMPRESA, inicio, fim) == esperado
+        assert esperado[0][date(2026, 10, 5)]["vl_receita"] == Decimal("200.00")
+
+        # Consolidado: leitura 100% do rollup, mesmo resultado
+        assert await DashboardRollupService.processar_eventos(db) > 0
+        assert await db.scalar(text("SELECT count(*) FROM tb_dashboard_eventos")) == 0
+        assert await DashboardRollupService.obter_periodo(db, EMPRESA, inicio, fim) == esperado
+
+        # Mudanças depois da consolidação: dias antigo/novo lidos ao vivo, resto do rollup
+        await db.execute(
+            text("UPDATE tb_agendamentos SET dt_agendamento = :dt WHERE id_agendamento = :id"),
+            {"dt": datetime(2026, 10, 20, 8), "id": remarcado},
+        )
+        await db.execute(
+            text("UPDATE tb_agendamentos SET ds_status = 'cancelado' WHERE id_agendamento = :id"),
+            {"id": cancelado},
+        )
+        await _agendar(db, CLINICA, datetime(2026, 10, 26, 11), "concluido", Decimal("60.00"))
+        await db.commit()
+
+        esperado = await _tudo_ao_vivo(db, inicio, fim)
+        assert await DashboardRollupService.obter_periodo(db, EMPRESA, inicio, fim) == esperado
+        assert esperado[0][date(2026, 10, 19)]["nr_cancelados"] == 1
+        assert esperado[0][date(2026, 10, 20)]["vl_receita"] == Decimal("90.00")
+
+        await DashboardRollupService.processar_eventos(db)
+        assert await DashboardRollupService.obter_periodo(db, EMPRESA, inicio, fim) == esperado
@@ -0,0 +1,169 @@
+"""
+Testes do motor de disponibilidade (bitmap de ocupação + expediente)
+e do calendário em cache (Redis em memória via fakeredis, banco falso)
+"""
+import uuid
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from src.services import disponibilidade_service
+from src.services.disponibilidade_service import (
+    EXPEDIENTE_PADRAO,
+    MOTIVO_PASSADO,
+    MOTIVO_RESERVADO,
+    calcular_slots,
+    carregar_calendario,
+    horario_livre,
+    invalidar_calendario,
+    marcar_ocupacao,
+    parse_expediente,
+)
+from src.utils.cache_helper import CacheHelper
+
+SEGUNDA = date(2030, 1, 7)
+PASSADO = datetime(2000, 1, 1)
+
+
+def test_sem_configuracao_usa_horario_comercial():
+    expediente = parse_expediente(None)
+    assert all(expediente[dia] == EXPEDIENTE_PADRAO for dia in range(7))
+
+
+def test_formatos_de_expediente():
+    expediente = parse_expediente({
+        "segunda": "08:00-12:00,14:00-18:00",
+        "terca": {"ativo": True, "hr_inicio": "09:00", "hr_fim": "17:00"},
+        "quarta": {"ativo": True, "inicio": "10:00", "fim": "16:00"},
+        "sabado": {"ativo": False},
+        "domingo": "FECHADO",
+        "intervalo_consultas": 10,
+    })
+
+    assert expediente[0] == [(480, 720), (840, 1080)]
+    assert expediente[1] == [(540, 1020)]
+    assert expediente[2] == [(600, 960)]
+    assert expediente[3] == []  # dia não configurado = fechado
+    assert expediente[5] == []
+    assert expediente[6] == []
+
+
+def test_slots_respeitam_turnos_e_agendamentos():
+    expediente = parse_expediente({"segunda": "08:00-12:00,14:00-16:00"})
+    ocupacao = {}
+    marcar_ocupacao(ocupacao, datetime.combine(SEGUNDA, datetime.min.time()) + timedelta(hours=9), 45)
+
+    slots = calcular_slots(expediente, ocupacao, [SEGUNDA], 60, agora=PASSADO)
+    por_horario = {slot.dt_horario.strftime("%H:%M"): slot for slot in slots}
+
+    # Nenhum slot cruza o intervalo de almoço nem passa do fim do turno
+    assert "11:30" not in por_horario
+    assert "15:30" not in por_horario
+    assert por_horario["11:00"].disponivel
+    # 08:30-09:30 e 09:00-10:00 conflitam com 09:00-09:45; 09:30-10:30 também
+    assert not por_horario["08:30"].disponivel
+    assert por_horario["09:00"].motivo == MOTIVO_RESERVADO
+    assert not por_horario["09:30"].disponivel
+    assert por_horario["10:00"].disponivel
+    assert por_horario["08:00"].disponivel
+
+
+def test_agendamento_que_cruza_meia_noite():
+    ocupacao = {}
+    marcar_ocupacao(ocupacao, datetime(2030, 1, 6, 23, 30), 120)
+    expediente = parse_expediente({"segunda": "00:00-03:00"})
+
+    slots = calcular_slots(expediente, ocupacao, [SEGUNDA], 30, agora=PASSADO)
+    livres = [slot.dt_horario.strftime("%H:%M") for slot in slots if slot.disponivel]
+    assert livres == ["01:30", "02:00", "02:30"]
+
+
+def test_horario_no_passado():
+    slots = calcular_slots(parse_expediente(None), {}, [SEGUNDA], 60, agora=datetime(2030, 1, 7, 12, 0))
+    assert slots[0].motivo == MOTIVO_PASSADO
+    assert all(slot.disponivel for slot in slots if slot.dt_horario >= datetime(2030, 1, 7, 12, 0))
+
+
+def test_horario_livre_considera_turno_e_ocupacao():
+    expediente = parse_expediente({"segunda": "08:00-12:00"})
+    ocupacao = {}
+    marcar_ocupacao(ocupacao, datetime(2030, 1, 7, 10, 0), 30)
+
+    assert horario_livre(expediente, ocupacao, datetime(2030, 1, 7, 8, 0), 60)
+    assert not horario_livre(expediente, ocupacao, datetime(2030, 1, 7, 9, 30), 60)
+    assert not horario_livre(expediente, ocupacao, datetime(2030, 1, 7, 11, 30), 60)
+    assert not horario_livre(expediente, ocupacao, datetime(2030, 1, 8, 8, 0), 60)
+
+
+PROFISSIONAL = str(uuid.uuid4())
+
+
+@pytest.fixture
+def calendario(monkeypatch):
+    """Cache em fakeredis e agenda do profissional em uma lista (o "banco")"""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    estado = SimpleNamespace(agenda=[], consultas=0, durante_consulta=None)
+
+    async def get_cache():
+        return CacheHelper(redis)
+
+    async def consultar_ocupacao(db, ids, inicio, fim, id_empresa=None):
+        estado.consultas += 1
+        linhas = [
+            SimpleNamespace(
+                id_profissional=PROFISSIONAL,
+                dt_agendamento=dt,
+                nr_duracao_minutos=duracao,
+                nr_segundos_reserva=None,
+            )
+            for dt, duracao in estado.agenda
+        ]
+        if estado.durante_consulta:
+            # Alteração commitada depois da leitura do banco, antes da gravação no cache
+            await estado.durante_consulta()
+        return linhas
+
+    async def carregar_expedientes(db, ids):
+        return {i: parse_expediente(None) for i in ids}
+
+    monkeypatch.setattr(disponibilidade_service, "_get_cache", get_cache)
+    monkeypatch.setattr(disponibilidade_service, "_consultar_ocupacao", consultar_ocupacao)
+    monkeypatch.setattr(disponibilidade_service, "carregar_expedientes", carregar_expedientes)
+    return estado
+
+
+@pytest.mark.asyncio
+async def test_calendario_cacheado_ate_invalidacao(calendario):
+    calendario.agenda = [(datetime(2030, 1, 7, 9, 0), 60)]
+
+    ocupacao, _ = await carregar_calendario(None, [PROFISSIONAL], SEGUNDA, SEGUNDA)
+    await carregar_calendario(None, [PROFISSIONAL], SEGUNDA, SEGUNDA)
+    assert calendario.consultas == 1
+    assert ocupacao[PROFISSIONAL][SEGUNDA]
+
+    calendario.agenda.append((datetime(2030, 1, 7, 14, 0), 60))
+    await invalidar_calendario(PROFISSIONAL, [(datetime(2030, 1, 7, 14, 0), 60)])
+    ocupacao, _ = await carregar_calendario(None, [PROFISSIONAL], SEGUNDA, SEGUNDA)
+
+    assert calendario.consultas == 2
+    assert not horario_livre(parse_expediente(None), ocupacao[PROFISSIONAL], datetime(2030, 1, 7, 14, 0), 30)
+
+
+@pytest.mark.asyncio
+async def test_invalidacao_durante_leitura_nao_grava_bitmap_antigo(calendario):
+    novo = (datetime(2030, 1, 7, 10, 0), 30)
+
+    async def agendar():
+        calendario.agenda.append(novo)
+        await invalidar_calendario(PROFISSIONAL, [novo])
+
+    calendario.durante_consulta = agendar
+    await carregar_calendario(None, [PROFISSIONAL], SEGUNDA, SEGUNDA)
+
+    # O bitmap lido antes do agendamento não foi gravado: a próxima leitura vai ao banco
+    calendario.durante_consulta = None
+    ocupacao, _ = await carregar_calendario(None, [PROFISSIONAL], SEGUNDA, SEGUNDA)
+    assert calendario.consultas == 2
+    assert not horario_livre(parse_expediente(None), ocupacao[PROFISSIONAL], novo[0], 30)
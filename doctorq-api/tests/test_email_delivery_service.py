@@ -0,0 +1,191 @@
+"""
+Testes do motor assíncrono de entrega de emails (pool SMTP + fila)
+Usa um servidor SMTP falso - não depende de rede nem de banco
+"""
+import smtplib
+from email.mime.text import MIMEText
+
+import pytest
+
+from src.services import email_delivery_service
+from src.services.email_delivery_service import (
+    EmailDeliveryEngine,
+    _RateLimiter,
+    _erro_transitorio,
+)
+from src.services.email_service import EmailService
+
+
+class FakeSMTP:
+    """SMTP em memória que conta conexões e pode falhar nos primeiros envios"""
+
+    conexoes = 0
+    enviados: list = []
+    falhas_restantes = 0
+
+    def __init__(self, *args, **kwargs):
+        FakeSMTP.conexoes += 1
+
+    def ehlo(self):
+        pass
+
+    def has_extn(self, name):
+        return True
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def noop(self):
+        return (250, b"OK")
+
+    def send_message(self, msg):
+        if FakeSMTP.falhas_restantes > 0:
+            FakeSMTP.falhas_restantes -= 1
+            raise smtplib.SMTPServerDisconnected("conexão perdida")
+        FakeSMTP.enviados.append(msg["To"])
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    FakeSMTP.conexoes = 0
+    FakeSMTP.enviados = []
+    FakeSMTP.falhas_restantes = 0
+    monkeypatch.setattr(email_delivery_service.smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(email_delivery_service.random, "random", lambda: 0.0)
+
+    engine = EmailDeliveryEngine("smtp.test", 587, "user", "secret")
+    engine._rate_limiter = _RateLimiter(0, burst=1)
+    return engine
+
+
+def _mensagens(total: int):
+    mensagens = []
+    for i in range(total):
+        msg = MIMEText("corpo")
+        msg["To"] = f"paciente{i}@teste.com"
+        mensagens.append(msg)
+    return mensagens
+
+
+@pytest.mark.asyncio
+async def test_bulk_reaproveita_conexoes(engine):
+    """Cem emails devem ser entregues sem abrir uma conexão por mensagem"""
+    assert await engine.enqueue(_mensagens(100), aguardar=True)
+    await engine.stop()
+
+    assert len(FakeSMTP.enviados) == 100
+    assert FakeSMTP.conexoes <= engine.pool.max_size
+
+
+@pytest.mark.asyncio
+async def test_retentativa_nao_duplica_envios(engine):
+    """Falha transitória no meio do lote retenta só o que faltou"""
+    FakeSMTP.falhas_restantes = 1
+    engine.batch_size = 10
+
+    assert await engine.enqueue(_mensagens(10), aguardar=True)
+    await engine.stop()
+
+    assert sorted(FakeSMTP.enviados) == sorted(
+        f"paciente{i}@teste.com" for i in range(10)
+    )
+    assert engine.stats()["retentativas"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sem_credenciais_nao_enfileira():
+    engine = EmailDeliveryEngine("smtp.test", 587, "", "")
+    assert await engine.enqueue(_mensagens(1)) == 0
+
+
+@pytest.mark.asyncio
+async def test_fila_cheia_informa_quantas_entraram(engine):
+    """Lotes que entraram antes da fila encher seguem para entrega"""
+    engine.queue_maxsize = 1
+    engine.batch_size = 10
+
+    assert await engine.enqueue(_mensagens(25)) == 10
+    assert engine.stats()["descartados_fila_cheia"] == 15
+    await engine.stop()
+
+    assert len(FakeSMTP.enviados) == 10
+
+
+@pytest.mark.asyncio
+async def test_stop_drena_retentativas_agendadas(engine):
+    """Retentativa no backoff é entregue no stop() em vez de cancelada"""
+    FakeSMTP.falhas_restantes = 1
+    assert await engine.enqueue(_mensagens(3)) == 3
+    await engine._queue.join()
+    assert engine.stats()["retentativas_agendadas"] == 1
+
+    await engine.stop()
+
+    assert len(FakeSMTP.enviados) == 3
+    assert engine.stats()["falhas"] == 0
+
+
+def test_erros_transitorios():
+    assert _erro_transitorio(ConnectionResetError())
+    assert _erro_transitorio(TimeoutError())
+    assert _erro_transitorio(smtplib.SMTPServerDisconnected())
+    assert _erro_transitorio(smtplib.SMTPResponseException(451, b"tente depois"))
+    assert not _erro_transitorio(smtplib.SMTPResponseException(550, b"caixa inexistente"))
+    assert not _erro_transitorio(OSError("certificado inválido"))
+    assert not _erro_transitorio(smtplib.SMTPAuthenticationError(535, b"senha"))
+
+
+@pytest.mark.asyncio
+async def test_recuperacao_de_senha_usa_motor_de_entrega(engine):
+    service = EmailService()
+    service.delivery = engine
+
+    assert await service.send_password_reset_email("ana@teste.com", "tok", "Ana")
+    await engine.stop()
+
+    assert FakeSMTP.enviados == ["ana@teste.com"]
+
+
+@pytest.mark.asyncio
+async def test_aviso_de_limite_so_enfileira(engine):
+    service = EmailService()
+    service.delivery = engine
+
+    # Retorna ao enfileirar, sem esperar o SMTP; a entrega sai no background
+    assert await service.send_user_limit_warning_email(
+        "admin@teste.com", "Clínica", "Admin", current_users=9, limit=10, percentage=90.0
+    )
+    await engine.stop()
+
+    assert FakeSMTP.enviados == ["admin@teste.com"]
+
+
+@pytest.mark.asyncio
+async def test_entregar_lote_usa_orcamento_proprio(engine):
+    """Lote com orçamento nomeado não consome o limite geral e informa cada mensagem"""
+
+    class LimiteGeralProibido:
+        async def acquire(self, tokens=1):
+            raise AssertionError("lote com orçamento próprio usou o limite geral")
+
+    engine._rate_limiter = LimiteGeralProibido()
+    engine._orcamentos["broadcast"] = _RateLimiter(0, burst=1)
+    engine.batch_size = 4
+    FakeSMTP.falhas_restantes = 1
+    engine.max_retries = 0
+
+    entregues = await engine.entregar_lote(_mensagens(10), orcamento="broadcast")
+    await engine.stop()
+
+    # O primeiro lote SMTP falha sem retentativa; os demais são entregues
+    assert entregues == [False] * 4 + [True] * 6
+    assert len(FakeSMTP.enviados) == 6
@@ -0,0 +1,321 @@
+"""
+Testes do motor de estoque: efeito das movimentações, ordem de lock das
+reservas, o UPDATE condicional de tb_produtos, consumo das reservas e a
+linha de base da migration 125
+
+Os testes marcados com requires_db rodam contra o Postgres de
+TEST_DATABASE_URL, num schema temporário; sem a variável são pulados.
+"""
+import asyncio
+import os
+from pathlib import Path
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import src.main  # noqa - registra todos os modelos do ORM (como o conftest)
+from src.models.estoque import MovimentacaoCreate
+from src.services.estoque_service import (
+    SQL_MOVIMENTAR,
+    SQL_RESERVAR,
+    SQL_SNAPSHOT,
+    EstoqueService,
+    consolidar_itens,
+    delta_movimentacao,
+)
+
+PRODUTO_A = UUID("00000000-0000-0000-0000-00000000000a")
+PRODUTO_B = UUID("00000000-0000-0000-0000-00000000000b")
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def test_delta_por_tipo_de_movimentacao():
+    assert delta_movimentacao("entrada", 5) == 5
+    assert delta_movimentacao("devolucao", 2) == 2
+    for tipo in ("saida", "ajuste", "reserva"):
+        assert delta_movimentacao(tipo, 3) == -3
+
+
+def test_itens_somados_e_ordenados_por_produto():
+    # Ordem de lock independente da ordem do pedido: sem deadlock entre reservas
+    assert consolidar_itens([(PRODUTO_B, 1), (PRODUTO_A, 2), (PRODUTO_B, 4)]) == [
+        (PRODUTO_A, 2),
+        (PRODUTO_B, 5),
+    ]
+    assert consolidar_itens([]) == []
+
+
+@pytest.fixture
+async def sessoes():
+    """Sessões num schema descartável com só as colunas de tb_produtos usadas."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_estoque_{uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}}
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.execute(text(f"""
+            CREATE TABLE {schema}.tb_produtos (
+                id_produto uuid PRIMARY KEY,
+                nr_quantidade_estoque integer,
+                nr_quantidade_reservada integer NOT NULL DEFAULT 0,
+                dt_atualizacao timestamp
+            )
+        """))
+        await conn.execute(
+            text(f"INSERT INTO {schema}.tb_produtos VALUES (:a, 10, 0, now()), (:b, NULL, 0, now())"),
+            {"a": PRODUTO_A, "b": PRODUTO_B},
+        )
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+async def _produto(sessoes, id_produto):
+    async with sessoes() as db:
+        result = await db.execute(
+            text("SELECT nr_quantidade_estoque, nr_quantidade_reservada FROM tb_produtos WHERE id_produto = :id"),
+            {"id": id_produto},
+        )
+        return tuple(result.one())
+
+
+@pytest.mark.requires_db
+async def test_saida_maior_que_o_disponivel_nao_afeta_linha(sessoes):
+    async with sessoes() as db:
+        result = await db.execute(
+            SQL_MOVIMENTAR, {"id_produto": PRODUTO_A, "delta": -11, "liberar": 0}
+        )
+        assert result.scalar_one_or_none() is None
+        result = await db.execute(
+            SQL_MOVIMENTAR, {"id_produto": PRODUTO_A, "delta": -10, "liberar": 0}
+        )
+        assert result.scalar_one() == 0
+        # Estoque NULL conta como zero
+        result = await db.execute(
+            SQL_MOVIMENTAR, {"id_produto": PRODUTO_B, "delta": 3, "liberar": 0}
+        )
+        assert result.scalar_one() == 3
+        await db.commit()
+
+    assert await _produto(sessoes, PRODUTO_A) == (0, 0)
+
+
+@pytest.mark.requires_db
+async def test_saida_respeita_reservado_e_consome_a_propria_reserva(sessoes):
+    async with sessoes() as db:
+        assert (await db.execute(
+            SQL_RESERVAR, {"id_produto": PRODUTO_A, "quantidade": 6}
+        )).scalar_one() == 6
+        # Disponível = 10 - 6: uma saída avulsa de 5 não cabe
+        assert (await db.execute(
+            SQL_MOVIMENTAR, {"id_produto": PRODUTO_A, "delta": -5, "liberar": 0}
+        )).scalar_one_or_none() is None
+        # A saída do agendamento libera a reserva que consome
+        assert (await db.execute(
+            SQL_MOVIMENTAR, {"id_produto": PRODUTO_A, "delta": -6, "liberar": 6}
+        )).scalar_one() == 4
+        await db.commit()
+
+    assert await _produto(sessoes, PRODUTO_A) == (4, 0)
+
+
+@pytest.mark.requires_db
+async def test_reservas_concorrentes_nao_vendem_alem_do_estoque(sessoes):
+    inicio = asyncio.Event()
+
+    async def reservar() -> bool:
+        async with sessoes() as db:
+            await inicio.wait()
+            result = await db.execute(SQL_RESERVAR, {"id_produto": PRODUTO_A, "quantidade": 3})
+            reservou = result.scalar_one_or_none() is not None
+            await db.commit()
+            return reservou
+
+    tarefas = [asyncio.create_task(reservar()) for _ in range(8)]
+    inicio.set()
+    resultados = await asyncio.gather(*tarefas)
+
+    # 10 em estoque: só 3 reservas de 3 cabem, as demais falham sem efeito
+    assert resultados.count(True) == 3
+    assert await _produto(sessoes, PRODUTO_A) == (10, 9)
+
+
+EMPRESA = uuid4()
+FORNECEDOR = uuid4()
+PRODUTO_FORNECEDOR = UUID("00000000-0000-0000-0000-00000000000c")
+PRODUTO_SEM_EMPRESA = UUID("00000000-0000-0000-0000-00000000000d")
+MIGRATION_125 = Path(__file__).parents[1] / "database" / "migration_125_estoque_atomico.sql"
+
+TABELAS_LEDGER = """
+CREATE TABLE tb_fornecedores (id_fornecedor uuid PRIMARY KEY, id_empresa uuid);
+CREATE TABLE tb_produtos (
+    id_produto uuid PRIMARY KEY,
+    id_empresa uuid,
+    id_fornecedor uuid,
+    nr_quantidade_estoque integer,
+    dt_atualizacao timestamp
+);
+CREATE TABLE tb_reservas_estoque (
+    id_reserva uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    id_empresa uuid NOT NULL,
+    id_produto uuid NOT NULL,
+    id_agendamento uuid NOT NULL,
+    nr_quantidade integer NOT NULL CHECK (nr_quantidade > 0),
+    st_reserva varchar(20) DEFAULT 'ativa',
+    dt_expiracao timestamp,
+    dt_criacao timestamp DEFAULT now(),
+    dt_atualizacao timestamp
+);
+CREATE TABLE tb_movimentacoes_estoque (
+    id_movimentacao uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    id_empresa uuid NOT NULL,
+    id_produto uuid NOT NULL,
+    id_user uuid,
+    id_agendamento uuid,
+    id_pedido uuid,
+    tp_movimentacao varchar(20) NOT NULL,
+    nr_quantidade integer NOT NULL CHECK (nr_quantidade > 0),
+    nr_estoque_anterior integer NOT NULL,
+    nr_estoque_atual integer NOT NULL,
+    vl_custo_unitario numeric(10,2),
+    ds_motivo text,
+    ds_lote varchar(50),
+    dt_validade timestamp,
+    dt_criacao timestamp DEFAULT now()
+);
+"""
+
+
+@pytest.fixture
+async def ledger():
+    """
+    Sessões num schema descartável com a migration 125 aplicada sobre
+    produtos pré-existentes: A (com histórico), C (empresa do fornecedor) e
+    D (sem empresa), os dois últimos sem nenhuma movimentação
+    """
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_ledger_{uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}}
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.execute(TABELAS_LEDGER)
+        await raw.execute("INSERT INTO tb_fornecedores VALUES ($1, $2)", FORNECEDOR, EMPRESA)
+        await raw.executemany(
+            "INSERT INTO tb_produtos (id_produto, id_empresa, id_fornecedor, nr_quantidade_estoque) VALUES ($1, $2, $3, $4)",
+            [
+                (PRODUTO_A, EMPRESA, None, 10),
+                (PRODUTO_FORNECEDOR, None, FORNECEDOR, 7),
+                (PRODUTO_SEM_EMPRESA, None, None, 2),
+            ],
+        )
+        await raw.execute(
+            """
+            INSERT INTO tb_movimentacoes_estoque (id_empresa, id_produto, tp_movimentacao,
+                nr_quantidade, nr_estoque_anterior, nr_estoque_atual)
+            VALUES ($1, $2, 'entrada', 10, 0, 10)
+            """,
+            EMPRESA,
+            PRODUTO_A,
+        )
+        await raw.execute(MIGRATION_125.read_text(encoding="utf-8"))
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+@pytest.mark.requires_db
+async def test_linha_de_base_cobre_produtos_sem_historico(ledger):
+    async with ledger() as db:
+        linhas = (await db.execute(text(
+            "SELECT id_produto, nr_sequencia, nr_estoque FROM tb_estoque_snapshots"
+        ))).all()
+    assert {(p, e) for p, _, e in linhas} == {
+        (PRODUTO_A, 10), (PRODUTO_FORNECEDOR, 7), (PRODUTO_SEM_EMPRESA, 2)
+    }
+    assert {p: s for p, s, _ in linhas}[PRODUTO_FORNECEDOR] == 0
+
+    # Primeira movimentação de um produto sem histórico parte da linha de base
+    async with ledger() as db:
+        await EstoqueService.definir_estoque(db, PRODUTO_FORNECEDOR, 4)
+        snapshots = (await db.execute(SQL_SNAPSHOT)).all()
+        await db.commit()
+    assert [(s.id_produto, s.nr_estoque, s.nr_divergencia) for s in snapshots] == [
+        (PRODUTO_FORNECEDOR, 4, 0)
+    ]
+
+
+@pytest.mark.requires_db
+async def test_definir_estoque_grava_entrada_ou_ajuste_no_ledger(ledger):
+    async with ledger() as db:
+        entrada = await EstoqueService.definir_estoque(db, PRODUTO_FORNECEDOR, 12, ds_motivo="Cadastro")
+        ajuste = await EstoqueService.definir_estoque(db, PRODUTO_A, 6)
+        assert await EstoqueService.definir_estoque(db, PRODUTO_A, 6) is None
+        await db.commit()
+
+    # Produto sem empresa própria usa a do fornecedor
+    assert (entrada.id_empresa, entrada.tp_movimentacao, entrada.nr_quantidade) == (EMPRESA, "entrada", 5)
+    assert (entrada.nr_estoque_anterior, entrada.nr_estoque_atual) == (7, 12)
+    assert (ajuste.tp_movimentacao, ajuste.nr_quantidade, ajuste.nr_estoque_atual) == ("ajuste", 4, 6)
+
+    async with ledger() as db:
+        with pytest.raises(ValueError, match="sem empresa"):
+            await EstoqueService.definir_estoque(db, PRODUTO_SEM_EMPRESA, 5)
+        await db.rollback()
+        estoque = await db.scalar(text(
+            "SELECT nr_quantidade_estoque FROM tb_produtos WHERE id_produto = :id"
+        ), {"id": PRODUTO_SEM_EMPRESA})
+    assert estoque == 2
+
+
+@pytest.mark.requires_db
+async def test_saida_do_agendamento_consome_so_a_quantidade_movimentada(ledger):
+    agendamento = uuid4()
+    async with ledger() as db:
+        await EstoqueService.criar_reservas(db, EMPRESA, agendamento, [(PRODUTO_A, 5)])
+
+    async with ledger() as db:
+        await EstoqueService.movimentar(db, EMPRESA, None, MovimentacaoCreate(
+            id_produto=PRODUTO_A, tp_movimentacao="saida", nr_quantidade=2, id_agendamento=agendamento,
+        ))
+        await db.commit()
+
+    async with ledger() as db:
+        produto = (await db.execute(text(
+            "SELECT nr_quantidade_estoque, nr_quantidade_reservada FROM tb_produtos WHERE id_produto = :id"
+        ), {"id": PRODUTO_A})).one()
+        reservas = (await db.execute(text(
+            "SELECT st_reserva, nr_quantidade FROM tb_reservas_estoque"
+        ))).all()
+    # Saíram 2 dos 5 reservados: os outros 3 continuam comprometidos
+    assert tuple(produto) == (8, 3)
+    assert [tuple(r) for r in reservas] == [("ativa", 3)]
+
+    async with ledger() as db:
+        await EstoqueService.movimentar(db, EMPRESA, None, MovimentacaoCreate(
+            id_produto=PRODUTO_A, tp_movimentacao="saida", nr_quantidade=3, id_agendamento=agendamento,
+        ))
+        await db.commit()
+        reservas = (await db.execute(text(
+            "SELECT st_reserva, nr_quantidade FROM tb_reservas_estoque"
+        ))).all()
+        reservado = await db.scalar(text(
+            "SELECT nr_quantidade_reservada FROM tb_produtos WHERE id_produto = :id"
+        ), {"id": PRODUTO_A})
+    assert [tuple(r) for r in reservas] == [("confirmada", 3)]
+    assert reservado == 0
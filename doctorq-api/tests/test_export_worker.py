@@ -0,0 +1,225 @@
+"""
+Testes da exportação em arquivo: writers CSV/XLSX e o ciclo do ExportWorker
+(reivindicação → gravação → conclusão, e o cancelamento no meio do arquivo)
+
+Os writers rodam só em disco (tmp_path). O ciclo do worker roda contra o
+Postgres de TEST_DATABASE_URL, num schema temporário com tb_export_jobs; o
+relatório em si vem de um stream falso. Sem a variável esses são pulados.
+"""
+import asyncio
+import csv
+import os
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import src.main  # noqa: F401 - registra todos os modelos do ORM (como o conftest)
+from src.models.export import FormatoExport, StatusExport
+from src.services import export_service, export_worker
+from src.services.export_service import ExportService
+from src.services.export_stream_service import CSVExportWriter, XLSXExportWriter
+from src.services.export_worker import ExportWorker
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+TABELAS = """
+CREATE TABLE tb_export_jobs (
+    id_export UUID PRIMARY KEY,
+    id_empresa UUID NOT NULL,
+    id_user_solicitante UUID NOT NULL,
+    tp_relatorio VARCHAR(50) NOT NULL,
+    ds_nome_relatorio VARCHAR(255) NOT NULL,
+    tp_formato VARCHAR(20) NOT NULL,
+    ds_filtros JSON,
+    st_export VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    ds_mensagem_erro TEXT,
+    ds_arquivo_path TEXT,
+    ds_arquivo_url TEXT,
+    nr_total_registros INTEGER DEFAULT 0,
+    nr_registros_processados INTEGER DEFAULT 0,
+    nr_tamanho_bytes BIGINT DEFAULT 0,
+    dt_solicitacao TIMESTAMP NOT NULL DEFAULT now(),
+    dt_inicio_processamento TIMESTAMP,
+    dt_heartbeat TIMESTAMP,
+    dt_fim_processamento TIMESTAMP,
+    dt_expiracao TIMESTAMP,
+    fg_agendado BOOLEAN DEFAULT false,
+    id_agendamento UUID,
+    dt_criacao TIMESTAMP NOT NULL DEFAULT now()
+);
+"""
+
+PAGINAS = [
+    [
+        {"id": 1, "paciente": "Ana", "valor": Decimal("150.50"), "data_hora": datetime(2026, 3, 1, 10)},
+        {"id": 2, "paciente": "Bia", "valor": None, "data_hora": datetime(2026, 3, 1, 11)},
+    ],
+    [{"id": 3, "paciente": "Caio", "valor": Decimal("80"), "data_hora": datetime(2026, 3, 2, 9)}],
+]
+
+
+def test_csv_writer_grava_cabecalho_e_linhas(tmp_path):
+    caminho = tmp_path / "relatorio.csv"
+    writer = CSVExportWriter(str(caminho))
+    writer.write_rows([])
+    for pagina in PAGINAS:
+        writer.write_rows(pagina)
+    writer.close()
+
+    with open(caminho, newline="", encoding="utf-8") as arquivo:
+        linhas = list(csv.reader(arquivo))
+    assert writer.total_linhas == 3
+    assert linhas[0] == ["id", "paciente", "valor", "data_hora"]
+    assert linhas[1] == ["1", "Ana", "150.5", "2026-03-01T10:00:00"]
+    assert linhas[2][2] == ""
+    assert linhas[3][1] == "Caio"
+
+
+def test_xlsx_writer_grava_planilha_em_modo_write_only(tmp_path):
+    caminho = tmp_path / "relatorio.xlsx"
+    writer = XLSXExportWriter(str(caminho), titulo="Agendamentos")
+    for pagina in PAGINAS:
+        writer.write_rows(pagina)
+    writer.close()
+
+    planilha = load_workbook(caminho, read_only=True)["Agendamentos"]
+    linhas = [list(linha) for linha in planilha.iter_rows(values_only=True)]
+    assert writer.total_linhas == 3
+    assert linhas[0] == ["id", "paciente", "valor", "data_hora"]
+    assert linhas[1][:2] == [1, "Ana"]
+    assert linhas[2][2] is None
+    assert linhas[3][:2] == [3, "Caio"]
+
+
+def test_descartar_nao_finaliza_o_arquivo(tmp_path):
+    caminho = tmp_path / "parcial.xlsx"
+    writer = XLSXExportWriter(str(caminho))
+    writer.write_rows(PAGINAS[0])
+    writer.descartar()
+
+    # Sem save: nada é gerado no caminho final
+    assert not caminho.exists()
+
+
+@pytest.fixture
+async def sessoes(monkeypatch, tmp_path):
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_export_{uuid.uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}}
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await (await conn.get_raw_connection()).driver_connection.execute(TABELAS)
+    fabrica = async_sessionmaker(engine, expire_on_commit=False)
+
+    monkeypatch.setattr(export_worker, "get_async_session_context", fabrica)
+    monkeypatch.setattr(export_service, "get_async_session_context", fabrica)
+    monkeypatch.setattr(ExportService, "EXPORT_DIR", str(tmp_path))
+    try:
+        yield fabrica
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+def relatorio_falso(monkeypatch, paginas, bloquear_apos_primeira: asyncio.Event = None):
+    """Substitui a contagem e o cursor do relatório por páginas fixas."""
+
+    async def contar(_db, _tp_relatorio, _id_empresa, _filtros=None):
+        return sum(len(pagina) for pagina in paginas)
+
+    async def stream(_db, _tp_relatorio, _id_empresa, _filtros=None):
+        for pagina in paginas:
+            yield pagina
+            if bloquear_apos_primeira is not None:
+                # A página já foi gravada: o export fica parado no meio do arquivo
+                bloquear_apos_primeira.set()
+                await asyncio.Event().wait()
+
+    monkeypatch.setattr(export_service, "contar_registros", contar)
+    monkeypatch.setattr(export_service, "stream_paginas", stream)
+
+
+async def solicitar(sessoes, tp_formato: str) -> uuid.UUID:
+    id_export = uuid.uuid4()
+    async with sessoes() as db:
+        await db.execute(
+            text("""
+                INSERT INTO tb_export_jobs (
+                    id_export, id_empresa, id_user_solicitante, tp_relatorio,
+                    ds_nome_relatorio, tp_formato
+                ) VALUES (:id, :empresa, :usuario, 'agendamentos', 'Agendamentos', :formato)
+            """),
+            {"id": id_export, "empresa": uuid.uuid4(), "usuario": uuid.uuid4(), "formato": tp_formato},
+        )
+        await db.commit()
+    return id_export
+
+
+async def ler_job(sessoes, id_export):
+    async with sessoes() as db:
+        return (
+            await db.execute(
+                text("SELECT * FROM tb_export_jobs WHERE id_export = :id"), {"id": id_export}
+            )
+        ).mappings().one()
+
+
+@pytest.mark.requires_db
+async def test_ciclo_reivindica_grava_e_conclui(sessoes, monkeypatch, tmp_path):
+    relatorio_falso(monkeypatch, PAGINAS)
+    id_export = await solicitar(sessoes, FormatoExport.CSV.value)
+    worker = ExportWorker(heartbeat_interval=60)
+
+    assert await worker._reivindicar_job() == id_export
+    # Nada mais pendente: a segunda reivindicação não pega o mesmo job
+    assert await worker._reivindicar_job() is None
+    assert (await ler_job(sessoes, id_export))["st_export"] == StatusExport.PROCESSANDO.value
+
+    await worker._executar(id_export)
+
+    job = await ler_job(sessoes, id_export)
+    assert job["st_export"] == StatusExport.CONCLUIDO.value
+    assert job["nr_total_registros"] == job["nr_registros_processados"] == 3
+    assert job["ds_arquivo_path"] == str(tmp_path / f"agendamentos_{id_export}.csv")
+    assert job["nr_tamanho_bytes"] == os.path.getsize(job["ds_arquivo_path"])
+    with open(job["ds_arquivo_path"], newline="", encoding="utf-8") as arquivo:
+        assert [linha[1] for linha in csv.reader(arquivo)] == ["paciente", "Ana", "Bia", "Caio"]
+
+
+@pytest.mark.requires_db
+async def test_cancelamento_remove_o_parcial_e_reenfileira(sessoes, monkeypatch, tmp_path):
+    gravou_primeira = asyncio.Event()
+    relatorio_falso(monkeypatch, PAGINAS, gravou_primeira)
+    id_export = await solicitar(sessoes, FormatoExport.EXCEL.value)
+    worker = ExportWorker(heartbeat_interval=60)
+
+    assert await worker._reivindicar_job() == id_export
+    tarefa = asyncio.create_task(worker._executar(id_export))
+    await asyncio.wait_for(gravou_primeira.wait(), timeout=5)
+
+    tarefa.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await tarefa
+
+    assert list(tmp_path.iterdir()) == []
+    job = await ler_job(sessoes, id_export)
+    assert job["st_export"] == StatusExport.PENDENTE.value
+    assert job["dt_heartbeat"] is None
+    assert job["nr_registros_processados"] == 0
+
+    # De volta à fila: o próximo worker conclui o export
+    relatorio_falso(monkeypatch, PAGINAS)
+    assert await worker._reivindicar_job() == id_export
+    await worker._executar(id_export)
+    job = await ler_job(sessoes, id_export)
+    assert job["st_export"] == StatusExport.CONCLUIDO.value
+    assert [p.name for p in tmp_path.iterdir()] == [f"agendamentos_{id_export}.xlsx"]
@@ -0,0 +1,107 @@
+"""
+Testes do pipeline de logging (níveis por módulo, JSON e fila limitada)
+"""
+import json
+import logging
+import queue
+import threading
+
+import pytest
+
+from src.config.logger_config import (
+    FilaLogHandler,
+    JsonFormatter,
+    LoggerConfig,
+    parse_niveis_modulos,
+)
+
+
+def _record(nivel: int, msg: str, *args, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("src.teste", nivel, __file__, 10, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_parse_niveis_modulos_ignora_entradas_invalidas():
+    niveis = parse_niveis_modulos(
+        "src.middleware=warning, src.services.embedding_service=DEBUG,invalido,x=NADA"
+    )
+    assert niveis == {
+        "src.middleware": logging.WARNING,
+        "src.services.embedding_service": logging.DEBUG,
+    }
+    assert parse_niveis_modulos("") == {}
+
+
+def test_json_formatter_inclui_mensagem_e_extra():
+    linha = JsonFormatter().format(
+        _record(logging.INFO, "busca em %s", "docs", id_empresa="e1")
+    )
+    dados = json.loads(linha)
+    assert dados["message"] == "busca em docs"
+    assert dados["level"] == "INFO"
+    assert dados["logger"] == "src.teste"
+    assert dados["id_empresa"] == "e1"
+
+
+def test_fila_cheia_descarta_info_e_mantem_args_lazy():
+    fila: queue.Queue = queue.Queue(maxsize=1)
+    handler = FilaLogHandler(fila, timeout_bloqueio=0.01)
+
+    handler.emit(_record(logging.INFO, "x=%s", 1))
+    handler.emit(_record(logging.INFO, "x=%s", 2))
+    handler.emit(_record(logging.ERROR, "falha"))
+
+    assert handler.nr_descartados == 2
+    record = fila.get_nowait()
+    # Formatação fica para o listener
+    assert record.msg == "x=%s" and record.args == (1,)
+
+
+class Lazy:
+    """Argumento de log que registra em qual thread foi formatado."""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread())
+        return "lazy"
+
+
+@pytest.fixture
+def restaurar_logging():
+    root = logging.getLogger()
+    handlers, nivel = root.handlers[:], root.level
+    yield
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(nivel)
+    logging.getLogger("src.teste.ruidoso").setLevel(logging.NOTSET)
+
+
+def test_pipeline_assincrono_formata_na_thread_do_listener(monkeypatch, capsys, restaurar_logging):
+    monkeypatch.setenv("LOG_JSON", "true")
+    monkeypatch.setenv("LOG_ASYNC", "true")
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    monkeypatch.setenv("LOG_LEVELS", "src.teste.ruidoso=WARNING")
+    config = LoggerConfig()
+    try:
+        argumento = Lazy()
+        logging.getLogger("src.teste").info("valor=%s", argumento, extra={"id_empresa": "e1"})
+        logging.getLogger("src.teste.ruidoso").info("filtrado pelo nível do módulo")
+        logging.getLogger("src.teste.ruidoso").warning("aviso")
+    finally:
+        config.stop_listener()
+
+    linhas = [json.loads(linha) for linha in capsys.readouterr().out.splitlines() if linha.startswith("{")]
+    assert [(l["logger"], l["message"]) for l in linhas] == [
+        ("src.teste", "valor=lazy"),
+        ("src.teste.ruidoso", "aviso"),
+    ]
+    assert linhas[0]["id_empresa"] == "e1"
+    # Args formatados só na thread do listener, nunca no chamador
+    assert argumento.threads and all(t is not threading.main_thread() for t in argumento.threads)
+    assert config.logs_descartados() == 0
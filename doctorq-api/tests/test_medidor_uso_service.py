@@ -0,0 +1,174 @@
+"""
+Testes da medição de uso (decisão de quota, contadores e compactação dos deltas)
+Redis em memória via fakeredis; o banco é um fake que registra as linhas
+"""
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import fakeredis
+import pytest
+
+from src.services import medidor_uso_service
+from src.services.medidor_uso_service import (
+    CHAVE_PENDENTE,
+    ContextoCobranca,
+    MedidorUso,
+    avaliar_quota,
+    campo_pendente,
+    chave_contador,
+    chave_lote,
+    linhas_pendentes,
+)
+
+INICIO = datetime(2026, 10, 1)
+FIM = datetime(2026, 10, 31, 23, 59, 59)
+
+
+def test_avaliar_quota():
+    assert avaliar_quota(-1, 1e9, "api_calls")[0]
+    bloqueado, info = avaliar_quota(0, 0, "agents")
+    assert not bloqueado and info["message"] == "Feature agents não incluída no plano"
+
+    permitido, info = avaliar_quota(100, 75, "messages")
+    assert permitido and info["remaining"] == 25 and info["usage_percentage"] == 75.0
+    excedido, info = avaliar_quota(100, 100, "messages")
+    assert not excedido and info["remaining"] == 0
+
+
+def test_contexto_serializado_sem_quotas():
+    contexto = ContextoCobranca(
+        id_subscription=str(uuid.uuid4()),
+        id_plan=str(uuid.uuid4()),
+        dt_period_start=INICIO,
+        dt_period_end=FIM,
+        quotas={"api_calls": 1000},
+    )
+    # Quotas ficam numa chave por plano (invalidada em update_plan)
+    assert "quotas" not in contexto.serializar()
+    restaurado = ContextoCobranca.desserializar(contexto.serializar(), {"api_calls": 500})
+    assert restaurado == contexto and restaurado.quotas == {"api_calls": 500}
+
+    assert contexto.contem(datetime(2026, 10, 5), datetime(2026, 10, 6))
+    assert not contexto.contem(datetime(2026, 9, 30), datetime(2026, 10, 6))
+
+
+def test_deltas_pendentes_viram_uma_linha_por_grupo():
+    id_subscription, id_user = uuid.uuid4(), uuid.uuid4()
+    campo = campo_pendente(id_subscription, id_user, "tokens", INICIO, FIM)
+    linhas = linhas_pendentes({campo: "1234.5", campo_pendente(id_subscription, id_user, "agents", INICIO, FIM): "0"})
+
+    assert len(linhas) == 1
+    linha = linhas[0]
+    assert linha["id_subscription"] == id_subscription and linha["id_user"] == id_user
+    assert linha["nm_metric_type"] == "tokens"
+    assert linha["nr_value"] == Decimal("1234.50")
+    assert (linha["dt_period_start"], linha["dt_period_end"]) == (INICIO, FIM)
+
+
+
+class FakeBanco:
+    """tb_usage_metrics em memória: INSERT ... ON CONFLICT (id_metric) DO NOTHING"""
+
+    def __init__(self):
+        self.linhas = {}
+        self.falhar = False
+
+    @asynccontextmanager
+    async def sessao(self):
+        banco = self
+
+        class Sessao:
+            async def execute(self, stmt, linhas):
+                if banco.falhar:
+                    raise ConnectionError("banco indisponível")
+                for linha in linhas:
+                    banco.linhas.setdefault(linha["id_metric"], linha)
+
+            async def commit(self):
+                pass
+
+        yield Sessao()
+
+    def total(self, metric_type):
+        return sum(l["nr_value"] for l in self.linhas.values() if l["nm_metric_type"] == metric_type)
+
+
+@pytest.fixture
+def medidor(monkeypatch):
+    banco = FakeBanco()
+    monkeypatch.setattr(medidor_uso_service, "get_async_session_context", banco.sessao)
+    medidor = MedidorUso(fakeredis.FakeAsyncRedis(decode_responses=True))
+    medidor.banco = banco
+    return medidor
+
+
+@pytest.fixture
+def contexto():
+    return ContextoCobranca(
+        id_subscription=str(uuid.uuid4()),
+        id_plan=str(uuid.uuid4()),
+        dt_period_start=INICIO,
+        dt_period_end=datetime(2099, 1, 1),
+    )
+
+
+def _campo(contexto, id_user, metric_type="api_calls"):
+    return campo_pendente(
+        contexto.id_subscription, id_user, metric_type, contexto.dt_period_start, contexto.dt_period_end
+    )
+
+
+@pytest.mark.asyncio
+async def test_contador_e_descarga_agregada(medidor, contexto):
+    id_user = uuid.uuid4()
+    await medidor.semear(id_user, {"api_calls": 10.0}, contexto)
+    for _ in range(5):
+        await medidor.incrementar(id_user, "api_calls", 2.0, contexto, _campo(contexto, id_user))
+
+    assert await medidor.ler(id_user, ["api_calls"], contexto) == {"api_calls": 20.0}
+    assert await medidor.descarregar() == 1
+    assert medidor.banco.total("api_calls") == Decimal("10.00")
+    assert not await medidor.redis.keys("uso:pendente*")
+
+
+@pytest.mark.asyncio
+async def test_semente_apos_eviction_inclui_delta_pendente(medidor, contexto):
+    id_user = uuid.uuid4()
+    await medidor.semear(id_user, {"api_calls": 0.0}, contexto)
+    await medidor.incrementar(id_user, "api_calls", 3.0, contexto, _campo(contexto, id_user))
+    await medidor.redis.delete(chave_contador(id_user, "api_calls", INICIO))
+
+    # O banco ainda não tem os 3 (estão só no hash pendente)
+    await medidor.semear(id_user, {"api_calls": 7.0}, contexto)
+
+    assert await medidor.ler(id_user, ["api_calls"], contexto) == {"api_calls": 10.0}
+
+
+@pytest.mark.asyncio
+async def test_lote_orfao_e_regravado_sem_duplicar(medidor, contexto, monkeypatch):
+    id_user = uuid.uuid4()
+    await medidor.redis.hincrbyfloat(CHAVE_PENDENTE, _campo(contexto, id_user), 4.0)
+
+    # Falha no INSERT: o lote fica no Redis em vez de se perder
+    medidor.banco.falhar = True
+    with pytest.raises(ConnectionError):
+        await medidor.descarregar()
+    medidor.banco.falhar = False
+    [lote] = await medidor.redis.keys("uso:pendente:lote:*")
+
+    # Dentro da janela de tolerância o lote pertence a quem o criou
+    assert await medidor.descarregar() == 0
+    assert await medidor.redis.exists(lote)
+
+    monkeypatch.setattr(medidor_uso_service, "LOTE_ORFAO_SEGUNDOS", 0)
+    assert await medidor.descarregar() == 1
+    assert medidor.banco.total("api_calls") == Decimal("4.00")
+
+    # Queda entre o commit e o DELETE do lote: regravar não duplica
+    id_lote = lote.rsplit(":", 1)[1]
+    await medidor.redis.hset(chave_lote(id_lote, time.time() - 3600), _campo(contexto, id_user), "4")
+    await medidor.descarregar()
+    assert medidor.banco.total("api_calls") == Decimal("4.00")
@@ -0,0 +1,165 @@
+"""
+Testes da manutenção de partições mensais de mensagens (datas de criação/retenção)
+
+Os testes marcados com requires_db aplicam a migration 128 num schema
+temporário do Postgres de TEST_DATABASE_URL; sem a variável são pulados.
+"""
+import os
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.services import particoes_mensagens_worker
+from src.services.particoes_mensagens_worker import (
+    ParticoesMensagensWorker,
+    limite_retencao,
+    somar_meses,
+)
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+MIGRATION_128 = (
+    Path(__file__).resolve().parents[1] / "database" / "migration_128_particionamento_mensagens.sql"
+)
+
+# Só as colunas que a migration referencia
+TABELAS_ANTES = """
+    CREATE TABLE tb_users (id_user uuid PRIMARY KEY);
+    CREATE TABLE tb_agentes (id_agente uuid PRIMARY KEY);
+    CREATE TABLE tb_conversas (id_conversa uuid PRIMARY KEY);
+    CREATE TABLE tb_conversas_omni (id_conversa uuid PRIMARY KEY);
+    CREATE TABLE tb_messages (
+        id_message uuid PRIMARY KEY,
+        id_conversa uuid REFERENCES tb_conversas ON DELETE CASCADE,
+        id_user uuid REFERENCES tb_users ON DELETE CASCADE,
+        id_agente uuid REFERENCES tb_agentes ON DELETE SET NULL,
+        ds_conteudo text,
+        st_deletada boolean DEFAULT false,
+        dt_criacao timestamp DEFAULT now(),
+        dt_atualizacao timestamp DEFAULT now()
+    );
+    CREATE TABLE tb_mensagens_omni (
+        id_mensagem uuid PRIMARY KEY,
+        id_conversa uuid REFERENCES tb_conversas_omni ON DELETE CASCADE,
+        id_externo varchar(255),
+        st_mensagem varchar(20),
+        dt_envio timestamp,
+        dt_criacao timestamp DEFAULT now()
+    );
+"""
+
+
+def test_somar_meses_cruza_o_ano():
+    assert somar_meses(date(2026, 10, 19), 3) == date(2027, 1, 1)
+    assert somar_meses(date(2026, 1, 31), -1) == date(2025, 12, 1)
+    assert somar_meses(date(2026, 10, 1), 0) == date(2026, 10, 1)
+
+
+def test_limite_retencao_preserva_meses_inteiros():
+    # 12 meses: partições até set/2025 (terminam em 01/10/2025) são removidas
+    assert limite_retencao(date(2026, 10, 19), 12) == date(2025, 10, 1)
+    assert limite_retencao(date(2026, 10, 19), 0) is None
+
+
+@pytest.fixture
+async def sessoes():
+    """Schema descartável com mensagens de meses antigos antes da migration 128."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_particoes_{uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}}
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        bruta = (await conn.get_raw_connection()).driver_connection
+        await bruta.execute(TABELAS_ANTES)
+        conversa = uuid4()
+        await bruta.execute("INSERT INTO tb_conversas VALUES ($1)", conversa)
+        for dt_criacao in (datetime(2024, 3, 10), datetime(2024, 3, 20), None):
+            await bruta.execute(
+                "INSERT INTO tb_messages (id_message, id_conversa, dt_criacao, dt_atualizacao) "
+                "VALUES ($1, $2, $3, $4)",
+                uuid4(), conversa, dt_criacao, datetime(2024, 5, 2),
+            )
+        await bruta.execute(MIGRATION_128.read_text(encoding="utf-8"))
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+async def _particoes(db, tabela):
+    result = await db.execute(
+        text("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:tabela AS regclass) ORDER BY c.relname
+        """),
+        {"tabela": tabela},
+    )
+    return [row.relname for row in result]
+
+
+@pytest.mark.requires_db
+async def test_migration_move_mensagens_para_particoes_mensais(sessoes):
+    async with sessoes() as db:
+        particoes = await _particoes(db, "tb_messages")
+        assert {"tb_messages_p202403", "tb_messages_p202405", "tb_messages_default"} <= set(particoes)
+
+        # dt_criacao NULL herdou dt_atualizacao; nada ficou na DEFAULT
+        result = await db.execute(text(
+            "SELECT tableoid::regclass::text AS particao, count(*) AS total "
+            "FROM tb_messages GROUP BY 1 ORDER BY 1"
+        ))
+        assert [tuple(row) for row in result] == [
+            ("tb_messages_p202403", 2),
+            ("tb_messages_p202405", 1),
+        ]
+
+        # Filtro por período lê só a partição do mês
+        plano = "\n".join(
+            row[0]
+            for row in await db.execute(text(
+                "EXPLAIN SELECT * FROM tb_messages "
+                "WHERE dt_criacao >= '2024-03-01' AND dt_criacao < '2024-04-01'"
+            ))
+        )
+        assert "tb_messages_p202403" in plano and "tb_messages_p202405" not in plano
+
+
+@pytest.mark.requires_db
+async def test_worker_cria_meses_futuros_e_remove_os_retidos(sessoes, monkeypatch):
+    @asynccontextmanager
+    async def sessao():
+        async with sessoes() as db:
+            yield db
+
+    monkeypatch.setattr(particoes_mensagens_worker, "get_async_session_context", sessao)
+    monkeypatch.setattr(particoes_mensagens_worker, "RETENCAO_MESES", 12)
+    hoje = date.today()
+    futuro = somar_meses(hoje, particoes_mensagens_worker.MESES_ANTECEDENCIA + 1)
+
+    worker = ParticoesMensagensWorker()
+    async with sessoes() as db:
+        await db.execute(
+            text("SELECT fn_criar_particoes_mensais('tb_messages', :mes, :mes)"), {"mes": futuro}
+        )
+        await db.commit()
+    resultado = await worker.executar()
+
+    async with sessoes() as db:
+        particoes = await _particoes(db, "tb_messages")
+    assert "tb_messages_p202403" not in particoes and "tb_messages_p202405" not in particoes
+    for meses in range(particoes_mensagens_worker.MESES_ANTECEDENCIA + 1):
+        assert f"tb_messages_p{somar_meses(hoje, meses):%Y%m}" in particoes
+    assert f"tb_messages_p{futuro:%Y%m}" in particoes
+    assert resultado["nr_removidas"] >= 2
+
+    # Idempotente: a segunda rodada não cria nem remove nada
+    assert await worker.executar() == {"nr_criadas": 0, "nr_removidas": 0}
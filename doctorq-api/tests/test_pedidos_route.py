@@ -0,0 +1,252 @@
+"""
+Testes da criação de pedido (SQL_CRIAR_PEDIDO): número pela sequence da
+migration 126, baixa de estoque tudo ou nada, movimentações no ledger e
+limpeza do carrinho
+
+Rodam contra o Postgres de TEST_DATABASE_URL, num schema temporário com as
+colunas usadas pela rota; sem a variável são pulados.
+"""
+import os
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.models.pedido import EnderecoEntrega, PedidoCreate
+from src.routes.pedidos_route import criar_pedido
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+MIGRATION_126 = Path(__file__).parents[1] / "database" / "migration_126_pedidos_sequencia.sql"
+
+pytestmark = pytest.mark.requires_db
+
+TABELAS = """
+CREATE TABLE tb_fornecedores (
+    id_fornecedor UUID PRIMARY KEY,
+    id_empresa UUID
+);
+CREATE TABLE tb_produtos (
+    id_produto UUID PRIMARY KEY,
+    id_empresa UUID,
+    id_fornecedor UUID,
+    nm_produto VARCHAR NOT NULL,
+    ds_imagem_url TEXT,
+    nr_quantidade_estoque INTEGER,
+    nr_quantidade_reservada INTEGER NOT NULL DEFAULT 0,
+    dt_atualizacao TIMESTAMP
+);
+CREATE TABLE tb_procedimentos (
+    id_procedimento UUID PRIMARY KEY,
+    nm_procedimento VARCHAR,
+    ds_imagem_url TEXT
+);
+CREATE TABLE tb_carrinho (
+    id_item_carrinho UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id_user UUID,
+    id_produto UUID,
+    id_procedimento UUID,
+    qt_quantidade INTEGER NOT NULL,
+    vl_preco_unitario NUMERIC(10,2) NOT NULL
+);
+CREATE TABLE tb_pedidos (
+    id_pedido UUID PRIMARY KEY,
+    id_user UUID,
+    id_fornecedor UUID,
+    nr_pedido VARCHAR(20) NOT NULL UNIQUE,
+    vl_subtotal NUMERIC(10,2) NOT NULL,
+    vl_desconto NUMERIC(10,2),
+    vl_frete NUMERIC(10,2),
+    vl_total NUMERIC(10,2) NOT NULL,
+    ds_status VARCHAR(50),
+    ds_endereco_entrega JSONB,
+    ds_forma_pagamento VARCHAR(50),
+    ds_observacoes TEXT,
+    dt_pedido TIMESTAMP,
+    dt_entrega_estimada DATE,
+    dt_criacao TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE TABLE tb_itens_pedido (
+    id_item UUID PRIMARY KEY,
+    id_pedido UUID REFERENCES tb_pedidos(id_pedido),
+    id_produto UUID,
+    id_procedimento UUID,
+    nm_item VARCHAR,
+    qt_quantidade INTEGER NOT NULL,
+    vl_unitario NUMERIC(10,2),
+    vl_subtotal NUMERIC(10,2),
+    ds_imagem_url TEXT
+);
+CREATE TABLE tb_movimentacoes_estoque (
+    id_movimentacao UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id_empresa UUID NOT NULL,
+    id_produto UUID NOT NULL,
+    id_user UUID,
+    id_pedido UUID,
+    tp_movimentacao VARCHAR(20) NOT NULL,
+    nr_quantidade INTEGER NOT NULL CHECK (nr_quantidade > 0),
+    nr_estoque_anterior INTEGER NOT NULL,
+    nr_estoque_atual INTEGER NOT NULL,
+    ds_motivo TEXT,
+    nr_sequencia BIGINT GENERATED ALWAYS AS IDENTITY
+);
+-- Pedido legado: a sequence continua a partir dele
+INSERT INTO tb_pedidos (id_pedido, nr_pedido, vl_subtotal, vl_total)
+VALUES (gen_random_uuid(), 'PED-000041', 0, 0);
+"""
+
+EMPRESA = uuid.uuid4()
+EMPRESA_FORNECEDOR = uuid.uuid4()
+FORNECEDOR = uuid.uuid4()
+SERUM = uuid.uuid4()
+PROTETOR = uuid.uuid4()
+AVULSO = uuid.uuid4()
+
+
+@pytest.fixture
+async def sessoes():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_pedidos_{uuid.uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}}
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.execute(TABELAS)
+        await raw.execute(MIGRATION_126.read_text(encoding="utf-8"))
+        await raw.execute("INSERT INTO tb_fornecedores VALUES ($1, $2)", FORNECEDOR, EMPRESA_FORNECEDOR)
+        await raw.executemany(
+            """
+            INSERT INTO tb_produtos (id_produto, id_empresa, id_fornecedor, nm_produto, nr_quantidade_estoque)
+            VALUES ($1, $2, $3, $4, $5)
+            """,
+            [
+                (SERUM, EMPRESA, None, "Sérum", 10),
+                # Sem empresa própria: a do fornecedor vai para o ledger
+                (PROTETOR, None, FORNECEDOR, "Protetor", 3),
+                (AVULSO, None, None, "Avulso", 5),
+            ],
+        )
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+async def encher_carrinho(sessoes, id_user, *itens):
+    async with sessoes() as db:
+        for id_produto, quantidade in itens:
+            await db.execute(
+                text("""
+                    INSERT INTO tb_carrinho (id_user, id_produto, qt_quantidade, vl_preco_unitario)
+                    VALUES (:id_user, :id_produto, :quantidade, 50)
+                """),
+                {"id_user": id_user, "id_produto": id_produto, "quantidade": quantidade},
+            )
+        await db.commit()
+
+
+async def pedir(sessoes, id_user):
+    pedido = PedidoCreate(
+        id_user=id_user,
+        ds_endereco_entrega=EnderecoEntrega(
+            nm_destinatario="Maria",
+            nr_telefone="11999999999",
+            ds_logradouro="Rua A",
+            nr_numero="1",
+            ds_bairro="Centro",
+            ds_cidade="São Paulo",
+            ds_estado="SP",
+            nr_cep="01234-567",
+        ),
+        ds_forma_pagamento="pix",
+    )
+    async with sessoes() as db:
+        return await criar_pedido(pedido, db, None)
+
+
+async def consultar(sessoes, sql, **params):
+    async with sessoes() as db:
+        return (await db.execute(text(sql), params)).all()
+
+
+async def estoques(sessoes):
+    linhas = await consultar(sessoes, "SELECT id_produto, nr_quantidade_estoque FROM tb_produtos")
+    return dict(linhas)
+
+
+async def test_pedidos_numerados_pela_sequence_com_ledger_e_carrinho_vazio(sessoes):
+    ana, bia = uuid.uuid4(), uuid.uuid4()
+    await encher_carrinho(sessoes, ana, (SERUM, 2), (PROTETOR, 1), (SERUM, 1))
+    await encher_carrinho(sessoes, bia, (SERUM, 4))
+
+    primeiro = await pedir(sessoes, ana)
+    segundo = await pedir(sessoes, bia)
+
+    # A sequence continua depois do maior número legado
+    assert primeiro.nr_pedido == "PED-000042"
+    assert segundo.nr_pedido == "PED-000043"
+    assert primeiro.vl_subtotal == Decimal("200.00")
+    assert len(primeiro.itens) == 3
+
+    assert await estoques(sessoes) == {SERUM: 3, PROTETOR: 2, AVULSO: 5}
+    assert await consultar(sessoes, "SELECT count(*) FROM tb_carrinho") == [(0,)]
+    assert await consultar(
+        sessoes,
+        "SELECT count(*) FROM tb_itens_pedido WHERE id_pedido = :id",
+        id=primeiro.id_pedido,
+    ) == [(3,)]
+
+    ledger = await consultar(
+        sessoes,
+        """
+        SELECT id_empresa, id_produto, id_pedido, tp_movimentacao, nr_quantidade,
+               nr_estoque_anterior, nr_estoque_atual, ds_motivo
+        FROM tb_movimentacoes_estoque
+        """,
+    )
+    # Itens repetidos viram uma movimentação; o protetor usa a empresa do fornecedor
+    assert len(ledger) == 3
+    assert set(ledger) == {
+        (EMPRESA, SERUM, primeiro.id_pedido, "saida", 3, 10, 7, "Pedido PED-000042"),
+        (EMPRESA_FORNECEDOR, PROTETOR, primeiro.id_pedido, "saida", 1, 3, 2, "Pedido PED-000042"),
+        (EMPRESA, SERUM, segundo.id_pedido, "saida", 4, 7, 3, "Pedido PED-000043"),
+    }
+
+
+async def test_estoque_insuficiente_desfaz_o_pedido_inteiro(sessoes):
+    ana = uuid.uuid4()
+    await encher_carrinho(sessoes, ana, (SERUM, 2), (PROTETOR, 4))
+
+    with pytest.raises(HTTPException) as erro:
+        await pedir(sessoes, ana)
+
+    assert erro.value.status_code == 400
+    assert "Protetor" in erro.value.detail
+    # Nem a baixa do sérum, nem pedido, itens ou ledger; o carrinho continua
+    assert await estoques(sessoes) == {SERUM: 10, PROTETOR: 3, AVULSO: 5}
+    assert await consultar(sessoes, "SELECT count(*) FROM tb_pedidos") == [(1,)]
+    assert await consultar(sessoes, "SELECT count(*) FROM tb_itens_pedido") == [(0,)]
+    assert await consultar(sessoes, "SELECT count(*) FROM tb_movimentacoes_estoque") == [(0,)]
+    assert await consultar(sessoes, "SELECT count(*) FROM tb_carrinho") == [(2,)]
+
+
+async def test_produto_sem_empresa_nao_baixa_estoque_sem_ledger(sessoes):
+    ana = uuid.uuid4()
+    await encher_carrinho(sessoes, ana, (SERUM, 1), (AVULSO, 1))
+
+    with pytest.raises(HTTPException) as erro:
+        await pedir(sessoes, ana)
+
+    assert erro.value.status_code == 500
+    assert "Avulso" in erro.value.detail
+    assert await estoques(sessoes) == {SERUM: 10, PROTETOR: 3, AVULSO: 5}
+    assert await consultar(sessoes, "SELECT count(*) FROM tb_movimentacoes_estoque") == [(0,)]
+    assert await consultar(sessoes, "SELECT count(*) FROM tb_carrinho") == [(2,)]
@@ -0,0 +1,70 @@
+"""
+Testes das permissões compiladas (frozenset de grupo/recurso/ação)
+Funções puras - não dependem de banco
+"""
+import uuid
+
+from src.services.permissao_cache import (
+    PermissoesCompiladas,
+    compilar_permissoes,
+    permissao_em_claims,
+)
+
+DETALHADAS = {
+    "clinica": {
+        "agendamentos": {"visualizar": True, "criar": True, "excluir": False},
+        "pacientes": {},
+    },
+    "admin": {"usuarios": {"criar": True}},
+}
+
+
+def _compiladas():
+    return PermissoesCompiladas(
+        id_perfil=uuid.uuid4(),
+        nm_perfil="Recepção",
+        versao="2026-10-19T10:00:00",
+        grupos=frozenset(["clinica", "profissional"]),
+        permissoes=compilar_permissoes(["clinica", "profissional"], DETALHADAS),
+        grupos_acesso=("clinica", "profissional"),
+        permissoes_detalhadas=DETALHADAS,
+    )
+
+
+def test_compila_apenas_acoes_concedidas_dos_grupos_do_perfil():
+    assert compilar_permissoes(["clinica"], DETALHADAS) == {
+        ("clinica", "agendamentos", "visualizar"),
+        ("clinica", "agendamentos", "criar"),
+    }
+    # Grupo fora de ds_grupos_acesso não concede nada (Nível 1)
+    assert compilar_permissoes([], DETALHADAS) == frozenset()
+    assert compilar_permissoes(None, None) == frozenset()
+
+
+def test_motivos_de_negacao_iguais_aos_da_verificacao_original():
+    permissoes = _compiladas()
+
+    assert permissoes.permite("clinica", "agendamentos", "criar")
+    assert permissoes.motivo_negacao("admin", "usuarios", "criar") == "Perfil não tem acesso ao grupo 'admin'"
+    assert permissoes.motivo_negacao("profissional", "agenda", "criar") == (
+        "Sem permissões configuradas para grupo 'profissional'"
+    )
+    assert permissoes.motivo_negacao("clinica", "pacientes", "criar") == (
+        "Sem permissões configuradas para recurso 'pacientes'"
+    )
+    assert permissoes.motivo_negacao("clinica", "agendamentos", "excluir") == (
+        "Sem permissão para 'excluir' em 'agendamentos'"
+    )
+
+
+def test_claims_so_valem_para_o_perfil_atual_do_usuario():
+    permissoes = _compiladas()
+    claims = permissoes.como_claims()
+
+    # Só o que é conferido no request vai no token
+    assert set(claims) == {"pid", "perms"}
+    assert permissao_em_claims(claims, permissoes.id_perfil, "clinica", "agendamentos", "criar") is True
+    assert permissao_em_claims(claims, permissoes.id_perfil, "clinica", "agendamentos", "excluir") is False
+    # Perfil trocado após o login: volta para o cache
+    assert permissao_em_claims(claims, uuid.uuid4(), "clinica", "agendamentos", "criar") is None
+    assert permissao_em_claims({"uid": "x"}, permissoes.id_perfil, "clinica", "agendamentos", "criar") is None
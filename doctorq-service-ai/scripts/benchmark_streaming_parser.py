@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark do parser incremental de function calls do streaming
+
+Custo por resposta: detecção antiga (reescaneia todo o texto acumulado a
+cada chunk) x ParserChamadasFuncao (só o delta) em streams sintéticos de até
+50k tokens. Os falsos positivos da detecção antiga e as chamadas que devem
+ser reconhecidas estão em tests/test_streaming_function_call_parser.py.
+
+    uv run python scripts/benchmark_streaming_parser.py
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.streaming_function_call_parser import ParserChamadasFuncao  # noqa: E402
+
+TOOLS = {"buscar_documentos", "consultar_agenda"}
+INDICADORES_ANTIGOS = ["tool_calls", "function_call", '{"name":', '{"arguments":', '"type":"function"']
+
+
+def detectar_antigo(chunks):
+    """Detecção anterior: texto acumulado reescaneado a cada chunk."""
+    acumulado = ""
+    enviados = 0
+    for chunk in chunks:
+        acumulado += chunk
+        texto = acumulado.lower()
+        if not any(indicador.lower() in texto for indicador in INDICADORES_ANTIGOS):
+            enviados += 1
+    return enviados
+
+
+def detectar_novo(chunks):
+    parser = ParserChamadasFuncao(TOOLS)
+    enviado = [parser.consumir(SimpleNamespace(content=chunk)) for chunk in chunks]
+    resto, tool_calls = parser.finalizar()
+    return "".join(enviado) + resto, tool_calls
+
+
+def em_chunks(texto: str, tamanho: int = 4):
+    return [texto[i : i + tamanho] for i in range(0, len(texto), tamanho)]
+
+
+def benchmark():
+    frase = "O tratamento com toxina botulínica dura de 4 a 6 meses, {conforme} avaliação. "
+    print(f"  {'tokens':>7} {'antigo (ms)':>12} {'novo (ms)':>10}")
+    for tokens in (5_000, 10_000, 25_000, 50_000):
+        texto = (frase * (tokens * 4 // len(frase) + 1))[: tokens * 4]
+        chunks = em_chunks(texto)
+        inicio = time.perf_counter()
+        detectar_antigo(chunks)
+        antigo = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        detectar_novo(chunks)
+        novo = (time.perf_counter() - inicio) * 1000
+        print(f"  {tokens:>7} {antigo:>12.1f} {novo:>10.1f}")
+
+
+if __name__ == "__main__":
+    print("Custo por resposta (chunks de ~1 token):")
+    benchmark()
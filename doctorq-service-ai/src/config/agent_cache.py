@@ -1,13 +1,60 @@
 ﻿# src/config/agent_cache.py
+"""
+Cache em processo de AgentExecutors, ferramentas e configurações de agentes.
+
+- Sem lock global: leituras e escritas são operações de dict no event loop
+  (atômicas entre awaits), então hits nunca esperam por outras requisições.
+- Chave do executor: agente + versão da configuração (versao_agente) +
+  filtros de tools. Editar o agente muda a versão e a entrada antiga deixa
+  de ser lida mesmo sem invalidação explícita.
+- Single-flight: misses concorrentes da mesma chave aguardam uma única
+  construção (get_or_create_agent_executor). Agente invalidado durante a
+  construção: quem a aguardava constrói de novo, o executor antigo não é
+  devolvido nem cacheado.
+- Invalidação entre processos: invalidate_agent publica no canal Redis
+  AGENT_CACHE_CANAL e cada worker remove as entradas do agente. Se a
+  assinatura cair, o cache local é limpo ao reassinar (mensagens perdidas).
+"""
 import asyncio
+import json
+import os
+import socket
+import time
 import uuid
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from src.config.logger_config import get_logger
 
 logger = get_logger(__name__)
 
+CANAL_INVALIDACAO = os.getenv("AGENT_CACHE_CANAL", "agent_cache:invalidacao")
+# agent_id especial da mensagem de invalidação: limpa o cache inteiro
+TODOS_AGENTES = "*"
+RECONEXAO_INTERVALO = 5.0
+
+ChaveExecutor = Tuple[str, str, str]
+
+
+def versao_agente(agent_config: Optional[Dict[str, Any]]) -> str:
+    """Versão da configuração: muda quando o agente ou seus document stores mudam."""
+    if not agent_config:
+        return "sem_config"
+    dt_atualizacao = agent_config.get("dt_atualizacao") or ""
+    document_stores = ",".join(
+        sorted(str(id_store) for id_store in agent_config.get("document_store_ids") or [])
+    )
+    return f"{dt_atualizacao}|{document_stores}"
+
+
+@dataclass
+class _Entrada:
+    valor: Any
+    criado_em: float
+    geracao: int
+
 
 class AgentCache:
     """
@@ -16,7 +63,6 @@ class AgentCache:
     """
 
     _instance: Optional["AgentCache"] = None
-    _lock = asyncio.Lock()
 
     def __new__(cls) -> "AgentCache":
         if cls._instance is None:
@@ -28,45 +74,94 @@ class AgentCache:
             return
 
         self._initialized = True
-        self._agents_cache: Dict[str, Any] = {}
-        self._tools_cache: Dict[uuid.UUID, List[Any]] = {}
-        self._agent_executors_cache: Dict[str, Any] = {}
-        self._cache_timestamps: Dict[str, datetime] = {}
-        self._cache_ttl = timedelta(minutes=30)  # 30 minutos de TTL
+        self._agents_cache: Dict[str, _Entrada] = {}
+        self._tools_cache: Dict[str, _Entrada] = {}
+        self._agent_executors_cache: "OrderedDict[ChaveExecutor, _Entrada]" = OrderedDict()
+        self._em_construcao: Dict[ChaveExecutor, asyncio.Future] = {}
+        # Geração por agente: invalidar incrementa e descarta construções em andamento
+        self._geracoes: Dict[str, int] = {}
+        self._cache_ttl = float(os.getenv("AGENT_CACHE_TTL_MINUTOS", "30")) * 60
+        self._max_executors = int(os.getenv("AGENT_CACHE_MAX_EXECUTORS", "500"))
+        self._instancia = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "construcoes_compartilhadas": 0,
+            "construcoes_descartadas": 0,
+            "invalidacoes": 0,
+        }
+
+        self._redis = None
+        self._escutando = False
+        self._task: Optional[asyncio.Task] = None
 
         logger.info("AgentCache inicializado")
 
-    async def get_agent_executor(self, agent_id: uuid.UUID, filter_sources: Optional[List[str]] = None) -> Optional[Any]:
+    # ------------------------------------------------------------------
+    # Entradas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _chave_executor(
+        agent_id: uuid.UUID, filter_sources: Optional[List[str]], versao: Optional[str]
+    ) -> ChaveExecutor:
+        filter_key = str(sorted(filter_sources)) if filter_sources else "no_filter"
+        return (str(agent_id), versao or "", filter_key)
+
+    def _geracao(self, agent_key: str) -> int:
+        return self._geracoes.get(agent_key, 0)
+
+    def _ler(self, cache: Dict[Any, _Entrada], chave: Any, agent_key: str) -> Optional[Any]:
+        entrada = cache.get(chave)
+        if entrada is None:
+            return None
+        if (
+            entrada.geracao != self._geracao(agent_key)
+            or time.monotonic() - entrada.criado_em >= self._cache_ttl
+        ):
+            cache.pop(chave, None)
+            return None
+        return entrada.valor
+
+    def _gravar(self, cache: Dict[Any, _Entrada], chave: Any, agent_key: str, valor: Any):
+        cache[chave] = _Entrada(valor, time.monotonic(), self._geracao(agent_key))
+
+    def _gravar_executor(self, chave: ChaveExecutor, valor: Any):
+        self._gravar(self._agent_executors_cache, chave, chave[0], valor)
+        self._agent_executors_cache.move_to_end(chave)
+        while len(self._agent_executors_cache) > self._max_executors:
+            self._agent_executors_cache.popitem(last=False)
+
+    async def get_agent_executor(
+        self,
+        agent_id: uuid.UUID,
+        filter_sources: Optional[List[str]] = None,
+        versao: Optional[str] = None,
+    ) -> Optional[Any]:
         """
-        Obter AgentExecutor do cache ou criar se nÃ£o existir.
+        Obter AgentExecutor do cache.
 
         Args:
             agent_id: ID do agente
             filter_sources: Lista de sources para filtrar tools (usado na chave de cache)
+            versao: Versão da configuração do agente (versao_agente)
 
         Returns:
             AgentExecutor ou None se nÃ£o encontrado
         """
-        async with self._lock:
-            # Gerar chave de cache que inclui filtros para evitar conflitos
-            filter_key = str(sorted(filter_sources)) if filter_sources else "no_filter"
-            cache_key = f"{agent_id}_{filter_key}"
-
-            # Verificar se existe no cache e nÃ£o estÃ¡ expirado
-            if cache_key in self._agent_executors_cache:
-                timestamp = self._cache_timestamps.get(f"executor_{cache_key}")
-                if timestamp and (datetime.now() - timestamp) < self._cache_ttl:
-                    logger.debug(f"AgentExecutor encontrado no cache: {agent_id} (filtros: {filter_sources})")
-                    return self._agent_executors_cache[cache_key]
-
-                # Expirado, remover do cache
-                logger.debug(f"AgentExecutor expirado no cache: {agent_id} (filtros: {filter_sources})")
-                self._agent_executors_cache.pop(cache_key, None)
-                self._cache_timestamps.pop(f"executor_{cache_key}", None)
-
-            return None
-
-    async def set_agent_executor(self, agent_id: uuid.UUID, executor: Any, filter_sources: Optional[List[str]] = None) -> None:
+        chave = self._chave_executor(agent_id, filter_sources, versao)
+        executor = self._ler(self._agent_executors_cache, chave, chave[0])
+        if executor is not None:
+            self._agent_executors_cache.move_to_end(chave)
+        return executor
+
+    async def set_agent_executor(
+        self,
+        agent_id: uuid.UUID,
+        executor: Any,
+        filter_sources: Optional[List[str]] = None,
+        versao: Optional[str] = None,
+    ) -> None:
         """
         Armazenar AgentExecutor no cache.
 
@@ -74,14 +169,59 @@ class AgentCache:
             agent_id: ID do agente
             executor: AgentExecutor para cachear
             filter_sources: Lista de sources para filtrar tools (usado na chave de cache)
+            versao: Versão da configuração do agente (versao_agente)
+        """
+        self._gravar_executor(self._chave_executor(agent_id, filter_sources, versao), executor)
+
+    async def get_or_create_agent_executor(
+        self,
+        agent_id: uuid.UUID,
+        factory: Callable[[], Awaitable[Optional[Any]]],
+        filter_sources: Optional[List[str]] = None,
+        versao: Optional[str] = None,
+    ) -> Optional[Any]:
+        """
+        Obter AgentExecutor do cache ou construí-lo uma única vez.
+
+        Requisições concorrentes com a mesma chave aguardam a mesma construção
+        (que continua mesmo se a requisição que a iniciou for cancelada).
+        Resultado None ou erro não é cacheado. Se o agente for invalidado
+        enquanto a construção roda, o resultado é descartado e a requisição
+        usa (ou inicia) uma construção posterior à invalidação.
         """
-        async with self._lock:
-            # Gerar chave de cache que inclui filtros para evitar conflitos
-            filter_key = str(sorted(filter_sources)) if filter_sources else "no_filter"
-            cache_key = f"{agent_id}_{filter_key}"
-            self._agent_executors_cache[cache_key] = executor
-            self._cache_timestamps[f"executor_{cache_key}"] = datetime.now()
-            logger.debug(f"AgentExecutor armazenado no cache: {agent_id} (filtros: {filter_sources})")
+        chave = self._chave_executor(agent_id, filter_sources, versao)
+        while True:
+            geracao = self._geracao(chave[0])
+            executor = self._ler(self._agent_executors_cache, chave, chave[0])
+            if executor is not None:
+                self._stats["hits"] += 1
+                self._agent_executors_cache.move_to_end(chave)
+                return executor
+
+            construcao = self._em_construcao.get(chave)
+            if construcao is None:
+                self._stats["misses"] += 1
+                construcao = asyncio.ensure_future(factory())
+                self._em_construcao[chave] = construcao
+                construcao.add_done_callback(
+                    partial(self._construcao_concluida, chave, geracao)
+                )
+            else:
+                self._stats["construcoes_compartilhadas"] += 1
+            executor = await asyncio.shield(construcao)
+            if geracao == self._geracao(chave[0]):
+                return executor
+            self._stats["construcoes_descartadas"] += 1
+
+    def _construcao_concluida(self, chave: ChaveExecutor, geracao: int, construcao: asyncio.Future):
+        if self._em_construcao.get(chave) is construcao:
+            del self._em_construcao[chave]
+        if construcao.cancelled() or construcao.exception() is not None:
+            return
+        executor = construcao.result()
+        # Agente invalidado durante a construção: resultado não entra no cache
+        if executor is not None and geracao == self._geracao(chave[0]):
+            self._gravar_executor(chave, executor)
 
     async def get_agent_tools(self, agent_id: uuid.UUID) -> Optional[List[Any]]:
         """
@@ -93,19 +233,7 @@ class AgentCache:
         Returns:
             Lista de ferramentas ou None se nÃ£o encontrado
         """
-        async with self._lock:
-            if agent_id in self._tools_cache:
-                timestamp = self._cache_timestamps.get(f"tools_{agent_id}")
-                if timestamp and (datetime.now() - timestamp) < self._cache_ttl:
-                    logger.debug(f"Ferramentas encontradas no cache: {agent_id}")
-                    return self._tools_cache[agent_id]
-
-                # Expirado, remover do cache
-                logger.debug(f"Ferramentas expiradas no cache: {agent_id}")
-                self._tools_cache.pop(agent_id, None)
-                self._cache_timestamps.pop(f"tools_{agent_id}", None)
-
-            return None
+        return self._ler(self._tools_cache, str(agent_id), str(agent_id))
 
     async def set_agent_tools(self, agent_id: uuid.UUID, tools: List[Any]) -> None:
         """
@@ -115,12 +243,7 @@ class AgentCache:
             agent_id: ID do agente
             tools: Lista de ferramentas para cachear
         """
-        async with self._lock:
-            self._tools_cache[agent_id] = tools
-            self._cache_timestamps[f"tools_{agent_id}"] = datetime.now()
-            logger.debug(
-                f"Ferramentas armazenadas no cache: {agent_id}, total: {len(tools)}"
-            )
+        self._gravar(self._tools_cache, str(agent_id), str(agent_id), tools)
 
     async def get_agent_config(self, agent_id: uuid.UUID) -> Optional[Dict[str, Any]]:
         """
@@ -132,22 +255,7 @@ class AgentCache:
         Returns:
             ConfiguraÃ§Ã£o do agente ou None se nÃ£o encontrado
         """
-        async with self._lock:
-            cache_key = str(agent_id)
-            if cache_key in self._agents_cache:
-                timestamp = self._cache_timestamps.get(f"config_{cache_key}")
-                if timestamp and (datetime.now() - timestamp) < self._cache_ttl:
-                    logger.debug(
-                        f"ConfiguraÃ§Ã£o do agente encontrada no cache: {agent_id}"
-                    )
-                    return self._agents_cache[cache_key]
-
-                # Expirado, remover do cache
-                logger.debug(f"ConfiguraÃ§Ã£o do agente expirada no cache: {agent_id}")
-                self._agents_cache.pop(cache_key, None)
-                self._cache_timestamps.pop(f"config_{cache_key}", None)
-
-            return None
+        return self._ler(self._agents_cache, str(agent_id), str(agent_id))
 
     async def set_agent_config(
         self, agent_id: uuid.UUID, config: Dict[str, Any]
@@ -159,104 +267,165 @@ class AgentCache:
             agent_id: ID do agente
             config: ConfiguraÃ§Ã£o para cachear
         """
-        async with self._lock:
-            cache_key = str(agent_id)
-            self._agents_cache[cache_key] = config
-            self._cache_timestamps[f"config_{cache_key}"] = datetime.now()
-            logger.debug(f"ConfiguraÃ§Ã£o do agente armazenada no cache: {agent_id}")
+        self._gravar(self._agents_cache, str(agent_id), str(agent_id), config)
+
+    # ------------------------------------------------------------------
+    # Invalidação
+    # ------------------------------------------------------------------
+
+    def _invalidar_local(self, agent_key: str):
+        if agent_key == TODOS_AGENTES:
+            self._limpar_local()
+            return
+        self._geracoes[agent_key] = self._geracao(agent_key) + 1
+        self._agents_cache.pop(agent_key, None)
+        self._tools_cache.pop(agent_key, None)
+        for chave in [c for c in self._agent_executors_cache if c[0] == agent_key]:
+            self._agent_executors_cache.pop(chave, None)
+        # Novas requisições não aguardam construções iniciadas antes da edição
+        for chave in [c for c in self._em_construcao if c[0] == agent_key]:
+            self._em_construcao.pop(chave, None)
+        self._stats["invalidacoes"] += 1
+
+    def _limpar_local(self):
+        for agent_key in {c[0] for c in self._agent_executors_cache} | {
+            c[0] for c in self._em_construcao
+        } | set(self._agents_cache) | set(self._tools_cache):
+            self._geracoes[agent_key] = self._geracao(agent_key) + 1
+        self._agents_cache.clear()
+        self._tools_cache.clear()
+        self._agent_executors_cache.clear()
+        self._em_construcao.clear()
+
+    async def _publicar(self, agent_key: str):
+        if self._redis is None:
+            return
+        try:
+            await self._redis.publish(
+                CANAL_INVALIDACAO,
+                json.dumps({"agent_id": agent_key, "origem": self._instancia}),
+            )
+        except Exception as e:
+            logger.warning(f"Erro ao publicar invalidação do agente {agent_key}: {e}")
 
-    async def invalidate_agent(self, agent_id: uuid.UUID) -> None:
+    async def invalidate_agent(self, agent_id: uuid.UUID, propagar: bool = True) -> None:
         """
-        Invalidar cache do agente especÃ­fico.
+        Invalidar cache do agente específico (neste processo e, se propagar,
+        em todos os workers inscritos no canal de invalidação).
 
         Args:
             agent_id: ID do agente
+            propagar: Publicar a invalidação no Redis
         """
-        async with self._lock:
-            cache_key = str(agent_id)
-
-            # Remover todas as entradas relacionadas ao agente
-            self._agents_cache.pop(cache_key, None)
-            self._tools_cache.pop(agent_id, None)
-            
-            # Remover todos os AgentExecutors que comeÃ§am com o agent_id (diferentes filtros)
-            executors_to_remove = [key for key in self._agent_executors_cache.keys() if key.startswith(f"{agent_id}_")]
-            for exec_key in executors_to_remove:
-                self._agent_executors_cache.pop(exec_key, None)
-
-            # Remover timestamps
-            self._cache_timestamps.pop(f"config_{cache_key}", None)
-            self._cache_timestamps.pop(f"tools_{agent_id}", None)
-            
-            # Remover timestamps dos executors com diferentes filtros
-            timestamp_keys_to_remove = [key for key in self._cache_timestamps.keys() if key.startswith(f"executor_{agent_id}_")]
-            for ts_key in timestamp_keys_to_remove:
-                self._cache_timestamps.pop(ts_key, None)
-
-            logger.info(f"Cache invalidado para agente: {agent_id} (incluindo todos os filtros)")
+        agent_key = str(agent_id)
+        self._invalidar_local(agent_key)
+        if propagar:
+            await self._publicar(agent_key)
+        logger.info(f"Cache invalidado para agente: {agent_id} (incluindo todos os filtros)")
 
     async def clear_expired(self) -> None:
         """Limpar entradas expiradas do cache."""
-        async with self._lock:
-            now = datetime.now()
-            expired_keys = []
-
-            for key, timestamp in self._cache_timestamps.items():
-                if (now - timestamp) > self._cache_ttl:
-                    expired_keys.append(key)
-
-            # Remover entradas expiradas
-            for key in expired_keys:
-                self._cache_timestamps.pop(key, None)
-
-                # Identificar tipo de cache e remover entrada correspondente
-                if key.startswith("config_"):
-                    agent_key = key.replace("config_", "")
-                    self._agents_cache.pop(agent_key, None)
-                elif key.startswith("tools_"):
-                    agent_id_str = key.replace("tools_", "")
-                    try:
-                        agent_uuid = uuid.UUID(agent_id_str)
-                        self._tools_cache.pop(agent_uuid, None)
-                    except ValueError:
-                        pass
-                elif key.startswith("executor_"):
-                    # A chave agora pode ter formato "executor_uuid_filter" ou "executor_uuid"
-                    agent_exec_key = key.replace("executor_", "")
-                    self._agent_executors_cache.pop(agent_exec_key, None)
-
-            if expired_keys:
-                logger.info(
-                    f"Removidas {len(expired_keys)} entradas expiradas do cache"
-                )
-
-    async def clear_all(self) -> None:
-        """Limpar todo o cache."""
-        async with self._lock:
-            self._agents_cache.clear()
-            self._tools_cache.clear()
-            self._agent_executors_cache.clear()
-            self._cache_timestamps.clear()
-            logger.info("Cache completamente limpo")
+        agora = time.monotonic()
+        removidas = 0
+        for cache in (self._agents_cache, self._tools_cache, self._agent_executors_cache):
+            expiradas = [
+                chave for chave, entrada in cache.items()
+                if agora - entrada.criado_em >= self._cache_ttl
+            ]
+            for chave in expiradas:
+                cache.pop(chave, None)
+            removidas += len(expiradas)
+
+        if removidas:
+            logger.info(f"Removidas {removidas} entradas expiradas do cache")
+
+    async def clear_all(self, propagar: bool = True) -> None:
+        """Limpar todo o cache (ex.: ferramenta compartilhada alterada)."""
+        self._limpar_local()
+        if propagar:
+            await self._publicar(TODOS_AGENTES)
+        logger.info("Cache completamente limpo")
 
     async def get_stats(self) -> Dict[str, Any]:
         """Obter estatÃ­sticas do cache."""
-        async with self._lock:
-            now = datetime.now()
-            active_entries = sum(
+        agora = time.monotonic()
+        caches = (self._agents_cache, self._tools_cache, self._agent_executors_cache)
+        return {
+            "agents_cached": len(self._agents_cache),
+            "tools_cached": len(self._tools_cache),
+            "executors_cached": len(self._agent_executors_cache),
+            "executors_em_construcao": len(self._em_construcao),
+            "active_entries": sum(
                 1
-                for timestamp in self._cache_timestamps.values()
-                if (now - timestamp) < self._cache_ttl
-            )
+                for cache in caches
+                for entrada in cache.values()
+                if agora - entrada.criado_em < self._cache_ttl
+            ),
+            "total_entries": sum(len(cache) for cache in caches),
+            "cache_ttl_minutes": self._cache_ttl / 60,
+            "invalidacao_distribuida": self._escutando,
+            **self._stats,
+        }
+
+    # ------------------------------------------------------------------
+    # Barramento de invalidação (Redis pub/sub)
+    # ------------------------------------------------------------------
+
+    def _aplicar_mensagem(self, dados: Any):
+        try:
+            mensagem = json.loads(dados)
+        except (TypeError, ValueError):
+            logger.warning(f"Mensagem de invalidação inválida: {dados!r}")
+            return
+        if mensagem.get("origem") == self._instancia or not mensagem.get("agent_id"):
+            return
+        self._invalidar_local(str(mensagem["agent_id"]))
+        logger.debug(f"Cache invalidado por outro worker: {mensagem['agent_id']}")
 
-            return {
-                "agents_cached": len(self._agents_cache),
-                "tools_cached": len(self._tools_cache),
-                "executors_cached": len(self._agent_executors_cache),
-                "active_entries": active_entries,
-                "total_entries": len(self._cache_timestamps),
-                "cache_ttl_minutes": self._cache_ttl.total_seconds() / 60,
-            }
+    async def start_invalidation_listener(self, redis_client) -> None:
+        """Assina o canal de invalidação (idempotente; sem Redis o cache fica local)."""
+        if self._escutando or redis_client is None:
+            return
+        self._redis = redis_client
+        self._escutando = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Invalidação distribuída do AgentCache ativa (canal {CANAL_INVALIDACAO})")
+
+    async def stop_invalidation_listener(self) -> None:
+        self._escutando = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._redis = None
+
+    async def _loop(self):
+        primeira = True
+        while self._escutando:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(CANAL_INVALIDACAO)
+                if not primeira:
+                    # Invalidações publicadas durante a queda foram perdidas
+                    self._limpar_local()
+                primeira = False
+                async for mensagem in pubsub.listen():
+                    if mensagem.get("type") == "message":
+                        self._aplicar_mensagem(mensagem.get("data"))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Erro no canal de invalidação do AgentCache: {e}")
+                primeira = False
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            try:
+                await asyncio.sleep(RECONEXAO_INTERVALO)
+            except asyncio.CancelledError:
+                break
 
 
 # InstÃ¢ncia global do cache
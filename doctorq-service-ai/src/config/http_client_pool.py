@@ -0,0 +1,273 @@
+# src/config/http_client_pool.py
+"""
+Clientes HTTP compartilhados das tools de API externa (ApiTool).
+
+- Um httpx.AsyncClient por host (scheme://host:porta), criado sob demanda e
+  fechado no shutdown da aplicação: conexões TCP/TLS reaproveitadas entre
+  chamadas e conversas (keep-alive)
+- Circuit breaker por host: HTTP_CB_FALHAS falhas seguidas (conexão, 429 ou
+  5xx) abrem o circuito por HTTP_CB_ABERTO_SEGUNDOS; depois uma única chamada
+  de teste (meio-aberto) fecha ou reabre o circuito
+- Cache TTL opcional de respostas de GET (ttl por endpoint), chave: método,
+  URL, parâmetros normalizados e hash dos headers (credenciais diferentes não
+  compartilham respostas)
+- Atraso de retry com jitter, respeitando Retry-After
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.config.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+HTTP_MAX_CONEXOES_HOST = int(os.getenv("HTTP_MAX_CONEXOES_HOST", "20"))
+HTTP_KEEPALIVE_HOST = int(os.getenv("HTTP_KEEPALIVE_HOST", "10"))
+HTTP_CB_FALHAS = int(os.getenv("HTTP_CB_FALHAS", "5"))
+HTTP_CB_ABERTO_SEGUNDOS = float(os.getenv("HTTP_CB_ABERTO_SEGUNDOS", "30"))
+HTTP_CACHE_MAX_ENTRADAS = int(os.getenv("HTTP_CACHE_MAX_ENTRADAS", "1000"))
+RETRY_ATRASO_BASE = 0.5
+RETRY_ATRASO_MAXIMO = 60.0
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+
+def host_da_url(url: str) -> str:
+    partes = urlsplit(url)
+    return f"{partes.scheme}://{partes.netloc}".lower()
+
+
+def atraso_retry(
+    tentativa: int,
+    retry_after: Optional[str] = None,
+    base: float = RETRY_ATRASO_BASE,
+    maximo: float = RETRY_ATRASO_MAXIMO,
+) -> float:
+    """Retry-After (segundos ou data HTTP) se presente; senão backoff exponencial com full jitter."""
+    if retry_after:
+        valor = retry_after.strip()
+        try:
+            return min(maximo, max(0.0, float(valor)))
+        except ValueError:
+            pass
+        try:
+            return min(maximo, max(0.0, parsedate_to_datetime(valor).timestamp() - time.time()))
+        except (TypeError, ValueError, IndexError, OverflowError):
+            pass
+    return random.uniform(0, min(maximo, base * (2**tentativa)))
+
+
+def chave_cache(
+    metodo: str,
+    url: str,
+    params: Optional[Mapping[str, Any]] = None,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Tuple[str, str, str, str]:
+    """Chave do cache: parâmetros em ordem estável e headers reduzidos a um hash."""
+    params_normalizados = json.dumps(
+        sorted((str(chave), str(valor)) for chave, valor in (params or {}).items())
+    )
+    headers_normalizados = json.dumps(
+        sorted((chave.lower(), valor) for chave, valor in (headers or {}).items())
+    )
+    return (
+        metodo.upper(),
+        url,
+        params_normalizados,
+        hashlib.sha256(headers_normalizados.encode()).hexdigest(),
+    )
+
+
+class CircuitoAbertoError(Exception):
+    """Host com circuito aberto: chamada recusada sem ir à rede."""
+
+    def __init__(self, host: str, segundos_restantes: float):
+        super().__init__(
+            f"Circuito aberto para {host} (nova tentativa em {segundos_restantes:.0f}s)"
+        )
+        self.host = host
+        self.segundos_restantes = segundos_restantes
+
+
+class CircuitBreaker:
+    """Circuit breaker de um host (fechado -> aberto -> meio-aberto -> fechado)."""
+
+    def __init__(
+        self,
+        host: str,
+        limite_falhas: int = HTTP_CB_FALHAS,
+        tempo_aberto: float = HTTP_CB_ABERTO_SEGUNDOS,
+    ):
+        self.host = host
+        self._limite_falhas = max(1, limite_falhas)
+        self._tempo_aberto = tempo_aberto
+        self._estado = FECHADO
+        self._falhas = 0
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+
+    @property
+    def estado(self) -> str:
+        if self._estado == ABERTO and self._restante() <= 0:
+            return MEIO_ABERTO
+        return self._estado
+
+    def _restante(self) -> float:
+        return self._aberto_em + self._tempo_aberto - time.monotonic()
+
+    def verificar(self):
+        """Libera a chamada ou levanta CircuitoAbertoError."""
+        if self._estado == FECHADO:
+            return
+        if self._estado == ABERTO and self._restante() > 0:
+            raise CircuitoAbertoError(self.host, self._restante())
+        # Meio-aberto: só uma chamada de teste por vez
+        if self._teste_em_andamento:
+            raise CircuitoAbertoError(self.host, 0)
+        self._estado = MEIO_ABERTO
+        self._teste_em_andamento = True
+
+    def registrar_sucesso(self):
+        if self._estado != FECHADO:
+            logger.info(f"Circuito fechado para {self.host}")
+        self._estado = FECHADO
+        self._falhas = 0
+        self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        self._falhas += 1
+        if self._estado == MEIO_ABERTO or self._falhas >= self._limite_falhas:
+            if self._estado != ABERTO:
+                logger.warning(
+                    f"Circuito aberto para {self.host} por {self._tempo_aberto:.0f}s "
+                    f"({self._falhas} falhas)"
+                )
+            self._estado = ABERTO
+            self._aberto_em = time.monotonic()
+        self._teste_em_andamento = False
+
+    def liberar_teste(self):
+        """Chamada de teste terminou sem resultado (ex.: cancelada)."""
+        self._teste_em_andamento = False
+
+    def status(self) -> Dict[str, Any]:
+        return {"estado": self.estado, "falhas": self._falhas}
+
+
+class CacheRespostas:
+    """Cache TTL (LRU limitado) de respostas já processadas."""
+
+    def __init__(self, max_entradas: int = HTTP_CACHE_MAX_ENTRADAS):
+        self._entradas: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, chave: Tuple) -> Optional[Any]:
+        entrada = self._entradas.get(chave)
+        if entrada is None or entrada[0] <= time.monotonic():
+            self._entradas.pop(chave, None)
+            self.misses += 1
+            return None
+        self._entradas.move_to_end(chave)
+        self.hits += 1
+        return entrada[1]
+
+    def gravar(self, chave: Tuple, valor: Any, ttl: float):
+        self._entradas[chave] = (time.monotonic() + ttl, valor)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self._max_entradas:
+            self._entradas.popitem(last=False)
+
+    def limpar(self):
+        self._entradas.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+class PoolClientesHttp:
+    """Clientes, circuit breakers e cache de respostas por host."""
+
+    def __init__(
+        self,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        limite_falhas: int = HTTP_CB_FALHAS,
+        tempo_aberto: float = HTTP_CB_ABERTO_SEGUNDOS,
+    ):
+        self._transport = transport
+        self._limite_falhas = limite_falhas
+        self._tempo_aberto = tempo_aberto
+        self._clientes: Dict[str, httpx.AsyncClient] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.cache = CacheRespostas()
+
+    def cliente(self, url: str) -> httpx.AsyncClient:
+        host = host_da_url(url)
+        cliente = self._clientes.get(host)
+        if cliente is None or cliente.is_closed:
+            cliente = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONEXOES_HOST,
+                    max_keepalive_connections=HTTP_KEEPALIVE_HOST,
+                ),
+                transport=self._transport,
+            )
+            self._clientes[host] = cliente
+            logger.debug(f"Cliente HTTP criado para {host}")
+        return cliente
+
+    def circuit_breaker(self, url: str) -> CircuitBreaker:
+        host = host_da_url(url)
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host, self._limite_falhas, self._tempo_aberto)
+            self._breakers[host] = breaker
+        return breaker
+
+    async def fechar(self):
+        clientes = list(self._clientes.values())
+        self._clientes.clear()
+        await asyncio.gather(*(cliente.aclose() for cliente in clientes), return_exceptions=True)
+        self.cache.limpar()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "clientes": sorted(self._clientes),
+            "circuitos": {host: breaker.status() for host, breaker in self._breakers.items()},
+            "cache": {
+                "entradas": len(self.cache),
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+            },
+        }
+
+
+_pool_http: Optional[PoolClientesHttp] = None
+
+
+def get_pool_http() -> PoolClientesHttp:
+    """Pool do processo (criado sob demanda fora do lifespan, ex.: scripts)."""
+    global _pool_http
+    if _pool_http is None:
+        _pool_http = PoolClientesHttp()
+    return _pool_http
+
+
+async def fechar_pool_http():
+    """Fecha os clientes HTTP compartilhados (shutdown da aplicação)."""
+    global _pool_http
+    pool, _pool_http = _pool_http, None
+    if pool:
+        await pool.fechar()
@@ -17,6 +17,16 @@ except (ImportError, ModuleNotFoundError):
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.config.langfuse_pipeline import (
+    TAXA_AMOSTRAGEM_PADRAO,
+    amostrar,
+    chave_amostragem,
+    estimar_tamanho,
+    get_fila_tracing,
+    instrumentar_handler,
+    taxa_amostragem,
+    truncar_payload,
+)
 from src.config.logger_config import get_logger
 from src.services.variable_service import VariableService
 
@@ -130,7 +140,7 @@ class LangFuseConfig:
                 **self._credentials, session_id=None
             )
 
-            self._wrap_callback_handler_with_truncation()
+            instrumentar_handler(self._callback_handler, get_fila_tracing())
             self._configure_token_capture()
 
             return True
@@ -177,56 +187,38 @@ class LangFuseConfig:
             Dados truncados se necessÃ¡rio
         """
         try:
-            import json
-
             if data is None:
                 return data
 
-            # Para strings, truncar diretamente
-            if isinstance(data, str):
-                size = len(data.encode("utf-8"))
-                if size > max_size:
-                    logger.warning(
-                        f"Input de emergÃªncia truncado: {size} bytes -> {max_size} bytes"
-                    )
-                    return self._truncate_string(data, max_size, "emergency_input")
-                return data
-
-            # Para outros tipos, verificar tamanho serializado
-            try:
-                data_str = json.dumps(data, ensure_ascii=False, default=str)
-                size = len(data_str.encode("utf-8"))
-
-                if size > max_size:
-                    logger.warning(
-                        f"Input complexo de emergÃªncia truncado: {size} bytes -> {max_size} bytes"
-                    )
-                    return self.truncate_large_data(
-                        data, max_size=max_size, field_name="emergency_complex_input"
-                    )
-
-                return data
-
-            except Exception:
-                # Se nÃ£o conseguir serializar, converter para string e truncar
-                data_str = str(data)
-                if len(data_str.encode("utf-8")) > max_size:
-                    logger.warning("Input nÃ£o serializÃ¡vel truncado para string")
-                    return self._truncate_string(
-                        data_str, max_size, "emergency_fallback_input"
-                    )
-                return data_str
+            size = estimar_tamanho(data, max_size)
+            if size > max_size:
+                logger.warning(
+                    f"Input de emergência truncado: >{max_size} bytes (estimado {size})"
+                )
+                return truncar_payload(data, max_size)
+            return data
 
         except Exception as e:
-            logger.error(f"Erro no truncamento de emergÃªncia: {e}")
+            logger.error(f"Erro no truncamento de emergência: {e}")
             return "Erro: dados muito grandes para processar"
 
-    def get_callbacks(self) -> list:
+    def should_sample(
+        self, session_id: Optional[str] = None, agent_config: Optional[dict] = None
+    ) -> bool:
+        """Amostragem head-based da sessão ou, sem sessão, do agente (taxa do agente, da empresa ou global)"""
+        return amostrar(chave_amostragem(session_id, agent_config), taxa_amostragem(agent_config))
+
+    def get_callbacks(
+        self, agent_config: Optional[dict] = None, session_id: Optional[str] = None
+    ) -> list:
         """Retornar callbacks do Langfuse"""
         if not self.enabled:
             logger.debug("Langfuse desabilitado - retornando lista vazia de callbacks")
             return []
 
+        if not self.should_sample(session_id, agent_config):
+            return []
+
         if not self._callback_handler:
             logger.warning("Callback handler nÃ£o inicializado - retornando lista vazia")
             return []
@@ -264,236 +256,6 @@ class LangFuseConfig:
         """Verificar se inicializado"""
         return self.enabled and self._client is not None
 
-    def _wrap_callback_handler_with_truncation(self):
-        """Aplica wrapper de truncamento ao callback handler"""
-        if not self._callback_handler:
-            return
-
-        try:
-            # Salvar mÃ©todos originais
-            original_on_llm_end = getattr(self._callback_handler, "on_llm_end", None)
-            original_on_chain_end = getattr(
-                self._callback_handler, "on_chain_end", None
-            )
-            original_on_tool_end = getattr(self._callback_handler, "on_tool_end", None)
-            original_on_agent_action = getattr(
-                self._callback_handler, "on_agent_action", None
-            )
-            original_on_agent_finish = getattr(
-                self._callback_handler, "on_agent_finish", None
-            )
-
-            # Wrapper para on_llm_end
-            def wrapped_on_llm_end(response, **kwargs):
-                if original_on_llm_end:
-                    try:
-                        # Truncar response se necessÃ¡rio (mais conservador)
-                        if hasattr(response, "generations"):
-                            for generation_list in response.generations:
-                                for generation in generation_list:
-                                    if hasattr(generation, "text"):
-                                        if (
-                                            len(generation.text.encode("utf-8")) > 50000
-                                        ):  # 50KB para LLM output (muito conservador)
-                                            generation.text = self._truncate_string(
-                                                generation.text, 50000, "llm_output"
-                                            )
-
-                        return original_on_llm_end(response, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_llm_end: {e}")
-                        return original_on_llm_end(response, **kwargs)
-
-            # Wrapper para on_chain_end
-            def wrapped_on_chain_end(outputs, **kwargs):
-                if original_on_chain_end:
-                    try:
-                        # Truncar outputs se necessÃ¡rio (mais conservador)
-                        truncated_outputs = self.truncate_large_data(
-                            outputs, max_size=50000, field_name="chain_outputs"
-                        )
-                        return original_on_chain_end(truncated_outputs, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_chain_end: {e}")
-                        return original_on_chain_end(outputs, **kwargs)
-
-            # Wrapper para on_tool_end
-            def wrapped_on_tool_end(output, **kwargs):
-                if original_on_tool_end:
-                    try:
-                        # Truncar tool output se necessÃ¡rio (mais conservador)
-                        truncated_output = self.truncate_large_data(
-                            output, max_size=50000, field_name="tool_output"
-                        )
-                        return original_on_tool_end(truncated_output, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_tool_end: {e}")
-                        return original_on_tool_end(output, **kwargs)
-
-            # Wrapper para on_agent_action
-            def wrapped_on_agent_action(action, **kwargs):
-                if original_on_agent_action:
-                    try:
-                        # Truncar action input se necessÃ¡rio (mais conservador)
-                        if hasattr(action, "tool_input"):
-                            action.tool_input = self.truncate_large_data(
-                                action.tool_input,
-                                max_size=30000,
-                                field_name="agent_action_input",
-                            )
-                        return original_on_agent_action(action, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_agent_action: {e}")
-                        return original_on_agent_action(action, **kwargs)
-
-            # Wrapper para on_agent_finish
-            def wrapped_on_agent_finish(finish, **kwargs):
-                if original_on_agent_finish:
-                    try:
-                        # Truncar agent output se necessÃ¡rio (mais conservador)
-                        if hasattr(finish, "return_values"):
-                            finish.return_values = self.truncate_large_data(
-                                finish.return_values,
-                                max_size=50000,
-                                field_name="agent_finish_output",
-                            )
-                        return original_on_agent_finish(finish, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_agent_finish: {e}")
-                        return original_on_agent_finish(finish, **kwargs)
-
-            # Aplicar wrappers
-            if original_on_llm_end:
-                setattr(self._callback_handler, "on_llm_end", wrapped_on_llm_end)
-            if original_on_chain_end:
-                setattr(self._callback_handler, "on_chain_end", wrapped_on_chain_end)
-            if original_on_tool_end:
-                setattr(self._callback_handler, "on_tool_end", wrapped_on_tool_end)
-            if original_on_agent_action:
-                setattr(
-                    self._callback_handler, "on_agent_action", wrapped_on_agent_action
-                )
-            if original_on_agent_finish:
-                setattr(
-                    self._callback_handler, "on_agent_finish", wrapped_on_agent_finish
-                )
-
-            logger.debug("Wrapper de truncamento aplicado ao callback handler")
-
-        except Exception as e:
-            logger.error(
-                f"Erro ao aplicar wrapper de truncamento ao callback handler: {e}"
-            )
-
-    def _apply_truncation_to_handler(self, handler):
-        """Aplica truncamento a um handler especÃ­fico"""
-        if not handler:
-            return
-
-        try:
-            # Salvar mÃ©todos originais
-            original_on_llm_end = getattr(handler, "on_llm_end", None)
-            original_on_chain_end = getattr(handler, "on_chain_end", None)
-            original_on_tool_end = getattr(handler, "on_tool_end", None)
-            original_on_agent_action = getattr(handler, "on_agent_action", None)
-            original_on_agent_finish = getattr(handler, "on_agent_finish", None)
-
-            # Wrapper para on_llm_end
-            def wrapped_on_llm_end(response, **kwargs):
-                if original_on_llm_end:
-                    try:
-                        # Truncar response se necessÃ¡rio
-                        if hasattr(response, "generations"):
-                            for generation_list in response.generations:
-                                for generation in generation_list:
-                                    if hasattr(generation, "text"):
-                                        if (
-                                            len(generation.text.encode("utf-8")) > 50000
-                                        ):  # 50KB para LLM output (muito conservador)
-                                            generation.text = self._truncate_string(
-                                                generation.text, 50000, "llm_output"
-                                            )
-
-                        return original_on_llm_end(response, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_llm_end (handler): {e}")
-                        return original_on_llm_end(response, **kwargs)
-
-            # Wrapper para on_chain_end
-            def wrapped_on_chain_end(outputs, **kwargs):
-                if original_on_chain_end:
-                    try:
-                        # Truncar outputs se necessÃ¡rio
-                        truncated_outputs = self.truncate_large_data(
-                            outputs, max_size=50000, field_name="chain_outputs"
-                        )
-                        return original_on_chain_end(truncated_outputs, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_chain_end (handler): {e}")
-                        return original_on_chain_end(outputs, **kwargs)
-
-            # Wrapper para on_tool_end
-            def wrapped_on_tool_end(output, **kwargs):
-                if original_on_tool_end:
-                    try:
-                        # Truncar tool output se necessÃ¡rio
-                        truncated_output = self.truncate_large_data(
-                            output, max_size=50000, field_name="tool_output"
-                        )
-                        return original_on_tool_end(truncated_output, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_tool_end (handler): {e}")
-                        return original_on_tool_end(output, **kwargs)
-
-            # Wrapper para on_agent_action
-            def wrapped_on_agent_action(action, **kwargs):
-                if original_on_agent_action:
-                    try:
-                        # Truncar action input se necessÃ¡rio
-                        if hasattr(action, "tool_input"):
-                            action.tool_input = self.truncate_large_data(
-                                action.tool_input,
-                                max_size=30000,
-                                field_name="agent_action_input",
-                            )
-                        return original_on_agent_action(action, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_agent_action (handler): {e}")
-                        return original_on_agent_action(action, **kwargs)
-
-            # Wrapper para on_agent_finish
-            def wrapped_on_agent_finish(finish, **kwargs):
-                if original_on_agent_finish:
-                    try:
-                        # Truncar agent output se necessÃ¡rio
-                        if hasattr(finish, "return_values"):
-                            finish.return_values = self.truncate_large_data(
-                                finish.return_values,
-                                max_size=50000,
-                                field_name="agent_finish_output",
-                            )
-                        return original_on_agent_finish(finish, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Erro no wrapped_on_agent_finish (handler): {e}")
-                        return original_on_agent_finish(finish, **kwargs)
-
-            # Aplicar wrappers
-            if original_on_llm_end:
-                setattr(handler, "on_llm_end", wrapped_on_llm_end)
-            if original_on_chain_end:
-                setattr(handler, "on_chain_end", wrapped_on_chain_end)
-            if original_on_tool_end:
-                setattr(handler, "on_tool_end", wrapped_on_tool_end)
-            if original_on_agent_action:
-                setattr(handler, "on_agent_action", wrapped_on_agent_action)
-            if original_on_agent_finish:
-                setattr(handler, "on_agent_finish", wrapped_on_agent_finish)
-
-            logger.debug("Wrapper de truncamento aplicado ao handler especÃ­fico")
-
-        except Exception as e:
-            logger.error(f"Erro ao aplicar truncamento ao handler: {e}")
-
     def flush(self) -> None:
         """Flush do cliente"""
         if not self.enabled:
@@ -501,12 +263,10 @@ class LangFuseConfig:
             return
 
         if self._client:
-            try:
-                logger.debug("Executando flush do cliente Langfuse...")
-                self._client.flush()
-                logger.debug("Flush do Langfuse executado com sucesso")
-            except Exception as e:
-                logger.error(f"Erro no flush do Langfuse: {e}")
+            # Na fila de tracing: roda depois dos eventos já enfileirados e
+            # não bloqueia a request com I/O de rede
+            if not get_fila_tracing().enfileirar(self._client.flush):
+                logger.debug("Fila de tracing cheia - flush do Langfuse descartado")
         else:
             logger.warning("Cliente Langfuse nÃ£o inicializado - flush ignorado")
 
@@ -525,31 +285,12 @@ class LangFuseConfig:
             bool: True se os dados estÃ£o em tamanho seguro
         """
         try:
-            import json
-
-            if data is None:
-                return True
-
-            # VerificaÃ§Ã£o rÃ¡pida para strings
-            if isinstance(data, str):
-                size = len(data.encode("utf-8"))
-                if size > max_size:
-                    logger.warning(
-                        f"Dados {field_name} muito grandes: {size} bytes > {max_size} bytes - serÃ¡ truncado"
-                    )
-                    return False
-                return True
-
-            # Para outros tipos, serializar para verificar tamanho
-            data_str = json.dumps(data, ensure_ascii=False, default=str)
-            size = len(data_str.encode("utf-8"))
-
+            size = estimar_tamanho(data, max_size)
             if size > max_size:
                 logger.warning(
-                    f"Dados {field_name} muito grandes: {size} bytes > {max_size} bytes - serÃ¡ truncado"
+                    f"Dados {field_name} muito grandes: >{max_size} bytes - será truncado"
                 )
                 return False
-
             return True
 
         except Exception as e:
@@ -572,34 +313,7 @@ class LangFuseConfig:
             Dados truncados
         """
         try:
-            import json
-
-            if data is None:
-                return data
-
-            # Calcular tamanho atual
-            data_str = json.dumps(data, ensure_ascii=False, default=str)
-            current_size = len(data_str.encode("utf-8"))
-
-            # Se estÃ¡ dentro do limite, retornar sem alteraÃ§Ãµes
-            if current_size <= max_size:
-                return data
-
-            logger.info(
-                f"Truncando {field_name}: {current_size} bytes > {max_size} bytes"
-            )
-
-            # EstratÃ©gias de truncamento baseadas no tipo
-            if isinstance(data, dict):
-                return self._truncate_dict(data, max_size, field_name)
-            if isinstance(data, str):
-                return self._truncate_string(data, max_size, field_name)
-            if isinstance(data, list):
-                return self._truncate_list(data, max_size, field_name)
-
-            # Para outros tipos, converter para string e truncar
-            data_str = str(data)
-            return self._truncate_string(data_str, max_size, field_name)
+            return truncar_payload(data, max_size)
 
         except Exception as e:
             logger.error(f"Erro ao truncar {field_name}: {e}")
@@ -608,163 +322,6 @@ class LangFuseConfig:
                 "truncated": True,
             }
 
-    def _truncate_string(self, data: str, max_size: int, field_name: str) -> str:
-        """Trunca string mantendo informaÃ§Ãµes importantes"""
-        # Calcular tamanho mÃ¡ximo aproximado para o conteÃºdo
-        overhead = 200  # Overhead para metadados de truncamento
-        max_content_size = max_size - overhead
-
-        if len(data.encode("utf-8")) <= max_content_size:
-            return data
-
-        # Truncar mantendo inÃ­cio e fim se possÃ­vel
-        data_bytes = data.encode("utf-8")
-        if len(data_bytes) > max_content_size:
-            # Manter 60% do inÃ­cio e 10% do fim (mais agressivo)
-            start_size = int(max_content_size * 0.6)
-            end_size = int(max_content_size * 0.1)
-
-            start_part = data_bytes[:start_size].decode("utf-8", errors="ignore")
-            end_part = data_bytes[-end_size:].decode("utf-8", errors="ignore")
-
-            truncation_info = f"\n\n[TRUNCADO: {len(data_bytes)} bytes > {max_size} bytes - mantido inÃ­cio e fim]"
-            result = start_part + truncation_info + "\n...\n" + end_part
-
-            logger.debug(
-                f"{field_name} string truncada: {len(data)} -> {len(result)} chars"
-            )
-            return result
-
-        return data
-
-    def _truncate_list(self, data: list, max_size: int, field_name: str) -> list:
-        """Trunca lista mantendo elementos importantes"""
-        import json
-
-        # Tentar manter os primeiros elementos atÃ© atingir o limite
-        truncated_list = []
-        current_size = 0
-        overhead = 500  # Overhead para metadados
-
-        for i, item in enumerate(data):
-            item_str = json.dumps(item, ensure_ascii=False, default=str)
-            item_size = len(item_str.encode("utf-8"))
-
-            if current_size + item_size + overhead > max_size:
-                # Adicionar informaÃ§Ã£o sobre truncamento
-                truncated_list.append(
-                    {
-                        "truncated": True,
-                        "message": f"Lista truncada apÃ³s {i} de {len(data)} itens",
-                        "original_size": len(data),
-                        "size_limit_reached": max_size,
-                    }
-                )
-                break
-
-            truncated_list.append(item)
-            current_size += item_size
-
-        logger.debug(
-            f"{field_name} lista truncada: {len(data)} -> {len(truncated_list)} itens"
-        )
-        return truncated_list
-
-    def _truncate_dict(self, data: dict, max_size: int, field_name: str) -> dict:
-        """Trunca dicionÃ¡rio priorizando campos importantes"""
-        import json
-
-        # Campos prioritÃ¡rios que devem ser mantidos
-        priority_fields = [
-            "content",
-            "input",
-            "output",
-            "message",
-            "result",
-            "response",
-        ]
-
-        # Campos que podem ser truncados mais agressivamente
-        truncatable_fields = [
-            "intermediate_steps",
-            "chat_history",
-            "context",
-            "full_content",
-            "raw_data",
-        ]
-
-        result = {}
-        current_size = 0
-        overhead = 1000  # Overhead para metadados e estrutura JSON
-
-        # Primeiro, incluir campos prioritÃ¡rios
-        for key in priority_fields:
-            if key in data:
-                value = data[key]
-
-                # Se o valor Ã© muito grande, truncar especificamente
-                if (
-                    isinstance(value, str)
-                    and len(value.encode("utf-8")) > max_size // 2
-                ):
-                    value = self._truncate_string(
-                        value, max_size // 2, f"{field_name}.{key}"
-                    )
-                elif (
-                    isinstance(value, list)
-                    and len(json.dumps(value, default=str).encode("utf-8"))
-                    > max_size // 2
-                ):
-                    value = self._truncate_list(
-                        value, max_size // 2, f"{field_name}.{key}"
-                    )
-
-                result[key] = value
-
-                # Calcular tamanho atual
-                result_str = json.dumps(result, ensure_ascii=False, default=str)
-                current_size = len(result_str.encode("utf-8"))
-
-                if current_size + overhead > max_size:
-                    break
-
-        # Incluir outros campos atÃ© o limite
-        for key, value in data.items():
-            if key in priority_fields:
-                continue  # JÃ¡ processado
-
-            if current_size + overhead > max_size:
-                break
-
-            # Para campos truncÃ¡veis, aplicar truncamento mais agressivo
-            if key in truncatable_fields:
-                if (
-                    isinstance(value, str) and len(value.encode("utf-8")) > 5000
-                ):  # 50KB max
-                    value = self._truncate_string(value, 50000, f"{field_name}.{key}")
-                elif isinstance(value, list) and len(value) > 10:  # Max 10 itens
-                    value = value[:10] + [
-                        {"truncated": f"Lista reduzida de {len(value)} para 10 itens"}
-                    ]
-
-            result[key] = value
-
-            # Recalcular tamanho
-            result_str = json.dumps(result, ensure_ascii=False, default=str)
-            current_size = len(result_str.encode("utf-8"))
-
-        # Adicionar informaÃ§Ã£o sobre truncamento se necessÃ¡rio
-        if len(result) < len(data):
-            result["_langfuse_truncated"] = {
-                "original_fields": len(data),
-                "truncated_fields": len(data) - len(result),
-                "size_limit": max_size,
-                "truncated_at": field_name,
-            }
-
-        logger.debug(f"{field_name} dict truncado: {len(data)} -> {len(result)} campos")
-        return result
-
     def clear_session_handlers(self) -> None:
         """Limpar cache de handlers por sessÃ£o"""
         try:
@@ -796,31 +353,22 @@ class LangFuseConfig:
 
         trace_kwargs = {"name": name, "session_id": session_id, **kwargs}
 
-        # VerificaÃ§Ã£o preventiva e truncamento mais agressivo
+        # Truncamento preventivo (estimativa incremental; cópia só se exceder)
         if "input" in kwargs:
-            if not self._check_data_size_safe(kwargs["input"], 50000, "trace_input"):
-                trace_kwargs["input"] = self.truncate_large_data(
-                    kwargs["input"], max_size=50000, field_name="trace_input"
-                )
-            else:
-                trace_kwargs["input"] = kwargs["input"]
+            trace_kwargs["input"] = self.truncate_large_data(
+                kwargs["input"], max_size=50000, field_name="trace_input"
+            )
             logger.debug(f"Input processado para trace {name}")
 
         if "output" in kwargs:
-            if not self._check_data_size_safe(kwargs["output"], 50000, "trace_output"):
-                trace_kwargs["output"] = self.truncate_large_data(
-                    kwargs["output"], max_size=50000, field_name="trace_output"
-                )
-            else:
-                trace_kwargs["output"] = kwargs["output"]
+            trace_kwargs["output"] = self.truncate_large_data(
+                kwargs["output"], max_size=50000, field_name="trace_output"
+            )
 
         if metadata:
-            if not self._check_data_size_safe(metadata, 10000, "trace_metadata"):
-                trace_kwargs["metadata"] = self.truncate_large_data(
-                    metadata, max_size=10000, field_name="trace_metadata"
-                )
-            else:
-                trace_kwargs["metadata"] = metadata
+            trace_kwargs["metadata"] = self.truncate_large_data(
+                metadata, max_size=10000, field_name="trace_metadata"
+            )
 
         logger.debug(f"Criando trace: {name} com session_id: {session_id}")
         logger.debug(f"Trace kwargs: {list(trace_kwargs.keys())}")
@@ -885,32 +433,21 @@ class LangFuseConfig:
         try:
             span_kwargs = {"name": name, **kwargs}
 
-            # VerificaÃ§Ã£o preventiva e truncamento mais agressivo
+            # Truncamento preventivo (estimativa incremental; cópia só se exceder)
             if metadata:
-                if not self._check_data_size_safe(metadata, 10000, "span_metadata"):
-                    span_kwargs["metadata"] = self.truncate_large_data(
-                        metadata, max_size=10000, field_name="span_metadata"
-                    )
-                else:
-                    span_kwargs["metadata"] = metadata
+                span_kwargs["metadata"] = self.truncate_large_data(
+                    metadata, max_size=10000, field_name="span_metadata"
+                )
 
             if input_data:
-                if not self._check_data_size_safe(input_data, 40000, "span_input"):
-                    span_kwargs["input"] = self.truncate_large_data(
-                        input_data, max_size=40000, field_name="span_input"
-                    )
-                else:
-                    span_kwargs["input"] = input_data
+                span_kwargs["input"] = self.truncate_large_data(
+                    input_data, max_size=40000, field_name="span_input"
+                )
 
             if "output" in kwargs:
-                if not self._check_data_size_safe(
-                    kwargs["output"], 40000, "span_output"
-                ):
-                    span_kwargs["output"] = self.truncate_large_data(
-                        kwargs["output"], max_size=40000, field_name="span_output"
-                    )
-                else:
-                    span_kwargs["output"] = kwargs["output"]
+                span_kwargs["output"] = self.truncate_large_data(
+                    kwargs["output"], max_size=40000, field_name="span_output"
+                )
 
             logger.debug(
                 f"Criando span: {name} no trace: {getattr(trace_context, 'id', 'unknown')}"
@@ -1080,8 +617,9 @@ class LangFuseConfig:
             }
 
             if input_data:
-                span_kwargs["input"] = input_data
-                logger.debug(f"Input adicionado ao tool span {tool_name}: {input_data}")
+                span_kwargs["input"] = self.truncate_large_data(
+                    input_data, max_size=40000, field_name="tool_span_input"
+                )
 
             logger.debug(
                 f"Criando tool execution span: {tool_name} no parent: {getattr(parent_span, 'id', 'unknown')}"
@@ -1140,8 +678,16 @@ class LangFuseConfig:
             elif hasattr(span_context, "id"):
                 span_name = f"span_{span_context.id}"
 
-            span_context.end(**end_kwargs)
-            logger.debug(f"Span finalizado: {span_name}")
+            def finalizar():
+                if "output" in end_kwargs:
+                    end_kwargs["output"] = truncar_payload(end_kwargs["output"], 50000)
+                span_context.end(**end_kwargs)
+
+            # Truncamento do output e envio na fila de tracing
+            if get_fila_tracing().enfileirar(finalizar):
+                logger.debug(f"Span finalizado: {span_name}")
+            else:
+                logger.debug(f"Fila de tracing cheia - fim do span {span_name} descartado")
 
         except Exception as e:
             logger.error(f"Erro ao finalizar span: {e}")
@@ -1149,12 +695,20 @@ class LangFuseConfig:
             logger.debug(f"Span context type: {type(span_context)}")
             logger.debug(f"Span context attributes: {dir(span_context)}")
 
-    def create_session_context(self, session_id: str, trace_name: Optional[str] = None):
+    def create_session_context(
+        self,
+        session_id: str,
+        trace_name: Optional[str] = None,
+        agent_config: Optional[dict] = None,
+    ):
         """Criar contexto de sessÃ£o para rastreamento"""
         if not self._client:
             logger.warning("Cliente Langfuse nÃ£o inicializado")
             return None
 
+        if not self.should_sample(session_id, agent_config):
+            return None
+
         try:
             # Criar trace principal da sessÃ£o com nome "AgentExecutor"
             effective_trace_name = trace_name or "AgentExecutor"
@@ -1264,10 +818,15 @@ class LangFuseConfig:
             "has_client": self._client is not None,
             "has_callback": self._callback_handler is not None,
             "host": self._credentials.get("host") if self._credentials else None,
+            "taxa_amostragem_padrao": TAXA_AMOSTRAGEM_PADRAO,
+            "pipeline": get_fila_tracing().metricas(),
         }
 
     def get_callbacks_with_session(
-        self, session_id: Optional[str] = None, trace_name: Optional[str] = None
+        self,
+        session_id: Optional[str] = None,
+        trace_name: Optional[str] = None,
+        agent_config: Optional[dict] = None,
     ) -> list:
         """Retornar callbacks com contexto de sessÃ£o - usar cache para evitar duplicaÃ§Ã£o"""
         if not self.enabled:
@@ -1278,6 +837,11 @@ class LangFuseConfig:
             # logger.warning("Credenciais nÃ£o configuradas - retornando lista vazia")
             return []
 
+        # Sessão fora da amostra: sem callbacks (nenhum custo de tracing)
+        if not self.should_sample(session_id, agent_config):
+            logger.debug(f"Sessão {session_id} fora da amostragem do Langfuse")
+            return []
+
         try:
             # Se session_id for fornecido, usar cache de handlers
             if session_id:
@@ -1314,8 +878,8 @@ class LangFuseConfig:
                         if attr in callback_attributes:
                             setattr(session_handler, attr, True)
 
-                    # Aplicar truncamento ao handler de sessÃ£o
-                    self._apply_truncation_to_handler(session_handler)
+                    # Eventos do handler de sessÃ£o passam pela fila de tracing
+                    instrumentar_handler(session_handler, get_fila_tracing())
 
                     # Armazenar no cache
                     self._session_handlers[session_id] = session_handler
@@ -0,0 +1,497 @@
+"""
+Pipeline de tracing do Langfuse fora do caminho de streaming
+
+- Amostragem head-based: a decisão é tomada uma vez por sessão (hash do
+  session_id), com taxa por agente (observability.taxaAmostragem), por empresa
+  (LANGFUSE_TAXA_AMOSTRAGEM_EMPRESAS) ou global (LANGFUSE_TAXA_AMOSTRAGEM).
+  Sessão não amostrada não recebe callbacks: custo zero.
+- Tamanho estimado por percurso incremental da estrutura (sem json.dumps),
+  interrompido assim que passa do limite.
+- Callbacks do handler só enfileiram o evento; truncamento e exportação rodam
+  na thread da FilaTracing. Fila cheia descarta o evento e os demais eventos
+  do mesmo run (backpressure sem spans órfãos).
+- Só depois de a fila aceitar o evento os containers do payload
+  (dict/list/tuple/set) são copiados, para a thread não ver mutações
+  posteriores do agente (ex.: a lista de mensagens que cresce); eventos
+  descartados não pagam a cópia, e tokens do streaming não são copiados. O
+  evento leva uma cópia do contexto (contextvars) do chamador, onde o handler
+  roda na thread.
+"""
+import contextvars
+import copy
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from src.config.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+CAPACIDADE_FILA = int(os.getenv("LANGFUSE_FILA_CAPACIDADE", "5000"))
+TAXA_AMOSTRAGEM_PADRAO = float(os.getenv("LANGFUSE_TAXA_AMOSTRAGEM", "1.0"))
+# Limite de nós visitados na estimativa (estruturas cíclicas ou gigantes)
+MAX_NOS_ESTIMATIVA = 200000
+# Abaixo disso não vale incluir mais campos/itens no payload truncado
+ORCAMENTO_MINIMO = 200
+# Fração da fila aceita para eventos que abrem runs: o restante fica para os
+# eventos de fim dos runs já aceitos (evita spans sem fim sob backpressure)
+FRACAO_FILA_INICIO = 0.9
+# Runs descartados lembrados para descartar os eventos seguintes do mesmo run
+MAX_RUNS_DESCARTADOS = 10000
+
+CAMPOS_PRIORITARIOS = ("content", "input", "output", "message", "result", "response")
+
+# Eventos de callback exportados pela fila: evento -> (posição do payload, limite em bytes)
+LIMITES_PAYLOAD = {
+    "on_llm_start": (1, 100000),
+    "on_chat_model_start": (1, 100000),
+    "on_llm_end": (0, 50000),
+    "on_chain_start": (1, 50000),
+    "on_chain_end": (0, 50000),
+    "on_tool_start": (1, 40000),
+    "on_tool_end": (0, 50000),
+    "on_agent_action": (0, 30000),
+    "on_agent_finish": (0, 50000),
+    "on_retriever_end": (0, 50000),
+}
+EVENTOS_CALLBACK = tuple(LIMITES_PAYLOAD) + (
+    "on_llm_new_token",
+    "on_llm_error",
+    "on_chain_error",
+    "on_tool_error",
+    "on_retriever_start",
+    "on_retriever_error",
+)
+SUFIXOS_FIM_RUN = ("_end", "_error", "_finish")
+# Payload só de objetos criados por evento (token e chunk): nada a copiar
+EVENTOS_SEM_COPIA = ("on_llm_new_token",)
+
+
+def _carregar_taxas_empresas(valor: str) -> dict:
+    if not valor:
+        return {}
+    try:
+        return {str(chave): float(taxa) for chave, taxa in json.loads(valor).items()}
+    except (ValueError, AttributeError, TypeError):
+        logger.warning("LANGFUSE_TAXA_AMOSTRAGEM_EMPRESAS inválido (esperado JSON {id_empresa: taxa})")
+        return {}
+
+
+TAXAS_AMOSTRAGEM_EMPRESAS = _carregar_taxas_empresas(
+    os.getenv("LANGFUSE_TAXA_AMOSTRAGEM_EMPRESAS", "")
+)
+
+
+# =====================================================
+# AMOSTRAGEM
+# =====================================================
+
+
+def taxa_amostragem(
+    agent_config: Optional[dict],
+    taxas_empresas: Optional[dict] = None,
+    taxa_padrao: Optional[float] = None,
+) -> float:
+    """Taxa do agente; senão a da empresa; senão a global (limitada a [0, 1])."""
+    if not isinstance(agent_config, dict):
+        agent_config = {}
+    taxas_empresas = TAXAS_AMOSTRAGEM_EMPRESAS if taxas_empresas is None else taxas_empresas
+    taxa = (agent_config.get("observability") or {}).get("taxaAmostragem")
+    if taxa is None and agent_config.get("id_empresa"):
+        taxa = taxas_empresas.get(str(agent_config["id_empresa"]))
+    if taxa is None:
+        taxa = TAXA_AMOSTRAGEM_PADRAO if taxa_padrao is None else taxa_padrao
+    return min(max(float(taxa), 0.0), 1.0)
+
+
+def chave_amostragem(session_id: Optional[str], agent_config: Optional[dict]) -> Optional[str]:
+    """Sessão; sem sessão, o agente (a decisão não muda a cada chamada)."""
+    if session_id:
+        return str(session_id)
+    if isinstance(agent_config, dict) and agent_config.get("agent_id"):
+        return f"agente:{agent_config['agent_id']}"
+    return None
+
+
+def amostrar(chave: Optional[str], taxa: float) -> bool:
+    """Decisão determinística por chave: a mesma sessão sempre tem a mesma decisão."""
+    if taxa >= 1:
+        return True
+    if taxa <= 0:
+        return False
+    if not chave:
+        return random.random() < taxa
+    digest = hashlib.blake2b(str(chave).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2**64 < taxa
+
+
+# =====================================================
+# TAMANHO E TRUNCAMENTO
+# =====================================================
+
+
+def _tamanho_texto(texto: str) -> int:
+    return len(texto) if texto.isascii() else len(texto.encode("utf-8"))
+
+
+def _conteudo_objeto(valor: Any) -> Any:
+    """Parte relevante de objetos do LangChain (mensagens, generations, documentos)."""
+    for atributo in ("content", "text", "page_content", "tool_input", "return_values"):
+        conteudo = getattr(valor, atributo, None)
+        if isinstance(conteudo, (str, list, dict)):
+            return conteudo
+    return str(valor)
+
+
+def estimar_tamanho(data: Any, limite: Optional[int] = None) -> int:
+    """
+    Estimativa do tamanho serializado em bytes, sem serializar.
+
+    Percorre a estrutura acumulando o tamanho e para assim que passa de
+    `limite` (o retorno então é só um limite inferior).
+    """
+    total = 0
+    pendentes = [data]
+    visitados = 0
+    while pendentes:
+        valor = pendentes.pop()
+        visitados += 1
+        if valor is None or isinstance(valor, bool):
+            total += 5
+        elif isinstance(valor, str):
+            total += _tamanho_texto(valor) + 2
+        elif isinstance(valor, (int, float)):
+            total += 8
+        elif isinstance(valor, dict):
+            total += 2
+            for chave, item in valor.items():
+                total += len(str(chave)) + 4
+                pendentes.append(item)
+        elif isinstance(valor, (list, tuple, set)):
+            total += 2 + len(valor)
+            pendentes.extend(valor)
+        else:
+            pendentes.append(_conteudo_objeto(valor))
+        if (limite is not None and total > limite) or visitados > MAX_NOS_ESTIMATIVA:
+            break
+    return total
+
+
+def truncar_texto(texto: str, limite: int) -> str:
+    """Mantém 60% do início e 10% do fim do texto, com marcador de truncamento."""
+    if _tamanho_texto(texto) <= limite:
+        return texto
+    dados = texto.encode("utf-8")
+    conteudo = max(limite - ORCAMENTO_MINIMO, 0)
+    inicio = dados[: int(conteudo * 0.6)].decode("utf-8", errors="ignore")
+    fim = dados[len(dados) - int(conteudo * 0.1):].decode("utf-8", errors="ignore")
+    aviso = f"\n\n[TRUNCADO: {len(dados)} bytes > {limite} bytes - mantido início e fim]"
+    return inicio + aviso + "\n...\n" + fim
+
+
+def _truncar_itens(itens: list, orcamento: int) -> list:
+    resultado = []
+    restante = orcamento - 2
+    for indice, item in enumerate(itens):
+        if restante <= ORCAMENTO_MINIMO:
+            resultado.append(
+                {
+                    "truncated": True,
+                    "message": f"Lista truncada após {indice} de {len(itens)} itens",
+                }
+            )
+            break
+        cota = restante // 2 if indice < len(itens) - 1 else restante
+        item = _truncar(item, cota)
+        resultado.append(item)
+        restante -= estimar_tamanho(item, cota) + 1
+    return resultado
+
+
+def _truncar_campos(campos: dict, orcamento: int) -> dict:
+    chaves = sorted(campos, key=lambda chave: chave not in CAMPOS_PRIORITARIOS)
+    resultado = {}
+    restante = orcamento - 2
+    for indice, chave in enumerate(chaves):
+        if restante <= ORCAMENTO_MINIMO:
+            resultado["_langfuse_truncated"] = {
+                "original_fields": len(campos),
+                "truncated_fields": len(campos) - indice,
+                "size_limit": orcamento,
+            }
+            break
+        cota = restante // 2 if indice < len(chaves) - 1 else restante
+        valor = _truncar(campos[chave], cota)
+        resultado[chave] = valor
+        restante -= estimar_tamanho(valor, cota) + len(str(chave)) + 4
+    return resultado
+
+
+def _truncar(valor: Any, orcamento: int) -> Any:
+    if estimar_tamanho(valor, orcamento) <= orcamento:
+        return valor
+    if isinstance(valor, str):
+        return truncar_texto(valor, orcamento)
+    if isinstance(valor, dict):
+        return _truncar_campos(valor, orcamento)
+    if isinstance(valor, (list, tuple, set)):
+        return _truncar_itens(list(valor), orcamento)
+    return _truncar(_conteudo_objeto(valor), orcamento)
+
+
+def truncar_payload(data: Any, limite: int) -> Any:
+    """Payload que cabe em ~limite bytes; dentro do limite, o próprio objeto (sem cópia)."""
+    if data is None:
+        return data
+    return _truncar(data, limite)
+
+
+def copiar_containers(valor: Any) -> Any:
+    """
+    Cópia dos containers (dict/list/tuple/set) da estrutura; folhas compartilhadas.
+
+    Strings e números são imutáveis e os objetos do LangChain (mensagens,
+    LLMResult) são criados por evento, então basta isolar os containers.
+    """
+    if isinstance(valor, dict):
+        return {chave: copiar_containers(item) for chave, item in valor.items()}
+    if isinstance(valor, list):
+        return [copiar_containers(item) for item in valor]
+    if isinstance(valor, tuple):
+        return tuple(copiar_containers(item) for item in valor)
+    if isinstance(valor, (set, frozenset)):
+        return type(valor)(valor)
+    return valor
+
+
+def _copiar_com(objeto: Any, **campos) -> Any:
+    """Cópia rasa com campos substituídos (modelos pydantic v1/v2 ou objetos simples)."""
+    for metodo in ("model_copy", "copy"):
+        copiar = getattr(objeto, metodo, None)
+        if callable(copiar):
+            try:
+                return copiar(update=campos)
+            except TypeError:
+                continue
+    copia = copy.copy(objeto)
+    for nome, valor in campos.items():
+        setattr(copia, nome, valor)
+    return copia
+
+
+def truncar_argumento_evento(evento: str, valor: Any, limite: int) -> Any:
+    """Versão truncada do payload do evento; o objeto original não é alterado."""
+    if evento == "on_llm_end" and hasattr(valor, "generations"):
+        alterado = False
+        geracoes = []
+        for lista in valor.generations:
+            nova_lista = []
+            for geracao in lista:
+                texto = getattr(geracao, "text", None)
+                if isinstance(texto, str) and _tamanho_texto(texto) > limite:
+                    geracao = _copiar_com(geracao, text=truncar_texto(texto, limite))
+                    alterado = True
+                nova_lista.append(geracao)
+            geracoes.append(nova_lista)
+        return _copiar_com(valor, generations=geracoes) if alterado else valor
+    if evento == "on_agent_action" and hasattr(valor, "tool_input"):
+        entrada = truncar_payload(valor.tool_input, limite)
+        return valor if entrada is valor.tool_input else _copiar_com(valor, tool_input=entrada)
+    if evento == "on_agent_finish" and hasattr(valor, "return_values"):
+        retorno = truncar_payload(valor.return_values, limite)
+        return valor if retorno is valor.return_values else _copiar_com(valor, return_values=retorno)
+    return truncar_payload(valor, limite)
+
+
+# =====================================================
+# FILA DE EXPORTAÇÃO
+# =====================================================
+
+
+class FilaTracing:
+    """Fila limitada consumida por uma thread: truncamento e envio fora do event loop."""
+
+    def __init__(self, capacidade: int = CAPACIDADE_FILA):
+        self._capacidade = capacidade
+        self._fila: queue.Queue = queue.Queue(maxsize=capacidade)
+        self._limite_inicio = max(int(capacidade * FRACAO_FILA_INICIO), 1)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._runs_descartados: set = set()
+        self._nr_enfileirados = 0
+        self._nr_descartados = 0
+        self._nr_exportados = 0
+        self._nr_erros = 0
+        self._s_enfileiramento = 0.0
+        self._s_exportacao = 0.0
+
+    def enfileirar(
+        self,
+        tarefa: Callable[[], Any],
+        run_id: Any = None,
+        parent_run_id: Any = None,
+        fim_run: bool = False,
+    ) -> bool:
+        """Enfileira sem bloquear; False se o evento foi descartado."""
+        return self.enfileirar_preparado(lambda: tarefa, run_id, parent_run_id, fim_run)
+
+    def enfileirar_preparado(
+        self,
+        preparar: Callable[[], Callable[[], Any]],
+        run_id: Any = None,
+        parent_run_id: Any = None,
+        fim_run: bool = False,
+    ) -> bool:
+        """
+        Como enfileirar, mas a tarefa só é montada (preparar()) se o evento
+        for aceito: cópias do payload não são feitas para eventos descartados.
+        """
+        inicio = time.perf_counter()
+        try:
+            with self._lock:
+                descartar = bool(self._runs_descartados) and (
+                    run_id in self._runs_descartados
+                    or parent_run_id in self._runs_descartados
+                )
+                if descartar and fim_run:
+                    self._runs_descartados.discard(run_id)
+            if not descartar and not fim_run and self._fila.qsize() >= self._limite_inicio:
+                descartar = True
+            if not descartar:
+                self._garantir_thread()
+                try:
+                    self._fila.put_nowait(preparar())
+                    self._nr_enfileirados += 1
+                    return True
+                except queue.Full:
+                    pass
+            self._nr_descartados += 1
+            if run_id is not None and not fim_run:
+                with self._lock:
+                    if len(self._runs_descartados) >= MAX_RUNS_DESCARTADOS:
+                        self._runs_descartados.clear()
+                    self._runs_descartados.add(run_id)
+            return False
+        finally:
+            self._s_enfileiramento += time.perf_counter() - inicio
+
+    def drenar(self, timeout: float = 5.0) -> bool:
+        """Aguarda a fila esvaziar (encerramento); True se esvaziou no prazo."""
+        limite = time.monotonic() + timeout
+        while self._fila.unfinished_tasks:
+            if time.monotonic() >= limite:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def metricas(self) -> dict:
+        processados = self._nr_enfileirados + self._nr_descartados
+        return {
+            "nr_backlog": self._fila.qsize(),
+            "nr_capacidade": self._capacidade,
+            "nr_enfileirados": self._nr_enfileirados,
+            "nr_descartados": self._nr_descartados,
+            "nr_exportados": self._nr_exportados,
+            "nr_erros": self._nr_erros,
+            # Custo do tracing no caminho da request (só o enfileiramento)
+            "ms_enfileiramento_total": round(self._s_enfileiramento * 1000, 3),
+            "us_enfileiramento_medio": (
+                round(self._s_enfileiramento * 1e6 / processados, 2) if processados else 0
+            ),
+            "ms_exportacao_total": round(self._s_exportacao * 1000, 3),
+        }
+
+    def _garantir_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._consumir, name="langfuse-tracing", daemon=True
+            )
+            self._thread.start()
+
+    def _consumir(self):
+        while True:
+            tarefa = self._fila.get()
+            inicio = time.perf_counter()
+            try:
+                tarefa()
+                self._nr_exportados += 1
+            except Exception as e:
+                self._nr_erros += 1
+                logger.debug(f"Erro ao exportar evento de tracing: {e}")
+            finally:
+                self._s_exportacao += time.perf_counter() - inicio
+                self._fila.task_done()
+
+
+def instrumentar_handler(handler: Any, fila: "FilaTracing") -> Any:
+    """
+    Troca os callbacks do handler por versões que só enfileiram o evento.
+
+    Eventos não implementados pelo handler (no-op herdado do langchain_core)
+    não são instrumentados.
+    """
+    if handler is None or getattr(handler, "_langfuse_pipeline", False):
+        return handler
+
+    for evento in EVENTOS_CALLBACK:
+        metodo_classe = getattr(type(handler), evento, None)
+        if metodo_classe is None or getattr(metodo_classe, "__module__", "").startswith(
+            "langchain_core."
+        ):
+            continue
+        original = getattr(handler, evento)
+        setattr(handler, evento, _callback_enfileirado(evento, original, fila))
+
+    handler._langfuse_pipeline = True
+    return handler
+
+
+def _callback_enfileirado(evento: str, original: Callable, fila: "FilaTracing") -> Callable:
+    posicao, limite = LIMITES_PAYLOAD.get(evento, (None, None))
+    copiar = evento not in EVENTOS_SEM_COPIA
+
+    def enfileirado(*args, **kwargs):
+        def preparar():
+            copia_args = copiar_containers(args) if copiar else args
+            copia_kwargs = copiar_containers(kwargs) if copiar else kwargs
+            contexto = contextvars.copy_context()
+
+            def exportar():
+                argumentos = copia_args
+                if posicao is not None and len(copia_args) > posicao:
+                    argumentos = list(copia_args)
+                    argumentos[posicao] = truncar_argumento_evento(
+                        evento, copia_args[posicao], limite
+                    )
+                return contexto.run(original, *argumentos, **copia_kwargs)
+
+            return exportar
+
+        fila.enfileirar_preparado(
+            preparar,
+            run_id=kwargs.get("run_id"),
+            parent_run_id=kwargs.get("parent_run_id"),
+            fim_run=evento.endswith(SUFIXOS_FIM_RUN),
+        )
+
+    return enfileirado
+
+
+_fila_tracing: Optional[FilaTracing] = None
+
+
+def get_fila_tracing() -> FilaTracing:
+    """Retorna instância singleton da fila de tracing."""
+    global _fila_tracing  # pylint: disable=global-statement
+    if _fila_tracing is None:
+        _fila_tracing = FilaTracing()
+    return _fila_tracing
@@ -14,7 +14,9 @@ from fastapi.responses import JSONResponse
 
 # Importar função de formatação de erro
 from src.agents.dtos import format_validation_error
-from src.config.cache_config import init_cache, is_cache_enabled
+from src.config.agent_cache import get_agent_cache
+from src.config.cache_config import get_cache_client, init_cache, is_cache_enabled
+from src.config.http_client_pool import fechar_pool_http
 from src.config.logger_config import get_logger
 
 # Importar configurações
@@ -93,6 +95,10 @@ async def lifespan(application: FastAPI):
 
             if is_cache_enabled():
                 logger.debug("Cache Redis inicializado e funcionando")
+                # Edições de agentes em outro worker invalidam o AgentCache local
+                await (await get_agent_cache()).start_invalidation_listener(
+                    await get_cache_client()
+                )
             else:
                 logger.info(
                     "Cache Redis configurado - usando variáveis de ambiente (.env)"
@@ -110,6 +116,9 @@ async def lifespan(application: FastAPI):
         logger.error("Erro fatal durante inicialização: %s", str(e))
         raise
     finally:
+        await (await get_agent_cache()).stop_invalidation_listener()
+        # Clientes HTTP compartilhados das tools de API (keep-alive por host)
+        await fechar_pool_http()
         await ORMConfig.close_connections()
         logger.debug("Finalizando aplicação...")
 
@@ -60,6 +60,12 @@ class ObservabilityConfig(BaseModel):
     tipo: Optional[TipoObservabilidade] = Field(
         None, description="Tipo de observabilidade"
     )
+    taxaAmostragem: Optional[float] = Field(
+        None,
+        ge=0,
+        le=1,
+        description="Fração das sessões rastreadas (padrão: taxa da empresa ou LANGFUSE_TAXA_AMOSTRAGEM)",
+    )
 
 
 class MemoryConfig(BaseModel):
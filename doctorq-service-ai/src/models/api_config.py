@@ -74,6 +74,11 @@ class ApiEndpointConfig(BaseModel):
     )
     timeout: int = Field(120, description="Timeout em segundos")
     max_retries: int = Field(3, description="NÃºmero mÃ¡ximo de tentativas")
+    cache_ttl: Optional[int] = Field(
+        None,
+        ge=0,
+        description="TTL em segundos do cache de respostas (apenas GET; vazio = sem cache)",
+    )
 
 
 class ApiToolConfig(BaseModel):
@@ -53,6 +53,8 @@ class DocumentoStore(Base):
         "DocumentoStoreFileChunk",
         back_populates="documento_store",
         cascade="all, delete-orphan",
+        # Chunks removidos pelo ON DELETE CASCADE do banco (sem carregar um a um)
+        passive_deletes=True,
         lazy="select"
     )
 
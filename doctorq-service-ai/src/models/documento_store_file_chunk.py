@@ -62,6 +62,9 @@ class DocumentoStoreFileChunkCreate(DocumentoStoreFileChunkBase):
     id_store: uuid.UUID = Field(..., description="ID do store")
     ds_page_content: str = Field(..., description="ConteÃºdo da pÃ¡gina")
     ds_metadata: Optional[str] = Field(None, description="Metadados do chunk")
+    ds_embedding: Optional[List[float]] = Field(
+        None, description="Embedding do chunk (opcional)"
+    )
 
 
 class DocumentoStoreFileChunkUpdate(BaseModel):
@@ -19,6 +19,7 @@ from src.agents import (
     TitleGeneratorAgent,
     format_validation_error,
 )
+from src.config.agent_cache import get_agent_cache
 from src.config.logger_config import get_logger
 from src.config.orm_config import get_async_session_context
 from src.models.agent import AgentCreate, AgentUpdate
@@ -149,6 +150,7 @@ async def update_agent(
         if not agent:
             raise HTTPException(status_code=404, detail="Agente nÃ£o encontrado")
 
+        await (await get_agent_cache()).invalidate_agent(agent_id)
         presenter = AgentPresenter()
         result = presenter.present_agent_response(agent, method="PUT")
         return result
@@ -173,6 +175,7 @@ async def delete_agent(
         success = await agent_service.delete_agent(agent_id)
         if not success:
             raise HTTPException(status_code=404, detail="Agente nÃ£o encontrado")
+        await (await get_agent_cache()).invalidate_agent(agent_id)
         return {"message": "Agente deletado com sucesso"}
     except Exception as e:
         logger.error(f"Erro ao deletar agente: {str(e)}")
@@ -555,6 +558,7 @@ async def add_tool_to_agent(
     """Adicionar uma ferramenta a um agente"""
     try:
         result = await agent_service.add_tool_to_agent(agent_id, body.tool_id)
+        await (await get_agent_cache()).invalidate_agent(agent_id)
         return {
             "message": "Ferramenta adicionada ao agente com sucesso",
             "data": result,
@@ -577,6 +581,7 @@ async def remove_tool_from_agent(
     """Remover uma ferramenta de um agente"""
     try:
         result = await agent_service.remove_tool_from_agent(agent_id, body.tool_id)
+        await (await get_agent_cache()).invalidate_agent(agent_id)
         return {"message": "Ferramenta removida do agente com sucesso", "data": result}
     except ValueError as e:
         logger.warning(f"Erro de validaÃ§Ã£o ao remover tool do agente: {str(e)}")
@@ -645,6 +650,7 @@ async def add_document_store_to_agent(
         result = await agent_service.add_document_store_to_agent(
             agent_id, body.document_store_id, body.search_type
         )
+        await (await get_agent_cache()).invalidate_agent(agent_id)
         return {
             "message": "Document Store vinculado ao agente com sucesso",
             "data": {
@@ -673,6 +679,7 @@ async def remove_document_store_from_agent(
     """Desvincular um Document Store de um agente"""
     try:
         await agent_service.remove_document_store_from_agent(agent_id, document_store_id)
+        await (await get_agent_cache()).invalidate_agent(agent_id)
         return {
             "message": "Document Store desvinculado do agente com sucesso",
             "agent_id": str(agent_id),
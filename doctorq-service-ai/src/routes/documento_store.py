@@ -449,8 +449,8 @@ async def query_document_store(
     Consulta o document store usando busca semântica com embeddings
 
     Retorna os chunks mais relevantes para a query usando:
-    - Busca vetorial por similaridade cosine (se embeddings disponíveis)
-    - Fallback para busca por palavras-chave
+    - Busca vetorial por similaridade cosine (índice HNSW) fundida com full-text
+    - Só full-text quando não há credencial de embeddings
 
     Parâmetros:
     - query: Texto da consulta
@@ -460,7 +460,7 @@ async def query_document_store(
 
     Resposta:
     - results: Lista de chunks com content, score, filename
-    - search_method: 'semantic' (vetorial) ou 'keyword' (texto)
+    - search_method: 'semantic' (vetorial), 'keyword' (texto) ou 'hybrid' (os dois) do primeiro resultado
     - stats: Estatísticas da busca
     """
     try:
@@ -62,6 +62,12 @@ async def chat_message(
             if agent_config:
                 agent_config = dict(agent_config)  # Criar cÃ³pia para modificar
                 agent_config["agent_id"] = str(id_agente)
+                # Chave da taxa de amostragem do Langfuse por empresa
+                agent_config["id_empresa"] = str(agent.id_empresa) if agent.id_empresa else None
+                # Versão da configuração na chave do AgentCache (edições não leem executor antigo)
+                agent_config["dt_atualizacao"] = (
+                    agent.dt_atualizacao.isoformat() if agent.dt_atualizacao else None
+                )
 
             # Buscar Document Stores vinculados ao agente
             document_stores_data = await agent_service.list_agent_document_stores(id_agente)
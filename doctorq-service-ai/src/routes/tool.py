@@ -3,6 +3,7 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 
+from src.config.agent_cache import get_agent_cache
 from src.config.logger_config import get_logger
 from src.models.api_config import ApiCallRequest, ApiCallResponse
 from src.models.tool import (
@@ -112,6 +113,8 @@ async def update_tool(
         if not tool:
             raise HTTPException(status_code=404, detail="Tool nÃ£o encontrado")
 
+        # Tool pode estar em qualquer agente: invalida os executors de todos os workers
+        await (await get_agent_cache()).clear_all()
         return ToolResponse.model_validate(tool)
 
     except ValueError as e:
@@ -136,6 +139,8 @@ async def delete_tool(
         if not deleted:
             raise HTTPException(status_code=404, detail="Tool nÃ£o encontrado")
 
+        await (await get_agent_cache()).clear_all()
+
     except HTTPException:
         raise
     except Exception as e:
@@ -1,13 +1,15 @@
 ﻿# src/services/documento_store_file_chunk_service.py
+import os
 import uuid
-from typing import List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from fastapi import Depends
-from sqlalchemy import and_, func, select
+from sqlalchemy import and_, delete, func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logger_config import get_logger
 from src.config.orm_config import get_db
+from src.models.documento_store import DocumentoStore
 from src.models.documento_store_file_chunk import (
     DocumentoStoreFileChunk,
     DocumentoStoreFileChunkCreate,
@@ -16,6 +18,10 @@ from src.models.documento_store_file_chunk import (
 
 logger = get_logger(__name__)
 
+# Linhas por INSERT ... RETURNING (um round-trip por lote; com ds_embedding
+# de 3072 dimensões cada linha ocupa ~12 KB no protocolo)
+CHUNK_LOTE_INSERCAO = int(os.getenv("CHUNK_LOTE_INSERCAO", "500"))
+
 
 class DocumentoStoreFileChunkService:
     """Service para operaÃ§Ãµes com chunks de arquivos do documento store"""
@@ -35,6 +41,7 @@ class DocumentoStoreFileChunkService:
                 id_store=chunk_data.id_store,
                 ds_page_content=chunk_data.ds_page_content,
                 ds_metadata=chunk_data.ds_metadata,
+                ds_embedding=chunk_data.ds_embedding,
             )
 
             self.db.add(db_chunk)
@@ -244,13 +251,14 @@ class DocumentoStoreFileChunkService:
             raise RuntimeError(f"Erro ao deletar chunk: {str(e)}") from e
 
     async def delete_chunks_by_documento(self, documento_id: uuid.UUID) -> int:
-        """Deletar todos os chunks de um documento"""
+        """Deletar todos os chunks de um documento (um DELETE, sem carregar os chunks)"""
         try:
-            chunks = await self.get_chunks_by_documento(documento_id)
-            count = len(chunks)
-
-            for chunk in chunks:
-                await self.db.delete(chunk)
+            result = await self.db.execute(
+                delete(DocumentoStoreFileChunk).where(
+                    DocumentoStoreFileChunk.id_documento == documento_id
+                )
+            )
+            count = result.rowcount or 0
 
             await self.db.commit()
             logger.info(f"Deletados {count} chunks do documento {documento_id}")
@@ -262,13 +270,14 @@ class DocumentoStoreFileChunkService:
             raise RuntimeError(f"Erro ao deletar chunks por documento: {str(e)}") from e
 
     async def delete_chunks_by_store(self, store_id: uuid.UUID) -> int:
-        """Deletar todos os chunks de um store"""
+        """Deletar todos os chunks de um store (um DELETE, sem carregar os chunks)"""
         try:
-            chunks = await self.get_chunks_by_store(store_id)
-            count = len(chunks)
-
-            for chunk in chunks:
-                await self.db.delete(chunk)
+            result = await self.db.execute(
+                delete(DocumentoStoreFileChunk).where(
+                    DocumentoStoreFileChunk.id_store == store_id
+                )
+            )
+            count = result.rowcount or 0
 
             await self.db.commit()
             logger.info(f"Deletados {count} chunks do store {store_id}")
@@ -279,6 +288,121 @@ class DocumentoStoreFileChunkService:
             await self.db.rollback()
             raise RuntimeError(f"Erro ao deletar chunks por store: {str(e)}") from e
 
+    async def create_chunks_batch(
+        self,
+        chunks: Iterable[DocumentoStoreFileChunkCreate],
+        batch_size: int = CHUNK_LOTE_INSERCAO,
+    ) -> List[uuid.UUID]:
+        """
+        Criar chunks em lote: um INSERT ... RETURNING por lote de batch_size
+        linhas, sem objetos ORM. Aceita um gerador (só um lote fica em memória
+        por vez) e faz um único commit no final.
+        """
+        try:
+            ids = await self._insert_batches(chunks, batch_size)
+            await self.db.commit()
+            logger.info(f"Criados {len(ids)} chunks em lote")
+            return ids
+
+        except Exception as e:
+            logger.error(f"Erro ao criar chunks em lote: {str(e)}")
+            await self.db.rollback()
+            raise RuntimeError(f"Erro ao criar chunks em lote: {str(e)}") from e
+
+    async def reindex_store_chunks(
+        self,
+        store_id: uuid.UUID,
+        chunks: Iterable[DocumentoStoreFileChunkCreate],
+        documento_id: Optional[uuid.UUID] = None,
+        batch_size: int = CHUNK_LOTE_INSERCAO,
+    ) -> Optional[Dict[str, int]]:
+        """
+        Trocar a geração de chunks do store (ou só de um documento dele) de uma
+        vez: DELETE da geração atual e INSERTs em lote da nova na mesma
+        transação. Consultas concorrentes seguem vendo a geração antiga até o
+        commit e uma falha no meio mantém a antiga intacta (rollback).
+
+        O lock na linha do store serializa reindexações concorrentes do mesmo
+        store (sem ele, duas trocas simultâneas duplicariam os chunks).
+        """
+        try:
+            result = await self.db.execute(
+                select(DocumentoStore.id_documento_store)
+                .where(DocumentoStore.id_documento_store == store_id)
+                .with_for_update()
+            )
+            if result.scalar_one_or_none() is None:
+                logger.warning(f"Store não encontrado para reindexação: {store_id}")
+                await self.db.rollback()
+                return None
+
+            filters = [DocumentoStoreFileChunk.id_store == store_id]
+            if documento_id:
+                filters.append(DocumentoStoreFileChunk.id_documento == documento_id)
+
+            result = await self.db.execute(
+                delete(DocumentoStoreFileChunk).where(and_(*filters))
+            )
+            deleted = result.rowcount or 0
+
+            ids = await self._insert_batches(chunks, batch_size, store_id, documento_id)
+            await self.db.commit()
+
+            logger.info(
+                f"Store {store_id} reindexado: {deleted} chunks removidos, {len(ids)} criados"
+            )
+            return {"chunks_deleted": deleted, "chunks_created": len(ids)}
+
+        except Exception as e:
+            logger.error(f"Erro ao reindexar chunks do store: {str(e)}")
+            await self.db.rollback()
+            raise RuntimeError(f"Erro ao reindexar chunks do store: {str(e)}") from e
+
+    async def _insert_batches(
+        self,
+        chunks: Iterable[DocumentoStoreFileChunkCreate],
+        batch_size: int,
+        store_id: Optional[uuid.UUID] = None,
+        documento_id: Optional[uuid.UUID] = None,
+    ) -> List[uuid.UUID]:
+        """INSERT ... RETURNING por lote (sem commit); store/documento fixos se informados."""
+        ids: List[uuid.UUID] = []
+        batch: List[Dict[str, Any]] = []
+
+        for chunk_data in chunks:
+            if store_id and chunk_data.id_store != store_id:
+                raise ValueError(f"Chunk do store {chunk_data.id_store} na reindexação de {store_id}")
+            if documento_id and chunk_data.id_documento != documento_id:
+                raise ValueError(
+                    f"Chunk do documento {chunk_data.id_documento} na reindexação de {documento_id}"
+                )
+            batch.append(
+                {
+                    "id_chunk": uuid.uuid4(),
+                    "id_documento": chunk_data.id_documento,
+                    "nr_chunk": chunk_data.nr_chunk,
+                    "id_store": chunk_data.id_store,
+                    "ds_page_content": chunk_data.ds_page_content,
+                    "ds_metadata": chunk_data.ds_metadata,
+                    "ds_embedding": chunk_data.ds_embedding,
+                }
+            )
+            if len(batch) >= batch_size:
+                ids.extend(await self._insert_batch(batch))
+                batch = []
+
+        if batch:
+            ids.extend(await self._insert_batch(batch))
+        return ids
+
+    async def _insert_batch(self, batch: List[Dict[str, Any]]) -> List[uuid.UUID]:
+        stmt = (
+            insert(DocumentoStoreFileChunk)
+            .values(batch)
+            .returning(DocumentoStoreFileChunk.id_chunk)
+        )
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
 
 def get_documento_store_file_chunk_service(
     db: AsyncSession = Depends(get_db),
@@ -0,0 +1,283 @@
+# src/services/documento_store_search.py
+"""
+Busca nos chunks de um document store (vetorial + full-text).
+
+- Vetorial: ordena pela distância de cosseno na mesma expressão do índice
+  HNSW (ds_embedding::halfvec(3072), migration 130) filtrando pelo store; o
+  score devolvido é a similaridade exata (1 - distância em vector)
+- Recursos conforme a versão do pgvector no banco (extversion, lida uma vez):
+  halfvec só a partir da 0.7 (antes ordena em vector, sem o índice) e
+  hnsw.iterative_scan só a partir da 0.8; o SET de um parâmetro desconhecido
+  abortaria a transação da busca
+- Full-text: to_tsvector('portuguese') com os termos da consulta em OR,
+  ordenado por ts_rank_cd (índice GIN da migration 130)
+- Híbrida: as duas listas de candidatos fundidas por Reciprocal Rank Fusion
+  (RRF); sem embedding da consulta (credencial indisponível) fica só o texto
+- min_similarity filtra pelo score: similaridade de cosseno, ou ts_rank
+  normalizado (rank / (rank + 1)) para chunks sem embedding
+- metadata_filter: ds_metadata @> filtro (jsonb, parâmetro ligado); linhas com
+  metadata fora do formato JSON são ignoradas pelo filtro em vez de quebrar a
+  consulta
+"""
+import ast
+import json
+import os
+import re
+import uuid
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import case, cast, func, literal_column, select, text, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.logger_config import get_logger
+from src.models.documento_store_file_chunk import DocumentoStoreFileChunk
+
+logger = get_logger(__name__)
+
+DIMENSOES_EMBEDDING = 3072
+DOCUMENT_STORE_BUSCA_HIBRIDA = os.getenv("DOCUMENT_STORE_BUSCA_HIBRIDA", "true").lower() == "true"
+DOCUMENT_STORE_HNSW_EF_SEARCH = int(os.getenv("DOCUMENT_STORE_HNSW_EF_SEARCH", "100"))
+# Só aplicado com pgvector >= 0.8: continua varrendo o HNSW até ter candidatos
+# do store (vazio = desligado)
+DOCUMENT_STORE_HNSW_ITERATIVE_SCAN = os.getenv("DOCUMENT_STORE_HNSW_ITERATIVE_SCAN", "relaxed_order")
+DOCUMENT_STORE_RRF_K = int(os.getenv("DOCUMENT_STORE_RRF_K", "60"))
+# Candidatos por lista antes da fusão: max(top_k * 4, mínimo)
+DOCUMENT_STORE_CANDIDATOS_MIN = int(os.getenv("DOCUMENT_STORE_CANDIDATOS_MIN", "40"))
+
+MODOS_ITERATIVE_SCAN = {"off", "strict_order", "relaxed_order"}
+VERSAO_HALFVEC = (0, 7)
+VERSAO_ITERATIVE_SCAN = (0, 8)
+_CONFIG_FTS = literal_column("'portuguese'::regconfig")
+# ds_metadata que pode ser convertido para jsonb (chunks antigos têm str(dict))
+_METADATA_JSON = r"^\s*\{\s*\""
+
+_versao_pgvector: Optional[Tuple[int, ...]] = None
+
+
+def termos_busca(query: str) -> List[str]:
+    """Palavras da consulta (2+ caracteres) para o tsquery em OR."""
+    termos = []
+    for termo in re.findall(r"\w+", query.lower()):
+        if len(termo) >= 2 and termo not in termos:
+            termos.append(termo)
+    return termos
+
+
+def fundir_rrf(
+    rankings: Sequence[Sequence[Hashable]], k: int = DOCUMENT_STORE_RRF_K
+) -> List[Tuple[Hashable, float]]:
+    """Reciprocal Rank Fusion: soma de 1 / (k + posição) em cada lista."""
+    pontos: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for posicao, chave in enumerate(ranking, 1):
+            pontos[chave] = pontos.get(chave, 0.0) + 1.0 / (k + posicao)
+    return sorted(pontos.items(), key=lambda item: item[1], reverse=True)
+
+
+def ordenar_candidatos(
+    vetoriais: Sequence[Dict[str, Any]],
+    textuais: Sequence[Dict[str, Any]],
+    top_k: int,
+    min_similarity: float = 0.0,
+) -> List[Dict[str, Any]]:
+    """
+    Funde as listas de candidatos (já ordenadas pelo banco) em um top-k.
+
+    Cada candidato tem chunk_id, similaridade (None sem embedding) e, nos
+    textuais, rank_texto. Uma lista só: a própria ordem; as duas: RRF.
+    """
+    candidatos: Dict[Any, Dict[str, Any]] = {}
+    for origem, lista in (("semantic", vetoriais), ("keyword", textuais)):
+        for candidato in lista:
+            atual = candidatos.get(candidato["chunk_id"])
+            if atual is None:
+                candidatos[candidato["chunk_id"]] = {**candidato, "search_method": origem}
+            else:
+                atual["search_method"] = "hybrid"
+                atual.setdefault("rank_texto", candidato.get("rank_texto"))
+
+    for candidato in candidatos.values():
+        similaridade = candidato.get("similaridade")
+        if similaridade is not None:
+            score = float(similaridade)
+        else:
+            rank = float(candidato.get("rank_texto") or 0.0)
+            score = rank / (rank + 1.0)
+        candidato["score"] = max(0.0, min(1.0, score))
+
+    rankings = [[c["chunk_id"] for c in lista] for lista in (vetoriais, textuais) if lista]
+    ordem = [chave for chave, _ in fundir_rrf(rankings)]
+    return [
+        candidatos[chave]
+        for chave in ordem
+        if min_similarity <= 0 or candidatos[chave]["score"] >= min_similarity
+    ][:top_k]
+
+
+def _metadata_dict(ds_metadata: Optional[str]) -> Dict[str, Any]:
+    if not ds_metadata:
+        return {}
+    try:
+        metadata = json.loads(ds_metadata)
+    except json.JSONDecodeError:
+        # Chunks antigos gravados com str(dict)
+        try:
+            metadata = ast.literal_eval(ds_metadata)
+        except (ValueError, SyntaxError):
+            return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+def _filtros(document_store_id: uuid.UUID, metadata_filter: Optional[dict]) -> list:
+    filtros = [DocumentoStoreFileChunk.id_store == document_store_id]
+    if metadata_filter:
+        metadata_jsonb = type_coerce(
+            case(
+                (
+                    DocumentoStoreFileChunk.ds_metadata.op("~")(_METADATA_JSON),
+                    cast(DocumentoStoreFileChunk.ds_metadata, JSONB),
+                )
+            ),
+            JSONB,
+        )
+        filtros.append(metadata_jsonb.contains(metadata_filter))
+    return filtros
+
+
+def _parse_versao(versao: Optional[str]) -> Tuple[int, ...]:
+    """'0.8.0' -> (0, 8, 0); extensão ausente -> (0,)."""
+    return tuple(int(parte) for parte in re.findall(r"\d+", versao or "")) or (0,)
+
+
+async def versao_pgvector(db: AsyncSession) -> Tuple[int, ...]:
+    """Versão da extensão vector no banco (consultada uma vez por processo)."""
+    global _versao_pgvector
+    if _versao_pgvector is None:
+        result = await db.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        )
+        _versao_pgvector = _parse_versao(result.scalar())
+        logger.info("pgvector %s", ".".join(map(str, _versao_pgvector)))
+    return _versao_pgvector
+
+
+async def _configurar_hnsw(db: AsyncSession, candidatos: int, versao: Tuple[int, ...]):
+    """Parâmetros do HNSW só para a transação corrente (SET LOCAL)."""
+    await db.execute(
+        text(f"SET LOCAL hnsw.ef_search = {max(DOCUMENT_STORE_HNSW_EF_SEARCH, candidatos)}")
+    )
+    if (
+        DOCUMENT_STORE_HNSW_ITERATIVE_SCAN in MODOS_ITERATIVE_SCAN
+        and versao >= VERSAO_ITERATIVE_SCAN
+    ):
+        await db.execute(
+            text(f"SET LOCAL hnsw.iterative_scan = {DOCUMENT_STORE_HNSW_ITERATIVE_SCAN}")
+        )
+
+
+async def buscar_chunks(
+    db: AsyncSession,
+    document_store_id: uuid.UUID,
+    query: str,
+    query_embedding: Optional[List[float]],
+    top_k: int = 5,
+    min_similarity: float = 0.0,
+    metadata_filter: Optional[dict] = None,
+    hibrida: bool = DOCUMENT_STORE_BUSCA_HIBRIDA,
+) -> List[Dict[str, Any]]:
+    """
+    Top-k chunks do store para a consulta.
+
+    Returns:
+        Lista de resultados com chunk_id, filename, chunk_index, content,
+        score, search_method ("semantic", "keyword" ou "hybrid") e metadata
+    """
+    candidatos = max(top_k * 4, DOCUMENT_STORE_CANDIDATOS_MIN)
+    filtros = _filtros(document_store_id, metadata_filter)
+    colunas = (
+        DocumentoStoreFileChunk.id_chunk,
+        DocumentoStoreFileChunk.nr_chunk,
+        DocumentoStoreFileChunk.ds_page_content,
+        DocumentoStoreFileChunk.ds_metadata,
+    )
+
+    similaridade = None
+    vetoriais: List[Dict[str, Any]] = []
+    if query_embedding:
+        # Ordenação na expressão do índice (halfvec); score na precisão da coluna
+        versao = await versao_pgvector(db)
+        distancia = DocumentoStoreFileChunk.ds_embedding.cosine_distance(query_embedding)
+        distancia_indice = (
+            cast(
+                DocumentoStoreFileChunk.ds_embedding, HALFVEC(DIMENSOES_EMBEDDING)
+            ).cosine_distance(query_embedding)
+            if versao >= VERSAO_HALFVEC
+            else distancia
+        )
+        similaridade = 1 - distancia
+
+        await _configurar_hnsw(db, candidatos, versao)
+        stmt = (
+            select(*colunas, similaridade.label("similaridade"))
+            .where(*filtros, DocumentoStoreFileChunk.ds_embedding.isnot(None))
+            .order_by(distancia_indice)
+            .limit(candidatos)
+        )
+        vetoriais = [dict(row._mapping) for row in (await db.execute(stmt)).all()]
+        # relaxed_order pode trazer pequenas inversões: reordena pela distância exata
+        vetoriais.sort(key=lambda row: row["similaridade"], reverse=True)
+
+    textuais: List[Dict[str, Any]] = []
+    termos = termos_busca(query)
+    if termos and (hibrida or not query_embedding):
+        documento_ts = func.to_tsvector(
+            _CONFIG_FTS,
+            func.coalesce(DocumentoStoreFileChunk.ds_page_content, literal_column("''::text")),
+        )
+        consulta_ts = func.to_tsquery(_CONFIG_FTS, " | ".join(termos))
+        rank_texto = func.ts_rank_cd(documento_ts, consulta_ts)
+        similaridade_texto = (
+            case((DocumentoStoreFileChunk.ds_embedding.isnot(None), similaridade))
+            if similaridade is not None
+            else literal_column("NULL")
+        )
+        stmt = (
+            select(
+                *colunas,
+                similaridade_texto.label("similaridade"),
+                rank_texto.label("rank_texto"),
+            )
+            .where(*filtros, documento_ts.op("@@")(consulta_ts))
+            .order_by(rank_texto.desc())
+            .limit(candidatos)
+        )
+        textuais = [dict(row._mapping) for row in (await db.execute(stmt)).all()]
+
+    for candidato in (*vetoriais, *textuais):
+        candidato["chunk_id"] = candidato.pop("id_chunk")
+
+    resultados = []
+    for candidato in ordenar_candidatos(vetoriais, textuais, top_k, min_similarity):
+        metadata = _metadata_dict(candidato["ds_metadata"])
+        resultados.append(
+            {
+                "chunk_id": str(candidato["chunk_id"]),
+                "filename": metadata.get("filename", "unknown"),
+                "chunk_index": candidato["nr_chunk"],
+                "content": candidato["ds_page_content"],
+                "score": round(candidato["score"], 4),
+                "search_method": candidato["search_method"],
+                "metadata": metadata,
+            }
+        )
+
+    logger.debug(
+        "Busca no store %s: %d vetoriais, %d textuais, %d resultados",
+        document_store_id,
+        len(vetoriais),
+        len(textuais),
+        len(resultados),
+    )
+    return resultados
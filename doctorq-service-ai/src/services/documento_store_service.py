@@ -17,6 +17,7 @@ from src.models.documento_store import (
     DocumentoStoreCreate,
     DocumentoStoreUpdate,
 )
+from src.services.documento_store_search import buscar_chunks
 
 logger = get_logger(__name__)
 
@@ -436,6 +437,10 @@ class DocumentoStoreService:
         """
         Processa upload de documento e cria chunks para RAG
 
+        Os embeddings são gerados antes da gravação e os chunks entram em lote
+        (create_chunks_batch). Re-upload de um arquivo já presente no store
+        troca a geração de chunks dele de uma vez (reindex_store_chunks).
+
         Args:
             document_store_id: ID do document store
             file: Arquivo uploaded
@@ -468,9 +473,12 @@ class DocumentoStoreService:
                 text_content = content.decode("utf-8", errors="ignore")
 
             # Criar chunks com overlap
-            from src.models.documento_store_file_chunk import DocumentoStoreFileChunk
+            import json
+            from src.models.documento_store_file_chunk import DocumentoStoreFileChunkCreate
+            from src.services.documento_store_file_chunk_service import (
+                DocumentoStoreFileChunkService,
+            )
 
-            chunks = []
             chunk_texts = []
             position = 0
 
@@ -480,38 +488,15 @@ class DocumentoStoreService:
                 chunk_text = text_content[position:end_position]
 
                 if chunk_text.strip():
-                    # Criar metadata com informações do arquivo
-                    metadata = {
-                        "filename": filename,
-                        "chunk_index": len(chunks),
-                        "document_store_id": str(document_store_id)
-                    }
-
-                    chunk = DocumentoStoreFileChunk(
-                        id_store=document_store_id,
-                        id_documento=document_store_id,  # Usar o mesmo ID por enquanto
-                        nr_chunk=len(chunks),
-                        ds_page_content=chunk_text,
-                        ds_metadata=str(metadata),
-                    )
-                    self.db.add(chunk)
-                    chunks.append(chunk)
                     chunk_texts.append(chunk_text)
 
                 # Avançar posição com overlap
                 position += (chunk_size - chunk_overlap)
 
-            # Commit dos chunks (sem embeddings ainda)
-            await self.db.commit()
-
-            logger.info(
-                f"Documento processado: {filename} - {len(chunks)} chunks criados"
-            )
-
             # Gerar embeddings usando OpenAI ou Azure OpenAI (sempre tentar gerar para suportar busca semântica)
-            embeddings_created = 0
+            embeddings = [None] * len(chunk_texts)
             try:
-                logger.info(f"🔄 Iniciando geração de embeddings para {len(chunks)} chunks")
+                logger.info(f"🔄 Iniciando geração de embeddings para {len(chunk_texts)} chunks")
 
                 # Obter credencial para embeddings
                 credential = None
@@ -576,7 +561,6 @@ class DocumentoStoreService:
                 # Gerar embeddings em batch
                 if not credential:
                     logger.error("❌ Nenhuma credencial disponível para gerar embeddings")
-                    embeddings = [None] * len(chunk_texts)
                 else:
                     logger.info(f"📊 Gerando {len(chunk_texts)} embeddings...")
                     embeddings = await self.generate_embeddings_batch(
@@ -585,32 +569,67 @@ class DocumentoStoreService:
                         batch_size=100
                     )
 
-                # Atualizar chunks com embeddings
-                logger.info(f"💾 Atualizando chunks com embeddings...")
-                for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                    if embedding:
-                        chunk.ds_embedding = embedding
-                        embeddings_created += 1
-                        if i < 3:  # Log dos primeiros 3 para debug
-                            logger.debug(f"Chunk {i}: embedding com {len(embedding)} dimensões")
-
-                # Commit das atualizações de embeddings
-                await self.db.commit()
-
-                if embeddings_created > 0:
-                    logger.info(f"✅ Embeddings criados e salvos: {embeddings_created}/{len(chunks)}")
-                else:
-                    logger.warning(f"⚠️  Nenhum embedding foi gerado (0/{len(chunks)})")
-
             except Exception as e:
                 logger.error(f"❌ Erro ao gerar embeddings: {str(e)}")
                 import traceback
                 logger.error(f"Traceback: {traceback.format_exc()}")
                 # Não falhar o upload se embeddings falharem
                 logger.info("Documento salvo sem embeddings - busca semântica não estará disponível")
+                embeddings = [None] * len(chunk_texts)
+            embeddings = list(embeddings) + [None] * (len(chunk_texts) - len(embeddings))
+
+            embeddings_created = sum(1 for embedding in embeddings if embedding)
+            if embeddings_created > 0:
+                logger.info(f"✅ Embeddings gerados: {embeddings_created}/{len(chunk_texts)}")
+            else:
+                logger.warning(f"⚠️  Nenhum embedding foi gerado (0/{len(chunk_texts)})")
+
+            # Um id_documento por arquivo do store; re-upload reaproveita o existente
+            id_documento = await self.check_file_exists(document_store_id, filename)
+            reupload = id_documento is not None and id_documento != document_store_id
+            if not reupload:
+                # Chunks antigos compartilham o id do store entre arquivos: não reindexar
+                id_documento = uuid.uuid5(document_store_id, filename)
+
+            chunks = (
+                DocumentoStoreFileChunkCreate(
+                    id_documento=id_documento,
+                    nr_chunk=i,
+                    id_store=document_store_id,
+                    ds_page_content=chunk_text,
+                    ds_metadata=json.dumps(
+                        {
+                            "filename": filename,
+                            "chunk_index": i,
+                            "document_store_id": str(document_store_id),
+                        }
+                    ),
+                    ds_embedding=embedding,
+                )
+                for i, (chunk_text, embedding) in enumerate(zip(chunk_texts, embeddings))
+            )
+
+            chunk_service = DocumentoStoreFileChunkService(self.db)
+            chunks_deleted = 0
+            if reupload:
+                reindexacao = await chunk_service.reindex_store_chunks(
+                    document_store_id, chunks, documento_id=id_documento
+                )
+                if reindexacao is None:
+                    raise ValueError(f"Document store {document_store_id} não encontrado")
+                chunks_deleted = reindexacao["chunks_deleted"]
+            else:
+                await chunk_service.create_chunks_batch(chunks)
+
+            logger.info(
+                f"Documento processado: {filename} - {len(chunk_texts)} chunks criados"
+                + (f", {chunks_deleted} substituídos" if reupload else "")
+            )
 
             return {
-                "chunks_created": len(chunks),
+                "id_documento": str(id_documento),
+                "chunks_created": len(chunk_texts),
+                "chunks_deleted": chunks_deleted,
                 "embeddings_created": embeddings_created,
                 "filename": filename,
                 "chunk_size": chunk_size,
@@ -660,7 +679,8 @@ class DocumentoStoreService:
         metadata_filter: Optional[dict] = None,
     ) -> list:
         """
-        Consulta o document store usando busca semântica com embeddings (fallback para keyword search)
+        Consulta o document store: busca vetorial (HNSW) fundida com full-text,
+        ou só full-text quando não há embedding da consulta (ver documento_store_search)
 
         Args:
             document_store_id: ID do document store
@@ -671,12 +691,11 @@ class DocumentoStoreService:
 
         Returns:
             Lista de resultados com chunk_id, content, score, filename, search_method
+            ("semantic", "keyword" ou "hybrid")
         """
         try:
-            from src.models.documento_store_file_chunk import DocumentoStoreFileChunk
             from src.models.agent import Agent
             from src.services.credencial_service import CredencialService
-            from sqlalchemy import or_, func
             import json
 
             # Buscar credencial para embeddings
@@ -707,151 +726,26 @@ class DocumentoStoreService:
                         if credential:
                             logger.info(f"Credencial obtida para busca (fallback): {credential.get('nome')} (tipo: {credential.get('nome_credencial')})")
 
-            # Tentar busca semântica primeiro
+            # Sem embedding da consulta (credencial indisponível) a busca fica só no texto
             query_embedding = await self.generate_embedding(query, credential)
 
-            chunks = []
-            search_method = "semantic"
-
-            if query_embedding:
-                # BUSCA SEMÂNTICA: Usar similaridade de cosseno com embeddings
-                logger.debug("Usando busca semântica com embeddings")
-
-                # Buscar chunks com embeddings que sejam mais similares à query
-                # Usar o operador <=> do pgvector que retorna cosine distance
-                # Similaridade = 1 - distance
-                from sqlalchemy import func as sql_func, text
-
-                stmt = (
-                    select(
-                        DocumentoStoreFileChunk,
-                        # Calcular similaridade como 1 - cosine_distance
-                        (1 - DocumentoStoreFileChunk.ds_embedding.cosine_distance(query_embedding)).label('similarity')
-                    )
-                    .where(DocumentoStoreFileChunk.id_store == document_store_id)
-                    .where(DocumentoStoreFileChunk.ds_embedding.isnot(None))
-                )
-
-                # Aplicar filtro de similaridade mínima
-                if min_similarity > 0:
-                    stmt = stmt.where(
-                        (1 - DocumentoStoreFileChunk.ds_embedding.cosine_distance(query_embedding)) >= min_similarity
-                    )
-
-                # Aplicar filtros de metadados se fornecidos
-                if metadata_filter:
-                    import json
-                    for key, value in metadata_filter.items():
-                        # Filtrar usando JSONB contains operator
-                        filter_json = json.dumps({key: value})
-                        stmt = stmt.where(
-                            text(f"ds_metadata::jsonb @> '{filter_json}'::jsonb")
-                        )
-
-                # Ordenar por similaridade (maior primeiro) e limitar
-                stmt = (
-                    stmt.order_by(DocumentoStoreFileChunk.ds_embedding.cosine_distance(query_embedding))
-                    .limit(top_k * 2)  # Buscar mais para ter margem após filtros
-                )
-
-                result = await self.db.execute(stmt)
-                rows = result.all()
-
-                # Extrair chunks e similaridades
-                chunks = [(row[0], row[1]) for row in rows]  # (chunk, similarity)
-
-                logger.info(f"Busca semântica retornou {len(chunks)} chunks")
-
-            # Fallback para busca por keywords se não houver embeddings ou resultados
-            if not chunks:
-                search_method = "keyword"
-                logger.debug("Fallback para busca por palavras-chave")
-
-                # Extrair palavras-chave da query (palavras com 3+ caracteres)
-                import re
-                keywords = [word for word in re.findall(r'\b\w+\b', query.lower())
-                           if len(word) >= 3 and word not in ['que', 'para', 'como', 'por', 'com', 'uma', 'um', 'o', 'a', 'os', 'as']]
-
-                logger.debug(f"Palavras-chave extraídas da query: {keywords}")
-
-                # Busca por palavras-chave
-                if not keywords:
-                    # Se não há palavras-chave, usar a query completa
-                    conditions = [DocumentoStoreFileChunk.ds_page_content.ilike(f"%{query}%")]
-                else:
-                    # Buscar chunks que contenham QUALQUER uma das palavras-chave
-                    conditions = [
-                        DocumentoStoreFileChunk.ds_page_content.ilike(f"%{keyword}%")
-                        for keyword in keywords
-                    ]
-
-                stmt = (
-                    select(DocumentoStoreFileChunk)
-                    .where(DocumentoStoreFileChunk.id_store == document_store_id)
-                    .where(or_(*conditions))
-                    .limit(top_k * 2)  # Buscar mais chunks para ter opções
-                )
-
-                result = await self.db.execute(stmt)
-                chunks = result.scalars().all()[:top_k]
-
-                logger.info(f"Busca por keywords retornou {len(chunks)} chunks")
-
-            # Formatar resultados
-            results = []
-            import json
-            import ast
-
-            # Para busca semântica, chunks é uma lista de tuplas (chunk, similarity)
-            # Para busca keyword, chunks é uma lista de objetos chunk
-            if search_method == "semantic":
-                chunks_to_process = chunks[:top_k]  # Já vem com (chunk, similarity)
-            else:
-                chunks_to_process = [(chunk, 0.0) for chunk in chunks[:top_k]]  # Keyword não tem similarity
-
-            for chunk_data in chunks_to_process:
-                # Desempacotar chunk e score
-                if search_method == "semantic":
-                    chunk, score = chunk_data
-                else:
-                    chunk = chunk_data[0]
-                    score = 0.0
-
-                # Extrair filename do metadata se possível
-                filename = "unknown"
-                metadata_dict = {}
-                try:
-                    if chunk.ds_metadata:
-                        # Tentar JSON primeiro (formato correto)
-                        try:
-                            metadata_dict = json.loads(chunk.ds_metadata)
-                        except json.JSONDecodeError:
-                            # Fallback para Python dict string (single quotes)
-                            metadata_dict = ast.literal_eval(chunk.ds_metadata)
-                        filename = metadata_dict.get("filename", "unknown")
-                except:
-                    pass
-
-                # Garantir que score está entre 0 e 1
-                score = max(0.0, min(1.0, float(score)))
-
-                results.append(
-                    {
-                        "chunk_id": str(chunk.id_chunk),
-                        "filename": filename,
-                        "chunk_index": chunk.nr_chunk,
-                        "content": chunk.ds_page_content,
-                        "score": round(score, 4),
-                        "search_method": search_method,
-                        "metadata": metadata_dict,
-                    }
-                )
+            results = await buscar_chunks(
+                self.db,
+                document_store_id,
+                query,
+                query_embedding,
+                top_k=top_k,
+                min_similarity=min_similarity,
+                metadata_filter=metadata_filter,
+            )
 
+            search_method = results[0]["search_method"] if results else "none"
             logger.info(f"Retornando {len(results)} resultados (método: {search_method})")
             return results
 
         except Exception as e:
             logger.error(f"Erro ao consultar document store: {str(e)}")
+            await self.db.rollback()
             return []
 
     async def list_files_in_document_store(
@@ -956,24 +850,26 @@ class DocumentoStoreService:
             from src.models.documento_store_file_chunk import DocumentoStoreFileChunk
             import json
 
-            # Buscar chunks que possam ter este filename no metadata
-            stmt = select(DocumentoStoreFileChunk).where(
-                DocumentoStoreFileChunk.id_store == document_store_id
-            ).limit(1000)  # Limitar para evitar carregar muitos chunks
+            # Primeiro chunk de cada arquivo (só id e metadata, sem o embedding)
+            stmt = select(
+                DocumentoStoreFileChunk.id_documento, DocumentoStoreFileChunk.ds_metadata
+            ).where(
+                DocumentoStoreFileChunk.id_store == document_store_id,
+                DocumentoStoreFileChunk.nr_chunk == 0,
+            )
 
             result = await self.db.execute(stmt)
-            chunks = result.scalars().all()
 
-            # Verificar metadata de cada chunk
-            for chunk in chunks:
-                if chunk.ds_metadata:
+            # Verificar metadata de cada arquivo
+            for id_documento, ds_metadata in result.all():
+                if ds_metadata:
                     try:
-                        metadata = json.loads(chunk.ds_metadata)
+                        metadata = json.loads(ds_metadata)
                         if metadata.get("filename") == filename:
                             logger.info(
-                                f"Arquivo '{filename}' já existe no store {document_store_id} (id_documento: {chunk.id_documento})"
+                                f"Arquivo '{filename}' já existe no store {document_store_id} (id_documento: {id_documento})"
                             )
-                            return chunk.id_documento
+                            return id_documento
                     except:
                         continue
 
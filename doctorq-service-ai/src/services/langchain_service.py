@@ -13,7 +13,7 @@ from langchain_openai import AzureChatOpenAI
 from pydantic import SecretStr
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.config.agent_cache import get_agent_cache
+from src.config.agent_cache import get_agent_cache, versao_agente
 from src.config.langfuse_config import get_langfuse_config
 from src.config.logger_config import get_logger, is_debug_level
 from src.config.orm_config import get_db
@@ -147,13 +147,15 @@ class LangChainService:
             # Reabilitar callbacks apÃ³s confirmar que streaming funciona
             if session_id:
                 callbacks = self.langfuse_config.get_callbacks_with_session(
-                    session_id=session_id, trace_name="AgentExecutor"
+                    session_id=session_id,
+                    trace_name="AgentExecutor",
+                    agent_config=agent_config,
                 )
                 logger.debug(
                     f"Callbacks Langfuse para Azure OpenAI habilitados (session: {session_id}): {len(callbacks)} callbacks"
                 )
             else:
-                callbacks = self.langfuse_config.get_callbacks()
+                callbacks = self.langfuse_config.get_callbacks(agent_config)
                 logger.debug(
                     f"Callbacks Langfuse padrÃ£o para Azure OpenAI: {len(callbacks)} callbacks"
                 )
@@ -219,18 +221,38 @@ class LangChainService:
                         f"agent_id invÃ¡lido no agent_config: {agent_config.get('agent_id')}"
                     )
 
-            # Tentar obter do cache primeiro (incluindo filtros na chave)
             if agent_id:
-                cached_executor = await self._agent_cache.get_agent_executor(
-                    agent_id, filter_sources
+                # Single-flight: requisições concorrentes do mesmo agente (mesma
+                # versão e filtros) aguardam uma única construção
+                agent_executor = await self._agent_cache.get_or_create_agent_executor(
+                    agent_id,
+                    lambda: self._construir_agent_executor(
+                        session_id, user_id, filter_sources, agent_config
+                    ),
+                    filter_sources=filter_sources,
+                    versao=versao_agente(agent_config),
                 )
-                if cached_executor:
-                    logger.info(
-                        f"AgentExecutor obtido do cache: {agent_id} (filtros: {filter_sources})"
-                    )
-                    self.agent_executor = cached_executor
-                    return cached_executor
+                if agent_executor:
+                    self.agent_executor = agent_executor
+                return agent_executor
+
+            return await self._construir_agent_executor(
+                session_id, user_id, filter_sources, agent_config
+            )
+
+        except Exception as e:
+            logger.error(f"Erro ao configurar agente: {e}")
+            return None
 
+    async def _construir_agent_executor(
+        self,
+        session_id: Optional[str],
+        user_id: Optional[str],
+        filter_sources: Optional[List[str]],
+        agent_config: Optional[Dict[str, Any]],
+    ) -> Optional[AgentExecutor]:
+        """Criar AgentExecutor (tools, prompt e callbacks) sem consultar o cache"""
+        try:
             # Verificar profundidade de inicializaÃ§Ã£o
             self._initialization_depth += 1
             if self._initialization_depth > self._max_initialization_depth:
@@ -253,10 +275,12 @@ class LangChainService:
             # CORREÃ‡ÃƒO: Obter callbacks do Langfuse ANTES de usar
             if session_id:
                 callbacks = self.langfuse_config.get_callbacks_with_session(
-                    session_id=session_id, trace_name="AgentExecutor"
+                    session_id=session_id,
+                    trace_name="AgentExecutor",
+                    agent_config=agent_config,
                 )
             else:
-                callbacks = self.langfuse_config.get_callbacks()
+                callbacks = self.langfuse_config.get_callbacks(agent_config)
 
             # Inicializar tool manager de forma mais simples
             if not self.tool_manager:
@@ -269,7 +293,9 @@ class LangChainService:
                 ):
                     try:
                         trace_context = self.langfuse_config.create_session_context(
-                            session_id=session_id, trace_name="AgentExecutor"
+                            session_id=session_id,
+                            trace_name="AgentExecutor",
+                            agent_config=agent_config,
                         )
                     except Exception as e:
                         logger.warning(
@@ -498,15 +524,6 @@ class LangChainService:
                     self.agent_executor = agent_executor
                     logger.debug("AgentExecutor armazenado com sucesso")
 
-                    # Salvar no cache se temos agent_id (incluindo filtros na chave)
-                    if agent_id and self._agent_cache:
-                        await self._agent_cache.set_agent_executor(
-                            agent_id, agent_executor, filter_sources
-                        )
-                        logger.debug(
-                            f"AgentExecutor salvo no cache: {agent_id} (filtros: {filter_sources})"
-                        )
-
                 except Exception as e:
                     logger.error(f"Erro ao criar AgentExecutor: {e}", exc_info=True)
                     agent_executor = None
@@ -1,4 +1,7 @@
 ﻿# src/services/streaming_agent_executor.py
+import asyncio
+import json
+import os
 import uuid
 from typing import Any, AsyncGenerator, Dict, List, Optional
 
@@ -6,9 +9,16 @@ from langchain_classic.agents import AgentExecutor
 from langchain_openai import AzureChatOpenAI
 
 from src.config.logger_config import get_logger
+from src.services.streaming_function_call_parser import ParserChamadasFuncao
 
 logger = get_logger(__name__)
 
+# Tool calls de um mesmo turno executadas em paralelo
+MAX_CONCORRENCIA_TOOLS = int(os.getenv("STREAMING_TOOLS_CONCORRENCIA", "4"))
+TIMEOUT_TOOL = float(os.getenv("STREAMING_TOOL_TIMEOUT", "120"))
+# Erros que abortam o turno (cancelam as demais tools) em vez de virar resultado
+ERROS_FATAIS_TOOL = (MemoryError, RecursionError)
+
 
 class StreamingAgentExecutor:
     """
@@ -16,9 +26,17 @@ class StreamingAgentExecutor:
     Combina streaming do LLM com execuÃ§Ã£o de ferramentas quando necessÃ¡rio.
     """
 
-    def __init__(self, agent_executor: AgentExecutor, llm: AzureChatOpenAI):
+    def __init__(
+        self,
+        agent_executor: AgentExecutor,
+        llm: AzureChatOpenAI,
+        max_concorrencia_tools: int = MAX_CONCORRENCIA_TOOLS,
+        timeout_tool: float = TIMEOUT_TOOL,
+    ):
         self.agent_executor = agent_executor
         self.llm = llm
+        self.max_concorrencia_tools = max(1, max_concorrencia_tools)
+        self.timeout_tool = timeout_tool
         self._intermediate_steps: List[Any] = []
 
     async def astream_invoke(
@@ -70,55 +88,37 @@ class StreamingAgentExecutor:
                     f"ðŸ”„ [STREAMING_AGENT] IteraÃ§Ã£o {iteration}/{max_tool_iterations}"
                 )
 
-                # 1. Tentar obter resposta do LLM com streaming
-                llm_response = ""
-                tool_calls = []
+                # 1. Stream do LLM: texto liberado assim que o parser sabe que
+                #    não faz parte de uma function call
+                parser = ParserChamadasFuncao(
+                    getattr(tool, "name", "") for tool in self.agent_executor.tools
+                )
 
                 try:
-                    # Stream da resposta do LLM
                     async for chunk in self.llm.astream(messages):
-                        if hasattr(chunk, "content") and chunk.content:
-                            content = str(chunk.content)
-                            llm_response += content
-
-                            # Se nÃ£o detectamos function calls ainda, fazer yield imediato
-                            if not self._contains_function_call_indicators(
-                                llm_response
-                            ):
-                                yield content
-
-                        # Capturar function calls se existirem
-                        if hasattr(chunk, "tool_calls") and chunk.tool_calls:
-                            tool_calls.extend(chunk.tool_calls)
-                        elif hasattr(
-                            chunk, "additional_kwargs"
-                        ) and chunk.additional_kwargs.get("tool_calls"):
-                            tool_calls.extend(chunk.additional_kwargs["tool_calls"])
+                        content = parser.consumir(chunk)
+                        if content:
+                            yield content
+                    resto, tool_calls = parser.finalizar()
+                    if resto:
+                        yield resto
 
                 except Exception as e:
                     logger.error(f"âŒ [STREAMING_AGENT] Erro no LLM streaming: {e}")
                     yield f"Erro no processamento: {e}"
                     return
 
-                # 2. Se nÃ£o hÃ¡ tool calls, resposta final
-                if not tool_calls and not self._needs_tool_execution(llm_response):
-                    logger.debug("âœ… [STREAMING_AGENT] Resposta final sem ferramentas")
-
-                    # Se ainda nÃ£o fizemos yield (caso function call foi detectado erroneamente)
-                    if self._contains_function_call_indicators(llm_response):
-                        # Limpar indicadores de function call e fazer yield
-                        clean_response = self._clean_function_call_artifacts(
-                            llm_response
-                        )
-                        if clean_response.strip():
-                            yield clean_response
+                llm_response = parser.texto
 
+                # 2. Sem tool calls (nativas ou JSON nomeando uma tool): resposta final
+                if not tool_calls:
+                    logger.debug("[STREAMING_AGENT] Resposta final sem ferramentas")
                     return
 
                 # 3. Executar ferramentas identificadas
-                if tool_calls or self._needs_tool_execution(llm_response):
+                if tool_calls:
                     logger.debug(
-                        f"ðŸ”§ [STREAMING_AGENT] Executando {len(tool_calls)} ferramentas"
+                        "[STREAMING_AGENT] Executando %d ferramentas", len(tool_calls)
                     )
 
                     # Indicar que estamos processando
@@ -130,9 +130,24 @@ class StreamingAgentExecutor:
                             tool_calls, llm_response
                         )
 
-                        # Adicionar resultados Ã s mensagens
+                        # Chamada do assistente antes dos resultados (ToolMessage
+                        # referencia o tool_call_id da AIMessage)
                         if tool_results:
-                            from langchain_core.messages import ToolMessage
+                            from langchain_core.messages import AIMessage, ToolMessage
+
+                            messages.append(
+                                AIMessage(
+                                    content=llm_response,
+                                    tool_calls=[
+                                        {
+                                            "name": tool_call["name"],
+                                            "args": self._parse_arguments(tool_call["arguments"]),
+                                            "id": tool_call["id"],
+                                        }
+                                        for tool_call in tool_calls
+                                    ],
+                                )
+                            )
 
                             for tool_result in tool_results:
                                 messages.append(
@@ -169,119 +184,133 @@ class StreamingAgentExecutor:
             logger.error(f"âŒ [STREAMING_AGENT] Erro geral: {e}")
             yield f"Erro no processamento: {e}"
 
-    def _contains_function_call_indicators(self, text: str) -> bool:
-        """Detectar se o texto contÃ©m indicadores de function calls."""
-        indicators = [
-            "tool_calls",
-            "function_call",
-            '{"name":',
-            '{"arguments":',
-            '"type":"function"',
-        ]
-        text_lower = text.lower()
-        return any(indicator.lower() in text_lower for indicator in indicators)
-
-    def _needs_tool_execution(self, text: str) -> bool:
-        """Determinar se precisamos executar ferramentas baseado no texto."""
-        # Implementar lÃ³gica para detectar necessidade de ferramentas
-        # Por exemplo, se o LLM menciona que vai usar uma ferramenta
-        tool_indicators = [
-            "vou buscar",
-            "vou consultar",
-            "vou pesquisar",
-            "consultando",
-            "buscando informaÃ§Ãµes",
-            "tool:",
-            "ferramenta:",
-        ]
-        text_lower = text.lower()
-        return any(indicator in text_lower for indicator in tool_indicators)
-
-    def _clean_function_call_artifacts(self, text: str) -> str:
-        """Limpar artefatos de function calls do texto."""
-        import re
-
-        # Remover JSON de function calls
-        text = re.sub(r'\{[^}]*"name"[^}]*\}', "", text)
-        text = re.sub(r'\{[^}]*"arguments"[^}]*\}', "", text)
-
-        # Remover linhas vazias extras
-        lines = [line.strip() for line in text.split("\n") if line.strip()]
-        return "\n".join(lines)
+    @staticmethod
+    def _parse_arguments(arguments: Any) -> Dict[str, Any]:
+        """Argumentos da tool call como dict (JSON inválido vira {})."""
+        if isinstance(arguments, dict):
+            return arguments
+        try:
+            parsed = json.loads(arguments or "{}")
+        except (TypeError, json.JSONDecodeError):
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
 
     async def _execute_tools(
         self, tool_calls: List[Any], llm_response: str
     ) -> List[Dict[str, Any]]:
-        """Executar ferramentas identificadas."""
+        """
+        Executar ferramentas identificadas.
+
+        Tool calls do mesmo turno são independentes: rodam em paralelo (até
+        max_concorrencia_tools) e os resultados voltam na ordem das chamadas.
+        Erro ou timeout de uma tool vira resultado "Erro: ..."; erro fatal
+        cancela as demais e é propagado.
+        """
         results = []
 
         try:
             if tool_calls:
-                # Executar via tool_calls estruturados
-                for tool_call in tool_calls:
-                    tool_name = tool_call.get("name") or tool_call.get(
-                        "function", {}
-                    ).get("name")
-                    tool_args = tool_call.get("arguments") or tool_call.get(
-                        "function", {}
-                    ).get("arguments", {})
-
-                    if isinstance(tool_args, str):
-                        import json
-
-                        try:
-                            tool_args = json.loads(tool_args)
-                        except json.JSONDecodeError:
-                            logger.warning(
-                                f"Argumentos invÃ¡lidos para {tool_name}: {tool_args}"
-                            )
-                            continue
-
-                    # Encontrar ferramenta correspondente
-                    tool = self._find_tool_by_name(tool_name)
-                    if tool:
-                        try:
-                            result = await tool.ainvoke(tool_args)
-                            results.append(
-                                {
-                                    "tool_name": tool_name,
-                                    "result": result,
-                                    "tool_call_id": tool_call.get(
-                                        "id", str(uuid.uuid4())
-                                    ),
-                                }
-                            )
-                            self._intermediate_steps.append((tool_call, result))
-                        except Exception as e:
-                            logger.error(f"Erro executando {tool_name}: {e}")
-                            results.append(
-                                {
-                                    "tool_name": tool_name,
-                                    "result": f"Erro: {e}",
-                                    "tool_call_id": tool_call.get(
-                                        "id", str(uuid.uuid4())
-                                    ),
-                                }
-                            )
+                semaforo = asyncio.Semaphore(self.max_concorrencia_tools)
+                tarefas = [
+                    asyncio.create_task(self._execute_tool_call(tool_call, semaforo))
+                    for tool_call in tool_calls
+                ]
+                try:
+                    resultados = await asyncio.gather(*tarefas)
+                except BaseException:
+                    for tarefa in tarefas:
+                        tarefa.cancel()
+                    await asyncio.gather(*tarefas, return_exceptions=True)
+                    raise
+
+                for tool_call, resultado in zip(tool_calls, resultados):
+                    results.append(resultado)
+                    if not resultado.get("erro"):
+                        self._intermediate_steps.append((tool_call, resultado["result"]))
             else:
                 # Fallback: tentar extrair do texto do LLM
                 logger.debug(
-                    f"Tentando extrair ferramentas do texto: {llm_response[:100]}..."
+                    "Tentando extrair ferramentas do texto: %s...", llm_response[:100]
                 )
                 # Implementar extraÃ§Ã£o de ferramentas do texto se necessÃ¡rio
 
+        except ERROS_FATAIS_TOOL:
+            raise
         except Exception as e:
             logger.error(f"Erro executando ferramentas: {e}")
-            results.append(
-                {
-                    "tool_name": "error",
-                    "result": f"Erro geral: {e}",
-                    "tool_call_id": str(uuid.uuid4()),
-                }
-            )
+            # Um resultado por chamada: a AIMessage lista todos os tool_call_id
+            results = [
+                self._resultado_erro(tool_call, f"Erro geral: {e}")
+                for tool_call in tool_calls
+            ]
 
         return results
 
+    async def _execute_tool_call(
+        self, tool_call: Any, semaforo: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        """
+        Executar uma tool call.
+
+        Argumentos inválidos ou tool desconhecida também viram resultado
+        "Erro: ...": todo tool_call_id da AIMessage precisa de um ToolMessage.
+        """
+        tool_name = self._tool_name(tool_call)
+        tool_args = tool_call.get("arguments") or tool_call.get(
+            "function", {}
+        ).get("arguments", {})
+
+        if isinstance(tool_args, str):
+            try:
+                tool_args = json.loads(tool_args)
+            except json.JSONDecodeError:
+                logger.warning(f"Argumentos invÃ¡lidos para {tool_name}: {tool_args}")
+                return self._resultado_erro(
+                    tool_call, f"Erro: argumentos inválidos para {tool_name}"
+                )
+
+        # Encontrar ferramenta correspondente
+        tool = self._find_tool_by_name(tool_name)
+        if not tool:
+            logger.warning(f"Tool desconhecida: {tool_name}")
+            return self._resultado_erro(tool_call, f"Erro: tool desconhecida: {tool_name}")
+
+        async with semaforo:
+            try:
+                result = await asyncio.wait_for(
+                    tool.ainvoke(tool_args), timeout=self.timeout_tool
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Timeout executando {tool_name} ({self.timeout_tool}s)")
+                return self._resultado_erro(
+                    tool_call, f"Erro: tempo limite de {self.timeout_tool:g}s excedido"
+                )
+            except ERROS_FATAIS_TOOL:
+                raise
+            except Exception as e:
+                logger.error(f"Erro executando {tool_name}: {e}")
+                return self._resultado_erro(tool_call, f"Erro: {e}")
+
+        return {
+            "tool_name": tool_name,
+            "result": result,
+            "tool_call_id": tool_call.get("id", str(uuid.uuid4())),
+        }
+
+    @staticmethod
+    def _tool_name(tool_call: Any) -> Optional[str]:
+        return tool_call.get("name") or tool_call.get("function", {}).get("name")
+
+    @classmethod
+    def _resultado_erro(cls, tool_call: Any, mensagem: str) -> Dict[str, Any]:
+        """Resultado de erro no tool_call_id da chamada (vira ToolMessage)."""
+        return {
+            "tool_name": cls._tool_name(tool_call),
+            "result": mensagem,
+            "tool_call_id": tool_call.get("id", str(uuid.uuid4())),
+            "erro": True,
+        }
+
     def _find_tool_by_name(self, tool_name: str) -> Optional[Any]:
         """Encontrar ferramenta pelo nome."""
         for tool in self.agent_executor.tools:
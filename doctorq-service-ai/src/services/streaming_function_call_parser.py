@@ -0,0 +1,212 @@
+# src/services/streaming_function_call_parser.py
+"""
+Parser incremental de function calls no streaming do LLM.
+
+Consome apenas o delta de cada chunk (custo linear no tamanho da resposta):
+- tool_calls nativos (tool_call_chunks / additional_kwargs["tool_calls"] no
+  formato OpenAI) são acumulados por índice até o fim do stream
+- texto é liberado para o cliente assim que se sabe que não faz parte de uma
+  chamada: só um "{" seguido de chave de function call ("name", "arguments",
+  "tool_calls", "function_call", "type") fica retido até o objeto JSON fechar
+- objeto JSON retido vira tool call se nomear uma tool do agente; senão volta
+  ao texto (JSON comum na resposta não dispara rodada de ferramentas)
+"""
+import json
+import re
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+CHAVES_CHAMADA = frozenset({"name", "arguments", "tool_calls", "function_call", "type"})
+
+# "{" + espaços + chave entre aspas + ":" (decisão) e seus prefixos (aguardar)
+_INICIO_CHAMADA = re.compile(r'\{\s*"([A-Za-z_]+)"\s*:')
+_INICIO_PARCIAL = re.compile(r'\{\s*(?:"[A-Za-z_]*(?:"\s*)?)?')
+# Retenção máxima para decidir se "{" inicia uma chamada
+_MAX_RETENCAO_INICIO = 64
+
+
+class ParserChamadasFuncao:
+    """Separa, chunk a chunk, o texto da resposta das function calls."""
+
+    def __init__(self, nomes_tools: Iterable[str] = ()):
+        self._nomes_tools = set(nomes_tools)
+        self._texto: List[str] = []
+        self._retido = ""
+        # Estado do objeto JSON em captura ("{" já classificado como chamada)
+        self._capturando = False
+        self._capturado: List[str] = []
+        self._profundidade = 0
+        self._em_string = False
+        self._escape = False
+        self._nativas: Dict[int, Dict[str, str]] = {}
+        self._textuais: List[Dict[str, Any]] = []
+
+    @property
+    def texto(self) -> str:
+        """Texto liberado até agora (sem as function calls)."""
+        return "".join(self._texto)
+
+    def consumir(self, chunk: Any) -> str:
+        """Processa um chunk do stream e retorna o texto que já pode ser enviado."""
+        self._consumir_tool_calls(chunk)
+        conteudo = getattr(chunk, "content", None)
+        return self.consumir_texto(str(conteudo)) if conteudo else ""
+
+    def consumir_texto(self, delta: str) -> str:
+        """Processa um delta de texto e retorna a parte que já pode ser enviada."""
+        liberado: List[str] = []
+        # _retido só guarda um "{" ainda não classificado (poucos caracteres)
+        pendente = self._retido + delta
+        self._retido = ""
+        posicao = 0
+
+        while posicao < len(pendente):
+            if self._capturando:
+                fim = self._avancar_json(pendente, posicao)
+                if fim is None:
+                    self._capturado.append(pendente[posicao:])
+                    break
+                self._capturado.append(pendente[posicao:fim])
+                self._fechar_objeto("".join(self._capturado), liberado)
+                posicao = fim
+                continue
+
+            abre = pendente.find("{", posicao)
+            if abre < 0:
+                liberado.append(pendente[posicao:])
+                break
+
+            decisao = self._classificar_inicio(pendente[abre : abre + _MAX_RETENCAO_INICIO])
+            liberado.append(pendente[posicao:abre])
+            if decisao is None:
+                self._retido = pendente[abre:]
+                break
+            if decisao:
+                self._iniciar_captura()
+                posicao = abre
+            else:
+                liberado.append("{")
+                posicao = abre + 1
+
+        texto = "".join(liberado)
+        if texto:
+            self._texto.append(texto)
+        return texto
+
+    def finalizar(self) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Fim do stream: texto ainda retido (objeto incompleto volta a ser texto)
+        e tool calls (nativas, ou as textuais se o modelo não usou as nativas).
+        """
+        resto = self._retido + "".join(self._capturado)
+        self._retido = ""
+        self._capturado = []
+        self._capturando = False
+        if resto:
+            self._texto.append(resto)
+
+        tool_calls = [
+            {
+                "name": chamada["name"],
+                "arguments": chamada["arguments"] or "{}",
+                "id": chamada["id"] or str(uuid.uuid4()),
+            }
+            for _, chamada in sorted(self._nativas.items())
+            if chamada["name"]
+        ]
+        return resto, tool_calls or list(self._textuais)
+
+    # ------------------------------------------------------------------
+
+    def _consumir_tool_calls(self, chunk: Any):
+        deltas = getattr(chunk, "tool_call_chunks", None)
+        if not deltas:
+            deltas = (getattr(chunk, "additional_kwargs", None) or {}).get("tool_calls") or []
+        for posicao, delta in enumerate(deltas):
+            funcao = delta.get("function") or {}
+            indice = delta.get("index")
+            indice = posicao if indice is None else indice
+            chamada = self._nativas.setdefault(indice, {"name": "", "arguments": "", "id": ""})
+            nome = delta.get("name") or funcao.get("name")
+            if nome:
+                chamada["name"] = nome
+            if delta.get("id"):
+                chamada["id"] = delta["id"]
+            argumentos = delta.get("args")
+            if argumentos is None:
+                argumentos = funcao.get("arguments")
+            if argumentos:
+                chamada["arguments"] += argumentos
+
+    @staticmethod
+    def _classificar_inicio(candidato: str) -> Optional[bool]:
+        """True: chamada; False: texto comum; None: precisa de mais texto."""
+        inicio = _INICIO_CHAMADA.match(candidato)
+        if inicio:
+            return inicio.group(1).lower() in CHAVES_CHAMADA
+        if len(candidato) < _MAX_RETENCAO_INICIO and _INICIO_PARCIAL.fullmatch(candidato):
+            return None
+        return False
+
+    def _iniciar_captura(self):
+        self._capturando = True
+        self._capturado = []
+        self._profundidade = 0
+        self._em_string = False
+        self._escape = False
+
+    def _avancar_json(self, texto: str, posicao: int) -> Optional[int]:
+        """Avança o objeto em captura; retorna o índice após o "}" final, se houver."""
+        for indice in range(posicao, len(texto)):
+            caractere = texto[indice]
+            if self._em_string:
+                if self._escape:
+                    self._escape = False
+                elif caractere == "\\":
+                    self._escape = True
+                elif caractere == '"':
+                    self._em_string = False
+            elif caractere == '"':
+                self._em_string = True
+            elif caractere == "{":
+                self._profundidade += 1
+            elif caractere == "}":
+                self._profundidade -= 1
+                if self._profundidade == 0:
+                    return indice + 1
+        return None
+
+    def _fechar_objeto(self, objeto: str, liberado: List[str]):
+        self._capturando = False
+        self._capturado = []
+        chamadas = self._chamadas_do_objeto(objeto)
+        if chamadas:
+            self._textuais.extend(chamadas)
+        else:
+            liberado.append(objeto)
+
+    def _chamadas_do_objeto(self, objeto: str) -> List[Dict[str, Any]]:
+        try:
+            dados = json.loads(objeto)
+        except ValueError:
+            return []
+        if not isinstance(dados, dict):
+            return []
+
+        candidatos = dados.get("tool_calls") if isinstance(dados.get("tool_calls"), list) else [dados]
+        chamadas = []
+        for candidato in candidatos:
+            if not isinstance(candidato, dict):
+                continue
+            funcao = candidato.get("function") or candidato.get("function_call") or candidato
+            if not isinstance(funcao, dict) or funcao.get("name") not in self._nomes_tools:
+                continue
+            argumentos = funcao.get("arguments", {})
+            chamadas.append(
+                {
+                    "name": funcao["name"],
+                    "arguments": argumentos if isinstance(argumentos, str) else json.dumps(argumentos),
+                    "id": candidato.get("id") or str(uuid.uuid4()),
+                }
+            )
+        return chamadas
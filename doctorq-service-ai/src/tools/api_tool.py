@@ -5,6 +5,12 @@ from typing import Any, Dict, List, Optional, Type
 import httpx
 from pydantic import BaseModel, Field, create_model
 
+from src.config.http_client_pool import (
+    CircuitoAbertoError,
+    atraso_retry,
+    chave_cache,
+    get_pool_http,
+)
 from src.config.logger_config import get_logger
 from src.models.api_config import ApiToolConfig, AuthType, HttpMethod
 
@@ -388,51 +394,94 @@ class ApiTool(BaseTool):
         }
 
     async def _execute_http_request(self, context: Dict[str, Any]) -> Any:
-        """Executa requisiÃ§Ã£o HTTP com retry inteligente."""
-        async with httpx.AsyncClient(timeout=context["timeout"]) as client:
-            last_exception = None
-
-            for attempt in range(context["max_retries"] + 1):
-                try:
-                    response = await client.request(
-                        method=context["method"],
-                        url=context["url"],
-                        params=context["params"],
-                        json=context["json"],
-                        headers=context["headers"],
-                    )
+        """
+        Executa requisição HTTP com retry inteligente.
 
-                    return await self._process_response(response)
+        Usa o cliente compartilhado do host (pool da aplicação), o circuit
+        breaker do host e, para GET com cache_ttl, o cache de respostas.
+        """
+        pool = get_pool_http()
+        client = self.client or pool.cliente(context["url"])
+        breaker = pool.circuit_breaker(context["url"])
+
+        cache_key = None
+        cache_ttl = self.api_config.endpoint.cache_ttl
+        if cache_ttl and context["method"] == HttpMethod.GET.value and not context["json"]:
+            cache_key = chave_cache(
+                context["method"], context["url"], context["params"], context["headers"]
+            )
+            cached = pool.cache.obter(cache_key)
+            if cached is not None:
+                logger.debug("Resposta de %s obtida do cache", context["url"])
+                return cached
 
-                except httpx.HTTPStatusError as e:
-                    last_exception = e
+        last_exception = None
 
-                    if not self._should_retry(
-                        e.response.status_code, attempt, context["max_retries"]
-                    ):
-                        raise ApiRequestError(
-                            f"HTTP {e.response.status_code}: {e.response.text[:200]}",
-                            status_code=e.response.status_code,
-                            response_text=e.response.text,
-                        )
+        for attempt in range(context["max_retries"] + 1):
+            try:
+                breaker.verificar()
+            except CircuitoAbertoError as e:
+                raise ApiRequestError(str(e), status_code=503)
 
-                    await self._handle_retry_delay(attempt, e.response.status_code)
+            try:
+                response = await client.request(
+                    method=context["method"],
+                    url=context["url"],
+                    params=context["params"],
+                    json=context["json"],
+                    headers=context["headers"],
+                    timeout=context["timeout"],
+                )
+            except httpx.TransportError as e:
+                breaker.registrar_falha()
+                last_exception = e
 
-                except Exception as e:
-                    last_exception = e
+                if attempt == context["max_retries"]:
+                    raise ApiRequestError(f"Erro de conexão: {str(e)}")
 
-                    if attempt == context["max_retries"]:
-                        raise ApiRequestError(f"Erro de conexÃ£o: {str(e)}")
+                logger.warning(
+                    "Tentativa %d falhou (%s), tentando novamente...",
+                    attempt + 1,
+                    type(e).__name__,
+                )
+                await self._handle_retry_delay(attempt, None)
+                continue
+            except BaseException:
+                breaker.liberar_teste()
+                raise
+
+            if response.status_code == 429 or response.status_code >= 500:
+                breaker.registrar_falha()
+            else:
+                breaker.registrar_sucesso()
 
-                    logger.warning(
-                        f"Tentativa {attempt + 1} falhou ({type(e).__name__}), tentando novamente..."
+            try:
+                response_data = await self._process_response(response)
+            except httpx.HTTPStatusError as e:
+                last_exception = e
+
+                if not self._should_retry(
+                    e.response.status_code, attempt, context["max_retries"]
+                ):
+                    raise ApiRequestError(
+                        f"HTTP {e.response.status_code}: {e.response.text[:200]}",
+                        status_code=e.response.status_code,
+                        response_text=e.response.text,
                     )
-                    await asyncio.sleep(2**attempt)
 
-            if last_exception:
-                raise ApiRequestError(
-                    f"Todas as tentativas falharam: {str(last_exception)}"
+                await self._handle_retry_delay(
+                    attempt, e.response.status_code, e.response.headers.get("Retry-After")
                 )
+                continue
+
+            if cache_key is not None:
+                pool.cache.gravar(cache_key, response_data, cache_ttl)
+            return response_data
+
+        if last_exception:
+            raise ApiRequestError(
+                f"Todas as tentativas falharam: {str(last_exception)}"
+            )
 
     async def _process_response(self, response: httpx.Response) -> Any:
         """Processa resposta HTTP."""
@@ -462,15 +511,17 @@ class ApiTool(BaseTool):
         }  # Rate limit, Bad Gateway, Service Unavailable, Gateway Timeout
         return status_code in retry_codes
 
-    async def _handle_retry_delay(self, attempt: int, status_code: int) -> None:
-        """Gerencia delay entre tentativas."""
-        if status_code == 429:  # Rate limit
-            delay = min(60, 2**attempt)  # Cap no mÃ¡ximo 60s para rate limit
-        else:
-            delay = 2**attempt
+    async def _handle_retry_delay(
+        self,
+        attempt: int,
+        status_code: Optional[int],
+        retry_after: Optional[str] = None,
+    ) -> None:
+        """Gerencia delay entre tentativas (Retry-After ou backoff com jitter)."""
+        delay = atraso_retry(attempt, retry_after)
 
         logger.info(
-            f"Aguardando {delay}s antes da prÃ³xima tentativa (HTTP {status_code})"
+            "Aguardando %.1fs antes da próxima tentativa (HTTP %s)", delay, status_code
         )
         await asyncio.sleep(delay)
 
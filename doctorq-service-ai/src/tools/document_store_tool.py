@@ -136,8 +136,10 @@ class DocumentStoreTool(BaseTool):
 
                 # Detectar método de busca do primeiro resultado
                 search_method = results[0].get('search_method', 'unknown') if results else 'unknown'
-                search_method_emoji = "🔍" if search_method == "semantic" else "📝"
-                search_method_name = "Busca Semântica (Vetorial)" if search_method == "semantic" else "Busca por Palavras-chave"
+                search_method_emoji, search_method_name = {
+                    "semantic": ("🔍", "Busca Semântica (Vetorial)"),
+                    "hybrid": ("🔀", "Busca Híbrida (Vetorial + Texto)"),
+                }.get(search_method, ("📝", "Busca por Palavras-chave"))
 
                 # Criar resposta formatada
                 response_parts = [
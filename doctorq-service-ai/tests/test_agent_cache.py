@@ -0,0 +1,179 @@
+"""
+Testes do AgentCache (single-flight, invalidação durante a construção e
+invalidação entre processos)
+Redis em memória via fakeredis; cada cache é uma instância própria (sem o singleton)
+"""
+
+import asyncio
+import uuid
+
+import fakeredis
+import pytest
+
+from src.config.agent_cache import CANAL_INVALIDACAO, AgentCache
+
+AGENTE = uuid.UUID("00000000-0000-0000-0000-0000000000a1")
+
+
+def novo_cache() -> AgentCache:
+    """Instância independente (AgentCache() devolve o singleton do processo)."""
+    cache = object.__new__(AgentCache)
+    cache.__init__()
+    return cache
+
+
+class Fabrica:
+    """Factory de executors que conta as construções e pode ficar bloqueada."""
+
+    def __init__(self):
+        self.nr_chamadas = 0
+        self.liberar = asyncio.Event()
+        self.liberar.set()
+
+    async def __call__(self):
+        self.nr_chamadas += 1
+        versao = self.nr_chamadas
+        await self.liberar.wait()
+        await asyncio.sleep(0.01)
+        return f"executor-v{versao}"
+
+
+async def _esperar(condicao, timeout=2.0):
+    limite = asyncio.get_running_loop().time() + timeout
+    while not condicao():
+        assert asyncio.get_running_loop().time() < limite, "condição não atingida"
+        await asyncio.sleep(0.01)
+
+
+async def test_misses_concorrentes_constroem_uma_vez():
+    cache, fabrica = novo_cache(), Fabrica()
+
+    resultados = await asyncio.gather(
+        *(
+            cache.get_or_create_agent_executor(AGENTE, fabrica, versao="v")
+            for _ in range(50)
+        )
+    )
+
+    assert fabrica.nr_chamadas == 1
+    assert set(resultados) == {"executor-v1"}
+    stats = await cache.get_stats()
+    assert (stats["misses"], stats["construcoes_compartilhadas"]) == (1, 49)
+    # Depois da construção, hit sem chamar a factory
+    assert (
+        await cache.get_or_create_agent_executor(AGENTE, fabrica, versao="v")
+        == "executor-v1"
+    )
+    assert fabrica.nr_chamadas == 1
+
+
+async def test_construcao_que_falha_nao_e_cacheada():
+    cache = novo_cache()
+
+    async def falhar():
+        raise RuntimeError("credencial indisponível")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_create_agent_executor(AGENTE, falhar)
+    assert await cache.get_agent_executor(AGENTE) is None
+    assert await cache.get_or_create_agent_executor(AGENTE, Fabrica()) == "executor-v1"
+
+
+async def test_invalidacao_durante_construcao_nunca_devolve_executor_antigo():
+    cache, fabrica = novo_cache(), Fabrica()
+    fabrica.liberar.clear()
+
+    antes = [
+        asyncio.create_task(
+            cache.get_or_create_agent_executor(AGENTE, fabrica, versao="v")
+        )
+        for _ in range(5)
+    ]
+    await _esperar(lambda: fabrica.nr_chamadas == 1)
+
+    await cache.invalidate_agent(AGENTE, propagar=False)
+    depois = asyncio.create_task(
+        cache.get_or_create_agent_executor(AGENTE, fabrica, versao="v")
+    )
+    await _esperar(lambda: fabrica.nr_chamadas == 2)
+    fabrica.liberar.set()
+
+    resultados = await asyncio.gather(*antes, depois)
+
+    assert "executor-v1" not in resultados
+    assert set(resultados) == {"executor-v2"}
+    assert fabrica.nr_chamadas == 2
+    assert await cache.get_agent_executor(AGENTE, versao="v") == "executor-v2"
+    assert (await cache.get_stats())["construcoes_descartadas"] == 5
+
+
+async def test_invalidacao_sem_outra_requisicao_reconstroi():
+    cache, fabrica = novo_cache(), Fabrica()
+    fabrica.liberar.clear()
+
+    tarefa = asyncio.create_task(cache.get_or_create_agent_executor(AGENTE, fabrica))
+    await _esperar(lambda: fabrica.nr_chamadas == 1)
+    await cache.invalidate_agent(AGENTE, propagar=False)
+    fabrica.liberar.set()
+
+    assert await tarefa == "executor-v2"
+
+
+@pytest.fixture
+async def dois_caches():
+    """Dois processos (caches) assinando o mesmo Redis."""
+    servidor = fakeredis.FakeServer()
+    redis_a = fakeredis.FakeAsyncRedis(server=servidor)
+    redis_b = fakeredis.FakeAsyncRedis(server=servidor)
+    a, b = novo_cache(), novo_cache()
+    await a.start_invalidation_listener(redis_a)
+    await b.start_invalidation_listener(redis_b)
+    await _esperar_assinaturas(redis_a, 2)
+    yield a, b
+    await a.stop_invalidation_listener()
+    await b.stop_invalidation_listener()
+
+
+async def _esperar_assinaturas(redis, total):
+    limite = asyncio.get_running_loop().time() + 2.0
+    canal = CANAL_INVALIDACAO.encode()
+    while dict(await redis.pubsub_numsub(CANAL_INVALIDACAO)).get(canal, 0) < total:
+        assert asyncio.get_running_loop().time() < limite, "assinaturas não ativas"
+        await asyncio.sleep(0.01)
+
+
+async def test_invalidacao_propagada_para_outro_processo(dois_caches):
+    a, b = dois_caches
+    outro_agente = uuid.uuid4()
+    for cache in (a, b):
+        await cache.set_agent_executor(AGENTE, "executor", versao="v")
+        await cache.set_agent_executor(outro_agente, "outro", versao="v")
+        await cache.set_agent_config(AGENTE, {"nome": "antigo"})
+
+    await a.invalidate_agent(AGENTE)
+
+    assert await a.get_agent_executor(AGENTE, versao="v") is None
+    await _esperar(
+        lambda: not b._agent_executors_cache.get((str(AGENTE), "v", "no_filter"))
+    )
+    assert await b.get_agent_config(AGENTE) is None
+    # Só o agente editado sai do cache; a mensagem própria é ignorada por A
+    assert await b.get_agent_executor(outro_agente, versao="v") == "outro"
+    assert (await a.get_stats())["invalidacoes"] == 1
+
+
+async def test_invalidacao_remota_descarta_construcao_em_andamento(dois_caches):
+    a, b = dois_caches
+    fabrica = Fabrica()
+    fabrica.liberar.clear()
+
+    tarefa = asyncio.create_task(
+        b.get_or_create_agent_executor(AGENTE, fabrica, versao="v")
+    )
+    await _esperar(lambda: fabrica.nr_chamadas == 1)
+    await a.invalidate_agent(AGENTE)
+    await _esperar(lambda: b._geracao(str(AGENTE)) == 1)
+    fabrica.liberar.set()
+
+    assert await tarefa == "executor-v2"
+    assert await b.get_agent_executor(AGENTE, versao="v") == "executor-v2"
@@ -0,0 +1,232 @@
+"""
+Testes do ApiTool com o pool de clientes HTTP (src/config/http_client_pool.py)
+Requisições atendidas por httpx.MockTransport: reuso do cliente por host,
+circuit breaker, Retry-After e cache de GET
+"""
+
+import asyncio
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from src.config import http_client_pool
+from src.config.http_client_pool import (
+    ABERTO,
+    FECHADO,
+    MEIO_ABERTO,
+    PoolClientesHttp,
+    atraso_retry,
+)
+from src.tools import api_tool
+from src.tools.api_tool import ApiRequestError, ApiTool
+
+
+class Servidor:
+    """Handler do MockTransport: respostas programadas por caminho e requisições recebidas."""
+
+    def __init__(self):
+        self.requisicoes = []
+        self.respostas = {}
+
+    def programar(self, caminho: str, *respostas: httpx.Response):
+        self.respostas[caminho] = list(respostas)
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requisicoes.append(request)
+        fila = self.respostas.get(request.url.path)
+        if fila:
+            return fila.pop(0) if len(fila) > 1 else fila[0]
+        return httpx.Response(200, json={"caminho": request.url.path})
+
+
+@pytest.fixture
+def servidor():
+    return Servidor()
+
+
+@pytest.fixture
+async def pool(servidor, monkeypatch):
+    pool = PoolClientesHttp(
+        transport=httpx.MockTransport(servidor), limite_falhas=3, tempo_aberto=0.2
+    )
+    monkeypatch.setattr(api_tool, "get_pool_http", lambda: pool)
+    yield pool
+    await pool.fechar()
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Atrasos de retry pedidos pelo ApiTool (sem dormir de verdade)."""
+    registradas = []
+
+    async def dormir(segundos):
+        registradas.append(segundos)
+
+    monkeypatch.setattr(api_tool, "asyncio", SimpleNamespace(sleep=dormir))
+    return registradas
+
+
+def criar_tool(url: str, token: str = "token-a", **endpoint) -> ApiTool:
+    return ApiTool.from_db_config(
+        {
+            "auth": {"type": "bearer", "token": token},
+            "endpoint": {
+                "url": url,
+                "method": "GET",
+                "max_retries": 0,
+                "parameters": [
+                    {
+                        "name": "q",
+                        "type": "string",
+                        "description": "Consulta",
+                        "location": "query",
+                    }
+                ],
+                **endpoint,
+            },
+        },
+        nm_tool="api_teste",
+        ds_tool="API de teste",
+    )
+
+
+async def test_cliente_reaproveitado_por_host(pool, servidor):
+    agenda = criar_tool("https://agenda.exemplo.com/horarios")
+    clinicas = criar_tool("https://agenda.exemplo.com/clinicas")
+    outro_host = criar_tool("https://pagamentos.exemplo.com/status")
+
+    for tool in (agenda, clinicas, agenda, outro_host):
+        await tool._execute_tool_logic(q="x")
+
+    assert len(servidor.requisicoes) == 4
+    assert pool.status()["clientes"] == [
+        "https://agenda.exemplo.com",
+        "https://pagamentos.exemplo.com",
+    ]
+    cliente = pool.cliente("https://AGENDA.exemplo.com/qualquer")
+    assert cliente is pool.cliente("https://agenda.exemplo.com/horarios")
+    assert cliente is not pool.cliente("https://pagamentos.exemplo.com/status")
+
+    # Cliente fechado é recriado na próxima chamada
+    await cliente.aclose()
+    await agenda._execute_tool_logic(q="x")
+    assert pool.cliente("https://agenda.exemplo.com") is not cliente
+
+
+async def test_circuit_breaker_fechado_aberto_meio_aberto_fechado(pool, servidor):
+    tool = criar_tool("https://instavel.exemplo.com/api")
+    breaker = pool.circuit_breaker("https://instavel.exemplo.com/api")
+    servidor.programar(
+        "/api",
+        httpx.Response(500),
+        httpx.Response(500),
+        httpx.Response(500),
+        httpx.Response(200, json={"ok": True}),
+    )
+
+    for _ in range(3):
+        assert breaker.estado == FECHADO
+        with pytest.raises(ApiRequestError) as erro:
+            await tool._execute_tool_logic(q="x")
+        assert erro.value.status_code == 500
+    assert breaker.estado == ABERTO
+
+    # Aberto: falha rápida sem ir à rede
+    with pytest.raises(ApiRequestError) as erro:
+        await tool._execute_tool_logic(q="x")
+    assert erro.value.status_code == 503
+    assert len(servidor.requisicoes) == 3
+
+    await asyncio.sleep(0.25)
+    assert breaker.estado == MEIO_ABERTO
+
+    assert await tool._execute_tool_logic(q="x") == {"ok": True}
+    assert breaker.estado == FECHADO
+    assert len(servidor.requisicoes) == 4
+
+
+async def test_falha_no_meio_aberto_reabre_o_circuito(pool, servidor):
+    tool = criar_tool("https://instavel.exemplo.com/api")
+    breaker = pool.circuit_breaker("https://instavel.exemplo.com/api")
+    servidor.programar("/api", httpx.Response(503))
+
+    for _ in range(3):
+        with pytest.raises(ApiRequestError):
+            await tool._execute_tool_logic(q="x")
+    await asyncio.sleep(0.25)
+
+    # Uma única falha na chamada de teste reabre
+    with pytest.raises(ApiRequestError) as erro:
+        await tool._execute_tool_logic(q="x")
+    assert erro.value.status_code == 503
+    assert breaker.estado == ABERTO
+    assert len(servidor.requisicoes) == 4
+
+
+async def test_retry_respeita_retry_after(pool, servidor, esperas):
+    tool = criar_tool("https://limitado.exemplo.com/api", max_retries=2)
+    servidor.programar(
+        "/api",
+        httpx.Response(429, headers={"Retry-After": "7"}),
+        httpx.Response(503, headers={"Retry-After": "2.5"}),
+        httpx.Response(200, json={"ok": True}),
+    )
+
+    assert await tool._execute_tool_logic(q="x") == {"ok": True}
+
+    assert esperas == [7.0, 2.5]
+    assert len(servidor.requisicoes) == 3
+    # As duas falhas ficam abaixo do limite: o circuito continua fechado
+    assert pool.circuit_breaker("https://limitado.exemplo.com").estado == FECHADO
+
+
+def test_atraso_retry_com_data_http_e_sem_retry_after():
+    em_30s = formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= atraso_retry(0, em_30s) <= 30
+    assert atraso_retry(0, formatdate(time.time() - 60, usegmt=True)) == 0.0
+    assert atraso_retry(0, "3600") == http_client_pool.RETRY_ATRASO_MAXIMO
+    # Sem Retry-After (ou inválido): full jitter até base * 2^tentativa
+    assert all(0 <= atraso_retry(2, "depois") <= 2.0 for _ in range(50))
+
+
+async def test_cache_de_get_por_url_parametros_e_headers(pool, servidor):
+    url = "https://catalogo.exemplo.com/procedimentos"
+    tool = criar_tool(url, cache_ttl=60)
+
+    primeira = await tool._execute_tool_logic(q="botox")
+    assert await tool._execute_tool_logic(q="botox") == primeira
+    assert len(servidor.requisicoes) == 1
+    assert pool.cache.hits == 1
+
+    # Outro parâmetro: outra entrada
+    await tool._execute_tool_logic(q="laser")
+    assert len(servidor.requisicoes) == 2
+
+    # Outra credencial no mesmo endpoint não reaproveita a resposta
+    await criar_tool(url, token="token-b", cache_ttl=60)._execute_tool_logic(q="botox")
+    assert len(servidor.requisicoes) == 3
+    assert servidor.requisicoes[-1].headers["Authorization"] == "Bearer token-b"
+
+    # Sem cache_ttl não há cache
+    sem_cache = criar_tool(url)
+    await sem_cache._execute_tool_logic(q="botox")
+    await sem_cache._execute_tool_logic(q="botox")
+    assert len(servidor.requisicoes) == 5
+
+
+async def test_cache_expira_pelo_ttl(pool, servidor, monkeypatch):
+    tool = criar_tool("https://catalogo.exemplo.com/procedimentos", cache_ttl=60)
+    agora = time.monotonic()
+    relogio = SimpleNamespace(monotonic=lambda: agora, time=time.time)
+    monkeypatch.setattr(http_client_pool, "time", relogio)
+
+    await tool._execute_tool_logic(q="botox")
+    await tool._execute_tool_logic(q="botox")
+    assert len(servidor.requisicoes) == 1
+
+    agora += 61
+    await tool._execute_tool_logic(q="botox")
+    assert len(servidor.requisicoes) == 2
@@ -0,0 +1,259 @@
+"""
+Testes do ciclo de vida dos chunks do document store: criação em lote,
+deleção por store, reindexação atômica e o upload de documentos
+
+Rodam contra o Postgres de TEST_DATABASE_URL (com a extensão vector), num
+schema temporário; sem a variável são pulados.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+
+import pytest
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.models.documento_store import DocumentoStore
+from src.models.documento_store_file_chunk import (
+    DocumentoStoreFileChunk,
+    DocumentoStoreFileChunkCreate,
+)
+from src.services import credencial_service
+from src.services.documento_store_file_chunk_service import (
+    DocumentoStoreFileChunkService,
+)
+from src.services.documento_store_service import DocumentoStoreService
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+DIMENSOES = 3072
+
+pytestmark = pytest.mark.requires_db
+
+
+class Statements:
+    """SQL enviado pelo engine (cada statement é um round-trip)."""
+
+    def __init__(self, engine):
+        self.executados = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self._registrar)
+
+    def _registrar(self, _conn, _cursor, statement, *_):
+        self.executados.append(statement.lstrip().split(None, 1)[0].upper())
+
+    def contar(self, comando: str) -> int:
+        return self.executados.count(comando)
+
+    def limpar(self):
+        self.executados.clear()
+
+
+@pytest.fixture
+async def banco():
+    """Engine num schema descartável com tb_documento_store e os chunks."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    schema = f"teste_chunks_{uuid.uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        connect_args={"server_settings": {"search_path": f"{schema},public"}},
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.run_sync(
+            DocumentoStore.metadata.create_all,
+            tables=[DocumentoStore.__table__, DocumentoStoreFileChunk.__table__],
+        )
+    try:
+        yield engine
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+@pytest.fixture
+def sessoes(banco):
+    return async_sessionmaker(banco, expire_on_commit=False)
+
+
+@pytest.fixture
+async def store_id(sessoes):
+    async with sessoes() as db:
+        store = DocumentoStore(nm_documento_store="teste")
+        db.add(store)
+        await db.commit()
+        return store.id_documento_store
+
+
+def embedding(semente: int):
+    return [((semente + i) % 7) / 7 for i in range(DIMENSOES)]
+
+
+def gerar_chunks(store_id, quantidade: int, geracao: int, documento_id=None):
+    """Gerador: cada chunk só é criado quando o lote do INSERT precisa dele."""
+    documento_id = documento_id or uuid.uuid5(store_id, "teste.txt")
+    for i in range(quantidade):
+        yield DocumentoStoreFileChunkCreate(
+            id_documento=documento_id,
+            nr_chunk=i,
+            id_store=store_id,
+            ds_page_content=f"Geração {geracao} - chunk {i}",
+            ds_metadata=json.dumps({"filename": "teste.txt", "chunk_index": i}),
+            ds_embedding=embedding(i),
+        )
+
+
+async def contar(sessoes, store_id, **filtros) -> int:
+    async with sessoes() as db:
+        stmt = select(func.count(DocumentoStoreFileChunk.id_chunk)).where(
+            DocumentoStoreFileChunk.id_store == store_id,
+            *(getattr(DocumentoStoreFileChunk, k) == v for k, v in filtros.items()),
+        )
+        return (await db.execute(stmt)).scalar()
+
+
+async def test_criacao_em_lote_e_delecao_por_store(banco, sessoes, store_id):
+    statements = Statements(banco)
+
+    async with sessoes() as db:
+        service = DocumentoStoreFileChunkService(db)
+        ids = await service.create_chunks_batch(
+            gerar_chunks(store_id, 1200, 1), batch_size=500
+        )
+
+        # 1200 linhas em 3 INSERT ... RETURNING
+        assert statements.contar("INSERT") == 3
+        assert len(set(ids)) == 1200
+        assert await contar(sessoes, store_id) == 1200
+
+        statements.limpar()
+        assert await service.delete_chunks_by_store(store_id) == 1200
+        assert statements.contar("DELETE") == 1
+        assert statements.contar("SELECT") == 0
+
+    assert await contar(sessoes, store_id) == 0
+
+
+async def test_reindexacao_nunca_expoe_geracao_parcial(banco, sessoes, store_id):
+    async with sessoes() as db:
+        service = DocumentoStoreFileChunkService(db)
+        await service.create_chunks_batch(gerar_chunks(store_id, 600, 1))
+
+        vistos = set()
+        fim = asyncio.Event()
+
+        async def leitor():
+            while not fim.is_set():
+                vistos.add(await contar(sessoes, store_id))
+
+        tarefa = asyncio.create_task(leitor())
+        resultado = await service.reindex_store_chunks(
+            store_id, gerar_chunks(store_id, 660, 2), batch_size=100
+        )
+        fim.set()
+        await tarefa
+
+    assert resultado == {"chunks_deleted": 600, "chunks_created": 660}
+    vistos.add(await contar(sessoes, store_id))
+    assert vistos <= {600, 660} and 660 in vistos
+
+
+async def test_falha_na_reindexacao_mantem_a_geracao_antiga(sessoes, store_id):
+    def geracao_quebrada():
+        yield from gerar_chunks(store_id, 150, 2)
+        raise ValueError("embedding indisponível")
+
+    async with sessoes() as db:
+        service = DocumentoStoreFileChunkService(db)
+        await service.create_chunks_batch(gerar_chunks(store_id, 300, 1))
+
+        with pytest.raises(RuntimeError):
+            await service.reindex_store_chunks(
+                store_id, geracao_quebrada(), batch_size=100
+            )
+
+    async with sessoes() as db:
+        conteudos = (
+            await db.execute(
+                select(DocumentoStoreFileChunk.ds_page_content).where(
+                    DocumentoStoreFileChunk.id_store == store_id
+                )
+            )
+        ).scalars()
+        assert all(c.startswith("Geração 1") for c in conteudos)
+    assert await contar(sessoes, store_id) == 300
+
+
+class ArquivoFalso:
+    def __init__(self, filename: str, conteudo: str):
+        self.filename = filename
+        self._conteudo = conteudo.encode()
+
+    async def read(self) -> bytes:
+        return self._conteudo
+
+
+class CredencialFalsa:
+    async def get_credencial_decrypted(self, _id):
+        return {"nome": "teste", "nome_credencial": "openIaApi"}
+
+
+@pytest.fixture
+def embedder_falso(monkeypatch):
+    async def gerar(_self, texts, credential=None, batch_size=100):
+        return [embedding(len(texto)) for texto in texts]
+
+    monkeypatch.setattr(credencial_service, "CredencialService", CredencialFalsa)
+    monkeypatch.setattr(DocumentoStoreService, "generate_embeddings_batch", gerar)
+
+
+async def test_upload_em_lote_e_reupload_reindexa_o_arquivo(
+    banco, sessoes, store_id, embedder_falso
+):
+    statements = Statements(banco)
+
+    async def upload(nome, conteudo):
+        async with sessoes() as db:
+            return await DocumentoStoreService(db).process_document_upload(
+                store_id, ArquivoFalso(nome, conteudo), embedding_credential_id="x"
+            )
+
+    # 2500 caracteres, chunks de 1000 com 200 de sobreposição: 4 chunks
+    guia = await upload("guia.txt", "a" * 2500)
+    assert guia["chunks_created"] == 4 and guia["embeddings_created"] == 4
+    assert guia["chunks_deleted"] == 0
+    # Todos os chunks do arquivo num único INSERT
+    assert statements.contar("INSERT") == 1
+
+    outro = await upload("outro.txt", "b" * 500)
+    assert outro["id_documento"] != guia["id_documento"]
+
+    statements.limpar()
+    novo = await upload("guia.txt", "c" * 700)
+    assert novo["id_documento"] == guia["id_documento"]
+    assert novo["chunks_created"] == 1 and novo["chunks_deleted"] == 4
+    assert statements.contar("DELETE") == 1 and statements.contar("INSERT") == 1
+
+    id_guia = uuid.UUID(guia["id_documento"])
+    async with sessoes() as db:
+        chunks = (
+            (
+                await db.execute(
+                    select(DocumentoStoreFileChunk).where(
+                        DocumentoStoreFileChunk.id_documento == id_guia
+                    )
+                )
+            )
+            .scalars()
+            .all()
+        )
+    assert [c.ds_page_content for c in chunks] == ["c" * 700]
+    assert chunks[0].ds_embedding is not None
+    # O outro arquivo do store não é tocado
+    assert (
+        await contar(sessoes, store_id, id_documento=uuid.UUID(outro["id_documento"]))
+        == 1
+    )
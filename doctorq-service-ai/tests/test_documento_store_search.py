@@ -0,0 +1,268 @@
+"""
+Testes da busca nos document stores: parâmetros do HNSW conforme a versão do
+pgvector e recall@k com um corpus rotulado
+
+Os embeddings vêm de um embedder falso e determinístico (feature hashing de
+radicais, com alguns sinônimos no mesmo radical), sem chamar provedor. Os
+testes de banco rodam contra o Postgres de TEST_DATABASE_URL (com a extensão
+vector), num schema temporário; sem a variável são pulados.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.models.documento_store import DocumentoStore
+from src.models.documento_store_file_chunk import (
+    DocumentoStoreFileChunk,
+    DocumentoStoreFileChunkCreate,
+)
+from src.services import documento_store_search
+from src.services.documento_store_file_chunk_service import (
+    DocumentoStoreFileChunkService,
+)
+from src.services.documento_store_search import (
+    DIMENSOES_EMBEDDING,
+    _configurar_hnsw,
+    _parse_versao,
+    buscar_chunks,
+)
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+CORPUS = {
+    "botox": (
+        "procedimentos.pdf",
+        "A toxina botulínica suaviza rugas dinâmicas da testa e dos olhos; o efeito dura de 4 a 6 meses.",
+    ),
+    "preenchimento": (
+        "procedimentos.pdf",
+        "O preenchimento com ácido hialurônico devolve volume aos lábios e às maçãs do rosto.",
+    ),
+    "bioestimulador": (
+        "procedimentos.pdf",
+        "Bioestimuladores de colágeno como Sculptra estimulam a produção natural de colágeno na pele.",
+    ),
+    "laser": (
+        "procedimentos.pdf",
+        "O laser de CO2 fracionado trata cicatrizes de acne e melhora a textura da pele.",
+    ),
+    "peeling": (
+        "procedimentos.pdf",
+        "O peeling químico remove camadas superficiais da pele e clareia manchas e melasma.",
+    ),
+    "pos_botox": (
+        "cuidados.pdf",
+        "Após a aplicação de toxina, evite deitar por 4 horas e não massageie a região tratada.",
+    ),
+    "pos_laser": (
+        "cuidados.pdf",
+        "Depois do laser use protetor solar FPS 50 e evite sol por 30 dias.",
+    ),
+    "gestante": (
+        "contraindicacoes.pdf",
+        "Gestantes e lactantes não devem realizar aplicação de toxina nem de bioestimuladores.",
+    ),
+    "agendamento": (
+        "atendimento.pdf",
+        "Agendamentos podem ser remarcados com 24 horas de antecedência pelo aplicativo.",
+    ),
+    "pagamento": (
+        "atendimento.pdf",
+        "Aceitamos Pix, cartão de crédito em até 10 vezes e boleto bancário.",
+    ),
+}
+
+CONSULTAS = [
+    ("quanto tempo dura o botox", {"botox"}),
+    ("tratamento para rugas na testa", {"botox"}),
+    ("encher os lábios", {"preenchimento"}),
+    ("Sculptra", {"bioestimulador"}),
+    ("cicatriz de acne", {"laser"}),
+    ("como tirar manchas e melasma", {"peeling"}),
+    ("cuidados depois do botox", {"pos_botox"}),
+    ("grávida pode fazer botox", {"gestante"}),
+    ("posso parcelar no cartão", {"pagamento"}),
+    ("remarcar consulta", {"agendamento"}),
+]
+
+RECALL_MINIMO = 0.8
+
+# Sinônimos no mesmo radical: o "semântico" do embedder falso
+SINONIMOS = {
+    "botox": "toxin",
+    "botulinica": "toxin",
+    "gravida": "gesta",
+    "gestantes": "gesta",
+    "encher": "volum",
+    "volume": "volum",
+    "labios": "labio",
+    "cicatriz": "cicat",
+    "cicatrizes": "cicat",
+    "parcelar": "vezes",
+    "remarcar": "agend",
+    "remarcados": "agend",
+    "manchas": "manch",
+    "rugas": "ruga",
+    "depois": "apos",
+}
+
+
+def radicais(texto: str):
+    sem_acento = (
+        unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode()
+    )
+    for palavra in re.findall(r"[a-z0-9]+", sem_acento):
+        if len(palavra) < 3:
+            continue
+        yield SINONIMOS.get(palavra, palavra[:5])
+
+
+def embedder_falso(texto: str):
+    """Feature hashing dos radicais em DIMENSOES_EMBEDDING posições, normalizado."""
+    vetor = [0.0] * DIMENSOES_EMBEDDING
+    for radical in radicais(texto):
+        digest = hashlib.sha1(radical.encode()).digest()
+        posicao = int.from_bytes(digest[:4], "big") % DIMENSOES_EMBEDDING
+        vetor[posicao] += 1.0 if digest[4] % 2 else -1.0
+    norma = math.sqrt(sum(v * v for v in vetor)) or 1.0
+    return [v / norma for v in vetor]
+
+
+class BancoFalso:
+    def __init__(self):
+        self.sql = []
+
+    async def execute(self, statement):
+        self.sql.append(str(statement))
+
+
+def test_parse_versao():
+    assert _parse_versao("0.8.0") == (0, 8, 0)
+    assert _parse_versao("0.7.4") == (0, 7, 4)
+    assert _parse_versao(None) == (0,)
+
+
+@pytest.mark.parametrize(
+    "versao, com_iterative_scan",
+    [((0, 6, 2), False), ((0, 7, 4), False), ((0, 8, 0), True), ((1, 0), True)],
+)
+async def test_iterative_scan_so_com_pgvector_que_suporta(versao, com_iterative_scan):
+    db = BancoFalso()
+
+    await _configurar_hnsw(db, 40, versao)
+
+    assert db.sql[0].startswith("SET LOCAL hnsw.ef_search")
+    assert any("iterative_scan" in sql for sql in db.sql) == com_iterative_scan
+
+
+@pytest.fixture
+async def store(monkeypatch):
+    """(sessões, store_id, chave do corpus por chunk_id) num schema descartável."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definida")
+    # Versão lida do banco de teste
+    monkeypatch.setattr(documento_store_search, "_versao_pgvector", None)
+    schema = f"teste_busca_{uuid.uuid4().hex[:8]}"
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        connect_args={"server_settings": {"search_path": f"{schema},public"}},
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.run_sync(
+            DocumentoStore.metadata.create_all,
+            tables=[DocumentoStore.__table__, DocumentoStoreFileChunk.__table__],
+        )
+    sessoes = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        async with sessoes() as db:
+            documento_store = DocumentoStore(nm_documento_store="recall")
+            db.add(documento_store)
+            await db.commit()
+            store_id = documento_store.id_documento_store
+
+            ids = await DocumentoStoreFileChunkService(db).create_chunks_batch(
+                DocumentoStoreFileChunkCreate(
+                    id_documento=uuid.uuid5(store_id, arquivo),
+                    nr_chunk=i,
+                    id_store=store_id,
+                    ds_page_content=conteudo,
+                    ds_metadata=json.dumps({"filename": arquivo, "chunk_index": i}),
+                    ds_embedding=embedder_falso(conteudo),
+                )
+                for i, (arquivo, conteudo) in enumerate(CORPUS.values())
+            )
+        chaves_por_id = {str(id_chunk): chave for id_chunk, chave in zip(ids, CORPUS)}
+        yield sessoes, store_id, chaves_por_id
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+
+async def recall_e_mrr(sessoes, store_id, chaves_por_id, k: int, modo: str):
+    acertos, rr = 0.0, 0.0
+    for consulta, relevantes in CONSULTAS:
+        embedding = None if modo == "texto" else embedder_falso(consulta)
+        async with sessoes() as db:
+            resultados = await buscar_chunks(
+                db, store_id, consulta, embedding, top_k=k, hibrida=(modo == "hibrida")
+            )
+        chaves = [chaves_por_id[r["chunk_id"]] for r in resultados]
+        acertos += len(relevantes & set(chaves)) / len(relevantes)
+        rr += next((1 / (i + 1) for i, c in enumerate(chaves) if c in relevantes), 0.0)
+        assert all(0.0 <= r["score"] <= 1.0 for r in resultados), resultados
+    return acertos / len(CONSULTAS), rr / len(CONSULTAS)
+
+
+@pytest.mark.requires_db
+async def test_recall_da_busca_hibrida(store):
+    sessoes, store_id, chaves_por_id = store
+
+    recall = {}
+    for modo in ("vetorial", "texto", "hibrida"):
+        recall[modo], _ = await recall_e_mrr(sessoes, store_id, chaves_por_id, 3, modo)
+
+    # Uma busca vazia (ex.: SET rejeitado pelo pgvector) zeraria o recall
+    assert recall["vetorial"] > 0 and recall["texto"] > 0
+    assert recall["hibrida"] >= RECALL_MINIMO, recall
+    assert recall["hibrida"] >= max(recall["vetorial"], recall["texto"]), recall
+
+
+@pytest.mark.requires_db
+async def test_metadata_filter_e_min_similarity(store):
+    sessoes, store_id, _ = store
+
+    async with sessoes() as db:
+        filtrados = await buscar_chunks(
+            db,
+            store_id,
+            "toxina",
+            embedder_falso("toxina"),
+            top_k=10,
+            metadata_filter={"filename": "cuidados.pdf"},
+        )
+    assert filtrados
+    assert all(r["filename"] == "cuidados.pdf" for r in filtrados)
+
+    async with sessoes() as db:
+        limiar = await buscar_chunks(
+            db,
+            store_id,
+            "toxina botulínica rugas",
+            embedder_falso("toxina botulínica rugas"),
+            top_k=10,
+            min_similarity=0.3,
+        )
+    assert limiar
+    assert all(r["score"] >= 0.3 for r in limiar)
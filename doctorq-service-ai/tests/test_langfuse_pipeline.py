@@ -0,0 +1,238 @@
+"""
+Testes do pipeline de tracing do Langfuse (src/config/langfuse_pipeline.py):
+amostragem por sessão, estimativa de tamanho e truncamento, e a fila com
+backpressure (fila cheia descarta o evento e o resto do run)
+"""
+
+import json
+import threading
+import uuid
+
+import pytest
+
+from src.config import langfuse_pipeline
+from src.config.langfuse_pipeline import (
+    FilaTracing,
+    amostrar,
+    chave_amostragem,
+    estimar_tamanho,
+    instrumentar_handler,
+    taxa_amostragem,
+    truncar_payload,
+)
+
+# =====================================================
+# AMOSTRAGEM
+# =====================================================
+
+
+def test_taxa_do_agente_da_empresa_ou_global():
+    empresas = {"emp-1": 0.25}
+
+    assert (
+        taxa_amostragem(
+            {"observability": {"taxaAmostragem": 0.1}, "id_empresa": "emp-1"},
+            empresas,
+            0.5,
+        )
+        == 0.1
+    )
+    assert taxa_amostragem({"id_empresa": "emp-1"}, empresas, 0.5) == 0.25
+    assert taxa_amostragem({"id_empresa": "emp-2"}, empresas, 0.5) == 0.5
+    assert taxa_amostragem(None, empresas, 0.5) == 0.5
+    # Limitada a [0, 1]
+    assert taxa_amostragem({"observability": {"taxaAmostragem": 3}}, {}, 0.5) == 1.0
+    assert taxa_amostragem({"observability": {"taxaAmostragem": -1}}, {}, 0.5) == 0.0
+
+
+def test_chave_de_amostragem():
+    assert chave_amostragem("sessao-1", {"agent_id": "a"}) == "sessao-1"
+    assert chave_amostragem(None, {"agent_id": "a"}) == "agente:a"
+    assert chave_amostragem(None, None) is None
+
+
+def test_amostragem_deterministica_por_sessao():
+    sessoes = [f"sessao-{i}" for i in range(4000)]
+
+    decisoes = [amostrar(sessao, 0.3) for sessao in sessoes]
+
+    # A mesma sessão sempre tem a mesma decisão
+    assert decisoes == [amostrar(sessao, 0.3) for sessao in sessoes]
+    assert 0.27 <= sum(decisoes) / len(sessoes) <= 0.33
+    # Taxa maior só acrescenta sessões (hash comparado ao limiar)
+    assert all(amostrar(s, 0.6) for s, d in zip(sessoes, decisoes) if d)
+    assert all(amostrar(s, 1.0) for s in sessoes)
+    assert not any(amostrar(s, 0.0) for s in sessoes)
+
+
+# =====================================================
+# TAMANHO E TRUNCAMENTO
+# =====================================================
+
+
+def test_estimar_tamanho_aproxima_o_json_e_para_no_limite():
+    dados = {"input": "olá mundo", "itens": [1, 2.5, None, True], "n": 3}
+
+    serializado = len(json.dumps(dados, ensure_ascii=False).encode("utf-8"))
+    assert estimar_tamanho(dados) == pytest.approx(serializado, rel=0.25)
+
+    grande = ["x" * 1000] * 1000
+    assert estimar_tamanho(grande) > 1_000_000
+    # Com limite, o percurso para logo depois de passar dele
+    assert 5000 < estimar_tamanho(grande, limite=5000) < 7000
+
+
+def test_truncar_payload_dentro_do_limite_nao_copia():
+    dados = {"input": "curto", "lista": [1, 2, 3]}
+
+    assert truncar_payload(dados, 1000) is dados
+    assert truncar_payload(None, 10) is None
+
+
+def test_truncar_payload_respeita_o_limite_e_prioriza_campos():
+    dados = {
+        "metadata": {"chave": "m" * 5000},
+        "input": "i" * 20000,
+        "historico": ["h" * 3000 for _ in range(20)],
+    }
+
+    truncado = truncar_payload(dados, 8000)
+
+    assert estimar_tamanho(truncado) <= 8000 * 1.1
+    # O campo prioritário entra primeiro, com início e fim preservados
+    assert "TRUNCADO" in truncado["input"]
+    assert truncado["input"].startswith("iii") and truncado["input"].endswith("iii")
+    # O original não é alterado
+    assert len(dados["input"]) == 20000 and len(dados["historico"]) == 20
+
+
+def test_truncar_lista_longa_marca_o_corte():
+    truncado = truncar_payload(["y" * 1000 for _ in range(100)], 5000)
+
+    assert truncado[-1]["truncated"] is True
+    assert "de 100 itens" in truncado[-1]["message"]
+
+
+# =====================================================
+# FILA E BACKPRESSURE
+# =====================================================
+
+
+@pytest.fixture
+def fila_travada():
+    """Fila de capacidade 10 com a thread presa numa tarefa até liberar()."""
+    fila = FilaTracing(capacidade=10)
+    iniciou, liberar = threading.Event(), threading.Event()
+
+    def travar():
+        iniciou.set()
+        liberar.wait(5)
+
+    assert fila.enfileirar(travar)
+    assert iniciou.wait(5)
+    fila.liberar = liberar.set
+    yield fila
+    liberar.set()
+    fila.drenar()
+
+
+def test_fila_cheia_descarta_o_run_inteiro(fila_travada):
+    fila = fila_travada
+    exportados = []
+    runs = [uuid.uuid4() for _ in range(10)]
+
+    # 90% da capacidade para inícios de run
+    for run_id in runs[:9]:
+        assert fila.enfileirar(lambda r=run_id: exportados.append(r), run_id=run_id)
+    assert not fila.enfileirar(lambda: exportados.append(runs[9]), run_id=runs[9])
+
+    # O restante fica para os fins dos runs aceitos
+    assert fila.enfileirar(lambda: exportados.append("fim"), runs[0], fim_run=True)
+    assert not fila.enfileirar(lambda: None, runs[1], fim_run=True)
+
+    # Filhos e o fim do run descartado também são descartados
+    assert not fila.enfileirar(lambda: None, uuid.uuid4(), parent_run_id=runs[9])
+    assert not fila.enfileirar(lambda: None, runs[9], fim_run=True)
+
+    fila.liberar()
+    assert fila.drenar()
+    assert exportados == runs[:9] + ["fim"]
+    metricas = fila.metricas()
+    assert metricas["nr_enfileirados"] == 11
+    assert metricas["nr_descartados"] == 4
+    assert metricas["nr_exportados"] == 11
+    assert metricas["nr_backlog"] == 0
+
+    # Com espaço de novo, runs novos voltam a ser aceitos
+    assert fila.enfileirar(lambda: None, run_id=uuid.uuid4())
+
+
+class HandlerFalso:
+    """Handler com a assinatura dos callbacks do LangChain; guarda o que recebeu."""
+
+    def __init__(self):
+        self.eventos = []
+
+    def on_chain_start(
+        self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs
+    ):
+        self.eventos.append(("chain_start", list(inputs["mensagens"])))
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        self.eventos.append(("chain_end", outputs))
+
+    def on_llm_new_token(self, token, *, run_id, parent_run_id=None, **kwargs):
+        self.eventos.append(("token", token))
+
+
+@pytest.fixture
+def copias(monkeypatch):
+    """Payloads (args/kwargs) copiados pelos callbacks, sem as chamadas recursivas."""
+    contagem = []
+    original = langfuse_pipeline.copiar_containers
+    copiando = threading.local()
+
+    def contar(valor):
+        if getattr(copiando, "ativo", False):
+            return original(valor)
+        contagem.append(valor)
+        copiando.ativo = True
+        try:
+            return original(valor)
+        finally:
+            copiando.ativo = False
+
+    monkeypatch.setattr(langfuse_pipeline, "copiar_containers", contar)
+    return contagem
+
+
+def test_callback_isola_o_payload_e_trunca_na_thread(copias):
+    fila = FilaTracing(capacidade=10)
+    handler = instrumentar_handler(HandlerFalso(), fila)
+    run_id = uuid.uuid4()
+    mensagens = ["oi"]
+
+    handler.on_chain_start({}, {"mensagens": mensagens}, run_id=run_id)
+    # O agente continua mexendo na lista depois do callback
+    mensagens.append("depois")
+    handler.on_llm_new_token("tok", run_id=run_id)
+    handler.on_chain_end({"output": "z" * 100000}, run_id=run_id)
+
+    assert fila.drenar()
+    assert handler.eventos[0] == ("chain_start", ["oi"])
+    assert handler.eventos[1] == ("token", "tok")
+    assert "TRUNCADO" in handler.eventos[2][1]["output"]
+    # Tokens não são copiados: só args/kwargs dos outros dois eventos
+    assert len(copias) == 4
+
+
+def test_evento_descartado_nao_copia_o_payload(fila_travada, copias):
+    fila = fila_travada
+    handler = instrumentar_handler(HandlerFalso(), fila)
+    for _ in range(9):
+        assert fila.enfileirar(lambda: None, run_id=uuid.uuid4())
+
+    handler.on_chain_start({}, {"mensagens": ["x" * 1000] * 1000}, run_id=uuid.uuid4())
+
+    assert copias == []
+    assert fila.metricas()["nr_descartados"] == 1
@@ -0,0 +1,152 @@
+"""
+Testes da execução das tool calls de um turno (paralelismo, ordem, timeout
+e erro fatal)
+Tools são stubs assíncronos com latência fixa; o LLM não é usado
+"""
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.streaming_agent_executor import StreamingAgentExecutor
+
+
+class ToolStub:
+    """Tool com latência fixa que registra execuções simultâneas e cancelamentos."""
+
+    ativas = 0
+    pico = 0
+
+    def __init__(self, name: str, latencia: float, erro: BaseException = None):
+        self.name = name
+        self.latencia = latencia
+        self.erro = erro
+        self.cancelada = False
+
+    async def ainvoke(self, args):
+        ToolStub.ativas += 1
+        ToolStub.pico = max(ToolStub.pico, ToolStub.ativas)
+        try:
+            await asyncio.sleep(self.latencia)
+            if self.erro:
+                raise self.erro
+            return f"{self.name}:{args.get('q')}"
+        except asyncio.CancelledError:
+            self.cancelada = True
+            raise
+        finally:
+            ToolStub.ativas -= 1
+
+
+@pytest.fixture(autouse=True)
+def zerar_contadores():
+    ToolStub.ativas = ToolStub.pico = 0
+
+
+def executor_com(*tools, **kwargs) -> StreamingAgentExecutor:
+    return StreamingAgentExecutor(
+        SimpleNamespace(tools=list(tools)), llm=None, **kwargs
+    )
+
+
+def chamadas(*nomes):
+    return [
+        {"name": nome, "arguments": json.dumps({"q": i}), "id": f"call_{i}"}
+        for i, nome in enumerate(nomes)
+    ]
+
+
+async def _cronometrar(coro):
+    inicio = time.perf_counter()
+    resultado = await coro
+    return resultado, time.perf_counter() - inicio
+
+
+async def test_turno_leva_a_maior_latencia_e_mantem_a_ordem_das_chamadas():
+    executor = executor_com(
+        ToolStub("lenta", 0.3), ToolStub("media", 0.2), ToolStub("rapida", 0.1)
+    )
+
+    resultados, segundos = await _cronometrar(
+        executor._execute_tools(chamadas("lenta", "media", "rapida"), "")
+    )
+
+    # Em série seriam 0.6s
+    assert 0.3 <= segundos < 0.45
+    assert [r["result"] for r in resultados] == ["lenta:0", "media:1", "rapida:2"]
+    assert [r["tool_call_id"] for r in resultados] == ["call_0", "call_1", "call_2"]
+    assert len(executor.get_intermediate_steps()) == 3
+
+
+async def test_concorrencia_limitada_pelo_semaforo():
+    tools = [ToolStub(f"t{i}", 0.1) for i in range(4)]
+    executor = executor_com(*tools, max_concorrencia_tools=2)
+
+    resultados, segundos = await _cronometrar(
+        executor._execute_tools(chamadas(*(t.name for t in tools)), "")
+    )
+
+    assert ToolStub.pico == 2
+    assert 0.2 <= segundos < 0.35
+    assert [r["tool_name"] for r in resultados] == ["t0", "t1", "t2", "t3"]
+
+
+async def test_timeout_vira_resultado_de_erro_sem_afetar_as_demais():
+    executor = executor_com(
+        ToolStub("travada", 0.5), ToolStub("ok", 0.05), timeout_tool=0.15
+    )
+
+    resultados, segundos = await _cronometrar(
+        executor._execute_tools(chamadas("travada", "ok"), "")
+    )
+
+    assert segundos < 0.3
+    assert resultados[0]["result"].startswith("Erro:") and resultados[0]["erro"]
+    assert resultados[0]["tool_call_id"] == "call_0"
+    assert resultados[1]["result"] == "ok:1"
+    # Só o resultado válido entra nos passos intermediários
+    assert [passo[1] for passo in executor.get_intermediate_steps()] == ["ok:1"]
+
+
+async def test_excecao_comum_vira_resultado_de_erro():
+    executor = executor_com(
+        ToolStub("quebra", 0.01, ValueError("api fora")), ToolStub("ok", 0.01)
+    )
+
+    resultados = await executor._execute_tools(chamadas("quebra", "ok"), "")
+
+    assert resultados[0]["result"] == "Erro: api fora"
+    assert resultados[1]["result"] == "ok:1"
+
+
+async def test_erro_fatal_cancela_as_demais_tools():
+    irmas = [ToolStub("lenta", 0.5), ToolStub("media", 0.3)]
+    executor = executor_com(ToolStub("fatal", 0.05, MemoryError()), *irmas)
+
+    with pytest.raises(MemoryError):
+        await executor._execute_tools(chamadas("fatal", "lenta", "media"), "")
+
+    assert all(tool.cancelada for tool in irmas)
+    assert ToolStub.ativas == 0
+
+
+async def test_tool_desconhecida_e_argumentos_invalidos_viram_resultado_de_erro():
+    executor = executor_com(ToolStub("ok", 0.01))
+    tool_calls = [
+        {"name": "inexistente", "arguments": "{}", "id": "call_0"},
+        {"name": "ok", "arguments": '{"q": ', "id": "call_1"},
+        {"name": "ok", "arguments": '{"q": 2}', "id": "call_2"},
+    ]
+
+    resultados = await executor._execute_tools(tool_calls, "")
+
+    # Todo tool_call_id da AIMessage recebe um ToolMessage
+    assert [r["tool_call_id"] for r in resultados] == ["call_0", "call_1", "call_2"]
+    assert resultados[0]["result"] == "Erro: tool desconhecida: inexistente"
+    assert resultados[1]["result"] == "Erro: argumentos inválidos para ok"
+    assert resultados[0]["erro"] and resultados[1]["erro"]
+    assert resultados[2]["result"] == "ok:2"
+    assert [passo[1] for passo in executor.get_intermediate_steps()] == ["ok:2"]
@@ -0,0 +1,84 @@
+"""
+Testes do parser incremental de function calls do streaming
+Respostas comuns não podem virar tool call (falsos positivos da detecção
+antiga por palavras-chave); chamadas de tools conhecidas são reconhecidas
+em qualquer fatiamento do stream
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.streaming_function_call_parser import ParserChamadasFuncao
+
+TOOLS = {"buscar_documentos", "consultar_agenda"}
+
+SEM_CHAMADA = [
+    "Vou buscar essas informações no prontuário e já te respondo.",
+    "Consultando a agenda, o próximo horário livre é às 14h.",
+    "A ferramenta: laser CO2 é indicada para rejuvenescimento.",
+    "O campo tool_calls da API da OpenAI lista as chamadas do modelo.",
+    'Exemplo de cadastro: {"name": "Maria", "idade": 34} conforme o formulário.',
+    'Payload: {"type": "function", "function": {"name": "outra_tool"}} não é nosso.',
+    "Use chaves {assim} no template e {{duplas}} para escapar.",
+    "Fórmula: f(x) = {x | x > 0}. Conjunto vazio: {}.",
+    'JSON truncado no fim da resposta: {"name": "buscar_doc',
+]
+
+COM_CHAMADA = [
+    'Um momento. {"name": "buscar_documentos", "arguments": {"consulta": "botox"}}',
+    '{"tool_calls": [{"id": "c1", "function": {"name": "consultar_agenda", '
+    '"arguments": "{\\"data\\": \\"2026-10-20\\"}"}}]}',
+]
+
+TAMANHOS_CHUNK = [1, 3, 7, 1000]
+
+
+def processar(texto: str, tamanho: int):
+    """(texto emitido, tool_calls) com o texto entregue em chunks de tamanho fixo."""
+    parser = ParserChamadasFuncao(TOOLS)
+    enviado = [
+        parser.consumir(SimpleNamespace(content=texto[i : i + tamanho]))
+        for i in range(0, len(texto), tamanho)
+    ]
+    resto, tool_calls = parser.finalizar()
+    return "".join(enviado) + resto, tool_calls
+
+
+@pytest.mark.parametrize("tamanho", TAMANHOS_CHUNK)
+@pytest.mark.parametrize("texto", SEM_CHAMADA)
+def test_resposta_sem_chamada_passa_intacta(texto, tamanho):
+    enviado, tool_calls = processar(texto, tamanho)
+
+    assert enviado == texto
+    assert tool_calls == []
+
+
+@pytest.mark.parametrize("tamanho", TAMANHOS_CHUNK)
+@pytest.mark.parametrize("texto", COM_CHAMADA)
+def test_chamada_de_tool_conhecida_e_reconhecida(texto, tamanho):
+    enviado, tool_calls = processar(texto, tamanho)
+
+    assert len(tool_calls) == 1
+    assert tool_calls[0]["name"] in TOOLS
+    assert "{" not in enviado
+
+
+def test_tool_call_chunks_nativos_acumulados_por_indice():
+    parser = ParserChamadasFuncao(TOOLS)
+    for delta in (
+        {"index": 0, "id": "call_1", "name": "buscar_documentos", "args": ""},
+        {"index": 0, "args": '{"consulta": '},
+        {"index": 0, "args": '"laser"}'},
+    ):
+        parser.consumir(SimpleNamespace(content="", tool_call_chunks=[delta]))
+
+    _, tool_calls = parser.finalizar()
+
+    assert tool_calls == [
+        {
+            "name": "buscar_documentos",
+            "arguments": '{"consulta": "laser"}',
+            "id": "call_1",
+        }
+    ]
@@ -37,7 +37,8 @@ module.exports = {
       env: {
         ENVIRONMENT: 'production',
         PORT: 8080,
-        LOG_LEVEL: 'INFO'
+        LOG_LEVEL: 'INFO',
+        APP_ROLE: 'api'
       },
       error_file: '/home/ec2-user/logs/doctorq-api-error.log',
       out_file: '/home/ec2-user/logs/doctorq-api-out.log',
@@ -45,6 +46,31 @@ module.exports = {
       time: true,
       merge_logs: true,
       log_date_format: 'YYYY-MM-DD HH:mm:ss Z'
+    },
+    {
+      // Jobs singleton (fila, campanhas, broadcast, exportação, estoque...):
+      // pode ter mais de uma instância, cada job roda em uma só (lease)
+      name: 'doctorq-worker',
+      cwd: '/home/ec2-user/DoctorQ/estetiQ-api',
+      script: 'uv',
+      args: 'run python -m src.worker',
+      instances: 1,
+      exec_mode: 'fork',
+      autorestart: true,
+      watch: false,
+      max_memory_restart: '1G',
+      kill_timeout: 30000,
+      env: {
+        ENVIRONMENT: 'production',
+        LOG_LEVEL: 'INFO',
+        APP_ROLE: 'worker'
+      },
+      error_file: '/home/ec2-user/logs/doctorq-worker-error.log',
+      out_file: '/home/ec2-user/logs/doctorq-worker-out.log',
+      log_file: '/home/ec2-user/logs/doctorq-worker-combined.log',
+      time: true,
+      merge_logs: true,
+      log_date_format: 'YYYY-MM-DD HH:mm:ss Z'
     }
   ],
 